@@ -0,0 +1,229 @@
+"""
+Decision cache — skip the LLM agents when a decision's inputs have not changed.
+
+Entries are keyed on (decision key, features digest, prompt ids/versions,
+model) and hold the messages each node added in the run that produced them.
+The strategy node prefetches the feature summary (served from the candle
+store) before calling its agent; when the key is cached, strategy, signal and
+risk replay their cached messages instead of calling the LLM. A node that
+runs its agent after all (opted out, or missing from the entry) ends the
+replay: the nodes after it run too. The graph ends after risk only when every
+node was replayed and the earlier run's exec step succeeded. Otherwise exec
+runs, and its outcome is recorded on success.
+
+Nodes listed in `decision_cache.nodes` with `false` always run their agent.
+Entries expire after `ttl_seconds`; beyond `max_entries` the least recently
+used are evicted. Each lookup traces a `decision_cache` event with the hit rate.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import ToolMessage
+
+from app.settings import settings
+
+CACHEABLE_NODES = ("strategy", "signal", "risk")
+EXEC_NODE = "exec"  # recorded, never replayed
+# execute_order results that did not place the order
+_NOT_EXECUTED = ("skipped", "rejected", "error")
+
+Key = Tuple[str, str, Tuple[Tuple[str, str, str], ...], str]
+
+
+class DecisionCache:
+    """Thread-safe LRU of node outputs per decision input, with a TTL."""
+
+    def __init__(self, max_entries: int | None = None, ttl_seconds: float | None = None):
+        cfg = settings.decision_cache
+        self.max_entries = max_entries or cfg.max_entries
+        self.ttl = cfg.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries: "OrderedDict[Key, Tuple[float, Dict[str, List[Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.nodes_replayed = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Key) -> Optional[Dict[str, List[Any]]]:
+        with self._lock:
+            self.lookups += 1
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            created, nodes = item
+            if time.time() - created > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return nodes
+
+    def put(self, key: Key, node: str, messages: List[Any]) -> None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                item = self._entries[key] = (time.time(), {})
+            item[1][node] = list(messages)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def peek(self, key: Key) -> Optional[Dict[str, List[Any]]]:
+        """Like `get`, without counting a lookup or touching the LRU order."""
+        with self._lock:
+            item = self._entries.get(key)
+            return item[1] if item is not None and time.time() - item[0] <= self.ttl else None
+
+    def count_replay(self) -> None:
+        with self._lock:
+            self.nodes_replayed += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "nodes_replayed": self.nodes_replayed,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# Process-wide cache
+decision_cache = DecisionCache()
+
+
+def _digest_of(content: Any) -> Optional[str]:
+    try:
+        return json.loads(content).get("features_digest")
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _failed(messages: List[Any]) -> bool:
+    return any(isinstance(m, ToolMessage) and str(m.content).startswith('{"error"') for m in messages)
+
+
+def _executed(messages: List[Any]) -> bool:
+    """Whether an exec step completed without a failed, skipped or rejected order."""
+    if not messages or _failed(messages):
+        return False
+    for m in messages:
+        if isinstance(m, ToolMessage) and m.name == "execute_order":
+            try:
+                result = json.loads(m.content)
+            except (TypeError, ValueError):
+                return False
+            if not isinstance(result, dict) or "error" in result or result.get("status") in _NOT_EXECUTED:
+                return False
+    return True
+
+
+class NodeCache:
+    """
+    Glue between the traced graph nodes and a DecisionCache.
+
+    `lookup` runs before a node's agent: it returns the state update to use
+    instead of calling the agent (a hit), or None. `record` runs after the
+    agent and stores the node's new messages; both carry `features_digest`
+    and `cache_hit` forward in the state. `cache_hit` stays true only while
+    every node so far was replayed, and `executed` says whether the cached
+    run's exec step succeeded.
+    """
+
+    def __init__(self, prompts: Dict[str, str], features_tool, cache: DecisionCache | None = None):
+        from app.prompts import prompt_registry
+        self.cache = cache or decision_cache
+        self.features_tool = features_tool
+        self.prompts = tuple(
+            (node, prompt_id, str(prompt_registry.get(prompt_id).meta.get("version")))
+            for node, prompt_id in sorted(prompts.items())
+        )
+        self.enabled_nodes = {n for n in CACHEABLE_NODES if settings.decision_cache.nodes.get(n, True)}
+
+    def key(self, ctx: dict, digest: str) -> Key:
+        return (ctx["decision_key"], digest, self.prompts, settings.llm.model)
+
+    # ----- lookup -----
+    def lookup(self, node: str, state: dict, ctx: dict) -> Tuple[Optional[dict], dict]:
+        if node == "strategy":
+            digest = self._prefetch(ctx) if "decision_key" in ctx else None
+            return self._lookup_strategy(state, ctx, digest)
+        return self._lookup_downstream(node, state, ctx)
+
+    async def alookup(self, node: str, state: dict, ctx: dict) -> Tuple[Optional[dict], dict]:
+        if node == "strategy":
+            digest = await self._aprefetch(ctx) if "decision_key" in ctx else None
+            return self._lookup_strategy(state, ctx, digest)
+        return self._lookup_downstream(node, state, ctx)
+
+    def _lookup_strategy(self, state: dict, ctx: dict, digest: Optional[str]) -> Tuple[Optional[dict], dict]:
+        if digest is None:
+            return None, {}
+        key = self.key(ctx, digest)
+        entry = self.cache.get(key)
+        carry = {"features_digest": digest, "cache_hit": entry is not None}
+        self._trace("strategy", ctx, carry["cache_hit"])
+        return self._replay("strategy", state, entry, carry), carry
+
+    def _lookup_downstream(self, node: str, state: dict, ctx: dict) -> Tuple[Optional[dict], dict]:
+        digest = state.get("features_digest")
+        if not digest or "decision_key" not in ctx:
+            return None, {}
+        carry = {"features_digest": digest, "cache_hit": bool(state.get("cache_hit"))}
+        if not carry["cache_hit"]:
+            return None, carry
+        entry = self.cache.peek(self.key(ctx, digest))
+        return self._replay(node, state, entry, carry), carry
+
+    def _replay(self, node: str, state: dict, entry: Optional[dict], carry: dict) -> Optional[dict]:
+        if entry is None or node not in self.enabled_nodes or node not in entry:
+            return None
+        self.cache.count_replay()
+        return {"messages": list(state.get("messages") or []) + entry[node], **carry, "executed": EXEC_NODE in entry}
+
+    # ----- record -----
+    def record(self, node: str, state: dict, result: dict, ctx: dict, carry: dict) -> dict:
+        if not carry:
+            return result
+        messages = result.get("messages") or []
+        new = messages[len(state.get("messages") or []):]
+        if node == EXEC_NODE:
+            if _executed(new):
+                self.cache.put(self.key(ctx, carry["features_digest"]), node, new)
+        elif node in self.enabled_nodes and new and not _failed(new):
+            self.cache.put(self.key(ctx, carry["features_digest"]), node, new)
+        # This node's output is fresh, so the nodes after it must not replay theirs
+        return {**result, **carry, "cache_hit": False, "executed": False}
+
+    # ----- features -----
+    def _prefetch(self, ctx: dict) -> Optional[str]:
+        try:
+            return _digest_of(self.features_tool.invoke({"instrument": ctx["instrument"], "timeframe": ctx["timeframe"]}))
+        except Exception:
+            return None  # the agent's own tool call surfaces the error
+
+    async def _aprefetch(self, ctx: dict) -> Optional[str]:
+        try:
+            return _digest_of(await self.features_tool.ainvoke({"instrument": ctx["instrument"], "timeframe": ctx["timeframe"]}))
+        except Exception:
+            return None
+
+    def _trace(self, node: str, ctx: dict, hit: bool) -> None:
+        from app.telemetry import tracer
+        tracer.log({"event_type": "decision_cache", "node": node, "status": "hit" if hit else "miss", **ctx,
+                    "output": self.cache.stats()})
@@ -0,0 +1,376 @@
+"""
+Event engine — runs triggered by market events instead of blind polling.
+
+A tick feed (the OANDA pricing stream, or a replayable local file / TCP
+socket stand-in) drives a `RollingATR` per instrument: ticks are bucketed into
+bars of `price_stream.bar_seconds` and a Wilder ATR over `atr_window` bars is
+updated in O(1) per tick. A move from the last bar close beyond
+`spike_threshold_atr` ATRs publishes a `PriceSpikeEvent` on the event bus and
+triggers runs for that instrument's decisions on the scheduler (coalesced with
+any run already queued or in flight).
+
+`MacroThrottle` polls the macro calendar every `macro_throttle.poll_minutes`
+and holds runs for instruments in a high-impact event's currency from
+`before_minutes` before it to `after_minutes` after it (as the scheduler's
+gate), publishing a `MacroEvent` for each new event.
+
+    tasks = start_event_tasks(scheduler)   # on the scheduler's event loop
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import json
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+from app.events import EventBus, MacroEvent, PriceSpikeEvent, bus
+from app.settings import PriceStreamSettings, settings
+from app.tools.http_clients import http_clients
+
+
+class Tick(NamedTuple):
+    instrument: str
+    time: float  # epoch seconds
+    price: float  # mid
+
+
+# --- Tick parsing ---
+_last_second: Tuple[Optional[str], float] = (None, 0.0)  # (whole-second timestamp with offset, epoch) of the previous tick
+
+
+def _epoch(value) -> float:
+    """Epoch seconds from a number or an RFC 3339 string (OANDA sends nanoseconds); no offset means UTC."""
+    global _last_second
+    if isinstance(value, (int, float)):
+        return float(value)
+    s = str(value)
+    try:
+        return float(s)
+    except ValueError:
+        pass
+    # Fractional digits go beyond what fromisoformat takes: split them off the offset
+    base, rest, digits = s[:19], s[19:], ""
+    if rest.startswith("."):
+        rest = rest[1:]
+        digits = rest[:len(rest) - len(rest.lstrip("0123456789"))]
+        rest = rest[len(digits):]
+    # Ticks arrive many per second: parse the whole-second part once per second
+    stamp = base + rest
+    cached = _last_second
+    if stamp != cached[0]:
+        parsed = datetime.fromisoformat(stamp)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        cached = _last_second = (stamp, parsed.timestamp())
+    return cached[1] + (float("0." + digits) if digits else 0.0)
+
+
+def parse_tick(line) -> Optional[Tick]:
+    """
+    One tick from a feed line, or None (heartbeats, blank lines).
+    Accepts OANDA pricing-stream JSON (`PRICE` with bids/asks), JSON with
+    instrument/time and price or bid/ask, and CSV `time,instrument,price` or
+    `time,instrument,bid,ask`.
+    """
+    if isinstance(line, bytes):
+        line = line.decode()
+    line = line.strip()
+    if not line:
+        return None
+    if line[0] == "{":
+        msg = json.loads(line)
+        if msg.get("type") == "HEARTBEAT":
+            return None
+        if "bids" in msg:
+            bid, ask = float(msg["bids"][0]["price"]), float(msg["asks"][0]["price"])
+            return Tick(msg["instrument"], _epoch(msg["time"]), (bid + ask) / 2)
+        price = msg.get("price")
+        if price is None:
+            price = (float(msg["bid"]) + float(msg["ask"])) / 2
+        return Tick(msg["instrument"], _epoch(msg["time"]), float(price))
+    row = next(csv.reader(io.StringIO(line)))
+    if row[0] == "time":  # header
+        return None
+    price = float(row[2]) if len(row) == 3 else (float(row[2]) + float(row[3])) / 2
+    return Tick(row[1], _epoch(row[0]), price)
+
+
+# --- Rolling ATR ---
+class RollingATR:
+    """Wilder ATR over tick-built bars of `bar_seconds`, updated in O(1) per tick."""
+
+    __slots__ = ("window", "bar_seconds", "bar_start", "high", "low", "close", "prev_close", "atr", "bars", "_tr_sum")
+
+    def __init__(self, window: int = 14, bar_seconds: int = 60):
+        self.window = window
+        self.bar_seconds = bar_seconds
+        self.bar_start: Optional[float] = None
+        self.high = self.low = self.close = 0.0
+        self.prev_close: Optional[float] = None  # close of the last completed bar
+        self.atr = 0.0
+        self.bars = 0  # completed bars
+        self._tr_sum = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.bars >= self.window
+
+    def update(self, ts: float, price: float) -> None:
+        start = ts - ts % self.bar_seconds
+        if start != self.bar_start:
+            if self.bar_start is not None:
+                self._close_bar()
+            self.bar_start = start
+            self.high = self.low = price
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+
+    def _close_bar(self) -> None:
+        tr = self.high - self.low
+        if self.prev_close is not None:
+            tr = max(tr, abs(self.high - self.prev_close), abs(self.low - self.prev_close))
+        self.bars += 1
+        if self.bars <= self.window:
+            # Seed with the simple mean of the first `window` true ranges
+            self._tr_sum += tr
+            self.atr = self._tr_sum / self.bars
+        else:
+            self.atr = (self.atr * (self.window - 1) + tr) / self.window
+        self.prev_close = self.close
+
+
+# --- Engine ---
+class EventEngine:
+    def __init__(self, scheduler=None, event_bus: EventBus | None = None, cfg: PriceStreamSettings | None = None):
+        self.cfg = cfg or settings.scheduler.price_stream
+        self.scheduler = scheduler
+        self.bus = event_bus or bus
+        self.atr: Dict[str, RollingATR] = {}
+        self._last_spike: Dict[str, float] = {}
+        self.ticks = 0
+        self.spikes = 0
+        self.runs_triggered = 0
+
+    def on_tick(self, instrument: str, ts: float, price: float) -> Optional[PriceSpikeEvent]:
+        """Advance `instrument`'s ATR; returns the spike event if this tick is one."""
+        self.ticks += 1
+        state = self.atr.get(instrument)
+        if state is None:
+            state = self.atr[instrument] = RollingATR(self.cfg.atr_window, self.cfg.bar_seconds)
+        state.update(ts, price)
+        if not state.ready:
+            return None
+        move = abs(price - state.prev_close)
+        if move <= self.cfg.spike_threshold_atr * state.atr:
+            return None
+        if ts - self._last_spike.get(instrument, float("-inf")) < self.cfg.cooldown_seconds:
+            return None
+        self._last_spike[instrument] = ts
+        event = PriceSpikeEvent(instrument=instrument, abs_change=move, atr=state.atr, price=price, time=ts)
+        self.on_spike(event)
+        return event
+
+    def on_spike(self, event: PriceSpikeEvent) -> None:
+        self.spikes += 1
+        self.bus.publish(event)
+        from app.telemetry import tracer
+        tracer.log({"event_type": "price_spike", "node": "event_engine", "status": "ok", "instrument": event.instrument,
+                    "output": {"abs_change": event.abs_change, "atr": event.atr, "price": event.price}})
+        if self.scheduler is None:
+            return
+        for key, d in self.scheduler.decisions.items():
+            if d.instrument == event.instrument:
+                if self.scheduler.trigger(key, reason="price_spike") != "throttled":
+                    self.runs_triggered += 1
+
+    async def consume(self, feed: AsyncIterator[Tick]) -> int:
+        """Feed ticks into the engine until the feed ends. Returns the ticks consumed."""
+        n = 0
+        on_tick = self.on_tick
+        async for tick in feed:
+            on_tick(*tick)
+            n += 1
+        return n
+
+    def stats(self) -> dict:
+        return {
+            "ticks": self.ticks, "spikes": self.spikes, "runs_triggered": self.runs_triggered,
+            "atr": {i: s.atr for i, s in self.atr.items() if s.ready},
+        }
+
+
+# --- Feeds ---
+async def oanda_price_stream(instruments: Iterable[str]) -> AsyncIterator[Tick]:
+    """Ticks from the OANDA v20 pricing stream (one long-lived connection)."""
+    url = f"/v3/accounts/{settings.oanda.account_id}/pricing/stream"
+    headers = {"Authorization": f"Bearer {settings.oanda.api_key}"}
+    client = http_clients.client("oanda_stream")
+    # No read timeout: the stream sends a heartbeat every 5 s, reconnects handle dead peers
+    async with client.stream("GET", url, params={"instruments": ",".join(instruments)}, headers=headers,
+                             timeout=httpx.Timeout(None, connect=10.0)) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            tick = parse_tick(line)
+            if tick is not None:
+                yield tick
+
+
+async def replay_feed(path: str, speed: float = 0.0, yield_every: int = 1000) -> AsyncIterator[Tick]:
+    """
+    Ticks from a local JSONL/CSV file (e.g. a recorded pricing stream).
+    `speed` 0 replays as fast as possible; 1 keeps the recorded pacing.
+    """
+    t0 = wall0 = None
+    with open(path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            tick = parse_tick(line)
+            if tick is None:
+                continue
+            if speed > 0:
+                if t0 is None:
+                    t0, wall0 = tick.time, time.monotonic()
+                delay = (tick.time - t0) / speed - (time.monotonic() - wall0)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif i % yield_every == 0:
+                await asyncio.sleep(0)  # let the scheduler's workers run
+            yield tick
+
+
+async def socket_feed(host: str, port: int) -> AsyncIterator[Tick]:
+    """Ticks as lines (JSON or CSV) from a TCP socket, e.g. a local price relay."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while line := await reader.readline():
+            tick = parse_tick(line)
+            if tick is not None:
+                yield tick
+    finally:
+        writer.close()
+
+
+def configured_feed(cfg: PriceStreamSettings | None = None) -> AsyncIterator[Tick]:
+    cfg = cfg or settings.scheduler.price_stream
+    if cfg.source == "replay":
+        if not cfg.replay_path:
+            raise ValueError("price_stream.source is 'replay' but price_stream.replay_path is not set")
+        return replay_feed(cfg.replay_path, cfg.replay_speed)
+    if cfg.source == "socket":
+        return socket_feed(cfg.socket_host, cfg.socket_port)
+    return oanda_price_stream(cfg.instruments)
+
+
+async def run_feed(engine: EventEngine, feed_factory: Callable[[], AsyncIterator[Tick]], max_backoff: float = 30.0) -> None:
+    """Consume a live feed forever, reconnecting with exponential backoff."""
+    backoff = 1.0
+    while True:
+        try:
+            if await engine.consume(feed_factory()):
+                backoff = 1.0
+            if engine.cfg.source == "replay":
+                return  # a file ends; nothing to reconnect to
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[event_engine] Price feed failed: {type(e).__name__}: {e}. Reconnecting in {backoff:.0f}s.", flush=True)
+        await asyncio.sleep(backoff)
+        backoff = min(max_backoff, backoff * 2)
+
+
+# --- Macro throttle ---
+# Fallback when a calendar item carries no currency
+COUNTRY_CURRENCY = {
+    "united states": "USD", "euro area": "EUR", "germany": "EUR", "france": "EUR", "italy": "EUR", "spain": "EUR",
+    "united kingdom": "GBP", "japan": "JPY", "switzerland": "CHF", "canada": "CAD", "australia": "AUD",
+    "new zealand": "NZD", "china": "CNY",
+}
+
+
+class MacroThrottle:
+    """Throttle windows around high-impact calendar events, per currency."""
+
+    def __init__(self, before_minutes: int | None = None, after_minutes: int | None = None,
+                 fetch: Callable[[], Awaitable[list]] | None = None, event_bus: EventBus | None = None):
+        cfg = settings.scheduler.macro_throttle
+        self.before = 60 * (cfg.before_minutes if before_minutes is None else before_minutes)
+        self.after = 60 * (cfg.after_minutes if after_minutes is None else after_minutes)
+        self._fetch = fetch
+        self.bus = event_bus or bus
+        self.windows: List[tuple] = []  # (start, end, currency, title)
+        self._seen: set = set()
+
+    def load(self, items: list) -> int:
+        """Replace the windows from calendar items; returns the number of new events."""
+        windows, new = [], 0
+        for item in items:
+            try:
+                when = _epoch(str(item["Date"]).replace(" ", "T"))
+            except (KeyError, ValueError):
+                continue
+            country = str(item.get("Country", ""))
+            currency = str(item.get("Currency") or COUNTRY_CURRENCY.get(country.lower(), "")).upper()
+            title = str(item.get("Event") or item.get("Category") or "")
+            if not currency:
+                continue
+            windows.append((when - self.before, when + self.after, currency, title))
+            key = (when, currency, title)
+            if key not in self._seen:
+                self._seen.add(key)
+                new += 1
+                self.bus.publish(MacroEvent(high_impact=True, country=country, title=title))
+        self.windows = sorted(windows)
+        return new
+
+    def active(self, instrument: str, now: float | None = None) -> Optional[str]:
+        """The event throttling `instrument` right now, or None."""
+        now = time.time() if now is None else now
+        currencies = instrument.upper().split("_")
+        for start, end, currency, title in self.windows:
+            if start > now:
+                break
+            if now < end and currency in currencies:
+                return f"{currency} {title}".strip()
+        return None
+
+    async def poll_forever(self, interval_minutes: float | None = None) -> None:
+        interval = 60 * (interval_minutes or settings.scheduler.macro_throttle.poll_minutes)
+        while True:
+            try:
+                items = await (self._fetch() if self._fetch else _upcoming())
+                new = self.load(items)
+                from app.telemetry import tracer
+                tracer.log({"event_type": "macro_throttle", "node": "event_engine", "status": "ok",
+                            "output": {"windows": len(self.windows), "new_events": new}})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[event_engine] Macro calendar poll failed: {type(e).__name__}: {e}", flush=True)
+            await asyncio.sleep(interval)
+
+
+async def _upcoming() -> list:
+    from app.tools.macro_tradingecon import upcoming
+    return await upcoming(high_impact_only=True)
+
+
+def start_event_tasks(scheduler) -> List[asyncio.Task]:
+    """Start the configured price feed and macro throttle on the running loop, wired to `scheduler`."""
+    cfg = settings.scheduler
+    tasks = []
+    if cfg.macro_throttle.enabled:
+        throttle = MacroThrottle()
+        scheduler.gate = throttle.active
+        tasks.append(asyncio.create_task(throttle.poll_forever(), name="macro-throttle"))
+    if cfg.price_stream.enabled:
+        engine = EventEngine(scheduler)
+        tasks.append(asyncio.create_task(run_feed(engine, configured_feed), name="price-feed"))
+    return tasks
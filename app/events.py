@@ -1,18 +1,81 @@
+"""
+In-process events and a minimal synchronous event bus.
+
+`get_candles` publishes a `CandleCloseEvent` carrying the last bar's OHLC, so
+subscribers (e.g. the paper broker) advance without re-reading the candle cache.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
 from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Type
 
 @dataclass
 class CandleCloseEvent:
     instrument: str
     timeframe: str
+    # Last closed bar; None when the event is only a trigger (e.g. scheduler)
+    time: Optional[str] = None
+    open: Optional[float] = None
+    high: Optional[float] = None
+    low: Optional[float] = None
+    close: Optional[float] = None
+
+    @property
+    def has_bar(self) -> bool:
+        return None not in (self.open, self.high, self.low, self.close)
 
 @dataclass
 class PriceSpikeEvent:
     instrument: str
     abs_change: float
     atr: float
+    price: Optional[float] = None
+    time: Optional[float] = None  # epoch seconds of the spiking tick
 
 @dataclass
 class MacroEvent:
     high_impact: bool
     country: str
     title: str
+
+
+Handler = Callable[[Any], None]
+
+
+class EventBus:
+    """Synchronous publish/subscribe keyed by event type. Handler errors are traced, not raised."""
+
+    def __init__(self) -> None:
+        self._handlers: Dict[Type, List[Handler]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, event_type: Type, handler: Handler) -> None:
+        with self._lock:
+            if handler not in self._handlers[event_type]:
+                self._handlers[event_type].append(handler)
+
+    def unsubscribe(self, event_type: Type, handler: Handler) -> None:
+        with self._lock:
+            if handler in self._handlers[event_type]:
+                self._handlers[event_type].remove(handler)
+
+    def publish(self, event: Any) -> int:
+        """Deliver `event` to its subscribers in order. Returns the number of handlers called."""
+        with self._lock:
+            handlers = list(self._handlers.get(type(event), ()))
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                from app.telemetry import tracer
+                tracer.log({"event_type": "error", "node": "event_bus", "status": "error",
+                            "error_type": type(e).__name__, "error_message": str(e),
+                            "input": {"event": type(event).__name__, "handler": getattr(handler, "__qualname__", repr(handler))}})
+        return len(handlers)
+
+
+# Process-wide bus
+bus = EventBus()
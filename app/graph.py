@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 import time
 from typing import TypedDict, List, Optional
 from functools import wraps
@@ -9,9 +10,11 @@ import json
 from langgraph.graph import StateGraph, END, MessagesState
 from langgraph.prebuilt import create_react_agent
 from langchain_core.tools import BaseTool
-from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables import RunnableLambda, RunnableConfig
 from langchain_core.messages import ToolMessage
 
+from app.decision_cache import NodeCache
+from app.policies import NodePolicy, policy_stats
 from app.llm import make_llm, SUPPORTS_TOOL_CALLING
 from app.prompts import prompt_registry
 from app.settings import settings
@@ -21,48 +24,86 @@ from app.telemetry import tracer
 class TraderState(TypedDict):
     messages: List
     error: Optional[str] = None
+    # Set by the decision cache (app/decision_cache.py)
+    features_digest: Optional[str] = None
+    cache_hit: Optional[bool] = None
+    executed: Optional[bool] = None
 
 # --- Tracing & Error Handling ---
-def create_traced_node(node_name: str, prompt_id: str, agent_runnable):
-    def wrapper(state: TraderState):
-        prompt = prompt_registry.get(prompt_id)
-        tracer.log({"event_type": "node_enter", "node": node_name, "input": state, "prompt_id": prompt.id, "prompt_version": prompt.meta.get("version")})
+def _run_context(state: TraderState, config: Optional[RunnableConfig]) -> dict:
+    """
+    Identifiers of the current run for the trace (run/thread ids, decision key).
+    Taken from the run config set by the scheduler, falling back to the
+    "CandleCloseEvent <instrument> <timeframe>" input message.
+    """
+    config = config or {}
+    metadata = config.get("metadata") or {}
+    configurable = config.get("configurable") or {}
+    ctx = {}
+    for key in ("run_id", "thread_id", "assistant_id"):
+        value = metadata.get(key) or configurable.get(key)
+        if value:
+            ctx[key] = str(value)
 
-        last_exception = None
-        for attempt in range(2):
-            start_time = time.monotonic()
-            try:
-                result = agent_runnable.invoke(state)
-                latency_ms = (time.monotonic() - start_time) * 1000
-
-                log_payload = {"event_type": "node_exit", "node": node_name, "output": result, "latency_ms": latency_ms, "status": "ok", "attempt": attempt + 1}
-
-                # If a tool was called, inspect the result for the FeatureSummary
-                if result.get("messages"):
-                    for message in result.get("messages"):
-                        if isinstance(message, ToolMessage) and message.name == "get_candles":
-                            try:
-                                summary_data = json.loads(message.content)
-                                log_payload["features_digest"] = summary_data.get("features_digest")
-                                log_payload["cache_path"] = summary_data.get("cache_path")
-                            except (json.JSONDecodeError, IndexError):
-                                pass # Ignore if parsing fails
-
-                tracer.log(log_payload)
-                return result
-            except (httpx.ConnectError, httpx.ReadTimeout) as e:
-                latency_ms = (time.monotonic() - start_time) * 1000
-                last_exception = e
-                print(f"Attempt {attempt + 1} failed for node {node_name}: {type(e).__name__}. Retrying...")
-                tracer.log({
-                    "event_type": "node_retry", "node": node_name, "error_type": type(e).__name__,
-                    "error_message": str(e), "latency_ms": latency_ms, "attempt": attempt + 1
-                })
-                time.sleep(random.uniform(0.3, 0.7)) # Jitter
-            except Exception as e:
-                last_exception = e
-                break # Don't retry on other exceptions
+    instrument, timeframe = metadata.get("instrument"), metadata.get("timeframe")
+    if not (instrument and timeframe) and state.get("messages"):
+        first = state["messages"][0]
+        content = first.get("content") if isinstance(first, dict) else getattr(first, "content", "")
+        parts = str(content).split()
+        if len(parts) == 3 and parts[0] == "CandleCloseEvent":
+            instrument, timeframe = parts[1], parts[2]
+    if instrument and timeframe:
+        ctx.update({"instrument": instrument, "timeframe": timeframe, "decision_key": f"{instrument}_{timeframe}"})
+    return ctx
+
+def create_traced_node(node_name: str, prompt_id: Optional[str], agent_runnable, cache: Optional[NodeCache] = None,
+                       policy: Optional[NodePolicy] = None, calls_llm: bool = True):
+    """
+    Wrap an agent with tracing and one retry on connection errors.
+    The node runs natively on both paths: `invoke` (sync, `time.sleep` jitter)
+    and `ainvoke` (async, `asyncio.sleep` jitter), so async graph runs never
+    block a worker thread. With a decision `cache`, a cached result is
+    returned instead of calling the agent; after a miss, a rules `policy`
+    gets to decide before the agent is called. Deterministic steps pass no
+    `prompt_id` and `calls_llm=False`.
+    """
+    def enter(state: TraderState, config: Optional[RunnableConfig]) -> dict:
+        ctx = _run_context(state, config)
+        event = {"event_type": "node_enter", "node": node_name, "input": state, **ctx}
+        if prompt_id:
+            prompt = prompt_registry.get(prompt_id)
+            event.update(prompt_id=prompt.id, prompt_version=prompt.meta.get("version"))
+        tracer.log(event)
+        return ctx
+
+    def exit_ok(result: dict, start_time: float, attempt: int, ctx: dict) -> dict:
+        latency_ms = (time.monotonic() - start_time) * 1000
 
+        log_payload = {"event_type": "node_exit", "node": node_name, "output": result, "latency_ms": latency_ms, "status": "ok", "attempt": attempt + 1, **ctx}
+
+        # If a tool was called, inspect the result for the FeatureSummary
+        if result.get("messages"):
+            for message in result.get("messages"):
+                if isinstance(message, ToolMessage) and message.name == "get_candles":
+                    try:
+                        summary_data = json.loads(message.content)
+                        log_payload["features_digest"] = summary_data.get("features_digest")
+                        log_payload["cache_path"] = summary_data.get("cache_path")
+                    except (json.JSONDecodeError, IndexError):
+                        pass # Ignore if parsing fails
+
+        tracer.log(log_payload)
+        return result
+
+    def log_retry(e: Exception, start_time: float, attempt: int, ctx: dict) -> None:
+        latency_ms = (time.monotonic() - start_time) * 1000
+        print(f"Attempt {attempt + 1} failed for node {node_name}: {type(e).__name__}. Retrying...")
+        tracer.log({
+            "event_type": "node_retry", "node": node_name, "error_type": type(e).__name__,
+            "error_message": str(e), "latency_ms": latency_ms, "attempt": attempt + 1, **ctx
+        })
+
+    def fail(last_exception: Exception, start_time: float, ctx: dict) -> Exception:
         # If all retries fail or a non-retriable exception occurs
         latency_ms = (time.monotonic() - start_time) * 1000
         error_details = {
@@ -74,11 +115,87 @@ def create_traced_node(node_name: str, prompt_id: str, agent_runnable):
             "status": "error",
             "llm_base_url": settings.llm.base_url,
             "llm_model": settings.llm.model,
-            "attempts": 2
+            "attempts": 2,
+            **ctx,
         }
         tracer.log(error_details)
-        raise last_exception
-    return RunnableLambda(wrapper)
+        return last_exception
+
+    def cached(update: dict, start_time: float, ctx: dict) -> dict:
+        tracer.log({"event_type": "node_exit", "node": node_name, "output": update, "status": "ok", "cache": "hit",
+                    "latency_ms": (time.monotonic() - start_time) * 1000, "features_digest": update.get("features_digest"), **ctx})
+        return update
+
+    def ruled(update: dict, start_time: float, ctx: dict, state: TraderState, carry: dict) -> dict:
+        if cache is not None:
+            update = cache.record(node_name, state, update, ctx, carry)
+        return exit_ok(update, start_time, 0, {**ctx, "policy": policy.mode})
+
+    def wrapper(state: TraderState, config: Optional[RunnableConfig] = None):
+        ctx = enter(state, config)
+        carry = {}
+        if cache is not None:
+            start_time = time.monotonic()
+            update, carry = cache.lookup(node_name, state, ctx)
+            if update is not None:
+                return cached(update, start_time, ctx)
+        if policy is not None:
+            start_time = time.monotonic()
+            update = policy.decide(state, ctx)
+            if update is not None:
+                return ruled(update, start_time, ctx, state, carry)
+        if calls_llm:
+            policy_stats.record(node_name, "llm")
+        last_exception = None
+        for attempt in range(2):
+            start_time = time.monotonic()
+            try:
+                result = agent_runnable.invoke(state)
+                if cache is not None:
+                    result = cache.record(node_name, state, result, ctx, carry)
+                return exit_ok(result, start_time, attempt, ctx)
+            except (httpx.ConnectError, httpx.ReadTimeout) as e:
+                last_exception = e
+                log_retry(e, start_time, attempt, ctx)
+                time.sleep(random.uniform(0.3, 0.7)) # Jitter
+            except Exception as e:
+                last_exception = e
+                break # Don't retry on other exceptions
+        raise fail(last_exception, start_time, ctx)
+
+    async def awrapper(state: TraderState, config: Optional[RunnableConfig] = None):
+        ctx = enter(state, config)
+        carry = {}
+        if cache is not None:
+            start_time = time.monotonic()
+            update, carry = await cache.alookup(node_name, state, ctx)
+            if update is not None:
+                return cached(update, start_time, ctx)
+        if policy is not None:
+            start_time = time.monotonic()
+            update = await policy.adecide(state, ctx)
+            if update is not None:
+                return ruled(update, start_time, ctx, state, carry)
+        if calls_llm:
+            policy_stats.record(node_name, "llm")
+        last_exception = None
+        for attempt in range(2):
+            start_time = time.monotonic()
+            try:
+                result = await agent_runnable.ainvoke(state)
+                if cache is not None:
+                    result = cache.record(node_name, state, result, ctx, carry)
+                return exit_ok(result, start_time, attempt, ctx)
+            except (httpx.ConnectError, httpx.ReadTimeout) as e:
+                last_exception = e
+                log_retry(e, start_time, attempt, ctx)
+                await asyncio.sleep(random.uniform(0.3, 0.7)) # Jitter
+            except Exception as e:
+                last_exception = e
+                break # Don't retry on other exceptions
+        raise fail(last_exception, start_time, ctx)
+
+    return RunnableLambda(wrapper, afunc=awrapper, name=node_name)
 
 def error_handler_node(state: TraderState) -> dict:
     tracer.log({"event_type": "node_enter", "node": "error_handler", "input": state})
@@ -91,6 +208,13 @@ def check_for_tool_error(state: TraderState) -> str:
         return "error"
     return "continue"
 
+def end_on_cache_hit(router):
+    """After risk: end when the whole decision was replayed and the run that produced it executed it."""
+    def route(state: TraderState) -> str:
+        decision = router(state)
+        return END if decision == "continue" and state.get("cache_hit") and state.get("executed") else decision
+    return route
+
 def strategy_router(state: TraderState) -> str:
     """The router for the strategy node, with special handling for dry runs."""
     if state["messages"][-1].content == "DryRunEvent":
@@ -101,12 +225,24 @@ def strategy_router(state: TraderState) -> str:
 def build_trader_graph(
     config: dict,
     tools: Optional[List[BaseTool]] = None,
-    route_overrides: Optional[dict] = None
+    route_overrides: Optional[dict] = None,
+    modes: Optional[dict] = None,
+    topology: Optional[str] = None,
 ):
+    """
+    The trader StateGraph (uncompiled). `modes` overrides `policies.modes`
+    per node: "llm", "rules" or "rules-then-llm-on-ambiguity" (app/policies.py).
+    `topology` overrides `graph.topology`: "agents" or "single_call"
+    (app/single_call.py).
+    """
     if tools is None:
         from app.tools.registry import get_toolset
         tools = get_toolset()
 
+    if (topology or settings.graph.topology) == "single_call":
+        from app.single_call import build_single_call_graph
+        return build_single_call_graph(tools, route_overrides)
+
     # Set up default routers or use overrides
     routers = {
         "strategy": strategy_router,
@@ -118,7 +254,7 @@ def build_trader_graph(
         routers.update(route_overrides)
 
     strategy_tools = [t for t in tools if t.name == "get_candles"]
-    signal_tools = [t for t in tools if t.name == "propose_order"]
+    signal_tools = [t for t in tools if t.name in ("get_preset_features", "propose_order")]
     risk_tools = [t for t in tools if t.name == "attach_stops"]
     exec_tools = [t for t in tools if t.name == "execute_order"]
 
@@ -129,22 +265,38 @@ def build_trader_graph(
         raise ValueError("Tool calling is required by settings, but the configured LLM does not support it.")
 
     strategy_agent = create_react_agent(llm, tools=strategy_tools, prompt=prompt_registry.get("strategy/decide_strategy__v1").body)
-    signal_agent = create_react_agent(llm, tools=signal_tools, prompt=prompt_registry.get("signal/generate_signal__v1").body)
+    signal_agent = create_react_agent(llm, tools=signal_tools, prompt=prompt_registry.get("signal/generate_signal__v2").body)
     risk_agent = create_react_agent(llm, tools=risk_tools, prompt=prompt_registry.get("risk/assess_risk__v1").body)
     exec_agent = create_react_agent(llm, tools=exec_tools, prompt=prompt_registry.get("exec/execute_order__v1").body)
 
+    # --- Decision cache ---
+    prompts = {
+        "strategy": "strategy/decide_strategy__v1",
+        "signal": "signal/generate_signal__v2",
+        "risk": "risk/assess_risk__v1",
+        "exec": "exec/execute_order__v1",
+    }
+    cache = NodeCache(prompts, strategy_tools[0]) if settings.decision_cache.enabled and strategy_tools else None
+
+    # --- Execution modes ---
+    modes = {**settings.policies.modes, **(modes or {})}
+    policies = {
+        node: NodePolicy(node, mode, strategy_tools[0] if strategy_tools else None)
+        for node, mode in modes.items() if mode != "llm"
+    }
+
     # --- Graph ---
     graph = StateGraph(TraderState)
-    graph.add_node("strategy", create_traced_node("strategy", "strategy/decide_strategy__v1", strategy_agent))
-    graph.add_node("signal", create_traced_node("signal", "signal/generate_signal__v1", signal_agent))
-    graph.add_node("risk", create_traced_node("risk", "risk/assess_risk__v1", risk_agent))
-    graph.add_node("exec", create_traced_node("exec", "exec/execute_order__v1", exec_agent))
+    graph.add_node("strategy", create_traced_node("strategy", prompts["strategy"], strategy_agent, cache, policies.get("strategy")))
+    graph.add_node("signal", create_traced_node("signal", prompts["signal"], signal_agent, cache))
+    graph.add_node("risk", create_traced_node("risk", prompts["risk"], risk_agent, cache, policies.get("risk")))
+    graph.add_node("exec", create_traced_node("exec", prompts["exec"], exec_agent, cache))
     graph.add_node("error_handler", error_handler_node)
 
     graph.set_entry_point("strategy")
     graph.add_conditional_edges("strategy", routers["strategy"], {"continue": "signal", "error": "error_handler", END: END})
     graph.add_conditional_edges("signal", routers["signal"], {"continue": "risk", "error": "error_handler"})
-    graph.add_conditional_edges("risk", routers["risk"], {"continue": "exec", "error": "error_handler"})
+    graph.add_conditional_edges("risk", end_on_cache_hit(routers["risk"]), {"continue": "exec", "error": "error_handler", END: END})
     graph.add_conditional_edges("exec", routers["exec"], {"continue": END, "error": "error_handler"})
     graph.add_edge("error_handler", END)
 
@@ -1,7 +1,13 @@
 from __future__ import annotations
+import asyncio
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
 import httpx
 from langchain_openai import ChatOpenAI
 from langchain_core.language_models.chat_models import BaseChatModel
+from app.llm_cache import get_llm_cache
 from app.settings import settings
 
 # --- Globals ---
@@ -19,9 +25,7 @@ def probe_tool_calling_capability() -> bool:
         SUPPORTS_TOOL_CALLING = True
         return SUPPORTS_TOOL_CALLING
 
-    base_url = settings.llm.base_url.removesuffix("/")
-    if not base_url.endswith("/v1"):
-        base_url = f"{base_url}/v1"
+    base_url = _normalized_base_url(settings.llm.base_url)
 
     print(f"--- Probing LLM at {base_url} for tool-calling capability... ---")
     # This is a simplified probe. A real implementation would be more robust.
@@ -31,13 +35,105 @@ def probe_tool_calling_capability() -> bool:
     print(f"--- Tool calling supported: {SUPPORTS_TOOL_CALLING} ---")
     return SUPPORTS_TOOL_CALLING
 
+# --- Client cache ---
+# One ChatOpenAI per (base_url, model, temperature, max_tokens, api_key), all
+# sharing one sync connection pool and one async client. The async client's
+# connections are kept per event loop (they belong to the loop that opened
+# them), as in app.tools.http_clients. Call invalidate_llm_cache() after
+# changing settings.llm.
+_LLM_CACHE: Dict[Tuple[str, str, float, int, str], BaseChatModel] = {}
+_HTTP_CLIENTS: Optional[Tuple[httpx.Client, httpx.AsyncClient, "_LoopTransports"]] = None
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+class _LoopTransports(httpx.AsyncBaseTransport):
+    """An httpx transport per running event loop, so one AsyncClient serves every loop."""
+
+    def __init__(self, **transport_kwargs):
+        self._kwargs = transport_kwargs
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _current(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # Pools of loops that have gone away cannot be closed any more; just drop them
+            for stale in [lp for lp in self._transports.keys() if lp.is_closed()]:
+                self._transports.pop(stale, None)
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = httpx.AsyncHTTPTransport(**self._kwargs)
+            return transport
+
+    def loops(self) -> int:
+        return len(self._transports)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._current().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """Close the running loop's connections."""
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+    def close(self) -> None:
+        """Close every loop's connections: idle loops run the close, running loops get it scheduled."""
+        with self._lock:
+            transports = list(self._transports.items())
+            self._transports.clear()
+        for loop, transport in transports:
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(transport.aclose(), loop)
+                continue
+            try:
+                loop.run_until_complete(transport.aclose())
+            except Exception:
+                pass
+
+def _normalized_base_url(base_url: str) -> str:
+    base_url = base_url.removesuffix("/")
+    return base_url if base_url.endswith("/v1") else f"{base_url}/v1"
+
+def _http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """The shared, tuned connection pools for LLM calls (built on first use)."""
+    global _HTTP_CLIENTS
+    if _HTTP_CLIENTS is None:
+        cfg = settings.llm
+        timeout = httpx.Timeout(cfg.connect_timeout, read=cfg.read_timeout)
+        limits = httpx.Limits(
+            max_connections=cfg.max_connections,
+            max_keepalive_connections=cfg.max_keepalive_connections,
+            keepalive_expiry=cfg.keepalive_expiry,
+        )
+        transports = _LoopTransports(limits=limits)
+        _HTTP_CLIENTS = (httpx.Client(timeout=timeout, limits=limits), httpx.AsyncClient(timeout=timeout, transport=transports), transports)
+    return _HTTP_CLIENTS[0], _HTTP_CLIENTS[1]
+
+def invalidate_llm_cache() -> None:
+    """Drop cached LLM clients and close their connection pools (e.g. after settings change)."""
+    global _HTTP_CLIENTS
+    with _cache_lock:
+        _LLM_CACHE.clear()
+        if _HTTP_CLIENTS is not None:
+            http_client, _, transports = _HTTP_CLIENTS
+            http_client.close()
+            transports.close()
+            _HTTP_CLIENTS = None
+        _cache_stats.update(hits=0, misses=0)
+
+def llm_cache_info() -> dict:
+    return {**_cache_stats, "clients": len(_LLM_CACHE)}
+
 def make_llm() -> BaseChatModel:
     """
-    Factory function to create an LLM client.
-    Now uses a single OpenAI-compatible path for both VLLM and Ollama.
+    Return the LLM client for the current settings.
+    Uses a single OpenAI-compatible path for both VLLM and Ollama; clients are
+    cached and share one connection pool across graph builds and agents.
     """
-    print(f"--- Creating OpenAI-compatible client for model: {settings.llm.model} ---")
-
     # Capability gate
     if settings.llm.require_tools and not SUPPORTS_TOOL_CALLING:
         raise ValueError(
@@ -48,19 +144,31 @@ def make_llm() -> BaseChatModel:
     cfg = settings.llm
 
     # Normalize base_url to ensure it ends with /v1
-    base_url = cfg.base_url.removesuffix("/")
-    if not base_url.endswith("/v1"):
-        base_url = f"{base_url}/v1"
-
-    # Create a custom httpx client with tuned timeouts
-    timeout = httpx.Timeout(cfg.connect_timeout, read=cfg.read_timeout)
-    http_client = httpx.Client(timeout=timeout)
-
-    return ChatOpenAI(
-        base_url=base_url,
-        api_key=cfg.api_key or "not-needed-for-local",
-        model=cfg.model,
-        temperature=cfg.temperature,
-        max_tokens=cfg.max_tokens,
-        http_client=http_client,
-    )
+    base_url = _normalized_base_url(cfg.base_url)
+    api_key = cfg.api_key or "not-needed-for-local"
+    key = (base_url, cfg.model, cfg.temperature, cfg.max_tokens, api_key)
+
+    with _cache_lock:
+        llm = _LLM_CACHE.get(key)
+        if llm is not None:
+            _cache_stats["hits"] += 1
+            return llm
+
+        print(f"--- Creating OpenAI-compatible client for model: {settings.llm.model} ---")
+        http_client, http_async_client = _http_clients()
+        response_cache = get_llm_cache()
+        if response_cache is not None and cfg.temperature > 0 and settings.llm_cache.skip_when_sampling:
+            response_cache = None
+        llm = ChatOpenAI(
+            cache=response_cache if response_cache is not None else False,
+            base_url=base_url,
+            api_key=api_key,
+            model=cfg.model,
+            temperature=cfg.temperature,
+            max_tokens=cfg.max_tokens,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
+        _LLM_CACHE[key] = llm
+        _cache_stats["misses"] += 1
+        return llm
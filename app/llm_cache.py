@@ -0,0 +1,299 @@
+"""
+LLM response cache — exact-match answers for repeated chat completions.
+
+Plugged beneath `make_llm` as the chat models' LangChain cache. The key is a
+SHA-256 of the normalized message list (message ids, response metadata and
+usage dropped, so the same conversation matches across runs) and LangChain's
+llm string, which carries the model, sampling params and bound tool schemas.
+
+Two tiers: an in-memory LRU (`llm_cache.max_entries`) in front of an on-disk
+SQLite table (`llm_cache.path`) that survives restarts. The table is pruned
+of rows older than `ttl_seconds` and capped at `max_rows`, oldest first.
+`backend: memory` keeps only the first tier, `none` disables the cache. With
+`skip_when_sampling`, clients built with temperature > 0 bypass it; it is off
+by default, as the shipped `llm.temperature` is 0.2.
+
+Hits trace an `llm_cache` event with the tokens and latency saved.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from app.settings import settings
+
+RETURN_VAL = Sequence[Generation]
+
+# Fields of a serialized message that differ between otherwise identical requests
+_VOLATILE_FIELDS = ("id", "response_metadata", "usage_metadata")
+# A miss whose call never reports back (it raised) is forgotten after this long
+PENDING_EXPIRY_S = 600.0
+# The on-disk tier is pruned every this many writes
+PRUNE_EVERY = 64
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical form of LangChain's serialized message list for keying."""
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    for m in messages if isinstance(messages, list) else []:
+        kwargs = m.get("kwargs") if isinstance(m, dict) else None
+        if isinstance(kwargs, dict):
+            for name in _VOLATILE_FIELDS:
+                kwargs.pop(name, None)
+    return json.dumps(messages, sort_keys=True, separators=(",", ":"))
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{normalize_prompt(prompt)}\n{llm_string}".encode()).hexdigest()
+
+
+def _tokens(generations: RETURN_VAL) -> int:
+    total = 0
+    for g in generations:
+        usage = getattr(getattr(g, "message", None), "usage_metadata", None) or {}
+        total += int(usage.get("total_tokens", 0))
+    return total
+
+
+def _encode(generations: RETURN_VAL) -> str:
+    return json.dumps([
+        {"message": message_to_dict(g.message)} if isinstance(g, ChatGeneration) else {"text": g.text}
+        for g in generations
+    ])
+
+
+def _decode(value: str) -> list:
+    out = []
+    for item in json.loads(value):
+        if "message" in item:
+            out.append(ChatGeneration(message=messages_from_dict([item["message"]])[0]))
+        else:
+            out.append(Generation(text=item["text"]))
+    return out
+
+
+class _SQLiteTier:
+    def __init__(self, path: Path, max_rows: int, ttl: float | None):
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._writes = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "tokens INTEGER NOT NULL, latency_ms REAL NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_created ON llm_cache (created)")
+        self._lock = threading.Lock()
+        self.prune()
+
+    def get(self, key: str) -> Optional[Tuple[str, int, float, float]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT value, tokens, latency_ms, created FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+    def put(self, key: str, value: str, tokens: int, latency_ms: float, created: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)", (key, value, tokens, latency_ms, created)
+            )
+            self._writes += 1
+            due = self._writes % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Delete expired rows and the oldest beyond `max_rows`; returns the rows deleted."""
+        with self._lock:
+            deleted = 0
+            if self.ttl:
+                deleted += self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl,)).rowcount
+            deleted += self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY created DESC LIMIT -1 OFFSET ?)", (self.max_rows,)
+            ).rowcount
+            return deleted
+
+    def rows(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredLLMCache(BaseCache):
+    """In-memory LRU in front of an optional SQLite tier."""
+
+    def __init__(self, max_entries: int | None = None, path: Path | str | None = None, ttl_seconds: float | None = None,
+                 max_rows: int | None = None):
+        cfg = settings.llm_cache
+        self.max_entries = max_entries or cfg.max_entries
+        self.ttl = cfg.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[list, int, float, float]]" = OrderedDict()
+        self._disk = _SQLiteTier(Path(path), max_rows or cfg.max_rows, self.ttl) if path else None
+        self._pending: Dict[str, List[float]] = {}  # key -> starts of the calls that missed, oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.latency_saved_ms = 0.0
+
+    # ----- BaseCache -----
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL]:
+        key = cache_key(prompt, llm_string)
+        item = self._get(key)
+        if item is None:
+            now = time.perf_counter()
+            with self._lock:
+                self.misses += 1
+                self._expire_pending(now)
+                self._pending.setdefault(key, []).append(now)
+            return None
+        generations, tokens, latency_ms, _ = item
+        with self._lock:
+            self.hits += 1
+            self.tokens_saved += tokens
+            self.latency_saved_ms += latency_ms
+        self._trace(tokens, latency_ms)
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL) -> None:
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            starts = self._pending.get(key)
+            start = starts.pop(0) if starts else None
+            if not starts:
+                self._pending.pop(key, None)
+        latency_ms = (time.perf_counter() - start) * 1000 if start is not None else 0.0
+        item = (list(return_val), _tokens(return_val), latency_ms, time.time())
+        self._remember(key, item)
+        if self._disk is not None:
+            self._disk.put(key, _encode(return_val), item[1], latency_ms, item[3])
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._pending.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    # ----- tiers -----
+    def _get(self, key: str) -> Optional[Tuple[list, int, float, float]]:
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                self._memory.move_to_end(key)
+        if item is None and self._disk is not None:
+            row = self._disk.get(key)
+            if row is not None:
+                item = (_decode(row[0]), row[1], row[2], row[3])
+                if not self._expired(item):
+                    self._remember(key, item)
+                    with self._lock:
+                        self.disk_hits += 1
+        if item is None:
+            return None
+        if self._expired(item):
+            with self._lock:
+                self._memory.pop(key, None)
+            if self._disk is not None:
+                self._disk.delete(key)
+            return None
+        return item
+
+    def _expire_pending(self, now: float) -> None:
+        """Forget misses whose calls failed and so never reached update() (caller holds the lock)."""
+        cutoff = now - PENDING_EXPIRY_S
+        for key in [k for k, starts in self._pending.items() if starts[0] < cutoff]:
+            starts = [t for t in self._pending[key] if t >= cutoff]
+            if starts:
+                self._pending[key] = starts
+            else:
+                del self._pending[key]
+
+    def _expired(self, item: tuple) -> bool:
+        return bool(self.ttl) and time.time() - item[3] > self.ttl
+
+    def _remember(self, key: str, item: tuple) -> None:
+        with self._lock:
+            self._memory[key] = item
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    # ----- metrics -----
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+            "latency_saved_ms": self.latency_saved_ms,
+            "memory_entries": len(self._memory),
+            "pending": sum(len(starts) for starts in self._pending.values()),
+        }
+
+    def _trace(self, tokens: int, latency_ms: float) -> None:
+        from app.telemetry import tracer
+        tracer.log({"event_type": "llm_cache", "node": "llm", "status": "hit",
+                    "output": {"tokens": tokens, "latency_ms": latency_ms, **self.stats()}})
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+
+
+_CACHE: Optional[TieredLLMCache] = None
+_cache_guard = threading.Lock()
+
+
+def get_llm_cache() -> Optional[TieredLLMCache]:
+    """The process-wide response cache for the configured backend, or None when disabled."""
+    global _CACHE
+    cfg = settings.llm_cache
+    if cfg.backend == "none":
+        return None
+    with _cache_guard:
+        if _CACHE is None:
+            path = Path(cfg.path) if cfg.backend == "sqlite" else None
+            _CACHE = TieredLLMCache(path=path)
+        return _CACHE
+
+
+def reset_llm_cache() -> None:
+    """Forget the process-wide cache object (e.g. after changing settings.llm_cache)."""
+    global _CACHE
+    with _cache_guard:
+        if _CACHE is not None:
+            _CACHE.close()
+        _CACHE = None
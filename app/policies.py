@@ -0,0 +1,281 @@
+"""
+Deterministic node policies — answer clear-cut strategy and risk decisions
+without calling the LLM.
+
+Each rule-capable node runs in one of three modes (`policies.modes`, or the
+`modes` argument of `build_trader_graph`):
+
+- "llm": the node's agent decides (the default)
+- "rules": the Python policy always decides; inputs it cannot use end the run
+  through the graph's error route
+- "rules-then-llm-on-ambiguity": the policy decides clear-cut cases and hands
+  the rest to the agent
+
+Strategy rules read the feature summary (`get_candles`, served from the candle
+store): an EMA spread of at least `trend_spread_atr` ATRs is trend_following, a
+close `breakout_atr` ATRs away from flat EMAs is breakout, and flat EMAs with
+the close nearby are mean_reversion. Risk rules attach `risk.sl_buffer_atr` /
+`tp_buffer_atr` stops to the proposed order, as `attach_stops` does.
+
+Decisions are written as the same tool call/result and JSON answer the agent
+would produce, so downstream nodes and the decision cache see no difference.
+Every policy run traces a `node_policy` event with the share of LLM calls avoided.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from app.settings import settings
+from app.tools.risk_tool import stop_levels
+
+MODES = ("llm", "rules", "rules-then-llm-on-ambiguity")
+RULE_NODES = ("strategy", "risk")
+
+
+# ----- rules -----
+def strategy_rule(summary: dict, strict: bool = False) -> Optional[dict]:
+    """
+    A `{"preset", "rationale"}` decision from a FeatureSummary, or None when the
+    indicators are missing or (unless `strict`) the market is ambiguous.
+    """
+    indicators = summary.get("indicators") or {}
+    fast, slow, atr = indicators.get("ema_fast"), indicators.get("ema_slow"), indicators.get("atr")
+    if fast is None or slow is None or not atr or atr <= 0:
+        return None
+    cfg = settings.policies
+    closes = summary.get("last_n_closes") or []
+    last = closes[-1] if closes else slow
+    spread = (fast - slow) / atr
+    stretch = (last - slow) / atr
+
+    if abs(spread) >= cfg.trend_spread_atr:
+        direction = "above" if spread > 0 else "below"
+        return _decision("trend_following", f"The fast EMA ({fast:.5f}) is {abs(spread):.2f} ATR {direction} the slow EMA ({slow:.5f}).")
+    if abs(stretch) >= cfg.breakout_atr:
+        direction = "above" if stretch > 0 else "below"
+        return _decision("breakout", f"The close ({last:.5f}) is {abs(stretch):.2f} ATR {direction} flat EMAs (spread {spread:.2f} ATR).")
+    if abs(spread) <= cfg.range_spread_atr:
+        return _decision("mean_reversion", f"The EMAs are flat (spread {spread:.2f} ATR) with the close {stretch:.2f} ATR from the slow EMA.")
+    if not strict:
+        return None
+    # Between the range and trend thresholds: take the nearer one
+    if abs(spread) - cfg.range_spread_atr >= cfg.trend_spread_atr - abs(spread):
+        return _decision("trend_following", f"The EMA spread ({spread:.2f} ATR) is nearer the trend threshold.")
+    return _decision("mean_reversion", f"The EMA spread ({spread:.2f} ATR) is nearer the range threshold.")
+
+
+def risk_rule(order: dict, atr: Optional[float], reference_price: Optional[float] = None,
+              sl_mult: Optional[float] = None, tp_mult: Optional[float] = None) -> Optional[dict]:
+    """
+    The order with stop_loss/take_profit attached, or None when it has no usable
+    side, units or price, or the ATR is unknown. Market orders are priced at
+    `reference_price` (the last close).
+    """
+    side = str(order.get("side") or order.get("action") or "").lower()
+    price = order.get("price") or reference_price
+    if side not in ("buy", "sell") or not price or not atr or atr <= 0:
+        return None
+    try:
+        if int(order.get("units", 1)) <= 0:
+            return None
+    except (TypeError, ValueError):
+        return None
+    out = dict(order)
+    sl, tp = stop_levels(side, float(price), float(atr), sl_mult, tp_mult)
+    out["stop_loss"] = out.get("stop_loss") or sl
+    out["take_profit"] = out.get("take_profit") or tp
+    return out
+
+
+def _decision(preset: str, rationale: str) -> dict:
+    return {"preset": preset, "rationale": rationale}
+
+
+# ----- messages -----
+def parse_json(content: Any) -> Optional[Any]:
+    """Message content as JSON (dicts/lists pass through), or None."""
+    if isinstance(content, (dict, list)):
+        return content
+    try:
+        return json.loads(content)
+    except (TypeError, ValueError):
+        return None
+
+
+def last_tool_output(messages: List[Any], name: str) -> Optional[Any]:
+    """Parsed content of the newest `name` tool result in `messages`."""
+    for m in reversed(messages):
+        if isinstance(m, ToolMessage) and m.name == name:
+            return parse_json(m.content)
+    return None
+
+
+def tool_exchange(name: str, args: dict, content: str) -> List[Any]:
+    """An AI tool call and its result, as an agent would have produced them."""
+    call_id = f"rules_{uuid.uuid4().hex[:12]}"
+    return [
+        AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}]),
+        ToolMessage(content=content, name=name, tool_call_id=call_id),
+    ]
+
+
+def _signal_said_hold(messages: List[Any]) -> bool:
+    for m in reversed(messages):
+        if isinstance(m, AIMessage) and m.content:
+            answer = parse_json(m.content)
+            return isinstance(answer, dict) and str(answer.get("action", "")).lower() == "hold"
+    return False
+
+
+# ----- telemetry -----
+class PolicyStats:
+    """
+    Per-node counts of decisions made by rules vs by the agent (every node's
+    agent calls are counted, so the avoided share is over the whole graph),
+    and of escalations from rules to the agent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, node: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(node, {"rules": 0, "llm": 0, "escalated": 0})
+            counts[outcome] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            nodes = {n: {**c, "llm_avoided_share": c["rules"] / max(1, c["rules"] + c["llm"])} for n, c in self._counts.items()}
+        rules = sum(c["rules"] for c in nodes.values())
+        total = rules + sum(c["llm"] for c in nodes.values())
+        escalated = sum(c["escalated"] for c in nodes.values())
+        return {"nodes": nodes, "rules": rules, "llm": total - rules, "escalated": escalated,
+                "llm_avoided_share": rules / total if total else 0.0}
+
+
+# Process-wide counters
+policy_stats = PolicyStats()
+
+
+# ----- node glue -----
+class NodePolicy:
+    """
+    Glue between a traced graph node and its rule.
+
+    `decide` runs before the node's agent: it returns the state update to use
+    instead of calling the agent, or None to escalate to it (only in
+    "rules-then-llm-on-ambiguity" mode).
+    """
+
+    def __init__(self, node: str, mode: str, features_tool=None):
+        if node not in RULE_NODES:
+            raise ValueError(f"Node '{node}' has no rules policy; its mode must be 'llm'.")
+        if mode not in MODES or mode == "llm":
+            raise ValueError(f"Invalid policy mode for '{node}': {mode!r}")
+        if node == "strategy" and features_tool is None:
+            raise ValueError("The strategy rules need the get_candles tool.")
+        self.node = node
+        self.mode = mode
+        self.strict = mode == "rules"
+        self.features_tool = features_tool
+
+    def decide(self, state: dict, ctx: dict) -> Optional[dict]:
+        if self.node != "strategy":
+            return self._risk(state, ctx)
+        if "instrument" not in ctx:
+            return self._no_event(state, ctx)
+        args = {"instrument": ctx["instrument"], "timeframe": ctx["timeframe"]}
+        try:
+            features = self.features_tool.invoke(args)
+        except Exception as e:
+            features = json.dumps({"error": f"Failed to get candles: {e}"})
+        return self._strategy(state, ctx, args, features)
+
+    async def adecide(self, state: dict, ctx: dict) -> Optional[dict]:
+        if self.node != "strategy":
+            return self._risk(state, ctx)
+        if "instrument" not in ctx:
+            return self._no_event(state, ctx)
+        args = {"instrument": ctx["instrument"], "timeframe": ctx["timeframe"]}
+        try:
+            features = await self.features_tool.ainvoke(args)
+        except Exception as e:
+            features = json.dumps({"error": f"Failed to get candles: {e}"})
+        return self._strategy(state, ctx, args, features)
+
+    # ----- nodes -----
+    def _strategy(self, state: dict, ctx: dict, args: dict, features: Any) -> Optional[dict]:
+        exchange = tool_exchange("get_candles", args, features if isinstance(features, str) else json.dumps(features))
+        summary = parse_json(features)
+        if not isinstance(summary, dict) or "error" in summary:
+            if self.strict:  # the error result routes the run to the error handler
+                return self._decided(state, ctx, exchange, status="error")
+            return self._escalate(ctx, "features unavailable")
+        decision = strategy_rule(summary, strict=self.strict)
+        if decision is None:
+            if self.strict:
+                return self._error(state, ctx, "get_candles", args, "indicators missing from the feature summary")
+            return self._escalate(ctx, "ambiguous market")
+        return self._decided(state, ctx, exchange + [AIMessage(content=json.dumps(decision))])
+
+    def _risk(self, state: dict, ctx: dict) -> Optional[dict]:
+        messages = list(state.get("messages") or [])
+        order = last_tool_output(messages, "propose_order")
+        if not isinstance(order, dict):
+            if _signal_said_hold(messages):
+                return self._decided(state, ctx, [AIMessage(content=json.dumps({"action": "hold"}))])
+            if self.strict:
+                return self._error(state, ctx, "attach_stops", {}, "no order proposal to size")
+            return self._escalate(ctx, "no order proposal")
+        summary = last_tool_output(messages, "get_candles")
+        summary = summary if isinstance(summary, dict) else {}
+        atr = (summary.get("indicators") or {}).get("atr")
+        closes = summary.get("last_n_closes") or []
+        final = risk_rule(order, atr, closes[-1] if closes else None)
+        if final is None:
+            if self.strict:
+                return self._error(state, ctx, "attach_stops", {"order": order, "atr": atr}, "order or ATR unusable for stops")
+            return self._escalate(ctx, "order or ATR unusable for stops")
+        answer = json.dumps(final)
+        return self._decided(state, ctx, tool_exchange("attach_stops", {"order": order, "atr": atr}, answer) + [AIMessage(content=answer)])
+
+    # ----- outcomes -----
+    def _decided(self, state: dict, ctx: dict, new: List[Any], status: str = "rules") -> dict:
+        policy_stats.record(self.node, "rules")
+        self._trace(ctx, status)
+        return {"messages": list(state.get("messages") or []) + new}
+
+    def _error(self, state: dict, ctx: dict, tool: str, args: dict, reason: str) -> dict:
+        content = json.dumps({"error": f"Rules could not decide: {reason}"})
+        return self._decided(state, ctx, tool_exchange(tool, args, content), status="error")
+
+    def _no_event(self, state: dict, ctx: dict) -> Optional[dict]:
+        # Not a candle close (e.g. the doctor's DryRunEvent): nothing to decide
+        if not self.strict:
+            return self._escalate(ctx, "no instrument/timeframe in the run")
+        self._trace(ctx, "skipped")
+        return {"messages": list(state.get("messages") or [])}
+
+    def _escalate(self, ctx: dict, reason: str) -> None:
+        policy_stats.record(self.node, "escalated")
+        self._trace(ctx, "escalated", reason)
+        return None
+
+    def _trace(self, ctx: dict, status: str, reason: Optional[str] = None) -> None:
+        from app.telemetry import tracer
+        event = {"event_type": "node_policy", "node": self.node, "mode": self.mode, "status": status, **ctx,
+                 "output": policy_stats.stats()}
+        if reason:
+            event["reason"] = reason
+        tracer.log(event)
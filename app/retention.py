@@ -0,0 +1,274 @@
+"""
+Retention & compaction for local traces and the candle cache.
+
+- Closed-day `*_actions.jsonl|csv` files are compressed (gzip, or zstd when
+  the optional `zstandard` package is installed).
+- Closed-day Parquet trace partitions are merged into one file per
+  date/decision_key.
+- Anything older than `telemetry.local.rotate_days` is deleted.
+- The cache stores under `runs/cache` (candle parts, features, indicator
+  state, Arrow copies of mock history) are pruned by age and total size,
+  oldest first. The LLM response database prunes itself (`llm_cache.ttl_seconds`,
+  `max_rows`) and is left alone.
+
+Each pass handles at most `max_files_per_run` files so it can run often, in a
+background thread or from `scripts/trace_retention.py`, without stalling the
+scheduler.
+"""
+
+from __future__ import annotations
+
+import gzip
+import re
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import pyarrow.parquet as pq
+
+from app.settings import settings
+
+try:
+    import zstandard
+except Exception:  # optional: fall back to gzip
+    zstandard = None
+
+_DAILY_FILE = re.compile(r"^(\d{4}-\d{2}-\d{2})_actions\.(jsonl|csv)(\.gz|\.zst)?$")
+_DATE_DIR = re.compile(r"^date=(\d{4}-\d{2}-\d{2})$")
+COMPACTED_NAME = "part-compacted.parquet"
+# Open SQLite databases and their journals: never deleted by retention
+_SELF_MANAGED = (".sqlite", ".sqlite-wal", ".sqlite-shm")
+
+
+@dataclass
+class RetentionReport:
+    files_compressed: int = 0
+    partitions_compacted: int = 0
+    files_deleted: int = 0
+    cache_files_deleted: int = 0
+    bytes_reclaimed: int = 0
+    runtime_ms: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def cache_dir() -> Path:
+    """Root of the cache stores (candles/, features/, indicator_state/, mock_data/, llm/)."""
+    return Path(settings.persistence.get("path", "runs/")) / "cache"
+
+
+def _size(path: Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+def _compress(src: Path, compression: str) -> Path:
+    """Compress `src` next to itself and remove the original."""
+    if compression == "zstd" and zstandard is not None:
+        dst = src.with_name(src.name + ".zst")
+        with open(src, "rb") as fin, open(dst, "wb") as fout:
+            zstandard.ZstdCompressor(level=10).copy_stream(fin, fout)
+    else:
+        dst = src.with_name(src.name + ".gz")
+        with open(src, "rb") as fin, gzip.open(dst, "wb", compresslevel=6) as fout:
+            shutil.copyfileobj(fin, fout)
+    src.unlink()
+    return dst
+
+
+def _compact_partition(part_dir: Path) -> int:
+    """Merge all Parquet files of a partition into one. Returns bytes reclaimed."""
+    parts = sorted(p for p in part_dir.glob("*.parquet") if not p.name.startswith("."))
+    if len(parts) <= 1:
+        return 0
+    before = sum(p.stat().st_size for p in parts)
+
+    tmp_path = part_dir / f".{COMPACTED_NAME}.tmp"
+    writer = None
+    try:
+        for p in parts:
+            table = pq.read_table(p)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema, compression="zstd")
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    for p in parts:
+        p.unlink()
+    dst = part_dir / COMPACTED_NAME
+    tmp_path.replace(dst)
+    return before - dst.stat().st_size
+
+
+class RetentionJob:
+    """One incremental retention pass over traces and the cache stores."""
+
+    def __init__(
+        self,
+        trace_dir: Path | None = None,
+        cache_path: Path | None = None,
+        rotate_days: int | None = None,
+        compress_after_days: int | None = None,
+        compression: str | None = None,
+        cache_max_age_days: Optional[int] = None,
+        cache_max_bytes: Optional[int] = None,
+        max_files_per_run: int | None = None,
+    ):
+        local = settings.telemetry.local
+        self.trace_dir = Path(trace_dir or local.path)
+        self.cache_path = Path(cache_path or cache_dir())
+        self.rotate_days = local.rotate_days if rotate_days is None else rotate_days
+        self.compress_after_days = local.compress_after_days if compress_after_days is None else compress_after_days
+        self.compression = compression or local.compression
+        self.cache_max_age_days = settings.data.cache_max_age_days if cache_max_age_days is None else cache_max_age_days
+        self.cache_max_bytes = settings.data.cache_max_bytes if cache_max_bytes is None else cache_max_bytes
+        self.max_files_per_run = local.retention_max_files_per_run if max_files_per_run is None else max_files_per_run
+
+    def run(self, now: datetime | None = None) -> RetentionReport:
+        now = now or datetime.now(timezone.utc)
+        report = RetentionReport()
+        start = time.monotonic()
+        budget = [self.max_files_per_run]
+
+        for step in (self._expire_traces, self._compress_daily_files, self._compact_parquet, self._prune_cache):
+            if budget[0] <= 0:
+                break
+            try:
+                step(now, report, budget)
+            except OSError as e:
+                report.errors.append(f"{step.__name__}: {type(e).__name__}: {e}")
+
+        report.runtime_ms = (time.monotonic() - start) * 1000
+        return report
+
+    # ----- traces -----
+    def _expire_traces(self, now: datetime, report: RetentionReport, budget: List[int]) -> None:
+        if not self.rotate_days or not self.trace_dir.exists():
+            return
+        cutoff = (now - timedelta(days=self.rotate_days)).strftime("%Y-%m-%d")
+
+        expired: List[Path] = [
+            p for p in self.trace_dir.iterdir()
+            if (m := _DAILY_FILE.match(p.name)) and m.group(1) < cutoff
+        ]
+        parquet_root = self.trace_dir / "parquet"
+        if parquet_root.exists():
+            expired += [
+                p for p in parquet_root.iterdir()
+                if (m := _DATE_DIR.match(p.name)) and m.group(1) < cutoff
+            ]
+
+        for path in sorted(expired)[: budget[0]]:
+            size = _size(path)
+            shutil.rmtree(path) if path.is_dir() else path.unlink()
+            report.files_deleted += 1
+            report.bytes_reclaimed += size
+            budget[0] -= 1
+
+    def _compress_daily_files(self, now: datetime, report: RetentionReport, budget: List[int]) -> None:
+        if not self.trace_dir.exists():
+            return
+        cutoff = (now - timedelta(days=self.compress_after_days)).strftime("%Y-%m-%d")
+        candidates = sorted(
+            p for p in self.trace_dir.iterdir()
+            if (m := _DAILY_FILE.match(p.name)) and m.group(3) is None and m.group(1) <= cutoff
+            and m.group(1) < now.strftime("%Y-%m-%d")
+        )
+        for src in candidates[: budget[0]]:
+            before = src.stat().st_size
+            dst = _compress(src, self.compression)
+            report.files_compressed += 1
+            report.bytes_reclaimed += before - dst.stat().st_size
+            budget[0] -= 1
+
+    def _compact_parquet(self, now: datetime, report: RetentionReport, budget: List[int]) -> None:
+        parquet_root = self.trace_dir / "parquet"
+        if not parquet_root.exists():
+            return
+        today = now.strftime("%Y-%m-%d")
+        for date_dir in sorted(parquet_root.iterdir()):
+            m = _DATE_DIR.match(date_dir.name)
+            if not m or m.group(1) >= today:
+                continue
+            for part_dir in sorted(d for d in date_dir.iterdir() if d.is_dir()):
+                if budget[0] <= 0:
+                    return
+                if len(list(part_dir.glob("*.parquet"))) <= 1:
+                    continue
+                report.bytes_reclaimed += _compact_partition(part_dir)
+                report.partitions_compacted += 1
+                budget[0] -= 1
+
+    # ----- cache stores -----
+    def _prune_cache(self, now: datetime, report: RetentionReport, budget: List[int]) -> None:
+        if not self.cache_path.exists():
+            return
+        files = [
+            (p, p.stat()) for p in self.cache_path.rglob("*")
+            if p.is_file() and not p.name.endswith(_SELF_MANAGED)
+        ]
+        files.sort(key=lambda f: f[1].st_mtime)  # oldest first
+
+        doomed: List[tuple] = []
+        if self.cache_max_age_days:
+            cutoff = now.timestamp() - self.cache_max_age_days * 86400
+            doomed = [f for f in files if f[1].st_mtime < cutoff]
+        if self.cache_max_bytes is not None:
+            kept = [f for f in files if f not in doomed]
+            total = sum(f[1].st_size for f in kept)
+            for f in kept:
+                if total <= self.cache_max_bytes:
+                    break
+                doomed.append(f)
+                total -= f[1].st_size
+
+        for path, stat in doomed[: budget[0]]:
+            path.unlink(missing_ok=True)
+            report.cache_files_deleted += 1
+            report.bytes_reclaimed += stat.st_size
+            budget[0] -= 1
+
+
+def run_retention(now: datetime | None = None, log: bool = True) -> RetentionReport:
+    """Run one retention pass with the configured policy and trace the report."""
+    report = RetentionJob().run(now)
+    if log:
+        from app.telemetry import tracer
+        tracer.log({"event_type": "retention", "node": "retention", "status": "error" if report.errors else "ok",
+                    "latency_ms": report.runtime_ms, "output": report.to_dict()})
+    return report
+
+
+class RetentionWorker:
+    """Daemon thread that runs `run_retention` every `interval_minutes`."""
+
+    def __init__(self, interval_minutes: float | None = None):
+        self.interval = 60.0 * (interval_minutes or settings.telemetry.local.retention_interval_minutes)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="trace-retention", daemon=True)
+        self.last_report: RetentionReport | None = None
+
+    def start(self) -> "RetentionWorker":
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.last_report = run_retention()
+            except Exception as e:  # keep the worker alive
+                print(f"[retention] Pass failed: {type(e).__name__}: {e}", flush=True)
+            self._stop.wait(self.interval)
@@ -0,0 +1,396 @@
+"""
+Async fan-out scheduler for graph runs on the LangGraph server.
+
+Triggers are queued per decision key (`EUR_USD_M5`) and launched by
+`scheduler.max_concurrency` workers on one event loop with the async SDK
+client, optionally paced by a token bucket (`scheduler.rate_per_second`,
+`scheduler.rate_burst`) sized to the LLM backend. With `wait_for_runs` a worker
+holds its slot until the run finishes, so the limit caps the runs in flight.
+
+Each trigger carries the time it was due. A key has at most one queued run
+and one in flight; triggers arriving meanwhile are coalesced into the queued
+one. A trigger that starts more than `deadline_seconds` after it was due is
+late: `late_policy: skip` drops it, `coalesce` still runs it (it already
+stands for every trigger folded into it).
+
+Ticks come either from a fixed poll grid (`alignment: poll`, every
+`poll_interval_seconds`) or, by default, from bar closes (`alignment:
+bar_close`): each decision fires once per candle of its own timeframe,
+`bar_close_delay_seconds` after the close, so an H1 decision runs once an
+hour rather than on every poll. Before a tick's triggers, the optional
+`prepare` hook gets all of its due (instrument, timeframe) pairs at once (the
+scheduler trigger precomputes their feature summaries there).
+
+Every tick traces a `scheduler_cycle` event with the cycle lag (how late the
+tick fired), queue depth, runs in flight and the running counters.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.settings import settings
+from app.timeframes import bar_forms, next_bar_close
+
+THREAD_MAP_FILE = Path(__file__).resolve().parents[1] / "runs" / "threads.json"
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncThreadManager:
+    """
+    Thread ids per decision key, persisted to `runs/threads.json`.
+
+    Threads are verified once at startup; afterwards a stale thread only shows
+    up as a 404 on run creation, when the scheduler calls `force_recreate`.
+    """
+
+    def __init__(self, client, file_path: Path = THREAD_MAP_FILE):
+        self.client = client
+        self.file_path = file_path
+        self._thread_map: Dict[str, str] = json.loads(file_path.read_text()) if file_path.exists() else {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _save(self) -> None:
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.file_path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(self._thread_map, indent=2))
+        os.replace(temp_path, self.file_path)
+
+    async def verify(self) -> None:
+        """On startup, check if threads are stale. If so, wipe the map."""
+        first_thread_id = next(iter(self._thread_map.values()), None)
+        if not first_thread_id:
+            return
+        try:
+            await self.client.threads.get(first_thread_id)
+        except Exception:
+            print("Stale thread detected, assuming new server session. Wiping thread map.")
+            self._thread_map = {}
+            self._save()
+
+    async def ensure_thread_id(self, instrument: str, timeframe: str) -> str:
+        key = f"{instrument}_{timeframe}"
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            thread_id = self._thread_map.get(key)
+            if thread_id:
+                return thread_id
+            return await self._create_new_thread(key, instrument, timeframe)
+
+    async def force_recreate(self, instrument: str, timeframe: str) -> str:
+        key = f"{instrument}_{timeframe}"
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            return await self._create_new_thread(key, instrument, timeframe)
+
+    async def _create_new_thread(self, key: str, instrument: str, timeframe: str) -> str:
+        thread = await self.client.threads.create(metadata={"instrument": instrument, "timeframe": timeframe})
+        thread_id = thread["thread_id"]
+        self._thread_map[key] = thread_id
+        self._save()
+        print(f"Created thread for {key}: {thread_id}")
+        return thread_id
+
+
+@dataclass
+class _Decision:
+    instrument: str
+    timeframe: str
+    queued_due: Optional[float] = None   # due time of the queued trigger
+    queued_reason: str = "scheduled"
+    in_flight: bool = False
+    pending_due: Optional[float] = None  # trigger that arrived while a run was in flight
+    pending_reason: str = "scheduled"
+
+
+@dataclass
+class SchedulerStats:
+    triggered: int = 0
+    launched: int = 0
+    completed: int = 0
+    coalesced: int = 0
+    late: int = 0
+    skipped_late: int = 0
+    throttled: int = 0
+    errors: int = 0
+    start_lag_ms: List[float] = field(default_factory=list, repr=False)
+
+    def to_dict(self) -> dict:
+        lags = sorted(self.start_lag_ms)
+        return {
+            "triggered": self.triggered, "launched": self.launched, "completed": self.completed,
+            "coalesced": self.coalesced, "late": self.late, "skipped_late": self.skipped_late,
+            "throttled": self.throttled, "errors": self.errors,
+            "start_lag_p50_ms": lags[len(lags) // 2] if lags else 0.0,
+            "start_lag_max_ms": lags[-1] if lags else 0.0,
+        }
+
+
+class AsyncScheduler:
+    def __init__(
+        self,
+        client,
+        assistant_id: str,
+        decisions: List[dict],
+        thread_manager: AsyncThreadManager | None = None,
+        max_concurrency: int | None = None,
+        rate_per_second: float | None = None,
+        rate_burst: int | None = None,
+        deadline_seconds: float | None = None,
+        late_policy: str | None = None,
+        wait_for_runs: bool | None = None,
+        gate: Callable[[str], Optional[str]] | None = None,
+        prepare: Callable[[List[Tuple[str, str]]], Awaitable[Any]] | None = None,
+    ):
+        cfg = settings.scheduler
+        self.client = client
+        self.assistant_id = assistant_id
+        self.threads = thread_manager or AsyncThreadManager(client)
+        self.max_concurrency = max_concurrency or cfg.max_concurrency
+        rate = cfg.rate_per_second if rate_per_second is None else rate_per_second
+        self.bucket = TokenBucket(rate, rate_burst or cfg.rate_burst) if rate else None
+        self.deadline_seconds = cfg.deadline_seconds if deadline_seconds is None else deadline_seconds
+        self.late_policy = late_policy or cfg.late_policy
+        self.wait_for_runs = cfg.wait_for_runs if wait_for_runs is None else wait_for_runs
+        # gate(instrument) -> reason to hold its triggers (e.g. a macro throttle window), or None
+        self.gate = gate
+        # prepare([(instrument, timeframe), ...]) runs before a batch of bar-close triggers (e.g. feature precompute)
+        self.prepare = prepare
+
+        self.decisions: Dict[str, _Decision] = {
+            f"{d['instrument']}_{d['timeframe']}": _Decision(d["instrument"], d["timeframe"]) for d in decisions
+        }
+        self.stats = SchedulerStats()
+        self._queue: asyncio.Queue[str] | None = None
+        self._workers: List[asyncio.Task] = []
+
+    # ----- lifecycle -----
+    async def start(self) -> "AsyncScheduler":
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker(), name=f"scheduler-worker-{i}") for i in range(self.max_concurrency)]
+        return self
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def drain(self) -> None:
+        """Wait until every queued trigger (and coalesced follow-up) has been handled."""
+        await self._queue.join()
+
+    # ----- triggers -----
+    def trigger(self, key: str, due: float | None = None, reason: str = "scheduled") -> str:
+        """Queue a run for `key`, due at wall time `due`. Returns "queued", "coalesced", "pending" or "throttled"."""
+        self.stats.triggered += 1
+        if self.gate is not None and self.gate(self.decisions[key].instrument):
+            self.stats.throttled += 1
+            return "throttled"
+        return self._offer(key, time.time() if due is None else due, reason)
+
+    def _offer(self, key: str, due: float, reason: str) -> str:
+        d = self.decisions[key]
+        if d.in_flight and d.queued_due is None:
+            if d.pending_due is not None:
+                self.stats.coalesced += 1
+            d.pending_due, d.pending_reason = due, reason
+            return "pending"
+        if d.queued_due is not None:
+            self.stats.coalesced += 1
+            d.queued_due, d.queued_reason = max(d.queued_due, due), reason
+            return "coalesced"
+        d.queued_due, d.queued_reason = due, reason
+        self._queue.put_nowait(key)
+        return "queued"
+
+    def report(self, cycle_lag_ms: float = 0.0) -> dict:
+        """Trace and return the scheduler's state."""
+        report = {
+            "cycle_lag_ms": cycle_lag_ms,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": sum(d.in_flight for d in self.decisions.values()),
+            **self.stats.to_dict(),
+        }
+        self.stats.start_lag_ms.clear()
+        from app.telemetry import tracer
+        tracer.log({"event_type": "scheduler_cycle", "node": "scheduler", "status": "ok", "latency_ms": cycle_lag_ms, "output": report})
+        return report
+
+    async def run_forever(self) -> None:
+        """Run the schedule configured by `scheduler.alignment`."""
+        if settings.scheduler.alignment == "bar_close":
+            await self.run_bar_aligned()
+        else:
+            await self.run_polling()
+
+    async def run_polling(self, interval: float | None = None) -> None:
+        """Trigger every decision once per `interval` seconds, on a fixed grid."""
+        interval = interval or settings.scheduler.poll_interval_seconds
+        next_tick = time.time()
+        while True:
+            delay = next_tick - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag_ms = max(0.0, (time.time() - next_tick) * 1000)
+            await self._prepare(list(self.decisions))
+            for key in self.decisions:
+                self.trigger(key, due=next_tick)
+            self._log_cycle(lag_ms)
+            next_tick += interval
+            if next_tick < time.time():  # a cycle's worth of ticks was missed; don't replay them
+                next_tick = time.time()
+
+    async def run_bar_aligned(self) -> None:
+        """
+        Trigger each decision once per bar of its timeframe, `bar_close_delay_seconds`
+        after the candle closes, waking on a heap of per-decision deadlines.
+        """
+        deadlines = self.bar_deadlines(time.time())
+        while True:
+            due = deadlines[0][0] + settings.scheduler.bar_close_delay_seconds
+            delay = due - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag_ms = max(0.0, (time.time() - due) * 1000)
+            keys = self.pop_due(deadlines, time.time())
+            await self._prepare(keys)
+            for key in keys:
+                self.trigger(key, due=due, reason="bar_close")
+            self._log_cycle(lag_ms)
+
+    def bar_deadlines(self, now: float) -> List[tuple]:
+        """Heap of (next bar close, key) for every decision."""
+        heap = [(self._next_close(d.timeframe, now), key) for key, d in self.decisions.items()]
+        heapq.heapify(heap)
+        return heap
+
+    def pop_due(self, heap: List[tuple], now: float) -> List[str]:
+        """
+        Pop the decisions whose bars close at the earliest deadline and push their
+        next closes. Returns the keys whose closed bar actually formed (FX
+        weekend bars are dropped when `skip_market_closed` is set).
+        """
+        close = heap[0][0]
+        keys = []
+        while heap and heap[0][0] == close:
+            _, key = heapq.heappop(heap)
+            timeframe = self.decisions[key].timeframe
+            if not settings.scheduler.skip_market_closed or bar_forms(timeframe, close):
+                keys.append(key)
+            # After a stall, resume at the next close to come instead of replaying missed bars
+            heapq.heappush(heap, (self._next_close(timeframe, max(close, now - settings.scheduler.bar_close_delay_seconds)), key))
+        return keys
+
+    async def _prepare(self, keys: List[str]) -> None:
+        if self.prepare is None or not keys:
+            return
+        try:
+            await self.prepare([(self.decisions[k].instrument, self.decisions[k].timeframe) for k in keys])
+        except Exception as e:  # runs fall back to computing their own features
+            print(f"[scheduler] prepare failed: {type(e).__name__}: {e}")
+
+    @staticmethod
+    def _next_close(timeframe: str, now: float) -> float:
+        cfg = settings.scheduler
+        return next_bar_close(timeframe, now, cfg.daily_close_hour, cfg.weekly_close_weekday)
+
+    def _log_cycle(self, lag_ms: float) -> None:
+        r = self.report(lag_ms)
+        print(f"--- Cycle at {time.ctime()}: lag {lag_ms:.0f} ms, queue {r['queue_depth']}, in flight {r['in_flight']}, "
+              f"coalesced {r['coalesced']}, late {r['late']} ---")
+
+    # ----- workers -----
+    async def _worker(self) -> None:
+        while True:
+            key = await self._queue.get()
+            d = self.decisions[key]
+            try:
+                if self.bucket is not None:
+                    await self.bucket.acquire()
+                due, reason = d.queued_due, d.queued_reason
+                d.queued_due, d.in_flight = None, True
+                lag = time.time() - due
+                self.stats.start_lag_ms.append(lag * 1000)
+                if lag > self.deadline_seconds:
+                    self.stats.late += 1
+                    if self.late_policy == "skip":
+                        self.stats.skipped_late += 1
+                        print(f"Skipping late run for {key} ({lag:.1f}s past due).")
+                        continue
+                await self._launch(d, reason)
+            finally:
+                d.in_flight = False
+                if d.pending_due is not None and d.queued_due is None:
+                    due, d.pending_due = d.pending_due, None
+                    self._offer(key, due, d.pending_reason)
+                self._queue.task_done()
+
+    async def _launch(self, d: _Decision, reason: str) -> None:
+        run_input = {"messages": [{"role": "user", "content": f"CandleCloseEvent {d.instrument} {d.timeframe}"}]}
+        metadata = {
+            "instrument": d.instrument,
+            "timeframe": d.timeframe,
+            "mode": settings.mode,
+            "broker_provider": settings.broker_provider,
+            "llm_provider": settings.llm.provider_label,
+            "llm_model": settings.llm.model,
+            "run_reason": reason,
+            "app_version": settings.app.get("version", "0.1.0"),
+        }
+        for attempt in range(2):  # Allow one retry
+            try:
+                thread_id = await self.threads.ensure_thread_id(d.instrument, d.timeframe)
+                run = await self.client.runs.create(thread_id, self.assistant_id, input=run_input, metadata=metadata)
+                self.stats.launched += 1
+                if self.wait_for_runs:
+                    await self.client.runs.join(thread_id, run["run_id"])
+                    self.stats.completed += 1
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if "404" in str(e) and "thread" in str(e).lower() and attempt == 0:
+                    print(f"Stale thread detected on run creation for {d.instrument}/{d.timeframe}. Retrying once.")
+                    await self.threads.force_recreate(d.instrument, d.timeframe)
+                    continue
+                self.stats.errors += 1
+                print(f"Error triggering run for {d.instrument}/{d.timeframe}: {e}", file=sys.stderr)
+                return
+
+
+async def connect(lg_url: str, graph_id: str) -> tuple[Any, str]:
+    """Async SDK client and the assistant id for `graph_id`."""
+    from langgraph_sdk import get_client
+    client = get_client(url=lg_url)
+    assistants = await client.assistants.search(graph_id=graph_id)
+    if not assistants:
+        raise ValueError(f"No assistant found for graph_id '{graph_id}'")
+    return client, assistants[0]["assistant_id"]
@@ -20,6 +20,10 @@ class LLMSettings(BaseModel):
     max_tokens: int = 1024
     connect_timeout: int = 10
     read_timeout: int = 120
+    # Shared connection pool for all LLM clients
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 60.0
     require_tools: bool = True
     probe_tools: bool = True
 
@@ -33,6 +37,18 @@ class LLMSettings(BaseModel):
             self.provider_label = "OPENAI_COMPAT"
         return self
 
+# --- LLM Cache Settings ---
+class LLMCacheSettings(BaseModel):
+    # none | memory (LRU only) | sqlite (LRU in front of an on-disk table)
+    backend: Literal["none", "memory", "sqlite"] = "sqlite"
+    path: str = "runs/cache/llm/responses.sqlite"
+    max_entries: int = 1024  # in-memory tier
+    max_rows: int = 50_000  # on-disk tier; oldest rows are pruned beyond this
+    ttl_seconds: float | None = 86_400.0
+    # True: clients that sample (temperature > 0) bypass the cache. The shipped
+    # llm.temperature is 0.2, so the cache only runs by default with this off.
+    skip_when_sampling: bool = False
+
 # --- Telemetry Settings ---
 class LangSmithSettings(BaseModel):
     project: str | None = None
@@ -41,6 +57,27 @@ class LangSmithSettings(BaseModel):
 class LocalTraceSettings(BaseModel):
     path: str = "runs/traces/"
     rotate_days: int = 30
+    # "sync" writes each event inline; "background" hands events to a writer thread
+    writer: Literal["sync", "background"] = "sync"
+    flush_interval_ms: int = 500
+    max_batch_size: int = 256
+    queue_size: int = 10000
+    queue_full_policy: Literal["drop", "block"] = "drop"
+    # Per-event size caps; None disables the payload cap
+    max_payload_bytes: Optional[int] = None
+    digest_chars: int = 200
+    message_cache_size: int = 4096
+    # Parquet sink (tracing_provider: local_parquet): a partition's buffered rows are
+    # written as one file at this many rows, payload bytes, or age of the oldest row
+    parquet_row_group_size: int = 512
+    parquet_roll_bytes: int = 8 << 20
+    parquet_flush_interval_ms: int = 900_000
+    # Retention: compress closed days, delete data older than rotate_days
+    compress_after_days: int = 1
+    compression: Literal["gzip", "zstd"] = "gzip"
+    retention_background: bool = False
+    retention_interval_minutes: float = 60
+    retention_max_files_per_run: int = 200
 
 class TelemetrySettings(BaseModel):
     tracing_provider: str = "local_both"
@@ -52,6 +89,67 @@ class TelemetrySettings(BaseModel):
 class DataSettings(BaseModel):
     provider: str
     cache_format: Literal["parquet", "csv", "none"] = "csv"
+    # Candle cache retention; None disables the limit
+    cache_max_age_days: Optional[int] = 7
+    cache_max_bytes: Optional[int] = None
+    # In-process candle store (bars kept per provider/instrument/granularity)
+    store_max_bars: int = 5000
+
+class FeatureEngineSettings(BaseModel):
+    # Batch summaries for the decisions due at each bar close (app/tools/feature_engine.py)
+    enabled: bool = True
+    count: int = 200             # bars per summary; matches get_candles' default
+    max_concurrency: int = 8     # provider fetches in flight per batch
+    publish_to_disk: bool = True # runs/cache/features/, read by the LangGraph server process
+
+class FeatureRegistrySettings(BaseModel):
+    # Every preset's features from the summary pass, per digest (app/tools/feature_registry.py)
+    enabled: bool = True         # false: summaries compute only the trend_following columns they export
+    max_entries: int = 1024      # digests kept (LRU)
+
+class IndicatorStateSettings(BaseModel):
+    # Streaming indicator state per (instrument, granularity) (app/tools/indicator_state.py)
+    enabled: bool = False        # summaries advance the states by the new bars instead of recomputing windows
+    persist: bool = True         # runs/cache/indicator_state/, restored after a restart
+
+class DecisionCacheSettings(BaseModel):
+    enabled: bool = True
+    ttl_seconds: float = 3600.0
+    max_entries: int = 512
+    # Per-node opt-out: nodes set to false always call their agent
+    nodes: dict[str, bool] = {"strategy": True, "signal": True, "risk": True}
+
+class PolicySettings(BaseModel):
+    # Per-node execution mode (app/policies.py); only strategy and risk have rules
+    modes: dict[str, Literal["llm", "rules", "rules-then-llm-on-ambiguity"]] = {"strategy": "llm", "risk": "llm"}
+    trend_spread_atr: float = 0.5   # |ema_fast - ema_slow| / atr at or above this: trend_following
+    range_spread_atr: float = 0.15  # at or below this (close near ema_slow): mean_reversion
+    breakout_atr: float = 2.0       # |close - ema_slow| / atr at or above this, EMAs not trending: breakout
+
+class GraphSettings(BaseModel):
+    # "agents": strategy -> signal -> risk -> exec agents; "single_call": one structured LLM call (app/single_call.py)
+    topology: Literal["agents", "single_call"] = "agents"
+    structured_output_method: Literal["json_schema", "function_calling", "json_mode"] = "json_schema"
+
+# --- HTTP Client Settings ---
+class HttpPoolSettings(BaseModel):
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 10.0
+    read_timeout: float = 30.0
+    # In-flight requests per provider (per event loop)
+    max_concurrency: int = 4
+
+class HttpSettings(BaseModel):
+    http2: bool = True  # only used when the optional `h2` package is installed
+    log_requests: bool = True
+    default: HttpPoolSettings = HttpPoolSettings()
+    # Per-provider overrides of `default`, e.g. {"oanda": {"max_concurrency": 8}}
+    providers: dict[str, dict] = {}
+
+    def for_provider(self, provider: str) -> HttpPoolSettings:
+        return HttpPoolSettings(**{**self.default.model_dump(), **self.providers.get(provider, {})})
 
 # --- Other Settings ---
 class RiskSettings(BaseModel):
@@ -69,18 +167,59 @@ class OandaSettings(BaseModel):
     live_base: str
     account_id: str | None = None
     api_key: str | None = None
+    practice_stream_base: str = "https://stream-fxpractice.oanda.com"
+    live_stream_base: str = "https://stream-fxtrade.oanda.com"
     env: Literal["practice", "live"] = "practice"
 
     @property
     def base(self) -> str:
         return self.practice_base if self.env == "practice" else self.live_base
 
+    @property
+    def stream_base(self) -> str:
+        return self.practice_stream_base if self.env == "practice" else self.live_stream_base
+
+class PriceStreamSettings(BaseModel):
+    enabled: bool = False
+    instruments: list[str] = []
+    # Ticks are bucketed into bars of `bar_seconds` for a Wilder ATR over `atr_window` bars
+    atr_window: int = 14
+    bar_seconds: int = 60
+    # A move from the last bar close beyond this many ATRs is a PriceSpikeEvent
+    spike_threshold_atr: float = 2.5
+    cooldown_seconds: float = 60.0  # per instrument
+    source: Literal["oanda", "replay", "socket"] = "oanda"
+    replay_path: str | None = None  # JSONL/CSV ticks for `replay`
+    replay_speed: float = 0.0       # 0: as fast as possible, 1: real time
+    socket_host: str = "127.0.0.1"
+    socket_port: int = 9009
+
+class MacroThrottleSettings(BaseModel):
+    enabled: bool = False
+    # Runs for instruments in a high-impact event's currency are held this long around it
+    before_minutes: int = 15
+    after_minutes: int = 15
+    poll_minutes: float = 30.0
+
 class SchedulerSettings(BaseModel):
     decisions: list[dict]
     heartbeat_every_seconds: int = 60
-    stagger_seconds: int = 2
-    price_stream: dict | None = None
-    macro_throttle: dict | None = None
+    # When decisions fire: once per bar close of their timeframe, or every poll interval
+    alignment: Literal["poll", "bar_close"] = "bar_close"
+    poll_interval_seconds: int = 60
+    bar_close_delay_seconds: float = 2.0  # lets the provider publish the completed candle
+    daily_close_hour: int = 0             # UTC hour at which D/W bars close
+    weekly_close_weekday: int = 0         # 0 = Monday
+    skip_market_closed: bool = True       # no runs for intraday bars inside the FX weekend
+    # Async fan-out (app/scheduler.py)
+    max_concurrency: int = 4
+    rate_per_second: float | None = None  # token bucket for run launches; None: concurrency limit only
+    rate_burst: int = 1
+    deadline_seconds: float = 30.0
+    late_policy: Literal["skip", "coalesce"] = "coalesce"
+    wait_for_runs: bool = True
+    price_stream: PriceStreamSettings = PriceStreamSettings()
+    macro_throttle: MacroThrottleSettings = MacroThrottleSettings()
 
 class Settings(BaseModel):
     app: dict
@@ -96,6 +235,14 @@ class Settings(BaseModel):
     scheduler: SchedulerSettings
     risk: RiskSettings
     oanda: OandaSettings
+    http: HttpSettings = HttpSettings()
+    feature_engine: FeatureEngineSettings = FeatureEngineSettings()
+    indicator_state: IndicatorStateSettings = IndicatorStateSettings()
+    feature_registry: FeatureRegistrySettings = FeatureRegistrySettings()
+    decision_cache: DecisionCacheSettings = DecisionCacheSettings()
+    policies: PolicySettings = PolicySettings()
+    graph: GraphSettings = GraphSettings()
+    llm_cache: LLMCacheSettings = LLMCacheSettings()
     paper: dict | None = None
     mock_data: dict | None = None
     alpha_vantage: dict | None = None
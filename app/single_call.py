@@ -0,0 +1,181 @@
+"""
+Single-call topology — one structured LLM call per decision.
+
+    features -> decide -> risk -> exec
+
+`features` calls `get_candles` once. `decide` makes the only LLM call: the
+`decision/decide_trade__v1` prompt with the feature summary, answered as a
+`TradeDecision` (preset, signal and stop distances) through the model's
+structured output (`graph.structured_output_method`). A hold ends the run.
+`risk` attaches stops the way `attach_stops` does (app/policies.py `risk_rule`)
+and `exec` calls `execute_order`, whose guardrails still apply.
+
+Selected with `graph.topology: single_call` (or `build_trader_graph(...,
+topology="single_call")`). Each step is written to the state as the tool call
+and result an agent would have produced, and traced like the agent nodes.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import BaseTool
+from langgraph.graph import END, StateGraph
+
+from app.graph import TraderState, _run_context, check_for_tool_error, create_traced_node, error_handler_node, strategy_router
+from app.llm import make_llm
+from app.policies import last_tool_output, parse_json, risk_rule, tool_exchange
+from app.prompts import prompt_registry
+from app.settings import settings
+from app.tools.data_models import TradeDecision
+
+DECIDE_PROMPT = "decision/decide_trade__v1"
+
+
+def _content(output: Any) -> str:
+    return output if isinstance(output, str) else json.dumps(output)
+
+
+def _append(state: TraderState, new: List[Any]) -> dict:
+    return {"messages": list(state.get("messages") or []) + new}
+
+
+def _decision(state: TraderState) -> Optional[dict]:
+    for m in reversed(state.get("messages") or []):
+        if isinstance(m, AIMessage) and m.content:
+            answer = parse_json(m.content)
+            return answer if isinstance(answer, dict) else None
+    return None
+
+
+# ----- steps -----
+def features_step(features_tool: BaseTool) -> RunnableLambda:
+    def args_of(state: TraderState) -> Optional[dict]:
+        ctx = _run_context(state, None)
+        return {"instrument": ctx["instrument"], "timeframe": ctx["timeframe"]} if "instrument" in ctx else None
+
+    def run(state: TraderState) -> dict:
+        args = args_of(state)
+        if args is None:  # not a candle close (e.g. DryRunEvent): nothing to decide
+            return _append(state, [])
+        try:
+            content = _content(features_tool.invoke(args))
+        except Exception as e:
+            content = json.dumps({"error": f"Failed to get candles: {e}"})
+        return _append(state, tool_exchange("get_candles", args, content))
+
+    async def arun(state: TraderState) -> dict:
+        args = args_of(state)
+        if args is None:
+            return _append(state, [])
+        try:
+            content = _content(await features_tool.ainvoke(args))
+        except Exception as e:
+            content = json.dumps({"error": f"Failed to get candles: {e}"})
+        return _append(state, tool_exchange("get_candles", args, content))
+
+    return RunnableLambda(run, afunc=arun, name="features")
+
+
+def decide_step(llm) -> RunnableLambda:
+    structured = llm.with_structured_output(TradeDecision, method=settings.graph.structured_output_method)
+    prompt = prompt_registry.get(DECIDE_PROMPT)
+
+    def request(state: TraderState) -> list:
+        ctx = _run_context(state, None)
+        features = last_tool_output(state.get("messages") or [], "get_candles")
+        return [HumanMessage(content=prompt.render(
+            instrument=ctx.get("instrument"), timeframe=ctx.get("timeframe"), features=json.dumps(features),
+        ))]
+
+    def done(state: TraderState, decision: TradeDecision) -> dict:
+        return _append(state, [AIMessage(content=decision.model_dump_json())])
+
+    def run(state: TraderState) -> dict:
+        return done(state, structured.invoke(request(state)))
+
+    async def arun(state: TraderState) -> dict:
+        return done(state, await structured.ainvoke(request(state)))
+
+    return RunnableLambda(run, afunc=arun, name="decide")
+
+
+def risk_step() -> RunnableLambda:
+    def run(state: TraderState) -> dict:
+        messages = state.get("messages") or []
+        decision = _decision(state) or {}
+        summary = last_tool_output(messages, "get_candles") or {}
+        closes = summary.get("last_n_closes") or []
+        atr = (summary.get("indicators") or {}).get("atr")
+        order = {
+            "instrument": summary.get("instrument"),
+            "side": decision.get("action"),
+            "units": int(decision.get("units") or settings.risk.default_units),
+            "entry_type": decision.get("entry_type", "market"),
+            "price": decision.get("price"),
+        }
+        final = risk_rule(order, atr, closes[-1] if closes else None, decision.get("stop_loss_atr"), decision.get("take_profit_atr"))
+        content = json.dumps(final) if final else json.dumps({"error": "Failed to attach stops: order or ATR unusable"})
+        return _append(state, tool_exchange("attach_stops", {"order": order, "atr": atr}, content))
+
+    return RunnableLambda(run, name="risk")
+
+
+def exec_step(execute_tool: BaseTool) -> RunnableLambda:
+    def order_of(state: TraderState) -> dict:
+        return {"order": last_tool_output(state.get("messages") or [], "attach_stops")}
+
+    def run(state: TraderState) -> dict:
+        args = order_of(state)
+        return _append(state, tool_exchange("execute_order", args, _content(execute_tool.invoke(args))))
+
+    async def arun(state: TraderState) -> dict:
+        args = order_of(state)
+        return _append(state, tool_exchange("execute_order", args, _content(await execute_tool.ainvoke(args))))
+
+    return RunnableLambda(run, afunc=arun, name="exec")
+
+
+# ----- routing -----
+def decision_router(state: TraderState) -> str:
+    """After decide: a hold ends the run; an unreadable answer goes to the error handler."""
+    decision = _decision(state)
+    if not decision:
+        return "error"
+    return END if decision.get("action") == "hold" else "continue"
+
+
+# --- Graph Builder ---
+def build_single_call_graph(tools: List[BaseTool], route_overrides: Optional[dict] = None) -> StateGraph:
+    by_name = {t.name: t for t in tools}
+    missing = {"get_candles", "execute_order"} - set(by_name)
+    if missing:
+        raise ValueError(f"The single_call topology needs the tools: {sorted(missing)}")
+
+    routers = {
+        "features": strategy_router,
+        "decide": decision_router,
+        "risk": check_for_tool_error,
+        "exec": check_for_tool_error,
+    }
+    if route_overrides:
+        routers.update(route_overrides)
+
+    graph = StateGraph(TraderState)
+    graph.add_node("features", create_traced_node("features", None, features_step(by_name["get_candles"]), calls_llm=False))
+    graph.add_node("decide", create_traced_node("decide", DECIDE_PROMPT, decide_step(make_llm())))
+    graph.add_node("risk", create_traced_node("risk", None, risk_step(), calls_llm=False))
+    graph.add_node("exec", create_traced_node("exec", None, exec_step(by_name["execute_order"]), calls_llm=False))
+    graph.add_node("error_handler", error_handler_node)
+
+    graph.set_entry_point("features")
+    graph.add_conditional_edges("features", routers["features"], {"continue": "decide", "error": "error_handler", END: END})
+    graph.add_conditional_edges("decide", routers["decide"], {"continue": "risk", "error": "error_handler", END: END})
+    graph.add_conditional_edges("risk", routers["risk"], {"continue": "exec", "error": "error_handler"})
+    graph.add_conditional_edges("exec", routers["exec"], {"continue": END, "error": "error_handler"})
+    graph.add_edge("error_handler", END)
+
+    return graph
@@ -1,14 +1,179 @@
 from __future__ import annotations
+import atexit
 import csv
 import json
+import queue
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, IO, Tuple
 
 from langchain_core.messages import BaseMessage
 from langchain_core.messages import messages_to_dict
 
 from app.settings import settings
+from app.trace_store import ParquetTraceSink
+
+# Queue markers understood by the background writer
+_STOP = object()
+
+
+class TraceWriter:
+    """
+    Background writer for local trace files.
+
+    Events are queued by `Tracer.log` and drained by a dedicated thread that
+    writes them in batches through long-lived file handles, so the graph nodes
+    never wait on file I/O.
+    """
+
+    idle_tick = 1.0  # seconds without events before the Parquet sink is checked for due partitions
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        queue_size: int = 10000,
+        max_batch_size: int = 256,
+        flush_interval_ms: int = 500,
+        queue_full_policy: str = "drop",
+    ):
+        self._tracer = tracer
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.max_batch_size = max(1, max_batch_size)
+        self.flush_interval = max(0, flush_interval_ms) / 1000.0
+        self.queue_full_policy = queue_full_policy
+
+        self._handles: Dict[Path, IO] = {}
+        self._day: str | None = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    # ----- producer side -----
+    def submit(self, item: Tuple[str, Dict[str, Any], Dict[str, Any] | None]) -> bool:
+        """Enqueue a prepared (day, event, csv_row) item. Returns False if it was dropped."""
+        if self.queue_full_policy == "block":
+            self._queue.put(item)
+            return True
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until every event queued so far has been written."""
+        if not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        """Drain the queue, stop the worker thread and close the file handles."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    # ----- consumer side -----
+    def _run(self) -> None:
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=self.idle_tick)
+            except queue.Empty:
+                self._idle()
+                continue
+            batch: List[Any] = [item]
+            deadline = time.monotonic() + self.flush_interval
+
+            # Collect until the batch is full, the flush interval elapses or a marker arrives
+            while item is not _STOP and not isinstance(item, threading.Event) and len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            events = [b for b in batch if isinstance(b, tuple)]
+            try:
+                if events:
+                    self._write_batch(events)
+            except Exception as e:  # never let the writer thread die
+                print(f"[telemetry] Trace writer failed: {type(e).__name__}: {e}", flush=True)
+
+            for b in batch:
+                if isinstance(b, threading.Event):
+                    b.set()
+                elif b is _STOP:
+                    running = False
+
+        self._close_handles()
+
+    def _idle(self) -> None:
+        # A partition that stopped getting events is still written once it comes of age
+        try:
+            if self._tracer._parquet is not None:
+                self._tracer._parquet.flush_due()
+        except Exception as e:
+            print(f"[telemetry] Trace writer failed: {type(e).__name__}: {e}", flush=True)
+
+    def _handle(self, path: Path, is_csv: bool) -> IO:
+        fh = self._handles.get(path)
+        if fh is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            new_file = not path.exists() or path.stat().st_size == 0
+            fh = open(path, "a", newline="" if is_csv else None)
+            if is_csv and new_file:
+                csv.DictWriter(fh, fieldnames=self._tracer.csv_headers).writeheader()
+            self._handles[path] = fh
+        return fh
+
+    def _close_handles(self) -> None:
+        for fh in self._handles.values():
+            try:
+                fh.close()
+            except OSError:
+                pass
+        self._handles.clear()
+
+    def _write_batch(self, events: List[Tuple[str, Dict[str, Any], Dict[str, Any] | None]]) -> None:
+        for day, event, csv_row in events:
+            if day != self._day:
+                # Day rolled over: release yesterday's files
+                self._close_handles()
+                self._day = day
+
+            csv_path, jsonl_path = self._tracer._paths_for_day(day)
+            if jsonl_path:
+                self._handle(jsonl_path, is_csv=False).write(json.dumps(event, default=str) + "\n")
+            if csv_path and csv_row is not None:
+                csv.DictWriter(self._handle(csv_path, is_csv=True), fieldnames=self._tracer.csv_headers).writerow(csv_row)
+
+        for fh in self._handles.values():
+            fh.flush()
+
+        if self._tracer._parquet is not None:
+            self._tracer._parquet.write([event for _, event, _ in events])
+
+        with self._lock:
+            self.written += len(events)
+            self.batches += 1
+
 
 class Tracer:
     _instance = None
@@ -35,8 +200,43 @@ class Tracer:
             "features_digest", "cache_path"
         ]
 
+        local = settings.telemetry.local
+        self.max_payload_bytes = local.max_payload_bytes
+        self.digest_chars = local.digest_chars
+        self.message_cache_size = local.message_cache_size
+        self._message_memo: OrderedDict = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+        self._parquet: ParquetTraceSink | None = None
+        if "parquet" in self.provider:
+            self._parquet = ParquetTraceSink(
+                lambda: self.local_path / "parquet",
+                row_group_size=local.parquet_row_group_size,
+                flush_interval_ms=local.parquet_flush_interval_ms,
+                roll_bytes=local.parquet_roll_bytes,
+            )
+
+        self._writer: TraceWriter | None = None
+        if local.writer == "background" and "local" in self.provider:
+            self._writer = TraceWriter(
+                self,
+                queue_size=local.queue_size,
+                max_batch_size=local.max_batch_size,
+                flush_interval_ms=local.flush_interval_ms,
+                queue_full_policy=local.queue_full_policy,
+            )
+        if self._writer is not None or self._parquet is not None:
+            atexit.register(self.close)
+
         self._initialized = True
 
+    def _paths_for_day(self, day: str) -> (Path | None, Path | None):
+        csv_path = self.local_path / f"{day}_actions.csv" if "csv" in self.provider or "both" in self.provider else None
+        jsonl_path = self.local_path / f"{day}_actions.jsonl" if "jsonl" in self.provider or "both" in self.provider else None
+        return csv_path, jsonl_path
+
     def _get_log_paths(self) -> (Path | None, Path | None):
         if "local" not in self.provider:
             return None, None
@@ -44,8 +244,7 @@ class Tracer:
         self.local_path.mkdir(parents=True, exist_ok=True)
         today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
 
-        csv_path = self.local_path / f"{today}_actions.csv" if "csv" in self.provider or "both" in self.provider else None
-        jsonl_path = self.local_path / f"{today}_actions.jsonl" if "jsonl" in self.provider or "both" in self.provider else None
+        csv_path, jsonl_path = self._paths_for_day(today)
 
         if csv_path and not csv_path.exists():
             with open(csv_path, "w", newline="") as f:
@@ -58,32 +257,161 @@ class Tracer:
         """
         Recursively traverses data to redact sensitive keys and convert
         non-serializable objects (like LangChain messages) to dicts.
+
+        When `max_payload_bytes` is set, the walk stops once the (approximate)
+        serialized size reaches the cap; lists keep their newest items.
         """
+        budget = [self.max_payload_bytes] if self.max_payload_bytes else None
+        return self._sanitize(data, budget)
+
+    def _sanitize(self, data: Any, budget: List[int] | None) -> Any:
         if isinstance(data, dict):
             sanitized_dict = {}
-            for key, value in data.items():
+            for i, (key, value) in enumerate(data.items()):
+                if budget is not None:
+                    if budget[0] <= 0:
+                        sanitized_dict["__truncated_keys__"] = len(data) - i
+                        break
+                    budget[0] -= len(str(key)) + 4
                 if key in self.redact_keys:
                     sanitized_dict[key] = "***REDACTED***"
                 else:
-                    sanitized_dict[key] = self._sanitize_for_json(value)
+                    sanitized_dict[key] = self._sanitize(value, budget)
             return sanitized_dict
         elif isinstance(data, list):
-            return [self._sanitize_for_json(item) for item in data]
+            if budget is None:
+                return [self._sanitize(item, budget) for item in data]
+            # Walk from the end so the most recent items (e.g. messages) survive the cap
+            kept = []
+            for item in reversed(data):
+                if budget[0] <= 0:
+                    break
+                kept.append(self._sanitize(item, budget))
+            kept.reverse()
+            if len(kept) < len(data):
+                kept.insert(0, f"<{len(data) - len(kept)} earlier items truncated>")
+            return kept
         elif isinstance(data, BaseMessage):
-            # For a single message object, convert it to a dict
-            return messages_to_dict([data])[0]
+            # For a single message object, convert it to a dict (memoized)
+            converted, size = self._message_to_dict(data)
+            if budget is not None:
+                if size > budget[0]:
+                    converted = self._truncate_message(converted, budget[0])
+                budget[0] -= size
+            return converted
+        elif isinstance(data, str):
+            if budget is not None:
+                if len(data) > budget[0]:
+                    data = data[:max(budget[0], 0)] + "...<truncated>"
+                budget[0] -= len(data)
+            return data
         else:
+            if budget is not None:
+                budget[0] -= 8
             return data
 
+    def _message_to_dict(self, message: BaseMessage) -> Tuple[Dict[str, Any], int]:
+        """
+        Convert a message once and reuse the result for later events.
+
+        Messages are keyed by their id when they have one (checkpointed state
+        re-creates message objects between nodes) and by identity otherwise.
+        Returns the converted dict and its serialized size.
+        """
+        key = (message.type, message.id) if message.id else id(message)
+        with self._memo_lock:
+            hit = self._message_memo.get(key)
+            if hit is not None and (hit[0] is message or (message.id and hit[0].content == message.content)):
+                self._message_memo.move_to_end(key)
+                self.memo_hits += 1
+                return hit[1], hit[2]
+
+        converted = messages_to_dict([message])[0]
+        size = len(json.dumps(converted, default=str))
+
+        with self._memo_lock:
+            self.memo_misses += 1
+            self._message_memo[key] = (message, converted, size)
+            while len(self._message_memo) > self.message_cache_size:
+                self._message_memo.popitem(last=False)
+        return converted, size
+
+    @staticmethod
+    def _truncate_message(converted: Dict[str, Any], limit: int) -> Dict[str, Any]:
+        """Shallow copy of a converted message with its content cut to `limit` chars."""
+        data = dict(converted.get("data", {}))
+        content = data.get("content")
+        if isinstance(content, str) and len(content) > limit:
+            data["content"] = content[:max(limit, 0)] + "...<truncated>"
+        elif not isinstance(content, str):
+            data["content"] = "<truncated>"
+        return {"type": converted.get("type"), "data": data}
+
+    @staticmethod
+    def _iter_repr(data: Any, top: bool = True):
+        """Yield `str(data)` piece by piece so a digest can stop early."""
+        if isinstance(data, dict):
+            yield "{"
+            for i, (key, value) in enumerate(data.items()):
+                if i:
+                    yield ", "
+                yield repr(key)
+                yield ": "
+                yield from Tracer._iter_repr(value, top=False)
+            yield "}"
+        elif isinstance(data, list):
+            yield "["
+            for i, item in enumerate(data):
+                if i:
+                    yield ", "
+                yield from Tracer._iter_repr(item, top=False)
+            yield "]"
+        elif isinstance(data, str):
+            yield data if top else repr(data)
+        else:
+            yield repr(data) if not top else str(data)
+
+    def _digest(self, data: Any, limit: int | None = None) -> str:
+        """Equivalent to `str(data)[:limit]` without rendering the whole payload."""
+        limit = self.digest_chars if limit is None else limit
+        parts: List[str] = []
+        size = 0
+        for piece in self._iter_repr(data):
+            parts.append(piece)
+            size += len(piece)
+            if size >= limit:
+                break
+        return "".join(parts)[:limit]
+
+    def _csv_row(self, sanitized_event: Dict[str, Any]) -> Dict[str, Any]:
+        # Create a digest for CSV
+        csv_row = {k: sanitized_event.get(k, "") for k in self.csv_headers}
+
+        input_data = sanitized_event.get("input", {})
+        output_data = sanitized_event.get("output", {})
+
+        csv_row["input_digest"] = self._digest(input_data)
+        csv_row["output_digest"] = self._digest(output_data)
+        return csv_row
+
     def log(self, event: Dict[str, Any]):
         if self.provider == "none":
             return
 
-        csv_path, jsonl_path = self._get_log_paths()
-
         # Ensure standard fields are present
         event.setdefault("ts_iso", datetime.now(timezone.utc).isoformat())
 
+        if self._writer is not None:
+            # Sanitize on the caller's thread so later state mutations don't leak into the trace
+            day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            sanitized_event = self._sanitize_for_json(event)
+            csv_path, _ = self._paths_for_day(day)
+            csv_row = self._csv_row(sanitized_event) if csv_path else None
+            self._writer.submit((day, sanitized_event, csv_row))
+            return
+
+        csv_path, jsonl_path = self._get_log_paths()
+
         # Sanitize and prepare data for logging
         sanitized_event = self._sanitize_for_json(event)
 
@@ -93,18 +421,43 @@ class Tracer:
                 f.write(json.dumps(sanitized_event, default=str) + "\n")
 
         if csv_path:
-            # Create a digest for CSV
-            csv_row = {k: sanitized_event.get(k, "") for k in self.csv_headers}
-
-            input_data = sanitized_event.get("input", {})
-            output_data = sanitized_event.get("output", {})
-
-            csv_row["input_digest"] = str(input_data)[:200]
-            csv_row["output_digest"] = str(output_data)[:200]
+            csv_row = self._csv_row(sanitized_event)
 
             with open(csv_path, "a", newline="") as f:
                 writer = csv.DictWriter(f, fieldnames=self.csv_headers)
                 writer.writerow(csv_row)
 
+        if self._parquet is not None:
+            self._parquet.append(sanitized_event)
+
+    # ----- background writer control -----
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until queued/buffered events are on disk."""
+        ok = self._writer.flush(timeout) if self._writer is not None else True
+        if self._parquet is not None:
+            self._parquet.flush()
+        return ok
+
+    def close(self) -> None:
+        """Flush and stop the background writer and Parquet sink (registered with atexit)."""
+        if self._writer is not None:
+            self._writer.close()
+        if self._parquet is not None:
+            self._parquet.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Writer counters (queue depth, dropped/written events, batches) and message memo hits."""
+        memo = {"message_memo_hits": self.memo_hits, "message_memo_misses": self.memo_misses}
+        if self._writer is None:
+            return {"writer": "sync", "queue_depth": 0, "dropped": 0, "written": 0, "batches": 0, **memo}
+        return {
+            "writer": "background",
+            "queue_depth": self._writer.queue_depth,
+            "dropped": self._writer.dropped,
+            "written": self._writer.written,
+            "batches": self._writer.batches,
+            **memo,
+        }
+
 # Singleton instance
 tracer = Tracer()
@@ -0,0 +1,70 @@
+"""
+Timeframe helpers — bar lengths for OANDA-style granularities.
+"""
+
+from __future__ import annotations
+
+GRANULARITY_SECONDS = {
+    "S5": 5,
+    "S10": 10,
+    "S15": 15,
+    "S30": 30,
+    "M1": 60,
+    "M2": 120,
+    "M4": 240,
+    "M5": 300,
+    "M10": 600,
+    "M15": 900,
+    "M30": 1800,
+    "H1": 3600,
+    "H2": 7200,
+    "H3": 10800,
+    "H4": 14400,
+    "H6": 21600,
+    "H8": 28800,
+    "H12": 43200,
+    "D": 86400,
+    "D1": 86400,
+    "W": 604800,
+}
+
+
+def granularity_seconds(granularity: str) -> int:
+    """Length of one bar in seconds (unknown granularities fall back to M5)."""
+    return GRANULARITY_SECONDS.get(str(granularity).upper(), 300)
+
+
+# Epoch (1970-01-01) was a Thursday
+_EPOCH_WEEKDAY = 3
+# FX trades from Sunday ~21:00 UTC to Friday ~21:00 UTC (shifts by an hour with US DST)
+FX_WEEK_CLOSE = (4, 21)  # (weekday, hour UTC)
+FX_WEEK_OPEN = (6, 21)
+
+
+def next_bar_close(granularity: str, now: float, daily_close_hour: int = 0, weekly_close_weekday: int = 0) -> float:
+    """
+    Epoch seconds of the first bar close strictly after `now`.
+    Intraday bars close on multiples of their length (UTC); D bars close at
+    `daily_close_hour` UTC, W bars at that hour on `weekly_close_weekday` (0 = Monday).
+    """
+    interval = granularity_seconds(granularity)
+    offset = 0.0
+    if interval >= 86400:
+        offset = daily_close_hour * 3600
+        if interval > 86400:
+            offset += ((weekly_close_weekday - _EPOCH_WEEKDAY) % 7) * 86400
+    return ((now - offset) // interval + 1) * interval + offset
+
+
+def fx_market_open(ts: float) -> bool:
+    """Whether the FX market trades at epoch second `ts` (weekend gap only, no holidays)."""
+    week_seconds = (ts // 86400 + _EPOCH_WEEKDAY) % 7 * 86400 + ts % 86400  # since Monday 00:00 UTC
+    close = FX_WEEK_CLOSE[0] * 86400 + FX_WEEK_CLOSE[1] * 3600
+    reopen = FX_WEEK_OPEN[0] * 86400 + FX_WEEK_OPEN[1] * 3600
+    return not (close <= week_seconds < reopen)
+
+
+def bar_forms(granularity: str, close: float) -> bool:
+    """Whether a bar closing at `close` holds any trading (intraday bars inside the FX weekend don't)."""
+    interval = granularity_seconds(granularity)
+    return interval >= 86400 or fx_market_open(close - interval)
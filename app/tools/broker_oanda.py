@@ -1,6 +1,6 @@
-import httpx
 from app.settings import settings
 from app.tools.broker_provider import Order
+from app.tools.http_clients import http_clients
 
 
 def _build_order_payload(order: Order) -> dict:
@@ -33,7 +33,7 @@ async def place_order(order: Order) -> dict:
     if settings.mode.upper() == "BACKTEST":
         return {"status": "skipped", "reason": "backtest_mode"}
 
-    url = f"{settings.oanda.base}/v3/accounts/{settings.oanda.account_id}/orders"
+    url = f"/v3/accounts/{settings.oanda.account_id}/orders"
     headers = {
         "Authorization": f"Bearer {settings.oanda.api_key}",
         "Content-Type": "application/json",
@@ -41,7 +41,6 @@ async def place_order(order: Order) -> dict:
 
     payload = _build_order_payload(order)
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.post(url, headers=headers, json=payload)
-        r.raise_for_status()
-        return r.json()
+    r = await http_clients.request("oanda", "POST", url, headers=headers, json=payload)
+    r.raise_for_status()
+    return r.json()
@@ -1,5 +1,3 @@
-from __future__ import annotations
-
 """
 PaperBroker — a minimal simulated broker for demo/testing.
 
@@ -8,20 +6,40 @@ Features:
 - Fills market orders on the next bar close ± spread/slippage.
 - Fills limit orders if the bar trades through the limit.
 - Triggers SL/TP using the current bar's high/low.
-- Marks equity each bar; records fills/closures in a JSON ledger.
+- Marks each position at its own instrument's last close; equity, exposure
+  and unrealized PnL are maintained incrementally and queried in O(1).
+- Records fills/closures in a JSON ledger.
+- One in-memory instance per process; changes go to an append-only journal
+  (`<ledger>.journal.jsonl`) that is replayed on startup and folded into the
+  ledger every `paper.snapshot_every` records.
+- Can be driven by `CandleCloseEvent`s on the in-process event bus
+  (see `attach_to_bus`), so no candle data is re-read from disk.
 
 This broker is intentionally simple: it assumes 1:1 price-to-PnL units
 (e.g., units * price) and uses a basic pip model for spread/slippage.
 It’s good for end-to-end demos without any external broker account.
 """
 
+from __future__ import annotations
+
+import atexit
+import bisect
 import json
-from dataclasses import dataclass, asdict
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
 from datetime import datetime, UTC
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
 
+from app.events import CandleCloseEvent, EventBus, bus
 from app.settings import settings
+from app.timeframes import granularity_seconds
 
 
 # --------- Data models ---------
@@ -52,51 +70,319 @@ class PaperState:
     equity: float
     positions: Dict[str, PaperPosition]
     open_orders: List[PaperOrder]
-    history: List[dict]       # list of trade dicts (open/closed)
+    history: List[dict]       # list of trade dicts (open/closed), materialized on snapshot
     last_mark: Optional[str]
+    archived: int = 0         # closed trades spilled to the archive file
+    # Mark-to-market book, maintained incrementally (see PaperBroker._revalue)
+    prices: Dict[str, float] = field(default_factory=dict)  # last close per instrument
+    position_value: float = 0.0  # sum(units * price)
+    exposure: float = 0.0        # sum(|units| * price)
+    cost_basis: float = 0.0      # sum(units * avg_price)
+
+
+class _TriggerBook:
+    """
+    Open trades of one instrument with their SL/TP levels kept sorted, so the
+    trades a bar's high/low triggers are found by bisect instead of a scan.
+    Entries are (level, trade_id); trade_id preserves fill order.
+    """
+
+    def __init__(self) -> None:
+        self.trades: Dict[int, dict] = {}
+        self.long_sl: List[Tuple[float, int]] = []   # hit when low <= level
+        self.long_tp: List[Tuple[float, int]] = []   # hit when high >= level
+        self.short_sl: List[Tuple[float, int]] = []  # hit when high >= level
+        self.short_tp: List[Tuple[float, int]] = []  # hit when low <= level
+
+    def _levels(self, hist: dict):
+        long = hist["side"] == "buy"
+        return (
+            (self.long_sl if long else self.short_sl, hist.get("stop_loss")),
+            (self.long_tp if long else self.short_tp, hist.get("take_profit")),
+        )
+
+    def add(self, hist: dict) -> None:
+        self.trades[hist["trade_id"]] = hist
+        for levels, level in self._levels(hist):
+            if level is not None:
+                bisect.insort(levels, (float(level), hist["trade_id"]))
+
+    def remove(self, hist: dict) -> None:
+        self.trades.pop(hist["trade_id"], None)
+        for levels, level in self._levels(hist):
+            if level is not None:
+                i = bisect.bisect_left(levels, (float(level), hist["trade_id"]))
+                if i < len(levels) and levels[i][1] == hist["trade_id"]:
+                    del levels[i]
+
+    def touch_levels(self) -> Tuple[float, float]:
+        """(low, high) such that a bar triggers some trade iff its low <= low or its high >= high."""
+        low = max(self.long_sl[-1][0] if self.long_sl else -np.inf, self.short_tp[-1][0] if self.short_tp else -np.inf)
+        high = min(self.long_tp[0][0] if self.long_tp else np.inf, self.short_sl[0][0] if self.short_sl else np.inf)
+        return low, high
+
+    def triggered(self, h: float, l: float) -> List[Tuple[dict, float, str]]:
+        """Trades whose SL/TP this bar touches, in fill order. SL wins when both are touched."""
+        hits: Dict[int, Tuple[float, str]] = {}
+        for level, tid in self.long_sl[bisect.bisect_left(self.long_sl, (l, -1)):]:
+            hits[tid] = (level, "stop_loss")
+        for level, tid in self.short_sl[:bisect.bisect_right(self.short_sl, (h, float("inf")))]:
+            hits[tid] = (level, "stop_loss")
+        for level, tid in self.long_tp[:bisect.bisect_right(self.long_tp, (h, float("inf")))]:
+            hits.setdefault(tid, (level, "take_profit"))
+        for level, tid in self.short_tp[bisect.bisect_left(self.short_tp, (l, -1)):]:
+            hits.setdefault(tid, (level, "take_profit"))
+        return [(self.trades[tid], px, reason) for tid, (px, reason) in sorted(hits.items())]
 
 
 # --------- Broker implementation ---------
 class PaperBroker:
     """
-    A simple paper-trading execution simulator persisted to JSON.
+    A simple paper-trading execution simulator, one instance per process.
+
+    State lives in memory. Every mutation is appended to a JSONL journal
+    (fsynced in batches) and the full state is checkpointed to the JSON ledger
+    every `snapshot_every` journal records, after which the journal is
+    truncated. On startup the ledger is loaded and newer journal records are
+    replayed, so a crash loses at most the unsynced tail of the journal.
     """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(PaperBroker, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
 
     def __init__(self) -> None:
+        if self._initialized:
+            return
         p = getattr(settings, "paper", {}) or {}
         self.spread_pips: float = float(p.get("spread_pips", 0.8))
         self.slippage_pips: float = float(p.get("slippage_pips", 0.2))
         self.commission_per_million: float = float(p.get("commission_per_million", 0.0))
         self.lot_size: int = int(p.get("lot_size", 1000))
         self.ledger_path: Path = Path(p.get("ledger_path", "runs/paper_ledger.json"))
-        initial_cash = float(p.get("initial_cash", 100_000))
-
-        self._state = self._load(initial_cash)
+        self.journal_path: Path = Path(p.get("journal_path") or self.ledger_path.with_suffix(".journal.jsonl"))
+        self.snapshot_every: int = int(p.get("snapshot_every", 1000))
+        self.fsync_every: int = int(p.get("fsync_every", 64))
+        self.fsync_interval: float = float(p.get("fsync_interval_ms", 1000)) / 1000.0
+        self.archive_path: Path = Path(p.get("archive_path") or self.ledger_path.with_suffix(".archive.jsonl"))
+        self.archive_max_closed: int = int(p.get("archive_max_closed", 1000))
+        self.initial_cash = float(p.get("initial_cash", 100_000))
+
+        # Serializes mutations from concurrent graph runs
+        self._lock = threading.RLock()
+        self._journal = None
+        self._seq = 0                 # seq of the last applied journal record
+        self._since_snapshot = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        # Indexes over the in-memory book (rebuilt by _load)
+        self._pending: Dict[str, List[PaperOrder]] = {}
+        self._books: Dict[str, _TriggerBook] = {}
+        self._closed: List[dict] = []  # closed trades not yet spilled, in close order
+        self._next_trade_id = 1
+        # End (epoch seconds) of the newest closed bar applied per instrument from the event bus
+        self._bar_end: Dict[str, float] = {}
+
+        self._state = self._load(self.initial_cash)
+        atexit.register(self.close)
+        self._initialized = True
 
     # ----- persistence -----
     def _load(self, initial_cash: float) -> PaperState:
+        state = PaperState(
+            cash=initial_cash,
+            equity=initial_cash,
+            positions={},
+            open_orders=[],
+            history=[],
+            last_mark=None,
+        )
+        self._seq = 0
         if self.ledger_path.exists():
             data = json.loads(self.ledger_path.read_text())
-            return PaperState(
+            state = PaperState(
                 cash=float(data.get("cash", initial_cash)),
                 equity=float(data.get("equity", data.get("cash", initial_cash))),
                 positions={k: PaperPosition(**v) for k, v in data.get("positions", {}).items()},
                 open_orders=[PaperOrder(**o) for o in data.get("open_orders", [])],
                 history=list(data.get("history", [])),
                 last_mark=data.get("last_mark"),
+                archived=int(data.get("archived", 0)),
+                prices={k: float(v) for k, v in data.get("prices", {}).items()},
+                position_value=float(data.get("position_value", 0.0)),
+                exposure=float(data.get("exposure", 0.0)),
+                cost_basis=float(data.get("cost_basis", 0.0)),
             )
-        return PaperState(
-            cash=initial_cash,
-            equity=initial_cash,
-            positions={},
-            open_orders=[],
-            history=[],
-            last_mark=None,
-        )
-
-    def _save(self) -> None:
-        self.ledger_path.parent.mkdir(parents=True, exist_ok=True)
-        self.ledger_path.write_text(json.dumps(asdict(self._state), indent=2))
+            self._seq = int(data.get("seq", 0))
+            if "position_value" not in data:  # ledgers written before the mark book
+                self._recompute_marks(state)
+
+        self._state = state
+        self._index()
+        self._since_snapshot = self._replay()
+        return self._state
+
+    def _index(self) -> None:
+        """Split the loaded history into per-instrument open books and the closed archive."""
+        self._pending = {}
+        for od in self._state.open_orders:
+            self._pending.setdefault(od.instrument, []).append(od)
+        self._books, self._closed = {}, []
+        for n, hist in enumerate(self._state.history, start=self._state.archived + 1):
+            hist.setdefault("trade_id", n)  # ledgers written before trade ids
+            if hist.get("status") == "open":
+                self._books.setdefault(hist["instrument"], _TriggerBook()).add(hist)
+            else:
+                self._closed.append(hist)
+        self._next_trade_id = self._state.archived + len(self._state.history) + 1
+        self._state.history = []
+
+    def _materialize(self) -> None:
+        """Rebuild `state.history` (retained closed + open trades, in fill order) from the indexes."""
+        trades = self._closed + [t for book in self._books.values() for t in book.trades.values()]
+        self._state.history = sorted(trades, key=lambda t: t["trade_id"])
+
+    def _ledger_dict(self) -> dict:
+        """State as a JSON-ready dict. Trade dicts are shared, not deep-copied as `asdict` would."""
+        self._materialize()
+        st = self._state
+        return {
+            "cash": st.cash,
+            "equity": st.equity,
+            "positions": {k: asdict(v) for k, v in st.positions.items()},
+            "open_orders": [asdict(od) for od in st.open_orders],
+            "history": st.history,
+            "last_mark": st.last_mark,
+            "archived": st.archived,
+            "prices": st.prices,
+            "position_value": st.position_value,
+            "exposure": st.exposure,
+            "cost_basis": st.cost_basis,
+        }
+
+    def _spill(self) -> None:
+        """Move the oldest closed trades beyond `archive_max_closed` to the archive file."""
+        overflow = len(self._closed) - self.archive_max_closed
+        if overflow <= 0:
+            return
+        spilled, self._closed = self._closed[:overflow], self._closed[overflow:]
+        self.archive_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.archive_path, "a", encoding="utf-8") as f:
+            for hist in spilled:
+                f.write(json.dumps(hist, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._state.archived += len(spilled)
+
+    def _replay(self) -> int:
+        """Apply journal records newer than the loaded snapshot. Returns how many were applied."""
+        if not self.journal_path.exists():
+            return 0
+        applied, good = 0, 0  # `good`: byte offset just past the last intact record
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn tail from a crash mid-write
+                good += len(line)
+                if rec.get("seq", 0) <= self._seq:
+                    continue
+                self._apply(rec)
+                self._seq = rec["seq"]
+                applied += 1
+        # Cut the torn tail (or terminate a record cut before its newline) so that
+        # later appends start on a line of their own
+        with open(self.journal_path, "r+b") as f:
+            f.truncate(good)
+            if good:
+                f.seek(good - 1)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return applied
+
+    def _record(self, rec: dict) -> Any:
+        """Apply a mutation, append it to the journal and checkpoint when due (caller holds the lock)."""
+        result = self._apply(rec)
+        self._seq += 1
+        rec["seq"] = self._seq
+
+        if self._journal is None:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        self._unsynced += 1
+        self._since_snapshot += 1
+
+        if self._since_snapshot >= self.snapshot_every:
+            self.checkpoint()
+        elif self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self._sync()
+        return result
+
+    def _sync(self) -> None:
+        if self._journal is not None and self._unsynced:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _apply(self, rec: dict) -> Any:
+        op = rec["op"]
+        if op == "order":
+            od = PaperOrder(**rec["order"])
+            self._state.open_orders.append(od)
+            self._pending.setdefault(od.instrument, []).append(od)
+        elif op == "bar":
+            o, h, l, c = rec["ohlc"]
+            self._on_bar(rec["instrument"], o, h, l, c, rec["ts"])
+        elif op == "bars":
+            return self._on_bars(rec["instrument"], *(np.asarray(x, dtype=float) for x in rec["ohlc"]),
+                                 rec["times"], rec["tz"], rec["ts"])
+        else:
+            raise ValueError(f"Unknown paper journal op: {op}")
+
+    def checkpoint(self) -> None:
+        """Write the full state to the ledger and truncate the journal."""
+        with self._lock:
+            self._sync()
+            self._spill()
+            data = self._ledger_dict()
+            data["seq"] = self._seq
+            self.ledger_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.ledger_path.with_name(f".{self.ledger_path.name}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(data, separators=(",", ":")))
+                f.flush()
+                os.fsync(f.fileno())
+            tmp_path.replace(self.ledger_path)
+
+            # Records up to `seq` are in the ledger now; a crash before the
+            # truncate only leaves records that replay skips.
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self.journal_path.exists():
+                self.journal_path.unlink()
+            self._since_snapshot = 0
+
+    def flush(self) -> None:
+        """Fsync any journal records not yet on disk."""
+        with self._lock:
+            self._sync()
+
+    def close(self) -> None:
+        """Checkpoint and release the journal (registered with atexit)."""
+        try:
+            self.checkpoint()
+        except OSError:
+            pass
 
     # ----- utilities -----
     @staticmethod
@@ -124,40 +410,170 @@ class PaperBroker:
 
         # Signed units by side
         units = abs(int(order["units"])) * (1 if side == "buy" else -1)
-        oid = f"PAPER-{len(self._state.history) + len(self._state.open_orders) + 1}"
-
-        po = PaperOrder(
-            id=oid,
-            instrument=str(order["instrument"]),
-            side=side,
-            units=units,
-            entry_type=entry_type,
-            price=float(order["price"]) if entry_type == "limit" and order.get("price") is not None else None,
-            stop_loss=float(order["stop_loss"]) if order.get("stop_loss") is not None else None,
-            take_profit=float(order["take_profit"]) if order.get("take_profit") is not None else None,
-            status="pending",
-            ts=datetime.now(UTC).isoformat(),
-        )
-        self._state.open_orders.append(po)
-        self._save()
+
+        with self._lock:
+            oid = f"PAPER-{self._next_trade_id + len(self._state.open_orders)}"
+            po = PaperOrder(
+                id=oid,
+                instrument=str(order["instrument"]),
+                side=side,
+                units=units,
+                entry_type=entry_type,
+                price=float(order["price"]) if entry_type == "limit" and order.get("price") is not None else None,
+                stop_loss=float(order["stop_loss"]) if order.get("stop_loss") is not None else None,
+                take_profit=float(order["take_profit"]) if order.get("take_profit") is not None else None,
+                status="pending",
+                ts=datetime.now(UTC).isoformat(),
+            )
+            self._record({"op": "order", "order": asdict(po)})
         return {"status": "accepted", "order_id": oid}
 
-    def on_bar(self, instrument: str, o: float, h: float, l: float, c: float) -> None:
+    def on_bar(self, instrument: str, o: float, h: float, l: float, c: float, ts: str | None = None) -> None:
         """
         Advance the simulation one bar and attempt fills/triggers for the given instrument
-        using this bar's OHLC. Also marks-to-market equity.
+        using this bar's OHLC. Also marks-to-market equity. `ts` (ISO) stamps closes and
+        the mark; defaults to now.
+        """
+        with self._lock:
+            self._record({
+                "op": "bar", "instrument": instrument, "ts": ts or datetime.now(UTC).isoformat(),
+                "ohlc": [float(o), float(h), float(l), float(c)],
+            })
+
+    def on_closed_bar(self, instrument: str, granularity: str, time: str | None,
+                      o: float, h: float, l: float, c: float) -> bool:
         """
+        `on_bar` for a closed bar published on the event bus, applied once per instrument:
+        a bar ending no later than the newest one already applied (the same bar seen by
+        several decisions, or an H1 bar over M5 bars already simulated) is skipped.
+        Bars without a time are always applied. Returns whether the bar was applied.
+        """
+        with self._lock:
+            if time is not None:
+                end = pd.Timestamp(time).timestamp() + granularity_seconds(granularity)
+                if end <= self._bar_end.get(instrument, float("-inf")):
+                    return False
+                self._bar_end[instrument] = end
+            self.on_bar(instrument, o, h, l, c)
+            return True
+
+    def on_bars(
+        self,
+        instrument: str,
+        o: Sequence[float],
+        h: Sequence[float],
+        l: Sequence[float],
+        c: Sequence[float],
+        times: Sequence[Any] | None = None,
+    ) -> np.ndarray:
+        """
+        Advance the simulation over a series of bars; same result as calling `on_bar`
+        once per bar (with ts=times[i].isoformat()). Only bars on which an order fills
+        or an SL/TP is touched go through the per-bar path; equity in between is
+        marked in bulk. The series is journaled (and fsynced) as a single record.
+        Returns the equity after each bar.
+        """
+        rec: Dict[str, Any] = {
+            "op": "bars", "instrument": instrument, "ts": datetime.now(UTC).isoformat(),
+            "ohlc": [np.asarray(x, dtype=float).tolist() for x in (o, h, l, c)],
+            "times": None, "tz": None,
+        }
+        if times is not None:
+            # Epoch ns + zone: replays to the same isoformat() stamps without formatting every bar
+            idx = pd.DatetimeIndex(times).as_unit("ns")
+            rec["times"], rec["tz"] = idx.asi8.tolist(), str(idx.tz) if idx.tz is not None else None
+        with self._lock:
+            equity = self._record(rec)
+            self._sync()
+        return equity
+
+    def replay(self, instrument: str, df: pd.DataFrame) -> pd.Series:
+        """Run `on_bars` over an OHLC frame (time/open/high/low/close, as the data providers return)."""
+        times = df["time"].array if "time" in df else None
+        equity = self.on_bars(instrument, df["open"], df["high"], df["low"], df["close"], times)
+        return pd.Series(equity, index=df["time"] if "time" in df else df.index, name="equity")
+
+    def _on_bars(self, instrument: str, o: np.ndarray, h: np.ndarray, l: np.ndarray, c: np.ndarray,
+                 times: Optional[List[int]], tz: Optional[str], ts: str) -> np.ndarray:
+        n = len(c)
+
+        def stamp(i: int) -> str:
+            return pd.Timestamp(times[i], tz=tz).isoformat() if times is not None else ts
+
+        equity = np.empty(n)
+        i = 0
+        while i < n:
+            j = self._next_event(instrument, h, l, i)
+            if j > i:
+                # Nothing fills or closes on bars i..j-1: only this instrument's mark moves.
+                # Accumulate the same per-bar deltas as _revalue so results match on_bar exactly.
+                st, seg = self._state, c[i:j]
+                pos = st.positions.get(instrument)
+                if pos is not None:
+                    old = st.prices.get(instrument)
+                    mark, expo = pos.units * seg, abs(pos.units) * seg
+                    prev_mark = np.r_[pos.units * old if old is not None else 0.0, mark[:-1]]
+                    prev_expo = np.r_[abs(pos.units) * old if old is not None else 0.0, expo[:-1]]
+                    value = np.add.accumulate(np.r_[st.position_value, mark - prev_mark])[1:]
+                    exposure = np.add.accumulate(np.r_[st.exposure, expo - prev_expo])[1:]
+                    st.position_value, st.exposure = float(value[-1]), float(exposure[-1])
+                else:
+                    value = np.full(j - i, st.position_value)
+                st.prices[instrument] = float(seg[-1])
+                equity[i:j] = st.cash + value
+            if j == n:
+                break
+            self._on_bar(instrument, float(o[j]), float(h[j]), float(l[j]), float(c[j]), stamp(j))
+            equity[j] = self._state.equity
+            i = j + 1
+
+        if n:
+            self._state.equity = float(equity[-1])
+            self._state.last_mark = stamp(n - 1)
+        return equity
+
+    def _next_event(self, instrument: str, h: np.ndarray, l: np.ndarray, start: int) -> int:
+        """First bar >= start on which an `instrument` order fills or an SL/TP is touched (len(h) if none)."""
+        # A bar does something iff its low reaches `low_level` or its high reaches `high_level`
+        low_level, high_level = -np.inf, np.inf
+        for od in self._pending.get(instrument, ()):
+            if od.entry_type == "market":
+                return start
+            if od.price is None:
+                continue
+            if od.units > 0:
+                low_level = max(low_level, od.price)
+            else:
+                high_level = min(high_level, od.price)
+        book = self._books.get(instrument)
+        if book is not None:
+            low, high = book.touch_levels()
+            low_level, high_level = max(low_level, low), min(high_level, high)
+        if low_level == -np.inf and high_level == np.inf:
+            return len(h)
+
+        # Scan ahead in growing chunks so frequent events don't rescan the whole tail
+        n, k, step = len(h), start, 256
+        while k < n:
+            end = min(n, k + step)
+            hit = (l[k:end] <= low_level) | (h[k:end] >= high_level)
+            if hit.any():
+                return k + int(np.argmax(hit))
+            k, step = end, step * 4
+        return n
+
+    def _on_bar(self, instrument: str, o: float, h: float, l: float, c: float, ts: str) -> None:
         pip = self._pip_size(instrument)
         ask_close = c + self.spread_pips * pip / 2
         bid_close = c - self.spread_pips * pip / 2
 
-        # --- Fill pending orders ---
-        remaining: List[PaperOrder] = []
-        for od in self._state.open_orders:
-            if od.instrument != instrument:
-                remaining.append(od)
-                continue
+        # --- Mark this instrument (1:1 price * units PnL model) ---
+        with self._revalue(instrument):
+            self._state.prices[instrument] = float(c)
 
+        # --- Fill pending orders (only this instrument's) ---
+        remaining: List[PaperOrder] = []
+        for od in self._pending.get(instrument, ()):
             if od.entry_type == "market":
                 # Fill at close +/- half-spread + directional slippage
                 fill_px = ask_close if od.units > 0 else bid_close
@@ -176,114 +592,191 @@ class PaperBroker:
                 else:
                     remaining.append(od)
 
-        self._state.open_orders = remaining
-
-        # --- Mark-to-market current positions (simple 1:1 price * units PnL model) ---
-        mtm_equity = self._state.cash
-        for sym, pos in self._state.positions.items():
-            # mark positions at the current instrument's close if matching, else leave as-is
-            # (for a multi-symbol book, you'd want separate per-symbol prices)
-            if sym == instrument:
-                mtm_equity += pos.units * c
-            else:
-                mtm_equity += pos.units * c  # simplistic: use same close for all
+        if len(remaining) != len(self._pending.get(instrument, ())):
+            self._pending[instrument] = remaining
+            self._state.open_orders = [od for od in self._state.open_orders if od.status == "pending"]
 
         # --- Trigger SL/TP on this bar ---
-        to_close: List[tuple[dict, float, str]] = []
-        for hist in self._state.history:
-            if hist.get("status") != "open" or hist["instrument"] != instrument:
-                continue
-            sl = hist.get("stop_loss")
-            tp = hist.get("take_profit")
-            side = hist["side"]
-            # For long: SL hits if low <= SL; TP hits if high >= TP
-            # For short: SL hits if high >= SL; TP hits if low <= TP
-            if side == "buy":
-                if sl is not None and l <= sl:
-                    to_close.append((hist, float(sl), "stop_loss"))
-                elif tp is not None and h >= tp:
-                    to_close.append((hist, float(tp), "take_profit"))
-            else:
-                if sl is not None and h >= sl:
-                    to_close.append((hist, float(sl), "stop_loss"))
-                elif tp is not None and l <= tp:
-                    to_close.append((hist, float(tp), "take_profit"))
-
+        # For long: SL hits if low <= SL; TP hits if high >= TP
+        # For short: SL hits if high >= SL; TP hits if low <= TP
+        book = self._books.get(instrument)
+        to_close = book.triggered(h, l) if book is not None else []
         for hist, px, reason in to_close:
-            self._close_hist(hist, px, reason)
+            self._close_hist(hist, px, reason, ts)
 
-        self._state.equity = float(mtm_equity)
-        self._state.last_mark = datetime.now(UTC).isoformat()
-        self._save()
+        self._state.equity = self._state.cash + self._state.position_value
+        self._state.last_mark = ts
 
     # ----- internals -----
+    def _contrib(self, instrument: str) -> Tuple[float, float, float]:
+        """(mark value, exposure, cost basis) of the position in `instrument` at its last price."""
+        pos = self._state.positions.get(instrument)
+        if pos is None:
+            return 0.0, 0.0, 0.0
+        px = self._state.prices.get(instrument)
+        if px is None:
+            return 0.0, 0.0, pos.units * pos.avg_price
+        return pos.units * px, abs(pos.units) * px, pos.units * pos.avg_price
+
+    @contextmanager
+    def _revalue(self, instrument: str):
+        """Apply the change in `instrument`'s contribution made inside the block to the book totals."""
+        before = self._contrib(instrument)
+        yield
+        after = self._contrib(instrument)
+        st = self._state
+        st.position_value += after[0] - before[0]
+        st.exposure += after[1] - before[1]
+        st.cost_basis += after[2] - before[2]
+
+    def _recompute_marks(self, state: PaperState) -> None:
+        self._state = state
+        state.position_value = state.exposure = state.cost_basis = 0.0
+        for instrument in state.positions:
+            value, exposure, cost = self._contrib(instrument)
+            state.position_value += value
+            state.exposure += exposure
+            state.cost_basis += cost
+
     def _fill(self, od: PaperOrder, px: float) -> None:
         """
-        Book a new/added position at price px and record the trade as 'open' in history.
+        Book a new/added position at price px and add the trade to the instrument's open book.
         """
         notional = abs(od.units) * px
         commission = self.commission_per_million * (notional / 1_000_000.0)
         self._state.cash -= commission
 
-        pos = self._state.positions.get(od.instrument)
-        if pos is None:
-            self._state.positions[od.instrument] = PaperPosition(od.instrument, od.units, px)
-        else:
-            new_units = pos.units + od.units
-            if new_units == 0:
-                # flat after netting
-                self._state.positions.pop(od.instrument, None)
+        with self._revalue(od.instrument):
+            pos = self._state.positions.get(od.instrument)
+            if pos is None:
+                self._state.positions[od.instrument] = PaperPosition(od.instrument, od.units, px)
             else:
-                pos.avg_price = (pos.avg_price * pos.units + px * od.units) / new_units
-                pos.units = new_units
-                self._state.positions[od.instrument] = pos
-
-        self._state.history.append(
-            {
-                "status": "open",
-                "instrument": od.instrument,
-                "side": od.side,                # "buy"|"sell"
-                "units": od.units,              # signed
-                "open_price": px,
-                "stop_loss": od.stop_loss,
-                "take_profit": od.take_profit,
-                "ts_open": od.ts,
-            }
-        )
+                new_units = pos.units + od.units
+                if new_units == 0:
+                    # flat after netting
+                    self._state.positions.pop(od.instrument, None)
+                else:
+                    pos.avg_price = (pos.avg_price * pos.units + px * od.units) / new_units
+                    pos.units = new_units
+                    self._state.positions[od.instrument] = pos
+
+        hist = {
+            "trade_id": self._next_trade_id,
+            "status": "open",
+            "instrument": od.instrument,
+            "side": od.side,                # "buy"|"sell"
+            "units": od.units,              # signed
+            "open_price": px,
+            "stop_loss": od.stop_loss,
+            "take_profit": od.take_profit,
+            "ts_open": od.ts,
+        }
+        self._next_trade_id += 1
+        self._books.setdefault(od.instrument, _TriggerBook()).add(hist)
         od.status = "filled"
 
-    def _close_hist(self, hist: dict, px: float, reason: str) -> None:
+    def _close_hist(self, hist: dict, px: float, reason: str, ts: str) -> None:
         """
-        Close an open trade in history at price px and realize PnL into cash.
+        Close an open trade at price px, realize PnL into cash and move it to the closed archive.
         """
         pnl = hist["units"] * (px - hist["open_price"])
         self._state.cash += pnl
 
         # This logic assumes the entire position is closed by SL/TP, which is a simplification.
         instrument = hist["instrument"]
-        if instrument in self._state.positions:
-            del self._state.positions[instrument]
+        with self._revalue(instrument):
+            self._state.positions.pop(instrument, None)
 
         hist.update(
             {
                 "status": "closed",
                 "close_price": px,
-                "ts_close": datetime.now(UTC).isoformat(),
+                "ts_close": ts,
                 "pnl": float(pnl),
                 "close_reason": reason,
             }
         )
+        self._books[instrument].remove(hist)
+        self._closed.append(hist)
 
     # ----- helpers for external inspection -----
     def snapshot(self) -> dict:
-        """Return a shallow snapshot of the ledger/state (for UI/tests)."""
-        return asdict(self._state)
+        """Return a snapshot of the in-memory ledger/state (for UI/tests); spilled trades are in `archived_trades()`."""
+        with self._lock:
+            self._materialize()
+            return asdict(self._state)
+
+    def equity(self) -> float:
+        """Cash plus the mark value of all positions at their instruments' last prices (O(1))."""
+        return self._state.cash + self._state.position_value
+
+    def exposure(self) -> float:
+        """Gross notional of open positions, sum(|units| * last price) (O(1))."""
+        return self._state.exposure
+
+    def unrealized_pnl(self) -> float:
+        """Mark value minus cost basis of open positions (O(1))."""
+        return self._state.position_value - self._state.cost_basis
+
+    def last_price(self, instrument: str) -> Optional[float]:
+        return self._state.prices.get(instrument)
+
+    def account(self) -> dict:
+        """Cheap account summary for risk checks."""
+        st = self._state
+        return {
+            "cash": st.cash,
+            "equity": self.equity(),
+            "exposure": st.exposure,
+            "unrealized_pnl": self.unrealized_pnl(),
+            "open_positions": len(st.positions),
+        }
+
+    def open_trades(self, instrument: str | None = None) -> List[dict]:
+        """Open trades, optionally for one instrument, in fill order."""
+        with self._lock:
+            books = [self._books.get(instrument)] if instrument else list(self._books.values())
+            trades = [dict(t) for b in books if b is not None for t in b.trades.values()]
+        return sorted(trades, key=lambda t: t["trade_id"])
+
+    def archived_trades(self) -> Iterator[dict]:
+        """Closed trades spilled to the archive file, oldest first."""
+        if not self.archive_path.exists():
+            return
+        seen = set()
+        with open(self.archive_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    hist = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if hist["trade_id"] not in seen:  # a crash mid-checkpoint can spill a trade twice
+                    seen.add(hist["trade_id"])
+                    yield hist
 
     def reset(self) -> None:
-        """Hard reset the ledger (useful for tests)."""
-        if self.ledger_path.exists():
-            self.ledger_path.unlink()
-        p = getattr(settings, "paper", {}) or {}
-        initial_cash = float(p.get("initial_cash", 100_000))
-        self._state = self._load(initial_cash)
-        self._save()
+        """Hard reset the ledger and journal (useful for tests)."""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            for path in (self.ledger_path, self.journal_path, self.archive_path):
+                if path.exists():
+                    path.unlink()
+            self._unsynced = 0
+            self._bar_end.clear()
+            self._state = self._load(self.initial_cash)
+            self.checkpoint()
+
+
+# --------- Event bus wiring ---------
+def _on_candle_close(event: CandleCloseEvent) -> None:
+    if not event.has_bar:
+        return
+    PaperBroker().on_closed_bar(event.instrument, event.timeframe, event.time,
+                                event.open, event.high, event.low, event.close)
+
+
+def attach_to_bus(event_bus: EventBus | None = None) -> None:
+    """Subscribe the paper broker to candle-close events (idempotent)."""
+    (event_bus or bus).subscribe(CandleCloseEvent, _on_candle_close)
@@ -0,0 +1,240 @@
+"""
+CandleStore — reusable candle cache keyed by (provider, instrument, granularity).
+
+Bars are kept in memory and appended on disk as content-addressed part files,
+one growing dataset per instrument/granularity:
+
+    runs/cache/candles/<provider>/<instrument>_<granularity>/part-<first>-<last>.parquet
+
+A request is served from memory (or disk after a restart) while no new bar can
+have closed since the last provider call. Otherwise only the missing tail of
+bars is fetched and appended. `cache_format: csv` writes `.csv.gz` parts
+instead; `none` keeps the store in memory only.
+
+Each key is planned and fetched under its own lock (an asyncio lock per event
+loop for `aget`), so concurrent requests for the same bars make one provider
+call; the others are then served from memory.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.settings import settings
+from app.timeframes import granularity_seconds
+
+OHLC_COLUMNS = ["time", "open", "high", "low", "close"]
+
+# fetch(last_bar, count) -> raw OHLC frame. `last_bar` is the newest cached bar
+# (a dict with OHLC_COLUMNS) or None; providers return bars newer than it.
+Fetch = Callable[[Optional[dict], int], pd.DataFrame]
+AsyncFetch = Callable[[Optional[dict], int], Awaitable[pd.DataFrame]]
+
+Key = Tuple[str, str, str]
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame({c: pd.Series(dtype="float64") for c in OHLC_COLUMNS}).assign(
+            time=pd.Series(dtype="datetime64[ns, UTC]")
+        )
+    out = df[OHLC_COLUMNS].copy()
+    out["time"] = pd.to_datetime(out["time"], utc=True)
+    return out
+
+
+class CandleStore:
+    def __init__(self, root: Path | None = None, max_bars: int | None = None, compact_after_parts: int = 32):
+        self.root = Path(root) if root else Path(settings.persistence.get("path", "runs/")) / "cache" / "candles"
+        self.max_bars = max_bars or settings.data.store_max_bars
+        self.compact_after_parts = compact_after_parts
+        self._frames: Dict[Key, pd.DataFrame] = {}
+        self._last_fetch: Dict[Key, float] = {}
+        self._locks: Dict[Key, threading.Lock] = {}
+        # Event loop -> per-key asyncio locks held across `aget`'s awaited fetch
+        self._alocks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Key, asyncio.Lock]]" = weakref.WeakKeyDictionary()
+        self._guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.provider_calls = 0
+        self.disk_writes = 0
+
+    # ----- public API -----
+    def get(self, provider: str, instrument: str, granularity: str, count: int, fetch: Fetch) -> Tuple[pd.DataFrame, Optional[Path]]:
+        """Return the latest `count` bars and the dataset path, fetching only what is missing."""
+        key = (provider, instrument, granularity)
+        with self._lock(key):
+            frame, last_bar, n = self._plan(key, count)
+            if n:
+                new = _normalize(fetch(last_bar, n))
+                frame = self._merge(key, frame, new)
+            return frame.tail(count).reset_index(drop=True), self.dataset_path(key)
+
+    async def aget(self, provider: str, instrument: str, granularity: str, count: int, fetch: AsyncFetch) -> Tuple[pd.DataFrame, Optional[Path]]:
+        """Async variant of `get` for providers with async fetchers."""
+        key = (provider, instrument, granularity)
+        async with self._alock(key):
+            with self._lock(key):
+                frame, last_bar, n = self._plan(key, count)
+            if n:
+                new = _normalize(await fetch(last_bar, n))
+                with self._lock(key):
+                    frame = self._merge(key, frame, new)
+        return frame.tail(count).reset_index(drop=True), self.dataset_path(key)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses + self.refreshes
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "hit_rate": self.hits / total if total else 0.0,
+            "provider_calls": self.provider_calls,
+            "disk_writes": self.disk_writes,
+            "keys": len(self._frames),
+        }
+
+    def clear(self) -> None:
+        """Drop the in-memory tier (the on-disk datasets are kept)."""
+        with self._guard:
+            self._frames.clear()
+            self._last_fetch.clear()
+
+    def dataset_path(self, key: Key) -> Optional[Path]:
+        if settings.data.cache_format == "none":
+            return None
+        provider, instrument, granularity = key
+        return self.root / provider / f"{instrument}_{granularity}"
+
+    # ----- internals -----
+    def _lock(self, key: Key) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _alock(self, key: Key) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._guard:
+            return self._alocks.setdefault(loop, {}).setdefault(key, asyncio.Lock())
+
+    def _count(self, field: str) -> None:
+        with self._guard:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _plan(self, key: Key, count: int) -> Tuple[pd.DataFrame, Optional[dict], int]:
+        """Decide whether `key` can be served as-is, needs its tail, or a full fetch."""
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = self._load(key)
+            self._frames[key] = frame
+
+        interval = granularity_seconds(key[2])
+        now = time.time()
+        latest_close = (now // interval) * interval  # boundary at which the newest complete bar closed
+
+        if len(frame) < count:
+            self._count("misses")
+            self._count("provider_calls")
+            return frame.iloc[0:0], None, count
+
+        if self._last_fetch.get(key, 0.0) >= latest_close:
+            self._count("hits")
+            return frame, None, 0
+
+        # Only the bars that closed since the newest cached one (bar times are open times)
+        last_bar = frame.iloc[-1].to_dict()
+        elapsed = now - pd.Timestamp(last_bar["time"]).timestamp()
+        missing = int(max(1, elapsed // interval - 1))
+        if missing > count:
+            # A longer outage than one tail fetch covers: refetch and replace, never join across the hole
+            self._count("misses")
+            self._count("provider_calls")
+            return frame.iloc[0:0], None, count
+        self._count("refreshes")
+        self._count("provider_calls")
+        return frame, last_bar, missing
+
+    def _merge(self, key: Key, frame: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+        """Append a tail fetch to `frame`, or replace the key's bars with a full fetch (`frame` empty)."""
+        self._last_fetch[key] = time.time()
+        replace = frame.empty
+        if not replace:
+            frame = self._frames.get(key, frame)  # another loop may have appended since the plan
+            new = new[new["time"] > frame["time"].iloc[-1]]
+        if new.empty and not replace:
+            return frame
+
+        merged = new if replace else pd.concat([frame, new], ignore_index=True)
+        merged = (
+            merged.drop_duplicates(subset="time", keep="last")
+            .sort_values("time")
+            .tail(self.max_bars)
+            .reset_index(drop=True)
+        )
+        self._frames[key] = merged
+        self._append(key, new, replace)
+        return merged
+
+    def _append(self, key: Key, new: pd.DataFrame, replace: bool = False) -> None:
+        path = self.dataset_path(key)
+        if path is None or new.empty:
+            return
+        path.mkdir(parents=True, exist_ok=True)
+        if replace:
+            # A full fetch supersedes the stored parts (older or across a gap)
+            for p in path.glob("part-*"):
+                p.unlink()
+        self._write_part(path, new)
+        self._count("disk_writes")
+
+        parts = list(path.glob("part-*"))
+        if len(parts) > self.compact_after_parts:
+            # Rewrite the dataset as a single part holding the in-memory tail
+            for p in parts:
+                p.unlink()
+            self._write_part(path, self._frames[key])
+
+    @staticmethod
+    def _write_part(path: Path, frame: pd.DataFrame) -> None:
+        # Parts are named by the bar time range they hold
+        first, last = (frame["time"].iloc[i].strftime("%Y%m%dT%H%M%S") for i in (0, -1))
+        if settings.data.cache_format == "parquet":
+            frame.to_parquet(path / f"part-{first}-{last}.parquet", index=False)
+        else:
+            frame.to_csv(path / f"part-{first}-{last}.csv.gz", index=False, compression="gzip")
+
+    def _load(self, key: Key) -> pd.DataFrame:
+        """Rebuild the in-memory frame from the on-disk parts (after a restart)."""
+        path = self.dataset_path(key)
+        frames = []
+        if path is not None and path.exists():
+            for p in sorted(path.glob("part-*")):
+                try:
+                    frames.append(pd.read_parquet(p) if p.suffix == ".parquet" else pd.read_csv(p, compression="gzip"))
+                except Exception:
+                    continue  # a torn write is simply refetched
+        if not frames:
+            return _normalize(None)
+        frame = _normalize(pd.concat(frames, ignore_index=True))
+        return frame.drop_duplicates(subset="time", keep="last").sort_values("time").tail(self.max_bars).reset_index(drop=True)
+
+
+# Process-wide store
+candle_store = CandleStore()
+
+
+def log_cache_event(provider: str, instrument: str, granularity: str) -> None:
+    """Trace the store's running hit/miss counters after a request."""
+    from app.telemetry import tracer
+    tracer.log({
+        "event_type": "candle_cache", "node": "get_candles", "status": "ok",
+        "decision_key": f"{instrument}_{granularity}", "data_provider": provider,
+        "output": candle_store.stats(),
+    })
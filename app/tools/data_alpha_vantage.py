@@ -1,9 +1,9 @@
 import os
-import httpx
 import pandas as pd
 from app.settings import settings
+from app.tools.http_clients import http_clients
 
-BASE = "https://www.alphavantage.co/query"
+PATH = "/query"
 
 async def fx_daily(from_symbol: str, to_symbol: str) -> pd.DataFrame:
     key = settings.alpha_vantage.get("api_key") if settings.alpha_vantage else os.getenv("ALPHA_VANTAGE_KEY")
@@ -14,10 +14,9 @@ async def fx_daily(from_symbol: str, to_symbol: str) -> pd.DataFrame:
         "apikey": key,
         "outputsize": settings.alpha_vantage.get("outputsize", "compact") if settings.alpha_vantage else "compact",
     }
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(BASE, params=params)
-        r.raise_for_status()
-        data = r.json().get("Time Series FX (Daily)", {})
+    r = await http_clients.request("alpha_vantage", "GET", PATH, params=params)
+    r.raise_for_status()
+    data = r.json().get("Time Series FX (Daily)", {})
     rows = []
     for ts, ohlc in data.items():
         rows.append({
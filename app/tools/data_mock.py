@@ -1,77 +1,66 @@
-from __future__ import annotations
-
 """
 Mock Data Provider — synthetic or CSV-based candles for demos/tests.
 
-- synthetic: generates OHLC using a simple GBM process (reproducible via seed).
-- csv: loads OHLC from local CSV files per instrument.
+- synthetic: generates OHLC using a simple GBM process (reproducible via seed),
+  one bar per `granularity`, continuing from the newest cached bar.
+- csv: loads OHLC from local CSV (or Parquet) files per instrument, reading
+  only the newest rows (app/tools/tail_reader.py).
 
 Returns a pandas.DataFrame with columns: time, open, high, low, close
 (similar to OANDA candles shape used elsewhere in the app).
 """
 
+from __future__ import annotations
+
 from pathlib import Path
-from typing import Dict
-import hashlib
-import json
+from typing import Dict, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
 from app.settings import settings
+from app.timeframes import granularity_seconds
+from app.tools.candle_store import candle_store, log_cache_event
 from app.tools.data_models import FeatureSummary
-from app.tools.errors import ProviderError
-from app.tools.ta_tool import compute_indicators
+from app.tools.feature_engine import feature_engine
+from app.tools.tail_reader import tail_reader
 
 
 def _from_csv(instrument: str, count: int) -> pd.DataFrame:
     cfg: Dict = getattr(settings, "mock_data", {}) or {}
     file_map: Dict = cfg.get("csv_files", {}) or {}
-    path = Path(file_map.get(instrument, ""))
+    # Only the newest `count` rows are read (tail seek, last row groups or the mmapped Arrow copy)
+    return tail_reader.read(Path(file_map.get(instrument, "")), count, mode=str(cfg.get("csv_reader", "tail")).lower())
 
-    if not path.exists():
-        # Return empty DF with the expected columns
-        return pd.DataFrame(columns=["time", "open", "high", "low", "close"])
 
-    df = pd.read_csv(path)
-    # Accept flexible column casing; map to standard names
-    cols = {c.lower(): c for c in df.columns}
-    for required in ("time", "open", "high", "low", "close"):
-        if required not in cols:
-            raise ValueError(f"CSV {path} is missing required column: {required}")
-
-    out = pd.DataFrame(
-        {
-            "time": pd.to_datetime(df[cols["time"]]),
-            "open": pd.to_numeric(df[cols["open"]], errors="coerce").astype(float),
-            "high": pd.to_numeric(df[cols["high"]], errors="coerce").astype(float),
-            "low": pd.to_numeric(df[cols["low"]], errors="coerce").astype(float),
-            "close": pd.to_numeric(df[cols["close"]], errors="coerce").astype(float),
-        }
-    ).dropna()
-    # Keep the most recent `count` rows
-    return out.tail(count).reset_index(drop=True)
-
-
-def _synthetic(instrument: str, count: int) -> pd.DataFrame:
+def _synthetic(instrument: str, count: int, granularity: str = "M5", last_bar: Optional[dict] = None) -> pd.DataFrame:
     cfg: Dict = getattr(settings, "mock_data", {}) or {}
     seed = int(cfg.get("seed", 42))
     drift = float(cfg.get("drift", 0.0))   # daily drift
     vol = float(cfg.get("vol", 0.01))      # daily vol
 
-    rng = np.random.default_rng(seed)
+    step = pd.Timedelta(seconds=granularity_seconds(granularity))
+    end = pd.Timestamp.now(tz="UTC").floor(step) - step  # open time of the last closed bar (the store expects complete bars)
     n = int(max(2, count))
+    if last_bar is not None:
+        # Continue the cached series: every bar after the newest cached one, so the series has no hole
+        n = int((end - pd.Timestamp(last_bar["time"])) // step)
+        if n <= 0:
+            return pd.DataFrame(columns=["time", "open", "high", "low", "close"])
+        seed += int(pd.Timestamp(last_bar["time"]).timestamp())
+
+    rng = np.random.default_rng(seed)
     # Use a plausible starting level by instrument
-    s0 = 1.10 if instrument == "EUR_USD" else 1.27
-    # Treat each step as ~5 minutes (288 steps/day)
-    dt = 1.0 / 288.0
+    s0 = float(last_bar["close"]) if last_bar is not None else (1.10 if instrument == "EUR_USD" else 1.27)
+    # Scale the daily drift/vol to the bar length (M5 = 288 steps/day)
+    dt = step.total_seconds() / 86400.0
     rets = (drift - 0.5 * vol * vol) * dt + vol * np.sqrt(dt) * rng.standard_normal(n)
     close = s0 * np.exp(np.cumsum(rets))
-    open_ = np.r_[close[0], close[:-1]]  # previous close
+    open_ = np.r_[s0 if last_bar is not None else close[0], close[:-1]]  # previous close
     # Build a small range around open/close for H/L
     high = np.maximum(open_, close) * (1 + 0.0005 * rng.random(n))
     low = np.minimum(open_, close) * (1 - 0.0005 * rng.random(n))
-    t = pd.date_range(end=pd.Timestamp.utcnow(), periods=n, freq="5min")
+    t = pd.date_range(end=end, periods=n, freq=step)
 
     out = pd.DataFrame(
         {"time": t, "open": open_, "high": high, "low": low, "close": close}
@@ -81,63 +70,29 @@ def _synthetic(instrument: str, count: int) -> pd.DataFrame:
 
 def candles(instrument: str, granularity: str, count: int = 500) -> FeatureSummary:
     """
-    Return a FeatureSummary of recent candles for `instrument`.
-    `granularity` is currently ignored (we emit ~5-minute bars).
+    Return a FeatureSummary of recent candles for `instrument`: the one the
+    feature engine published for this bar, or computed from the candle store.
+    """
+    published = feature_engine.get("mock", instrument, granularity, count)
+    if published is not None:
+        return published
+    df, cache_path = frame(instrument, granularity, count)
+    return feature_engine.summarize_one(df, instrument, granularity, cache_path, "mock")
+
+
+def frame(instrument: str, granularity: str, count: int = 500) -> Tuple[pd.DataFrame, Optional[Path]]:
+    """
+    The latest `count` OHLC bars and their dataset path.
+    Bars are served from the candle store; only missing bars are generated/loaded.
     """
     cfg: Dict = getattr(settings, "mock_data", {}) or {}
     source = str(cfg.get("source", "synthetic")).lower()
 
-    if source == "csv":
-        df = _from_csv(instrument, count)
-    else:
-        df = _synthetic(instrument, count)
-
-    # Add indicators
-    df = compute_indicators(df, preset="trend_following")
-
-    # Create cache path and save data
-    cache_dir = Path(settings.persistence.get("path", "runs/")) / "cache"
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    timestamp = pd.Timestamp.utcnow().strftime("%Y%m%d_%H%M%S")
-
-    cache_format = settings.data.cache_format
-    cache_path = None
-    if cache_format != "none":
-        if cache_format == "parquet":
-            cache_path = cache_dir / f"{instrument}_{granularity}_{timestamp}.parquet"
-            try:
-                df.to_parquet(cache_path)
-            except ImportError:
-                raise ProviderError("Parquet engine not found. Please install pyarrow or fastparquet.")
-        elif cache_format == "csv":
-            cache_path = cache_dir / f"{instrument}_{granularity}_{timestamp}.csv.gz"
-            df.to_csv(cache_path, compression="gzip")
-
-    # Create summary
-    last_3_closes = df["close"].tail(3).tolist()
-
-    # Get the latest non-NaN indicator values
-    latest_indicators = {}
-    for col in ["ema_fast", "ema_slow", "atr"]:
-        if col in df:
-            last_valid = df[col].last_valid_index()
-            if last_valid is not None:
-                latest_indicators[col] = df.loc[last_valid, col]
-
-    # Create a digest
-    summary_data = {
-        "instrument": instrument,
-        "timeframe": granularity,
-        "last_3_closes": last_3_closes,
-        "indicators": latest_indicators,
-    }
-    digest = hashlib.md5(json.dumps(summary_data, sort_keys=True).encode()).hexdigest()
-
-    return FeatureSummary(
-        instrument=instrument,
-        timeframe=granularity,
-        last_n_closes=last_3_closes,
-        indicators=latest_indicators,
-        cache_path=str(cache_path),
-        features_digest=digest,
-    )
+    def fetch(last_bar: Optional[dict], n: int) -> pd.DataFrame:
+        if source == "csv":
+            return _from_csv(instrument, max(n, count))
+        return _synthetic(instrument, n, granularity, last_bar)
+
+    df, cache_path = candle_store.get("mock", instrument, granularity, count, fetch)
+    log_cache_event("mock", instrument, granularity)
+    return df, cache_path
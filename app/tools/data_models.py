@@ -1,6 +1,6 @@
 from __future__ import annotations
-from typing import List, Dict, Optional
-from pydantic import BaseModel
+from typing import Any, List, Dict, Literal, Optional
+from pydantic import BaseModel, Field
 
 class FeatureSummary(BaseModel):
     """A summary of market data features to be passed to the LLM."""
@@ -10,3 +10,16 @@ class FeatureSummary(BaseModel):
     indicators: Dict[str, float]
     cache_path: Optional[str] = None
     features_digest: str
+    # Last bar's OHLC (time as ISO string); in-process only, not sent to the LLM
+    last_bar: Optional[Dict[str, Any]] = Field(default=None, exclude=True)
+
+class TradeDecision(BaseModel):
+    """Strategy, signal and stops in one structured LLM answer (the single_call topology)."""
+    preset: Literal["trend_following", "mean_reversion", "breakout"]
+    rationale: str
+    action: Literal["buy", "sell", "hold"]
+    units: int = Field(default=0, description="Order size in units; 0 uses the risk default.")
+    entry_type: Literal["market", "limit"] = "market"
+    price: Optional[float] = Field(default=None, description="Limit price; null for market orders.")
+    stop_loss_atr: Optional[float] = Field(default=None, description="Stop-loss distance in ATRs; null uses the risk default.")
+    take_profit_atr: Optional[float] = Field(default=None, description="Take-profit distance in ATRs; null uses the risk default.")
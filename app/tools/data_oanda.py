@@ -1,27 +1,22 @@
-import httpx
-import pandas as pd
-import hashlib
-import json
 from pathlib import Path
+from typing import Optional, Tuple
+import pandas as pd
 
 from app.settings import settings
+from app.tools.candle_store import candle_store, log_cache_event
 from app.tools.data_models import FeatureSummary
-from app.tools.errors import ProviderError
-from app.tools.ta_tool import compute_indicators
+from app.tools.feature_engine import feature_engine
+from app.tools.http_clients import http_clients
 
 # Accepts already-valid OANDA granularities like M5, M15, H1, D, W
 
-async def _get(url: str, params: dict | None = None) -> dict:
+async def _get(path: str, params: dict | None = None) -> dict:
     headers = {"Authorization": f"Bearer {settings.oanda.api_key}"}
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(url, headers=headers, params=params)
-        r.raise_for_status()
-        return r.json()
+    r = await http_clients.request("oanda", "GET", path, headers=headers, params=params)
+    r.raise_for_status()
+    return r.json()
 
-async def candles(instrument: str, granularity: str, count: int = 500) -> FeatureSummary:
-    url = f"{settings.oanda.base}/v3/instruments/{instrument}/candles"
-    params = {"granularity": granularity, "count": str(count), "price": "M"}
-    data = await _get(url, params=params)
+def _parse_candles(data: dict) -> pd.DataFrame:
     rows = []
     for c in data.get("candles", []):
         if not c.get("complete", False):
@@ -33,54 +28,28 @@ async def candles(instrument: str, granularity: str, count: int = 500) -> Featur
             "low":  float(c["mid"]["l"]),
             "close":float(c["mid"]["c"]),
         })
-    df = pd.DataFrame(rows)
-
-    # Add indicators
-    df = compute_indicators(df, preset="trend_following")
-
-    # Create cache path and save data
-    cache_dir = Path(settings.persistence.get("path", "runs/")) / "cache"
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    timestamp = pd.Timestamp.utcnow().strftime("%Y%m%d_%H%M%S")
+    return pd.DataFrame(rows)
 
-    cache_format = settings.data.cache_format
-    cache_path = None
-    if cache_format != "none":
-        if cache_format == "parquet":
-            cache_path = cache_dir / f"{instrument}_{granularity}_{timestamp}.parquet"
-            try:
-                df.to_parquet(cache_path)
-            except ImportError:
-                raise ProviderError("Parquet engine not found. Please install pyarrow or fastparquet.")
-        elif cache_format == "csv":
-            cache_path = cache_dir / f"{instrument}_{granularity}_{timestamp}.csv.gz"
-            df.to_csv(cache_path, compression="gzip")
-
-    # Create summary
-    last_3_closes = df["close"].tail(3).tolist()
-
-    # Get the latest non-NaN indicator values
-    latest_indicators = {}
-    for col in ["ema_fast", "ema_slow", "atr"]:
-        if col in df:
-            last_valid = df[col].last_valid_index()
-            if last_valid is not None:
-                latest_indicators[col] = df.loc[last_valid, col]
-
-    # Create a digest
-    summary_data = {
-        "instrument": instrument,
-        "timeframe": granularity,
-        "last_3_closes": last_3_closes,
-        "indicators": latest_indicators,
-    }
-    digest = hashlib.md5(json.dumps(summary_data, sort_keys=True).encode()).hexdigest()
-
-    return FeatureSummary(
-        instrument=instrument,
-        timeframe=granularity,
-        last_n_closes=last_3_closes,
-        indicators=latest_indicators,
-        cache_path=str(cache_path),
-        features_digest=digest,
-    )
+async def candles(instrument: str, granularity: str, count: int = 500) -> FeatureSummary:
+    """The feature engine's published summary for this bar, or one computed from the candle store."""
+    published = feature_engine.get("oanda", instrument, granularity, count)
+    if published is not None:
+        return published
+    df, cache_path = await frame(instrument, granularity, count)
+    return feature_engine.summarize_one(df, instrument, granularity, cache_path, "oanda")
+
+async def frame(instrument: str, granularity: str, count: int = 500) -> Tuple[pd.DataFrame, Optional[Path]]:
+    """The latest `count` OHLC bars (only missing bars are fetched) and their dataset path."""
+    url = f"/v3/instruments/{instrument}/candles"
+
+    async def fetch(last_bar: Optional[dict], n: int) -> pd.DataFrame:
+        params = {"granularity": granularity, "count": str(n), "price": "M"}
+        if last_bar is not None:
+            # Only the bars after the newest cached one
+            params["from"] = pd.Timestamp(last_bar["time"]).isoformat()
+            params["includeFirst"] = "false"
+        return _parse_candles(await _get(url, params=params))
+
+    df, cache_path = await candle_store.aget("oanda", instrument, granularity, count, fetch)
+    log_cache_event("oanda", instrument, granularity)
+    return df, cache_path
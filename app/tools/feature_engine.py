@@ -0,0 +1,240 @@
+"""
+FeatureEngine — FeatureSummaries for many decision keys in one pass.
+
+`precompute(keys)` fetches the bars of many (instrument, granularity) keys
+concurrently through the candle store, stacks each group of equal-length
+frames into contiguous (N, T) close/high/low panels, and computes the features
+of every preset (app/tools/feature_registry.py) for the whole panel at once.
+The summary exports the trend_following view; all latest feature values go
+to the feature registry under the summary's digest. The
+resulting summaries are published per key. `get_candles` then serves them
+without touching the provider or recomputing, until the next bar closes.
+
+The scheduler calls `precompute` for the decisions due at a bar close, just
+before triggering their runs (`feature_engine.enabled`). Summaries are also
+written to `runs/cache/features/` so that the LangGraph server process reads
+what the scheduler computed (`publish_to_disk`).
+
+Single-key requests (`summarize_one`) use the same kernels, so batched and
+on-demand summaries are identical. With `indicator_state.enabled`, both
+instead advance each key's streaming state (app/tools/indicator_state.py) by
+the bars newer than its last one: O(1) per new bar rather than the whole
+window, with values that reflect every bar the state has seen.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.settings import settings
+from app.timeframes import granularity_seconds
+from app.tools import indicators
+from app.tools.data_models import FeatureSummary
+from app.tools.feature_registry import (PRESETS, SUMMARY_PRESET, columns_for, feature_registry,
+                                        features, preset_view)
+from app.tools.indicator_state import indicator_states
+from app.tools.features import make_summary
+
+DecisionKey = Tuple[str, str]  # (instrument, granularity)
+
+
+def _presets() -> Tuple[str, ...]:
+    # Every preset's features when the registry is on, else just what the summary exports
+    return PRESETS if settings.feature_registry.enabled else (SUMMARY_PRESET,)
+
+
+def _columns(df: pd.DataFrame) -> Dict[str, Any]:
+    cols: Dict[str, Any] = {c: df[c].to_numpy() for c in ("open", "high", "low", "close")}
+    cols["last_time"] = df["time"].iat[-1] if len(df) else None
+    return cols
+
+
+def panel_indicators(frames: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+    """Latest feature values of each frame's columns, computed per equal-length group in one pass."""
+    wanted = columns_for(_presets())
+    out: List[Dict[str, float]] = [{} for _ in frames]
+    groups: Dict[int, List[int]] = {}
+    for i, cols in enumerate(frames):
+        groups.setdefault(len(cols["close"]), []).append(i)
+    for length, members in groups.items():
+        if length == 0:
+            continue
+        close, high, low = (
+            np.stack([frames[i][col] for i in members]).astype(np.float64, copy=False) for col in ("close", "high", "low")
+        )
+        for name, panel in features(high, low, close, wanted).items():
+            latest = indicators.last_valid(panel)
+            for row, i in enumerate(members):
+                if not np.isnan(latest[row]):
+                    out[i][name] = float(latest[row])
+    return out
+
+
+def _last_bar(cols: Dict[str, Any]) -> Optional[dict]:
+    if len(cols["close"]) == 0:
+        return None
+    bar = {k: float(cols[k][-1]) for k in ("open", "high", "low", "close")}
+    bar["time"] = pd.Timestamp(cols["last_time"]).isoformat()
+    return bar
+
+
+class FeatureEngine:
+    def __init__(self, root: Path | None = None):
+        self.root = Path(root) if root else Path(settings.persistence.get("path", "runs/")) / "cache" / "features"
+        # (provider, instrument, granularity, count) -> (published at, summary)
+        self._published: Dict[Tuple[str, str, str, int], Tuple[float, FeatureSummary]] = {}
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.keys_computed = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ----- compute -----
+    def summarize(self, frames: Dict[DecisionKey, Tuple[pd.DataFrame, Optional[Path]]],
+                  provider: str | None = None) -> Dict[DecisionKey, FeatureSummary]:
+        """FeatureSummaries for many (frame, cache path) pairs, features computed panel-wide."""
+        provider = provider or settings.data.provider
+        keys = list(frames)
+        columns = [_columns(frames[k][0]) for k in keys]
+        if settings.indicator_state.enabled:
+            latest = [self._streamed(provider, key, frames[key][0]) for key in keys]
+        else:
+            latest = panel_indicators(columns)
+        out = {}
+        for key, cols, values in zip(keys, columns, latest):
+            summary = make_summary(key[0], key[1], frames[key][1], cols["close"][-3:].tolist(),
+                                   preset_view(values, SUMMARY_PRESET), _last_bar(cols))
+            if settings.feature_registry.enabled:
+                feature_registry.put(provider, key[0], key[1], summary.features_digest, values)
+            out[key] = summary
+        return out
+
+    def summarize_one(self, df: pd.DataFrame, instrument: str, granularity: str, cache_path: Optional[Path],
+                      provider: str | None = None) -> FeatureSummary:
+        return self.summarize({(instrument, granularity): (df, cache_path)}, provider)[(instrument, granularity)]
+
+    @staticmethod
+    def _streamed(provider: str, key: DecisionKey, df: pd.DataFrame) -> Dict[str, float]:
+        # One state set per key: a state shared by several presets is advanced once
+        values = indicator_states.advance_frame(provider, key[0], key[1], df, columns_for(_presets()))
+        return {feature: value for feature, value in values.items() if not np.isnan(value)}
+
+    async def precompute(self, keys: Iterable[DecisionKey], count: int | None = None, provider: str | None = None) -> Dict[DecisionKey, FeatureSummary]:
+        """Fetch, compute and publish the summaries of `keys` (one batch)."""
+        cfg = settings.feature_engine
+        count = count or cfg.count
+        provider = provider or settings.data.provider
+        keys = list(dict.fromkeys(keys))
+        start = time.perf_counter()
+        frames = await self._fetch(provider, keys, count)
+        summaries = self.summarize(frames, provider)
+        self.publish(provider, count, summaries)
+        with self._lock:
+            self.batches += 1
+            self.keys_computed += len(summaries)
+        self._trace(provider, len(summaries), (time.perf_counter() - start) * 1000)
+        return summaries
+
+    async def _fetch(self, provider: str, keys: List[DecisionKey], count: int) -> Dict[DecisionKey, Tuple[pd.DataFrame, Optional[Path]]]:
+        if provider == "mock":
+            from app.tools import data_mock  # in-process bars: no I/O worth overlapping
+            return {key: data_mock.frame(key[0], key[1], count) for key in keys}
+        from app.tools import data_oanda
+        limit = asyncio.Semaphore(settings.feature_engine.max_concurrency)
+
+        async def one(key: DecisionKey):
+            async with limit:
+                return key, await data_oanda.frame(key[0], key[1], count)
+
+        results = await asyncio.gather(*(one(k) for k in keys), return_exceptions=True)
+        # A failed key is left to its run's own get_candles call
+        return dict(r for r in results if not isinstance(r, BaseException))
+
+    # ----- publish / read -----
+    def publish(self, provider: str, count: int, summaries: Dict[DecisionKey, FeatureSummary]) -> None:
+        now = time.time()
+        with self._lock:
+            for (instrument, granularity), summary in summaries.items():
+                self._published[(provider, instrument, granularity, count)] = (now, summary)
+        if settings.feature_engine.publish_to_disk:
+            for (instrument, granularity), summary in summaries.items():
+                self._write(provider, instrument, granularity, count, now, summary)
+
+    def get(self, provider: str, instrument: str, granularity: str, count: int) -> Optional[FeatureSummary]:
+        """The published summary for the key, if computed since its newest bar closed."""
+        if not settings.feature_engine.enabled:
+            return None
+        interval = granularity_seconds(granularity)
+        latest_close = (time.time() // interval) * interval
+        key = (provider, instrument, granularity, count)
+        with self._lock:
+            item = self._published.get(key)
+        if item is None and settings.feature_engine.publish_to_disk:
+            read = self._read(*key)
+            item = read[:2] if read else None
+            if item is not None and item[0] >= latest_close:
+                with self._lock:
+                    self._published[key] = item
+                    self.disk_hits += 1
+                if read[2] and settings.feature_registry.enabled:  # the other presets' features, for get_preset_features
+                    feature_registry.put(provider, instrument, granularity, item[1].features_digest, read[2])
+        with self._lock:
+            if item is None or item[0] < latest_close:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return item[1]
+
+    def _path(self, provider: str, instrument: str, granularity: str, count: int) -> Path:
+        return self.root / provider / f"{instrument}_{granularity}_{count}.json"
+
+    def _write(self, provider: str, instrument: str, granularity: str, count: int, published: float, summary: FeatureSummary) -> None:
+        path = self._path(provider, instrument, granularity, count)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"published_at": published, "summary": summary.model_dump(mode="json"), "last_bar": summary.last_bar,
+                                   "features": feature_registry.peek(summary.features_digest)}))
+        os.replace(tmp, path)  # readers never see a torn file
+
+    def _read(self, provider: str, instrument: str, granularity: str, count: int) -> Optional[Tuple[float, FeatureSummary, Optional[dict]]]:
+        try:
+            data = json.loads(self._path(provider, instrument, granularity, count).read_text())
+            summary = FeatureSummary(**data["summary"], last_bar=data.get("last_bar"))
+            return float(data["published_at"]), summary, data.get("features")
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._published.clear()
+
+    # ----- metrics -----
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "batches": self.batches,
+            "keys_computed": self.keys_computed,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _trace(self, provider: str, keys: int, latency_ms: float) -> None:
+        from app.telemetry import tracer
+        tracer.log({"event_type": "feature_engine", "node": "feature_engine", "provider": provider, "keys": keys,
+                    "latency_ms": latency_ms, "output": self.stats()})
+
+
+# Process-wide engine
+feature_engine = FeatureEngine()
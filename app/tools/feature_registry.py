@@ -0,0 +1,139 @@
+"""
+Feature registry — every preset's indicators from one shared pass.
+
+`FEATURES` lists the kernels behind all presets. Each runs once per pass,
+however many presets use its columns (ATR serves all three). `PRESET_COLUMNS`
+maps a preset's column names (as ta_tool and pandas_ta name them) onto those
+feature columns.
+
+Whenever the feature engine summarizes a frame, it computes the union of all
+presets' features and stores their latest values here, keyed by the
+summary's `features_digest`. The `get_candles` summary keeps exporting the
+trend_following view (`ema_fast`, `ema_slow`, `atr`). The signal node calls
+`get_preset_features` for the preset the strategy chose, which is answered
+from this cache without another provider call.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from app.settings import settings
+from app.tools import indicators
+
+BBANDS = ("BBL_20_2.0", "BBM_20_2.0", "BBU_20_2.0", "BBB_20_2.0", "BBP_20_2.0")
+DONCHIAN = ("DCL_20_20", "DCM_20_20", "DCU_20_20")
+
+# --- Features ---
+# Kernel over (close, high, low) panels -> the feature columns it produces
+FEATURES: Dict[Tuple[str, ...], Callable[..., Dict[str, np.ndarray]]] = {
+    ("ema_12",): lambda c, h, l: {"ema_12": indicators.ema(c, 12)},
+    ("ema_20",): lambda c, h, l: {"ema_20": indicators.ema(c, 20)},
+    ("ema_26",): lambda c, h, l: {"ema_26": indicators.ema(c, 26)},
+    ("ema_50",): lambda c, h, l: {"ema_50": indicators.ema(c, 50)},
+    ("atr_14",): lambda c, h, l: {"atr_14": indicators.atr(h, l, c, 14)},
+    ("rsi_14",): lambda c, h, l: {"rsi_14": indicators.rsi(c, 14)},
+    BBANDS: lambda c, h, l: indicators.bbands(c, 20, 2.0),
+    DONCHIAN: lambda c, h, l: indicators.donchian(h, l, 20, 20),
+}
+
+# Preset -> {preset column: feature column}
+PRESET_COLUMNS: Dict[str, Dict[str, str]] = {
+    "trend_following": {"ema_fast": "ema_20", "ema_slow": "ema_50", "atr": "atr_14"},
+    "mean_reversion": {**{c: c for c in BBANDS}, "rsi": "rsi_14", "atr": "atr_14"},
+    "breakout": {"ema_fast": "ema_12", "ema_slow": "ema_26", **{c: c for c in DONCHIAN}, "atr": "atr_14"},
+    "default": {"ema_fast": "ema_12", "ema_slow": "ema_26", "atr": "atr_14"},
+}
+PRESETS = ("trend_following", "mean_reversion", "breakout")
+SUMMARY_PRESET = "trend_following"  # the view `get_candles` exports
+
+
+def preset_of(preset: str) -> str:
+    return preset if preset in PRESET_COLUMNS else "default"
+
+
+def columns_for(presets: Iterable[str]) -> set:
+    return {feature for p in presets for feature in PRESET_COLUMNS[preset_of(p)].values()}
+
+
+def features(high, low, close, columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """Feature columns over (T,) series or (N, T) panels, each kernel run once (all features by default)."""
+    wanted = None if columns is None else set(columns)
+    out: Dict[str, np.ndarray] = {}
+    for produces, kernel in FEATURES.items():
+        if wanted is None or wanted.intersection(produces):
+            out.update(kernel(close, high, low))
+    return out
+
+
+def preset_columns(high, low, close, preset: str) -> Dict[str, np.ndarray]:
+    """The indicator columns of a preset (unknown presets get `default`)."""
+    mapping = PRESET_COLUMNS[preset_of(preset)]
+    cols = features(high, low, close, mapping.values())
+    return {name: cols[feature] for name, feature in mapping.items()}
+
+
+def preset_view(values: Dict[str, float], preset: str) -> Dict[str, float]:
+    """A preset's latest indicator values, named as the preset names them."""
+    return {name: values[feature] for name, feature in PRESET_COLUMNS[preset_of(preset)].items() if feature in values}
+
+
+# --- Cache ---
+Key = Tuple[str, str, str]  # (provider, instrument, granularity)
+
+
+class FeatureRegistry:
+    """LRU of the latest feature values per summary digest, plus each key's newest digest."""
+
+    def __init__(self, max_entries: int | None = None):
+        self.max_entries = max_entries or settings.feature_registry.max_entries
+        self._entries: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._latest: Dict[Key, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, provider: str, instrument: str, granularity: str, digest: str, values: Dict[str, float]) -> None:
+        with self._lock:
+            self._entries[digest] = values
+            self._entries.move_to_end(digest)
+            self._latest[(provider, instrument, granularity)] = digest
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, provider: str, instrument: str, granularity: str,
+            digest: str | None = None) -> Optional[Tuple[str, Dict[str, float]]]:
+        """(digest, values) for exactly `digest`, or for the key's newest summary when no digest is given."""
+        with self._lock:
+            if digest is None:
+                digest = self._latest.get((provider, instrument, granularity))
+            values = self._entries.get(digest) if digest else None
+            if values is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return digest, values
+
+    def peek(self, digest: str) -> Optional[Dict[str, float]]:
+        """The values stored for `digest`, without counting a lookup or touching the LRU order."""
+        with self._lock:
+            return self._entries.get(digest)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+# Process-wide registry
+feature_registry = FeatureRegistry()
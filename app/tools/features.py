@@ -0,0 +1,66 @@
+"""
+Feature summaries shared by the data providers.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from app.tools.data_models import FeatureSummary
+
+SUMMARY_INDICATORS = ["ema_fast", "ema_slow", "atr"]
+
+
+def summarize(df: pd.DataFrame, instrument: str, granularity: str, cache_path: Path | None) -> FeatureSummary:
+    """Build the compact FeatureSummary (last closes, latest indicators, digest) for a frame."""
+    # Get the latest non-NaN indicator values
+    latest_indicators = {}
+    for col in SUMMARY_INDICATORS:
+        if col in df:
+            last_valid = df[col].last_valid_index()
+            if last_valid is not None:
+                latest_indicators[col] = df.loc[last_valid, col]
+    return build_summary(df, instrument, granularity, cache_path, latest_indicators)
+
+
+def build_summary(df: pd.DataFrame, instrument: str, granularity: str, cache_path: Path | None,
+                  latest_indicators: dict) -> FeatureSummary:
+    """The FeatureSummary of an OHLC frame, given its latest indicator values."""
+    return make_summary(instrument, granularity, cache_path, df["close"].to_numpy()[-3:].tolist(), latest_indicators, last_bar(df))
+
+
+def make_summary(instrument: str, granularity: str, cache_path: Path | None, last_3_closes: list,
+                 latest_indicators: dict, bar: dict | None) -> FeatureSummary:
+    """The FeatureSummary from already extracted values (closes, indicators, last bar)."""
+    # Create a digest
+    summary_data = {
+        "instrument": instrument,
+        "timeframe": granularity,
+        "last_3_closes": last_3_closes,
+        "indicators": latest_indicators,
+    }
+    digest = hashlib.md5(json.dumps(summary_data, sort_keys=True).encode()).hexdigest()
+
+    return FeatureSummary(
+        instrument=instrument,
+        timeframe=granularity,
+        last_n_closes=last_3_closes,
+        indicators=latest_indicators,
+        cache_path=str(cache_path),
+        features_digest=digest,
+        last_bar=bar,
+    )
+
+
+def last_bar(df: pd.DataFrame) -> dict | None:
+    """OHLC of the newest bar in `df` (time as ISO string), or None when empty."""
+    if df.empty:
+        return None
+    # Column-wise scalar reads: no mixed-dtype row Series
+    bar = {k: float(df[k].iat[-1]) for k in ("open", "high", "low", "close")}
+    bar["time"] = pd.Timestamp(df["time"].iat[-1]).isoformat()
+    return bar
@@ -0,0 +1,242 @@
+"""
+Shared, pooled HTTP clients for the provider APIs (OANDA, Alpha Vantage,
+Finnhub, TradingEconomics).
+
+One long-lived `httpx.AsyncClient` is kept per provider and event loop (an
+async client's connections belong to the loop that opened them), configured
+from `settings.http`: keep-alive limits, timeouts and a per-provider cap on
+in-flight requests. HTTP/2 is negotiated when the optional `h2` package is
+installed.
+
+    r = await http_clients.request("oanda", "GET", "/v3/accounts", headers=...)
+
+Sync callers (the tools' `invoke` path) go through `http_clients.run_sync(coro)`,
+which drives the coroutine on one long-lived background loop, so their pooled
+clients are reused across calls and closed at exit.
+
+Tests point a provider at a stand-in server (or an `httpx.MockTransport`)
+with `http_clients.override("oanda", base_url=..., transport=...)`.
+Connection reuse is tracked per provider and traced as `http_request` events.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+
+from app.settings import settings
+
+try:
+    import h2  # noqa: F401  (lets httpx negotiate HTTP/2)
+except Exception:  # optional
+    h2 = None
+
+T = TypeVar("T")
+
+# Base URL per provider, resolved when a client is built so env switches apply
+BASE_URLS: Dict[str, Callable[[], str]] = {
+    "oanda": lambda: settings.oanda.base,
+    "oanda_stream": lambda: settings.oanda.stream_base,
+    "alpha_vantage": lambda: "https://www.alphavantage.co",
+    "finnhub": lambda: "https://finnhub.io/api/v1",
+    "trading_economics": lambda: "https://api.tradingeconomics.com",
+}
+
+
+@dataclass
+class _Pool:
+    client: httpx.AsyncClient
+    semaphore: asyncio.Semaphore
+
+
+@dataclass
+class ProviderStats:
+    requests: int = 0
+    errors: int = 0
+    new_connections: int = 0
+    total_ms: float = 0.0
+    _streams: set = field(default_factory=set, repr=False)
+
+    def observe(self, response: httpx.Response) -> Optional[bool]:
+        """Record a response; returns whether it reused a pooled connection (None if unknown)."""
+        stream = response.extensions.get("network_stream")
+        if stream is None:  # e.g. MockTransport
+            return None
+        key = id(stream)
+        if key in self._streams:
+            return True
+        if len(self._streams) > 1024:
+            self._streams.clear()
+        self._streams.add(key)
+        self.new_connections += 1
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "new_connections": self.new_connections,
+            "reuse_ratio": 1 - self.new_connections / self.requests if self.requests else 0.0,
+            "avg_ms": self.total_ms / self.requests if self.requests else 0.0,
+        }
+
+
+class HttpClientRegistry:
+    def __init__(self) -> None:
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _Pool]]" = weakref.WeakKeyDictionary()
+        self._overrides: Dict[str, Dict[str, Any]] = {}
+        self._stats: Dict[str, ProviderStats] = {}
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_thread: Optional[threading.Thread] = None
+        self._sync_guard = threading.Lock()
+        atexit.register(self.close)
+
+    # ----- configuration -----
+    def override(self, provider: str, **client_kwargs: Any) -> None:
+        """Build `provider`'s clients with these httpx.AsyncClient kwargs (e.g. base_url, transport)."""
+        self._overrides[provider] = client_kwargs
+        self._drop(provider)
+
+    def clear_overrides(self) -> None:
+        for provider in list(self._overrides):
+            self._drop(provider)
+        self._overrides.clear()
+
+    # ----- clients -----
+    def client(self, provider: str) -> httpx.AsyncClient:
+        """The pooled client for `provider` on the running event loop."""
+        return self._pool(provider).client
+
+    async def request(self, provider: str, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a request through `provider`'s pooled client, within its concurrency cap."""
+        pool = self._pool(provider)
+        stats = self._stats.setdefault(provider, ProviderStats())
+        start = time.perf_counter()
+        async with pool.semaphore:
+            try:
+                response = await pool.client.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                stats.errors += 1
+                self._trace(provider, method, url, (time.perf_counter() - start) * 1000, stats, error=e)
+                raise
+        latency_ms = (time.perf_counter() - start) * 1000
+        stats.requests += 1
+        stats.total_ms += latency_ms
+        reused = stats.observe(response)
+        self._trace(provider, method, url, latency_ms, stats, response=response, reused=reused)
+        return response
+
+    def stats(self) -> Dict[str, dict]:
+        return {provider: s.to_dict() for provider, s in self._stats.items()}
+
+    # ----- sync callers -----
+    def run_sync(self, coro: Awaitable[T]) -> T:
+        """Run `coro` from sync code on the background loop, whose pooled clients outlive the call."""
+        loop = self._background_loop()
+        if threading.current_thread() is self._sync_thread:
+            coro.close()
+            raise RuntimeError("run_sync() called from the background loop; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._sync_guard:
+            if self._sync_loop is None or self._sync_loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="http-clients-sync", daemon=True)
+                thread.start()
+                self._sync_loop, self._sync_thread = loop, thread
+            return self._sync_loop
+
+    # ----- shutdown -----
+    async def aclose(self) -> None:
+        """Close the clients of the running event loop."""
+        pools = self._pools.pop(asyncio.get_running_loop(), {})
+        for pool in pools.values():
+            await pool.client.aclose()
+
+    def close(self) -> None:
+        """Close the background loop's clients and those of idle loops (registered with atexit); others are left to the GC."""
+        with self._sync_guard:
+            loop, thread = self._sync_loop, self._sync_thread
+            self._sync_loop = self._sync_thread = None
+        if loop is not None and loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(self.aclose(), loop).result(timeout=5)
+            except Exception:
+                pass
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+            loop.close()
+        for loop, pools in list(self._pools.items()):
+            if loop.is_closed() or loop.is_running():
+                continue
+            for pool in pools.values():
+                try:
+                    loop.run_until_complete(pool.client.aclose())
+                except Exception:
+                    pass
+        self._pools.clear()
+
+    # ----- internals -----
+    def _build(self, provider: str) -> _Pool:
+        cfg = settings.http.for_provider(provider)
+        kwargs: Dict[str, Any] = {
+            "base_url": BASE_URLS[provider](),
+            "http2": settings.http.http2 and h2 is not None,
+            "limits": httpx.Limits(
+                max_connections=cfg.max_connections,
+                max_keepalive_connections=cfg.max_keepalive_connections,
+                keepalive_expiry=cfg.keepalive_expiry,
+            ),
+            "timeout": httpx.Timeout(cfg.read_timeout, connect=cfg.connect_timeout),
+        }
+        kwargs.update(self._overrides.get(provider, {}))
+        return _Pool(httpx.AsyncClient(**kwargs), asyncio.Semaphore(cfg.max_concurrency))
+
+    def _pool(self, provider: str) -> _Pool:
+        loop = asyncio.get_running_loop()
+        # Clients of loops that have gone away cannot be closed any more; just drop them
+        for stale in [lp for lp in self._pools.keys() if lp.is_closed()]:
+            self._pools.pop(stale, None)
+        pools = self._pools.setdefault(loop, {})
+        pool = pools.get(provider)
+        if pool is None or pool.client.is_closed:
+            pool = pools[provider] = self._build(provider)
+        return pool
+
+    def _drop(self, provider: str) -> None:
+        for pools in self._pools.values():
+            pools.pop(provider, None)
+
+    def _trace(self, provider: str, method: str, url: str, latency_ms: float, stats: ProviderStats,
+               response: httpx.Response | None = None, reused: Optional[bool] = None,
+               error: Exception | None = None) -> None:
+        if not settings.http.log_requests:
+            return
+        from app.telemetry import tracer
+        event: Dict[str, Any] = {
+            "event_type": "http_request", "node": "http", "status": "error" if error else "ok",
+            "latency_ms": latency_ms, "data_provider": provider,
+            "output": {
+                # Path only: query strings carry API keys for some providers
+                "method": method, "path": httpx.URL(url).path,
+                "status_code": response.status_code if response is not None else None,
+                "http_version": response.http_version if response is not None else None,
+                "reused_connection": reused,
+                **stats.to_dict(),
+            },
+        }
+        if error is not None:
+            event.update({"error_type": type(error).__name__, "error_message": str(error)})
+        tracer.log(event)
+
+
+# Process-wide registry
+http_clients = HttpClientRegistry()
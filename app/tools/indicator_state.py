@@ -0,0 +1,423 @@
+"""
+Streaming indicator state — O(1) updates per new bar instead of recomputing windows.
+
+Each state object consumes one bar at a time and holds just what its
+recursion needs. The definitions are pandas_ta's, so after the same bars a
+state's value matches the windowed computation to float rounding:
+
+- `EMAState`: SMA of the first `length` closes, then alpha = 2 / (length + 1)
+- `RMAState`: Wilder's `ewm(alpha=1/length, adjust=True, min_periods=length)`
+- `ATRState`: RMA of the true range from the second bar
+- `RSIState`: 100 * RMA(gains) / (RMA(gains) + RMA(losses)) from the second bar
+- `BBandsState`: SMA ± std * population stdev over `length` closes (sliding
+  mean/M2, refreshed exactly from the window every `length` bars)
+- `DonchianState`: rolling low/high channels (amortized O(1) monotonic deques)
+
+`IndicatorSet` bundles the states behind a set of feature columns, keyed like
+`feature_registry.FEATURES`, so a state shared by several presets (ATR serves
+all three) is advanced once. `IndicatorStates` keeps one set per (provider,
+instrument, granularity), advances it by the bars of a frame newer than the
+last one it has seen, and persists it under `runs/cache/indicator_state/` so
+that a restart resumes where it left off. A frame that starts after the last
+seen bar (a gap), or that asks for columns the set does not hold, rebuilds
+the set from that frame.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from app.settings import settings
+from app.tools.feature_registry import BBANDS, DONCHIAN, FEATURES
+
+NAN = float("nan")
+
+
+# --- States ---
+class _State:
+    """Base: `update` consumes one bar, `value` is the latest output, `to_dict`/`from_dict` persist."""
+
+    __slots__ = ()
+    kind = ""
+
+    def to_dict(self) -> dict:
+        data = {"kind": self.kind}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            data[name] = list(value) if isinstance(value, deque) else value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "_State":
+        state = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(state, name, data[name])
+        return state
+
+
+class EMAState(_State):
+    __slots__ = ("length", "seen", "total", "ema")
+    kind = "ema"
+
+    def __init__(self, length: int):
+        self.length = length
+        self.seen = 0
+        self.total = 0.0  # sum of the first `length` values (the SMA seed)
+        self.ema: Optional[float] = None
+
+    def update(self, x: float) -> None:
+        self.seen += 1
+        if self.ema is not None:
+            self.ema += 2.0 / (self.length + 1) * (x - self.ema)
+            return
+        self.total += x
+        if self.seen == self.length:
+            self.ema = self.total / self.length
+
+    @property
+    def value(self) -> float:
+        return NAN if self.ema is None else self.ema
+
+
+class RMAState(_State):
+    __slots__ = ("length", "seen", "num", "den")
+    kind = "rma"
+
+    def __init__(self, length: int):
+        self.length = length
+        self.seen = 0
+        self.num = 0.0  # sum of decay^k * x[t-k]
+        self.den = 0.0  # sum of decay^k (adjust=True weights)
+
+    def update(self, x: float) -> None:
+        decay = 1.0 - 1.0 / self.length
+        self.seen += 1
+        self.num = x + decay * self.num
+        self.den = 1.0 + decay * self.den
+
+    @property
+    def value(self) -> float:
+        return self.num / self.den if self.seen >= self.length else NAN
+
+
+class ATRState(_State):
+    __slots__ = ("prev_close", "rma")
+    kind = "atr"
+
+    def __init__(self, length: int = 14):
+        self.prev_close: Optional[float] = None
+        self.rma = RMAState(length)
+
+    def update(self, high: float, low: float, close: float) -> None:
+        if self.prev_close is not None:  # no true range for the first bar
+            prev = self.prev_close
+            self.rma.update(max(high - low, abs(high - prev), abs(low - prev)))
+        self.prev_close = close
+
+    @property
+    def value(self) -> float:
+        return self.rma.value
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, "prev_close": self.prev_close, "rma": self.rma.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ATRState":
+        state = cls.__new__(cls)
+        state.prev_close = data["prev_close"]
+        state.rma = RMAState.from_dict(data["rma"])
+        return state
+
+
+class RSIState(_State):
+    __slots__ = ("prev_close", "gains", "losses")
+    kind = "rsi"
+
+    def __init__(self, length: int = 14):
+        self.prev_close: Optional[float] = None
+        self.gains = RMAState(length)
+        self.losses = RMAState(length)
+
+    def update(self, close: float) -> None:
+        if self.prev_close is not None:
+            change = close - self.prev_close
+            self.gains.update(max(change, 0.0))
+            self.losses.update(max(-change, 0.0))
+        self.prev_close = close
+
+    @property
+    def value(self) -> float:
+        gain, loss = self.gains.value, self.losses.value
+        if math.isnan(gain) or gain + loss == 0:
+            return NAN
+        return 100.0 * gain / (gain + loss)
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, "prev_close": self.prev_close,
+                "gains": self.gains.to_dict(), "losses": self.losses.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RSIState":
+        state = cls.__new__(cls)
+        state.prev_close = data["prev_close"]
+        state.gains = RMAState.from_dict(data["gains"])
+        state.losses = RMAState.from_dict(data["losses"])
+        return state
+
+
+class BBandsState(_State):
+    __slots__ = ("length", "std", "window", "mean", "m2", "since_refresh", "close")
+    kind = "bbands"
+
+    def __init__(self, length: int = 20, std: float = 2.0):
+        self.length = length
+        self.std = std
+        self.window: deque = deque(maxlen=length)
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from `mean` over the window
+        self.since_refresh = 0
+        self.close = NAN
+
+    def update(self, x: float) -> None:
+        self.close = x
+        if len(self.window) < self.length:
+            self.window.append(x)
+            delta = x - self.mean
+            self.mean += delta / len(self.window)
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.window[0]
+            self.window.append(x)  # drops `old`
+            mean = self.mean + (x - old) / self.length
+            self.m2 += (x - old) * (x - mean + old - self.mean)
+            self.mean = mean
+        self.since_refresh += 1
+        if self.since_refresh >= self.length:
+            # Exact recompute from the window so sliding rounding never accumulates
+            values = np.fromiter(self.window, dtype=np.float64, count=len(self.window))
+            self.mean = float(values.mean())
+            self.m2 = float(((values - self.mean) ** 2).sum())
+            self.since_refresh = 0
+
+    @property
+    def values(self) -> Dict[str, float]:
+        """pandas_ta bbands columns: lower, mid, upper, bandwidth (%) and %B."""
+        suffix = f"{self.length}_{self.std}"
+        if len(self.window) < self.length:
+            return {f"BB{c}_{suffix}": NAN for c in "LMUBP"}
+        dev = self.std * math.sqrt(max(self.m2, 0.0) / self.length)  # ddof=0, as pandas_ta bbands
+        lower, upper = self.mean - dev, self.mean + dev
+        width = upper - lower
+        return {
+            f"BBL_{suffix}": lower,
+            f"BBM_{suffix}": self.mean,
+            f"BBU_{suffix}": upper,
+            f"BBB_{suffix}": 100.0 * width / self.mean if self.mean else NAN,
+            f"BBP_{suffix}": (self.close - lower) / width if width else NAN,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BBandsState":
+        state = super().from_dict(data)
+        state.window = deque(data["window"], maxlen=data["length"])
+        return state
+
+
+class DonchianState(_State):
+    """Rolling min of the lows and max of the highs, via monotonic deques of (bar, value)."""
+
+    __slots__ = ("lower_length", "upper_length", "seen", "lows", "highs")
+    kind = "donchian"
+
+    def __init__(self, lower_length: int = 20, upper_length: int = 20):
+        self.lower_length = lower_length
+        self.upper_length = upper_length
+        self.seen = 0
+        self.lows: deque = deque()   # increasing values: the front is the window minimum
+        self.highs: deque = deque()  # decreasing values: the front is the window maximum
+
+    def update(self, high: float, low: float, close: float) -> None:
+        i = self.seen
+        self.seen += 1
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        self.lows.append((i, low))
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append((i, high))
+        if self.lows[0][0] <= i - self.lower_length:
+            self.lows.popleft()
+        if self.highs[0][0] <= i - self.upper_length:
+            self.highs.popleft()
+
+    @property
+    def values(self) -> Dict[str, float]:
+        """pandas_ta donchian columns: lower, mid and upper."""
+        suffix = f"{self.lower_length}_{self.upper_length}"
+        lower = self.lows[0][1] if self.seen >= self.lower_length else NAN
+        upper = self.highs[0][1] if self.seen >= self.upper_length else NAN
+        return {f"DCL_{suffix}": lower, f"DCM_{suffix}": 0.5 * (lower + upper), f"DCU_{suffix}": upper}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DonchianState":
+        state = super().from_dict(data)
+        state.lows = deque(tuple(p) for p in data["lows"])
+        state.highs = deque(tuple(p) for p in data["highs"])
+        return state
+
+
+STATE_TYPES = {cls.kind: cls for cls in (EMAState, RMAState, ATRState, RSIState, BBandsState, DonchianState)}
+
+
+# --- Feature sets ---
+# Feature columns produced -> state factory; the same keys as feature_registry.FEATURES
+FEATURE_STATES: Dict[Tuple[str, ...], Callable[[], _State]] = {
+    ("ema_12",): lambda: EMAState(12),
+    ("ema_20",): lambda: EMAState(20),
+    ("ema_26",): lambda: EMAState(26),
+    ("ema_50",): lambda: EMAState(50),
+    ("atr_14",): lambda: ATRState(14),
+    ("rsi_14",): lambda: RSIState(14),
+    BBANDS: lambda: BBandsState(20, 2.0),
+    DONCHIAN: lambda: DonchianState(20, 20),
+}
+FEATURES_ALL = tuple(c for produces in FEATURES for c in produces)
+
+
+class IndicatorSet:
+    """The streaming states behind `columns` (default: every feature), advanced bar by bar."""
+
+    def __init__(self, columns: Optional[Iterable[str]] = None):
+        wanted = None if columns is None else set(columns)
+        self.states: Dict[Tuple[str, ...], _State] = {
+            produces: make() for produces, make in FEATURE_STATES.items()
+            if wanted is None or wanted.intersection(produces)
+        }
+        self.last_time: Optional[int] = None  # epoch seconds of the newest bar consumed
+        self.bars = 0
+
+    @property
+    def columns(self) -> set:
+        return {c for produces in self.states for c in produces}
+
+    def update(self, time: int, high: float, low: float, close: float) -> None:
+        for state in self.states.values():
+            if isinstance(state, (ATRState, DonchianState)):
+                state.update(high, low, close)
+            else:
+                state.update(close)
+        self.last_time = int(time)
+        self.bars += 1
+
+    def values(self) -> Dict[str, float]:
+        """Latest values under the feature column names (`preset_view` maps them to a preset's)."""
+        out: Dict[str, float] = {}
+        for produces, state in self.states.items():
+            if isinstance(state, (BBandsState, DonchianState)):
+                out.update(state.values)
+            else:
+                out[produces[0]] = state.value
+        return out
+
+    def to_dict(self) -> dict:
+        return {"last_time": self.last_time, "bars": self.bars,
+                "states": {",".join(produces): state.to_dict() for produces, state in self.states.items()}}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IndicatorSet":
+        out = cls(())
+        out.last_time = data["last_time"]
+        out.bars = data["bars"]
+        out.states = {tuple(name.split(",")): STATE_TYPES[s["kind"]].from_dict(s) for name, s in data["states"].items()}
+        return out
+
+
+def bar_times(df) -> np.ndarray:
+    """Epoch seconds of a candle frame's `time` column."""
+    return df["time"].to_numpy(dtype="datetime64[s]", copy=False).astype(np.int64) if len(df) else np.empty(0, dtype=np.int64)
+
+
+# --- Store ---
+StateKey = Tuple[str, str, str]  # (provider, instrument, granularity)
+
+
+class IndicatorStates:
+    def __init__(self, root: Path | None = None):
+        self.root = Path(root) if root else Path(settings.persistence.get("path", "runs/")) / "cache" / "indicator_state"
+        self._sets: Dict[StateKey, IndicatorSet] = {}
+        self._lock = threading.Lock()
+        self.bars_applied = 0
+        self.rebuilds = 0
+        self.restored = 0
+
+    def advance(self, provider: str, instrument: str, granularity: str,
+                times: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                columns: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Consume the bars newer than the key's last one and return the latest feature values."""
+        key = (provider, instrument, granularity)
+        wanted = set(FEATURES_ALL if columns is None else columns)
+        with self._lock:
+            ind = self._sets.get(key) or self._restore(key)
+            if ind is not None and not wanted <= ind.columns:
+                ind = None  # asked for features the set does not hold: rebuild from this frame
+            elif ind is not None and len(times) and ind.last_time is not None and times[0] > ind.last_time:
+                self.rebuilds += 1  # the frame starts after the last bar seen: a gap
+                ind = None
+            if ind is None:
+                ind = IndicatorSet(wanted)
+            start = 0 if ind.last_time is None else int(np.searchsorted(times, ind.last_time, side="right"))
+            for i in range(start, len(times)):
+                ind.update(times[i], float(high[i]), float(low[i]), float(close[i]))
+            self._sets[key] = ind
+            self.bars_applied += len(times) - start
+            if start < len(times) and settings.indicator_state.persist:
+                self._write(key, ind)
+            return ind.values()
+
+    def advance_frame(self, provider: str, instrument: str, granularity: str, df,
+                      columns: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        return self.advance(provider, instrument, granularity, bar_times(df),
+                            df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), columns)
+
+    # ----- persistence -----
+    def _path(self, key: StateKey) -> Path:
+        provider, instrument, granularity = key
+        return self.root / provider / f"{instrument}_{granularity}.json"
+
+    def _write(self, key: StateKey, ind: IndicatorSet) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(ind.to_dict()))
+        os.replace(tmp, path)
+
+    def _restore(self, key: StateKey) -> Optional[IndicatorSet]:
+        if not settings.indicator_state.persist:
+            return None
+        try:
+            ind = IndicatorSet.from_dict(json.loads(self._path(key).read_text()))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        self.restored += 1
+        return ind
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sets.clear()
+
+    # ----- metrics -----
+    def stats(self) -> dict:
+        return {"keys": len(self._sets), "bars_applied": self.bars_applied,
+                "rebuilds": self.rebuilds, "restored": self.restored}
+
+
+# Process-wide states
+indicator_states = IndicatorStates()
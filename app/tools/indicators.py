@@ -0,0 +1,212 @@
+"""
+Vectorized indicator kernels over NumPy arrays.
+
+Every kernel takes float arrays whose last axis is time: one series of shape
+(T,) or a panel of shape (N, T) holding N instruments with aligned bars. The
+whole panel is computed in one pass, with no per-instrument Python work.
+Definitions follow pandas_ta's defaults. Warm-up values are NaN.
+
+- `ema`: seeded with the SMA of the first `length` values (pandas_ta `ema`)
+- `rma`: Wilder's smoothing, `ewm(alpha=1/length, adjust=True, min_periods=length)`
+- `true_range` / `atr`: max(high - low, |high - prev close|, |low - prev close|),
+  smoothed with `rma` (pandas_ta `atr` without TA-Lib)
+- `rsi`: 100 * rma(gains) / (rma(gains) + rma(losses)) of the close changes
+- `sma` / `stdev`: rolling mean and population stdev (ddof=0, as `bbands` uses)
+- `bbands`: sma ± std * stdev, with bandwidth (%) and %B
+- `donchian`: rolling min of the lows and max of the highs (breakout channels)
+
+Rolling windows are reduced over strided views in chunks, so
+memory stays bounded on long inputs.
+
+Recursive filters run blockwise in closed form. Within a block of B bars,
+y[t] = d^t * (d * y0 + cumsum(x[k] * d^-k)), and B is capped so d^-B stays
+small enough for float64. All blocks are scanned at once from a zero start;
+the carries between blocks are then resolved by a log2(#blocks) doubling scan
+and added back, so long series cost a few full-array passes, not a Python
+loop per block.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+_CHUNK = 1 << 16  # windows reduced per step by the rolling kernels
+
+
+def _as_panel(x) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64)
+
+
+def _block(decay: float) -> int:
+    # Keep decay ** -block below ~e^20
+    if decay <= 0.0:
+        return 1
+    return int(max(1, min(256, 20.0 / max(1e-12, -math.log(decay)))))
+
+
+def decay_scan(x: np.ndarray, decay: float, y0=0.0) -> np.ndarray:
+    """y[t] = decay * y[t-1] + x[t] along the last axis, with y[-1] = y0 (NaN-free `x`)."""
+    x = _as_panel(x)
+    T = x.shape[-1]
+    if T == 0:
+        return np.empty_like(x)
+    block = min(_block(decay), T)
+    nb = -(-T // block)
+    padded = np.zeros(x.shape[:-1] + (nb * block,))
+    padded[..., :T] = x
+    blocks = padded.reshape(x.shape[:-1] + (nb, block))
+    k = np.arange(block, dtype=np.float64)
+    up, down = decay ** -k, decay ** k
+    # Every block scanned from a zero start
+    local = down * np.cumsum(blocks * up, axis=-1)
+    # Carry out of each block: c[b] = local_last[b] + decay^block * c[b - 1], c[-1] = y0
+    y0 = np.broadcast_to(np.asarray(y0, dtype=np.float64), x.shape[:-1])
+    factor = decay ** block
+    carry = local[..., -1].copy()
+    carry[..., 0] += factor * y0
+    shift, f = 1, factor
+    while shift < nb and f != 0.0:
+        carry[..., shift:] = carry[..., shift:] + f * carry[..., :-shift]
+        shift, f = shift * 2, f * f
+    into = np.concatenate([y0[..., None], carry[..., :-1]], axis=-1)  # carry into each block
+    local += (decay * down) * into[..., None]
+    return local.reshape(x.shape[:-1] + (nb * block,))[..., :T]
+
+
+def ema(close, length: int) -> np.ndarray:
+    """Exponential moving average, alpha = 2 / (length + 1), seeded with the first SMA."""
+    x = _as_panel(close)
+    out = np.full_like(x, np.nan)
+    if length <= 0 or x.shape[-1] < length:
+        return out
+    alpha = 2.0 / (length + 1)
+    seed = x[..., :length].mean(axis=-1)
+    out[..., length - 1] = seed
+    out[..., length:] = decay_scan(alpha * x[..., length:], 1.0 - alpha, seed)
+    return out
+
+
+def rma(x, length: int, start: int = 0) -> np.ndarray:
+    """
+    Wilder's moving average, ewm(alpha=1/length, adjust=True) over x[..., start:]
+    (values before `start` are ignored, e.g. a leading NaN), NaN until `length`
+    values were seen.
+    """
+    x = _as_panel(x)
+    out = np.full_like(x, np.nan)
+    n = x.shape[-1] - start
+    if length <= 0 or n < length:
+        return out
+    decay = 1.0 - 1.0 / length
+    weights = np.full(n, 1.0 / (1.0 - decay)) if decay > 0 else np.ones(n)
+    if decay > 0:
+        # adjust=True weights sum(decay^k); past ~-37/log(decay) bars they equal the limit in float64
+        head = min(n, int(-37.0 / math.log(decay)) + 1)
+        weights[:head] = (1.0 - decay ** np.arange(1, head + 1)) / (1.0 - decay)
+    smoothed = decay_scan(x[..., start:], decay) / weights
+    out[..., start + length - 1:] = smoothed[..., length - 1:]
+    return out
+
+
+def true_range(high, low, close) -> np.ndarray:
+    high, low, close = _as_panel(high), _as_panel(low), _as_panel(close)
+    out = np.full_like(close, np.nan)
+    prev = close[..., :-1]
+    h, l = high[..., 1:], low[..., 1:]
+    out[..., 1:] = np.maximum(h - l, np.maximum(np.abs(h - prev), np.abs(l - prev)))
+    return out
+
+
+def atr(high, low, close, length: int = 14) -> np.ndarray:
+    """Average true range (Wilder smoothing of the true range from the second bar)."""
+    return rma(true_range(high, low, close), length, start=1)
+
+
+def _rolling(x, length: int, reduce) -> np.ndarray:
+    """reduce(windows, axis=-1) over each full window of `length` values, NaN before."""
+    x = _as_panel(x)
+    out = np.full_like(x, np.nan)
+    T = x.shape[-1]
+    if length <= 0 or T < length:
+        return out
+    windows = sliding_window_view(x, length, axis=-1)  # (..., T - length + 1, length), no copy
+    for s in range(0, windows.shape[-2], _CHUNK):
+        chunk = windows[..., s:s + _CHUNK, :]
+        out[..., length - 1 + s:length - 1 + s + chunk.shape[-2]] = reduce(chunk, axis=-1)
+    return out
+
+
+def _rolling_extreme(x, length: int, op) -> np.ndarray:
+    """Rolling min/max (`op` = np.minimum / np.maximum) in O(T): block prefix and suffix scans (van Herk/Gil-Werman)."""
+    x = _as_panel(x)
+    out = np.full_like(x, np.nan)
+    T = x.shape[-1]
+    if length <= 0 or T < length:
+        return out
+    nb = -(-T // length)
+    padded = np.full(x.shape[:-1] + (nb * length,), np.nan)
+    padded[..., :T] = x
+    blocks = padded.reshape(x.shape[:-1] + (nb, length))
+    prefix = op.accumulate(blocks, axis=-1).reshape(padded.shape)
+    suffix = op.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+    # A window starting at i spans the suffix of i's block and the prefix of the next one
+    out[..., length - 1:] = op(suffix[..., :T - length + 1], prefix[..., length - 1:T])
+    return out
+
+
+def sma(close, length: int) -> np.ndarray:
+    return _rolling(close, length, np.mean)
+
+
+def stdev(close, length: int) -> np.ndarray:
+    """Rolling population standard deviation (ddof=0)."""
+    return _rolling(close, length, np.std)
+
+
+def rsi(close, length: int = 14) -> np.ndarray:
+    """Relative strength index of the close changes, Wilder-smoothed from the second bar."""
+    x = _as_panel(close)
+    change = np.zeros_like(x)
+    change[..., 1:] = np.diff(x, axis=-1)
+    gains = rma(np.maximum(change, 0.0), length, start=1)
+    losses = rma(np.maximum(-change, 0.0), length, start=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100.0 * gains / (gains + losses)
+
+
+def bbands(close, length: int = 20, std: float = 2.0) -> Dict[str, np.ndarray]:
+    """Bollinger bands as pandas_ta names them: BBL/BBM/BBU/BBB/BBP_<length>_<std>."""
+    x = _as_panel(close)
+    mid = sma(x, length)
+    dev = std * stdev(x, length)
+    lower, upper = mid - dev, mid + dev
+    suffix = f"{length}_{float(std)}"
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            f"BBL_{suffix}": lower,
+            f"BBM_{suffix}": mid,
+            f"BBU_{suffix}": upper,
+            f"BBB_{suffix}": 100.0 * (upper - lower) / mid,
+            f"BBP_{suffix}": (x - lower) / (upper - lower),
+        }
+
+
+def donchian(high, low, lower_length: int = 20, upper_length: int = 20) -> Dict[str, np.ndarray]:
+    """Donchian channels as pandas_ta names them: DCL/DCM/DCU_<lower>_<upper>."""
+    lower = _rolling_extreme(low, lower_length, np.minimum)
+    upper = _rolling_extreme(high, upper_length, np.maximum)
+    suffix = f"{lower_length}_{upper_length}"
+    return {f"DCL_{suffix}": lower, f"DCM_{suffix}": 0.5 * (lower + upper), f"DCU_{suffix}": upper}
+
+
+def last_valid(panel: np.ndarray) -> np.ndarray:
+    """The newest non-NaN value of each series (NaN when there is none)."""
+    panel = _as_panel(panel)
+    valid = ~np.isnan(panel)
+    idx = panel.shape[-1] - 1 - np.argmax(valid[..., ::-1], axis=-1)
+    values = np.take_along_axis(panel, idx[..., None], axis=-1)[..., 0]
+    return np.where(valid.any(axis=-1), values, np.nan)
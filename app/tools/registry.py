@@ -6,6 +6,6 @@ def get_toolset() -> List[BaseTool]:
     """
     Returns the standard set of tools for the trading agents.
     """
-    from app.tools.standard import get_candles, execute_order, propose_order, attach_stops
+    from app.tools.standard import get_candles, get_preset_features, execute_order, propose_order, attach_stops
 
-    return [get_candles, execute_order, propose_order, attach_stops]
+    return [get_candles, get_preset_features, execute_order, propose_order, attach_stops]
@@ -32,6 +32,14 @@ def position_units(equity: float, risk_pct: float, atr: float, atr_pips: float =
     return units
 
 
+def stop_levels(side: str, price: float, atr: float, sl_mult: float | None = None, tp_mult: float | None = None) -> Tuple[float, float]:
+    # SL/TP `sl_buffer_atr`/`tp_buffer_atr` ATRs from price: below/above for buys, above/below for sells
+    slm = sl_mult or settings.risk.sl_buffer_atr
+    tpm = tp_mult or settings.risk.tp_buffer_atr
+    sign = -1.0 if str(side).lower() == "sell" else 1.0
+    return price - sign * slm * atr, price + sign * tpm * atr
+
+
 def daily_drawdown_ok(current_dd: float) -> bool:
     return current_dd <= settings.risk.max_daily_loss
 
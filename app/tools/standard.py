@@ -1,18 +1,27 @@
 from __future__ import annotations
-import asyncio
 import json
 import datetime as dt
 
 from langchain.tools import tool
+from langchain_core.tools import StructuredTool
 
+from app.events import CandleCloseEvent, bus
 from app.settings import settings
-from app.tools.risk_tool import guardrails_pass
+from app.tools.risk_tool import guardrails_pass, stop_levels
 
 from app.tools.data_models import FeatureSummary
 from app.tools.errors import ProviderError
+from app.tools.http_clients import http_clients
 
-@tool
-async def get_candles(instrument: str, timeframe: str, count: int = 200) -> str:
+# Tools with I/O have a native coroutine (used by `ainvoke`, e.g. in the
+# LangGraph server) and a sync entry point for `invoke`, which drives the same
+# coroutine on the HTTP registry's long-lived background loop, so sync calls
+# reuse its pooled clients. Async callers always get the coroutine.
+
+def _run_sync(coro):
+    return http_clients.run_sync(coro)
+
+async def _get_candles(instrument: str, timeframe: str, count: int = 200) -> str:
     """
     Gets a summary of recent market data, including the last N closes,
     technical indicators, and a digest of the features.
@@ -23,20 +32,11 @@ async def get_candles(instrument: str, timeframe: str, count: int = 200) -> str:
         else:
             from app.tools import data_oanda; summary = await data_oanda.candles(instrument, timeframe, count=count)
 
-        # This part for the paper broker is a bit of a hack.
-        # It assumes the last bar's data can be read from the summary.
-        # A better solution would be a proper event bus.
-        if settings.broker_provider == "paper" and summary.cache_path:
-            from app.tools.broker_paper import PaperBroker
-            # We need to read the parquet file to get the last bar for the paper broker
-            # This is not ideal, but it's the only way to get the data without changing the tool's interface
-            import pandas as pd
-            from pathlib import Path
-
-            if Path(summary.cache_path).exists():
-                df = pd.read_parquet(summary.cache_path)
-                if not df.empty:
-                     PaperBroker().on_bar(instrument, float(df.iloc[-1].open), float(df.iloc[-1].high), float(df.iloc[-1].low), float(df.iloc[-1].close))
+        # Advance in-process subscribers (e.g. the paper broker) with the last bar
+        if settings.broker_provider == "paper":
+            from app.tools.broker_paper import attach_to_bus; attach_to_bus()
+        if summary.last_bar:
+            bus.publish(CandleCloseEvent(instrument=instrument, timeframe=timeframe, **summary.last_bar))
 
         return summary.model_dump_json()
     except ProviderError:
@@ -44,8 +44,61 @@ async def get_candles(instrument: str, timeframe: str, count: int = 200) -> str:
     except Exception as e:
         return json.dumps({"error": f"Failed to get candles: {e}"})
 
-@tool
-def execute_order(order: dict, open_positions: int = 0, daily_dd: float = 0.0, allow_new_entries: bool = True) -> str:
+def _get_candles_sync(instrument: str, timeframe: str, count: int = 200) -> str:
+    return _run_sync(_get_candles(instrument, timeframe, count))
+
+get_candles = StructuredTool.from_function(
+    func=_get_candles_sync, coroutine=_get_candles, name="get_candles", description=_get_candles.__doc__.strip(),
+)
+
+async def _get_preset_features(instrument: str, timeframe: str, preset: str, features_digest: str = "") -> str:
+    """
+    Gets the latest indicators of a strategy preset for the bars get_candles
+    summarized: trend_following (EMAs, ATR), mean_reversion (Bollinger bands,
+    RSI, ATR) or breakout (EMAs, Donchian channels, ATR). Pass the summary's
+    features_digest; if those bars are no longer known, the newest values are
+    returned with "stale": true.
+    """
+    try:
+        from app.tools.feature_registry import feature_registry, preset_of, preset_view
+        if not settings.feature_registry.enabled:
+            return json.dumps({"error": "Preset features are disabled (feature_registry.enabled)"})
+        provider = settings.data.provider
+        found = feature_registry.get(provider, instrument, timeframe, features_digest or None)
+        if found is None:
+            # Not summarized in this process yet: one summary pass (bars from the candle store) fills the registry
+            if provider == "mock":
+                from app.tools import data_mock; data_mock.candles(instrument, timeframe)
+            else:
+                from app.tools import data_oanda; await data_oanda.candles(instrument, timeframe)
+            found = feature_registry.get(provider, instrument, timeframe, features_digest or None)
+        stale = False
+        if found is None and features_digest:
+            # Evicted, or summarized in another process: the newest bars, flagged as not the requested ones
+            found = feature_registry.get(provider, instrument, timeframe)
+            stale = found is not None
+        if found is None:
+            return json.dumps({"error": f"No features for {instrument} {timeframe}"})
+        digest, values = found
+        out = {"instrument": instrument, "timeframe": timeframe, "preset": preset_of(preset),
+               "features_digest": digest, "indicators": preset_view(values, preset)}
+        if stale:
+            out.update(stale=True, requested_digest=features_digest)
+        return json.dumps(out)
+    except ProviderError:
+        raise
+    except Exception as e:
+        return json.dumps({"error": f"Failed to get preset features: {e}"})
+
+def _get_preset_features_sync(instrument: str, timeframe: str, preset: str, features_digest: str = "") -> str:
+    return _run_sync(_get_preset_features(instrument, timeframe, preset, features_digest))
+
+get_preset_features = StructuredTool.from_function(
+    func=_get_preset_features_sync, coroutine=_get_preset_features, name="get_preset_features",
+    description=_get_preset_features.__doc__.strip(),
+)
+
+async def _execute_order(order: dict, open_positions: int = 0, daily_dd: float = 0.0, allow_new_entries: bool = True) -> str:
     """Executes an order."""
     try:
         ok, reason = guardrails_pass(dt.datetime.now(dt.UTC), open_positions, daily_dd, allow_new_entries)
@@ -53,11 +106,18 @@ def execute_order(order: dict, open_positions: int = 0, daily_dd: float = 0.0, a
         if settings.broker_provider == "paper":
             from app.tools.broker_paper import PaperBroker; result = PaperBroker().place_order(order)
         else:
-            from app.tools import broker_oanda; result = asyncio.run(broker_oanda.place_order(order))
+            from app.tools import broker_oanda; result = await broker_oanda.place_order(order)
         return json.dumps(result)
     except Exception as e:
         return json.dumps({"error": f"Failed to execute order: {e}"})
 
+def _execute_order_sync(order: dict, open_positions: int = 0, daily_dd: float = 0.0, allow_new_entries: bool = True) -> str:
+    return _run_sync(_execute_order(order, open_positions, daily_dd, allow_new_entries))
+
+execute_order = StructuredTool.from_function(
+    func=_execute_order_sync, coroutine=_execute_order, name="execute_order", description=_execute_order.__doc__,
+)
+
 @tool
 def propose_order(instrument: str, side: str, units: int, entry_type: str = "market", price: float | None = None):
     """Creates a normalized order proposal."""
@@ -66,10 +126,9 @@ def propose_order(instrument: str, side: str, units: int, entry_type: str = "mar
 @tool
 def attach_stops(order: dict, atr: float, sl_mult: float = None, tp_mult: float = None):
     """Attaches SL/TP to an order."""
-    slm = sl_mult or settings.risk.sl_buffer_atr
-    tpm = tp_mult or settings.risk.tp_buffer_atr
     o = order.copy()
     price = o.get("price")
-    o["stop_loss"] = o.get("stop_loss") or (price - slm * atr if price else None)
-    o["take_profit"] = o.get("take_profit") or (price + tpm * atr if price else None)
+    sl, tp = stop_levels(o.get("side", "buy"), price, atr, sl_mult, tp_mult) if price else (None, None)
+    o["stop_loss"] = o.get("stop_loss") or sl
+    o["take_profit"] = o.get("take_profit") or tp
     return o
@@ -1,30 +1,28 @@
+"""
+Preset indicators for candle frames.
+
+The columns are computed by the NumPy kernels in app/tools/indicators.py,
+mapped to each preset by the feature registry. They follow pandas_ta's
+definitions and column names, so pandas_ta is not needed at runtime (it is
+the optional `ta` extra, used only to validate and benchmark the kernels).
+"""
+
+from __future__ import annotations
+
+from typing import Dict
+
+import numpy as np
 import pandas as pd
 
-try:
-    import pandas_ta as ta
-except Exception:  # fallback minimal TA
-    ta = None
+from app.tools.feature_registry import PRESETS, preset_columns
+
+
+def indicator_arrays(high, low, close, preset: str) -> Dict[str, np.ndarray]:
+    """The preset's indicator columns from raw OHLC arrays (no DataFrame involved)."""
+    return preset_columns(high, low, close, preset)
 
 
 def compute_indicators(df: pd.DataFrame, preset: str) -> pd.DataFrame:
-    out = df.copy()
-    if ta is None:
-        out["ema_fast"] = out["close"].ewm(span=20, adjust=False).mean()
-        out["ema_slow"] = out["close"].ewm(span=50, adjust=False).mean()
-        out["atr"] = (out["high"] - out["low"]).rolling(14).mean()
-        return out
-
-    if preset == "trend_following":
-        out["ema_fast"] = ta.ema(out["close"], length=20)
-        out["ema_slow"] = ta.ema(out["close"], length=50)
-        out["atr"] = ta.atr(out["high"], out["low"], out["close"], length=14)
-    elif preset == "mean_reversion":
-        bb = ta.bbands(out["close"], length=20)
-        out = out.join(bb)
-        out["rsi"] = ta.rsi(out["close"], length=14)
-        out["atr"] = ta.atr(out["high"], out["low"], out["close"], length=14)
-    else:  # default
-        out["ema_fast"] = ta.ema(out["close"], length=12)
-        out["ema_slow"] = ta.ema(out["close"], length=26)
-        out["atr"] = ta.atr(out["high"], out["low"], out["close"], length=14)
-    return out
+    """`df` with the preset's indicator columns appended."""
+    cols = indicator_arrays(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), preset)
+    return pd.concat([df, pd.DataFrame(cols, index=df.index)], axis=1)
@@ -0,0 +1,221 @@
+"""
+Tail-only readers for local OHLC history files (data_mock `source: csv`).
+
+Serving the latest `count` bars should not parse years of history:
+
+- CSV: seek backwards from the end of the file in blocks until `count` rows
+  are buffered, then parse just those lines under the header.
+- Parquet: read only the last row groups that hold `count` rows.
+- Arrow (`mock_data.csv_reader: arrow`): on first use the file is converted to an
+  uncompressed Arrow IPC copy under `runs/cache/mock_data/`, written in
+  record batches of `BATCH_ROWS`. Later reads memory-map it and take only the
+  last batches, zero-copy. The copy records the source's mtime and size and
+  is rebuilt when either changes.
+
+Recently served windows are kept in an in-process LRU (`mock_data.window_cache`) keyed
+on (path, mtime, size, count). A file that has not changed is then served
+without I/O.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from app.settings import settings
+
+OHLC_COLUMNS = ["time", "open", "high", "low", "close"]
+BLOCK_BYTES = 1 << 16
+BATCH_ROWS = 1 << 14
+
+
+def empty() -> pd.DataFrame:
+    return pd.DataFrame(columns=OHLC_COLUMNS)
+
+
+def standardize(df: pd.DataFrame, path: Path) -> pd.DataFrame:
+    """Map flexible column casing to OHLC_COLUMNS, parse types and drop unusable rows."""
+    cols = {str(c).lower(): c for c in df.columns}
+    for required in OHLC_COLUMNS:
+        if required not in cols:
+            raise ValueError(f"CSV {path} is missing required column: {required}")
+    out = pd.DataFrame({"time": pd.to_datetime(df[cols["time"]]).dt.as_unit("ns")})  # same unit from every reader
+    for c in OHLC_COLUMNS[1:]:
+        out[c] = pd.to_numeric(df[cols[c]], errors="coerce").astype(float)
+    return out.dropna().reset_index(drop=True)
+
+
+# --- CSV ---
+def _tail_lines(path: Path, rows: int) -> Tuple[bytes, bytes, bool]:
+    """(header line, last `rows` data lines, whether the whole file was read)."""
+    with open(path, "rb") as f:
+        header = f.readline()
+        start = len(header)
+        end = f.seek(0, os.SEEK_END)
+        pos, buf = end, b""
+        # One extra newline: the block may start mid-line, and the last line may end with "\n"
+        while pos > start and buf.count(b"\n") <= rows:
+            step = min(BLOCK_BYTES, pos - start)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    if pos > start:
+        buf = buf[buf.index(b"\n") + 1:]  # drop the partial first line
+    lines = buf.splitlines(keepends=True)
+    return header, b"".join(lines[-rows:]), pos <= start and len(lines) <= rows
+
+
+def read_csv_tail(path: Path, count: int) -> pd.DataFrame:
+    rows = max(1, count)
+    while True:
+        header, body, whole = _tail_lines(path, rows)
+        if not header.strip():
+            return empty()
+        df = standardize(pd.read_csv(io.BytesIO(header + body)), path)
+        # Rows dropped as unusable leave the window short: read further back
+        if len(df) >= count or whole:
+            return df.tail(count).reset_index(drop=True)
+        rows *= 2
+
+
+# --- Parquet ---
+def read_parquet_tail(path: Path, count: int) -> pd.DataFrame:
+    pf = pq.ParquetFile(path)
+    groups, rows = [], 0
+    for i in range(pf.num_row_groups - 1, -1, -1):
+        if rows >= count:
+            break
+        groups.insert(0, i)
+        rows += pf.metadata.row_group(i).num_rows
+    if not groups:
+        return empty()
+    df = pf.read_row_groups(groups).to_pandas()
+    return standardize(df, path).tail(count).reset_index(drop=True)
+
+
+# --- Arrow copy ---
+def _signature(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+class ArrowCopies:
+    """Memory-mapped Arrow IPC copies of history files, rebuilt when the source changes."""
+
+    def __init__(self, root: Path | None = None):
+        self.root = Path(root) if root else Path(settings.persistence.get("path", "runs/")) / "cache" / "mock_data"
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def path_for(self, source: Path) -> Path:
+        digest = hashlib.md5(str(source.resolve()).encode()).hexdigest()[:8]
+        return self.root / f"{source.stem}-{digest}.arrow"
+
+    def read_tail(self, source: Path, count: int) -> pd.DataFrame:
+        copy = self.ensure(source)
+        with pa.memory_map(str(copy)) as mm:
+            reader = pa.ipc.open_file(mm)
+            batches, rows = [], 0
+            for i in range(reader.num_record_batches - 1, -1, -1):
+                if rows >= count:
+                    break
+                batch = reader.get_batch(i)
+                batches.insert(0, batch)
+                rows += batch.num_rows
+            table = pa.Table.from_batches(batches, schema=reader.schema)
+            df = table.to_pandas()
+        return df.tail(count).reset_index(drop=True)
+
+    def ensure(self, source: Path) -> Path:
+        copy = self.path_for(source)
+        mtime, size = _signature(source)
+        with self._lock:
+            if self._current(copy, mtime, size):
+                return copy
+            df = read_history(source)
+            table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(
+                {"source_mtime_ns": str(mtime), "source_size": str(size)}
+            )
+            copy.parent.mkdir(parents=True, exist_ok=True)
+            tmp = copy.with_suffix(f".{os.getpid()}.tmp")
+            with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                for batch in table.to_batches(max_chunksize=BATCH_ROWS):
+                    writer.write_batch(batch)
+            os.replace(tmp, copy)
+            self.builds += 1
+            return copy
+
+    @staticmethod
+    def _current(copy: Path, mtime: int, size: int) -> bool:
+        try:
+            with pa.memory_map(str(copy)) as mm:
+                meta = pa.ipc.open_file(mm).schema.metadata or {}
+        except (OSError, pa.ArrowInvalid):
+            return False
+        return meta.get(b"source_mtime_ns") == str(mtime).encode() and meta.get(b"source_size") == str(size).encode()
+
+
+def read_history(path: Path) -> pd.DataFrame:
+    """The whole file, standardized (what the Arrow copy is built from)."""
+    if path.suffix == ".parquet":
+        return standardize(pq.read_table(path).to_pandas(), path)
+    return standardize(pacsv.read_csv(path).to_pandas(), path)
+
+
+# --- Reader ---
+class TailReader:
+    """The latest `count` rows of a history file, with an LRU of recently served windows."""
+
+    def __init__(self, max_windows: int | None = None, copies: ArrowCopies | None = None):
+        self.max_windows = max_windows
+        self.copies = copies or ArrowCopies()
+        self._windows: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.reads = 0
+
+    def read(self, path: Path, count: int, mode: str = "tail") -> pd.DataFrame:
+        path = Path(path)
+        if not path.is_file():
+            return empty()
+        key = (str(path), *_signature(path), count, mode)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None:
+                self._windows.move_to_end(key)
+                self.hits += 1
+                return window.copy()
+        if mode == "arrow":
+            window = self.copies.read_tail(path, count)
+        elif path.suffix == ".parquet":
+            window = read_parquet_tail(path, count)
+        else:
+            window = read_csv_tail(path, count)
+        with self._lock:
+            self.reads += 1
+            self._windows[key] = window
+            limit = self.max_windows if self.max_windows is not None else int((settings.mock_data or {}).get("window_cache", 16))
+            while len(self._windows) > limit:
+                self._windows.popitem(last=False)
+        return window.copy()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
+
+    def stats(self) -> dict:
+        return {"windows": len(self._windows), "hits": self.hits, "reads": self.reads, "arrow_builds": self.copies.builds}
+
+
+# Process-wide reader
+tail_reader = TailReader()
@@ -0,0 +1,318 @@
+"""
+Columnar trace storage — Parquet sink and query API for run history.
+
+Events are written as Parquet files under a hive-partitioned layout:
+
+    <telemetry.local.path>/parquet/date=YYYY-MM-DD/decision_key=EUR_USD_M5/part-*.parquet
+
+Rows are buffered per partition, and a partition's file (a single row group)
+is written once it holds `row_group_size` rows or about `roll_bytes` of
+payload, or once its oldest row is `flush_interval_ms` old. A run every few
+minutes then adds rows to the current file instead of creating one per
+flush.
+
+Queries go through `pyarrow.dataset`, so date/decision-key filters prune
+whole directories and column filters are pushed down to the row groups
+instead of parsing text logs.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+UNKNOWN_KEY = "unknown"
+
+# Columns stored in every file; `date` and `decision_key` live in the directory names
+TRACE_SCHEMA = pa.schema([
+    ("ts", pa.timestamp("us", tz="UTC")),
+    ("run_id", pa.string()),
+    ("thread_id", pa.string()),
+    ("assistant_id", pa.string()),
+    ("event_type", pa.string()),
+    ("node", pa.string()),
+    ("status", pa.string()),
+    ("error_type", pa.string()),
+    ("error_message", pa.string()),
+    ("latency_ms", pa.float64()),
+    ("attempt", pa.int64()),
+    ("prompt_id", pa.string()),
+    ("prompt_version", pa.string()),
+    ("llm_provider", pa.string()),
+    ("llm_model", pa.string()),
+    ("instrument", pa.string()),
+    ("timeframe", pa.string()),
+    ("features_digest", pa.string()),
+    ("cache_path", pa.string()),
+    ("result", pa.string()),
+    ("payload", pa.large_string()),
+])
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("date", pa.string()), ("decision_key", pa.string())]), flavor="hive"
+)
+
+_DATASET_SCHEMA = pa.schema(list(TRACE_SCHEMA) + [("date", pa.string()), ("decision_key", pa.string())])
+
+_STRING_FIELDS = [f.name for f in TRACE_SCHEMA if pa.types.is_string(f.type)]
+
+
+def _parse_ts(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        ts = value
+    else:
+        try:
+            ts = datetime.fromisoformat(str(value))
+        except ValueError:
+            ts = datetime.now(timezone.utc)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _last_message_content(output: Any) -> Optional[str]:
+    """Content of the last message in a sanitized node output, if any."""
+    if not isinstance(output, dict):
+        return None
+    messages = output.get("messages") or []
+    if not messages or not isinstance(messages[-1], dict):
+        return None
+    last = messages[-1]
+    content = last.get("data", last).get("content")
+    return str(content)[:1000] if content is not None else None
+
+
+def event_to_row(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a sanitized trace event into a TRACE_SCHEMA row (plus partition keys)."""
+    ts = _parse_ts(event.get("ts_iso"))
+    row: Dict[str, Any] = {name: None for name in TRACE_SCHEMA.names}
+    for name in _STRING_FIELDS:
+        value = event.get(name)
+        row[name] = None if value is None or value == "" else str(value)
+
+    latency = event.get("latency_ms")
+    row["latency_ms"] = float(latency) if isinstance(latency, (int, float)) else None
+    attempt = event.get("attempt", event.get("attempts"))
+    row["attempt"] = int(attempt) if isinstance(attempt, int) else None
+    row["ts"] = ts
+    row["result"] = _last_message_content(event.get("output"))
+    row["payload"] = json.dumps(event, default=str)
+
+    row["_date"] = ts.strftime("%Y-%m-%d")
+    row["_decision_key"] = str(event.get("decision_key") or UNKNOWN_KEY)
+    return row
+
+
+class _Partition:
+    __slots__ = ("rows", "bytes", "first_buffered")
+
+    def __init__(self) -> None:
+        self.rows: List[Dict[str, Any]] = []
+        self.bytes = 0
+        self.first_buffered = time.monotonic()
+
+
+class ParquetTraceSink:
+    """
+    Buffers trace rows per partition and writes each partition's rows as one Parquet file.
+
+    `root` is resolved on every write so callers can repoint the trace directory.
+    A partition is written once it holds `row_group_size` rows or `roll_bytes`
+    of payload, once its oldest row is older than `flush_interval_ms`, or on an
+    explicit `flush()`. Age is checked on every write and by `flush_due()`, which
+    the background trace writer calls when idle; with the sync writer, a
+    partition that has come of age waits for the next event or `flush()`.
+    """
+
+    def __init__(self, root: Callable[[], Path], row_group_size: int = 512, flush_interval_ms: int = 900_000,
+                 roll_bytes: int = 8 << 20):
+        self._root = root
+        self.row_group_size = max(1, row_group_size)
+        self.flush_interval = max(0, flush_interval_ms) / 1000.0
+        self.roll_bytes = max(1, roll_bytes)
+        self._partitions: Dict[tuple, _Partition] = {}
+        self._lock = threading.Lock()
+        self.files_written = 0
+
+    def append(self, event: Dict[str, Any]) -> None:
+        self.write([event])
+
+    def write(self, events: Iterable[Dict[str, Any]]) -> None:
+        """Buffer a batch of events, writing the partitions that are due (used by the background writer)."""
+        rows = [event_to_row(e) for e in events]
+        with self._lock:
+            for row in rows:
+                key = (row["_date"], row["_decision_key"])
+                part = self._partitions.get(key)
+                if part is None:
+                    part = self._partitions[key] = _Partition()
+                part.rows.append(row)
+                part.bytes += len(row["payload"])
+        self.flush_due()
+
+    def flush_due(self) -> None:
+        """Write the partitions that are full or whose oldest row has reached `flush_interval_ms`."""
+        with self._lock:
+            due = self._take(self._due(time.monotonic()))
+        if due:
+            self._write_partitions(due)
+
+    def flush(self) -> None:
+        with self._lock:
+            due = self._take(list(self._partitions))
+        if due:
+            self._write_partitions(due)
+
+    def buffered_rows(self) -> int:
+        with self._lock:
+            return sum(len(p.rows) for p in self._partitions.values())
+
+    def _due(self, now: float) -> List[tuple]:
+        return [
+            key for key, part in self._partitions.items()
+            if len(part.rows) >= self.row_group_size or part.bytes >= self.roll_bytes
+            or now - part.first_buffered >= self.flush_interval
+        ]
+
+    def _take(self, keys: List[tuple]) -> Dict[tuple, List[Dict[str, Any]]]:
+        return {key: self._partitions.pop(key).rows for key in keys}
+
+    def _write_partitions(self, partitions: Dict[tuple, List[Dict[str, Any]]]) -> None:
+        root = Path(self._root())
+        for (day, key), part_rows in partitions.items():
+            part_dir = root / f"date={day}" / f"decision_key={key}"
+            part_dir.mkdir(parents=True, exist_ok=True)
+            table = pa.Table.from_pylist(
+                [{name: r[name] for name in TRACE_SCHEMA.names} for r in part_rows], schema=TRACE_SCHEMA
+            )
+            name = f"part-{datetime.now(timezone.utc).strftime('%H%M%S%f')}-{uuid.uuid4().hex[:8]}.parquet"
+            tmp_path = part_dir / f".{name}.tmp"
+            pq.write_table(table, tmp_path, compression="zstd")
+            tmp_path.replace(part_dir / name)
+            self.files_written += 1
+
+
+class TraceStore:
+    """Read-side query API over the partitioned Parquet traces."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def dataset(self) -> ds.Dataset | None:
+        if not self.root.exists():
+            return None
+        return ds.dataset(
+            self.root, format="parquet", partitioning=PARTITIONING, schema=_DATASET_SCHEMA,
+            exclude_invalid_files=False, ignore_prefixes=[".", "_"],
+        )
+
+    @staticmethod
+    def _time_filter(start: datetime | None, end: datetime | None) -> ds.Expression | None:
+        expr = None
+        if start is not None:
+            start = _parse_ts(start)
+            expr = (pc.field("date") >= start.strftime("%Y-%m-%d")) & (pc.field("ts") >= pa.scalar(start, pa.timestamp("us", tz="UTC")))
+        if end is not None:
+            end = _parse_ts(end)
+            end_expr = (pc.field("date") <= end.strftime("%Y-%m-%d")) & (pc.field("ts") < pa.scalar(end, pa.timestamp("us", tz="UTC")))
+            expr = end_expr if expr is None else expr & end_expr
+        return expr
+
+    def _read(self, columns: List[str], *filters: ds.Expression | None) -> pa.Table:
+        dataset = self.dataset()
+        if dataset is None:
+            return _DATASET_SCHEMA.empty_table().select(columns)
+        expr = None
+        for f in filters:
+            if f is not None:
+                expr = f if expr is None else expr & f
+        return dataset.to_table(columns=columns, filter=expr)
+
+    def latest_runs(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        decision_keys: Optional[List[str]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Latest run per decision key, with the last output/error of each node.
+        Returns {decision_key: {"run_id", "ts", "prompt_id", "prompt_version", "nodes": {node: result}}}.
+        """
+        key_filter = pc.field("decision_key").isin(decision_keys) if decision_keys else None
+        runs = self._read(
+            ["decision_key", "run_id", "ts"],
+            self._time_filter(start, end), key_filter, pc.field("run_id").is_valid(),
+        )
+        if runs.num_rows == 0:
+            return {}
+
+        last = runs.group_by(["decision_key", "run_id"]).aggregate([("ts", "max")]).to_pylist()
+        latest: Dict[str, Dict[str, Any]] = {}
+        for r in last:
+            current = latest.get(r["decision_key"])
+            if current is None or r["ts_max"] > current["ts"]:
+                latest[r["decision_key"]] = {"run_id": r["run_id"], "ts": r["ts_max"], "nodes": {}}
+
+        run_ids = [r["run_id"] for r in latest.values()]
+        events = self._read(
+            ["decision_key", "run_id", "ts", "event_type", "node", "status", "error_type", "result", "prompt_id", "prompt_version"],
+            self._time_filter(start, end), pc.field("run_id").isin(run_ids),
+        ).sort_by("ts").to_pylist()
+
+        for ev in events:
+            run = latest.get(ev["decision_key"])
+            if run is None or run["run_id"] != ev["run_id"] or not ev["node"]:
+                continue
+            if ev["node"] in ("strategy", "decide") and ev["event_type"] == "node_enter":
+                run["prompt_id"], run["prompt_version"] = ev["prompt_id"], ev["prompt_version"]
+            if ev["event_type"] == "node_exit":
+                run["nodes"][ev["node"]] = f"ERROR: {ev['error_type']}" if ev["status"] == "error" else ev["result"]
+        return latest
+
+    def node_latency_percentiles(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        percentiles: Iterable[float] = (50, 90, 99),
+    ) -> Dict[str, Dict[str, float]]:
+        """Latency percentiles (ms) of successful node exits, per node."""
+        table = self._read(
+            ["node", "latency_ms"],
+            self._time_filter(start, end),
+            (pc.field("event_type") == "node_exit") & (pc.field("status") == "ok") & pc.field("latency_ms").is_valid(),
+        )
+        if table.num_rows == 0:
+            return {}
+        qs = [p / 100.0 for p in percentiles]
+        out: Dict[str, Dict[str, float]] = {}
+        for node in pc.unique(table["node"]).to_pylist():
+            lat = table.filter(pc.equal(table["node"], node))["latency_ms"]
+            values = pc.quantile(lat, q=qs, interpolation="linear").to_pylist()
+            out[node] = {f"p{p:g}": v for p, v in zip(percentiles, values)}
+            out[node]["count"] = len(lat)
+        return out
+
+    def error_counts(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        by: str = "node",
+    ) -> Dict[str, int]:
+        """Count of error events (failed node exits and tool errors) grouped by `by`."""
+        table = self._read(
+            [by],
+            self._time_filter(start, end),
+            (pc.field("status") == "error") | (pc.field("event_type") == "error"),
+        )
+        if table.num_rows == 0:
+            return {}
+        counts = table.group_by(by).aggregate([(by, "count")]).to_pylist()
+        return {str(r[by]): r[f"{by}_count"] for r in counts}
@@ -0,0 +1,89 @@
+"""
+Benchmark: trader graph runs per second, sync vs async.
+
+Runs the full graph (mock candles, paper broker) against a local fake LLM
+server (scripts/fake_openai_server.py) with a fixed per-call latency:
+
+- sync:  `graph.invoke` per decision key, one after another (one worker thread)
+- async: `graph.ainvoke` for all decision keys concurrently on one event loop
+
+    python scripts/bench_async_graph.py [--keys 32] [--latency-ms 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from langchain_core.messages import HumanMessage
+
+from app.graph import build_trader_graph
+from app.llm import invalidate_llm_cache
+from app.settings import settings
+from app.telemetry import tracer
+from app.tools.broker_paper import PaperBroker
+from scripts.fake_openai_server import start
+
+INSTRUMENTS = ["EUR_USD", "GBP_USD", "USD_JPY", "AUD_USD", "USD_CAD", "USD_CHF", "NZD_USD", "EUR_GBP"]
+TIMEFRAMES = ["M1", "M5", "M15", "H1"]
+
+
+def _inputs(n: int) -> list:
+    keys = [(i, t) for t in TIMEFRAMES for i in INSTRUMENTS]
+    return [{"messages": [HumanMessage(content=f"CandleCloseEvent {i} {t}")]} for i, t in (keys * (n // len(keys) + 1))[:n]]
+
+
+def run_sync(app, inputs: list) -> float:
+    start = time.perf_counter()
+    for state in inputs:
+        app.invoke(state)
+    return time.perf_counter() - start
+
+
+async def run_async(app, inputs: list) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(app.ainvoke(state) for state in inputs))
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark sync vs async trader graph runs.")
+    ap.add_argument("--keys", type=int, default=32, help="decision keys (graph runs) per mode")
+    ap.add_argument("--latency-ms", type=float, default=50.0, help="fake LLM latency per call")
+    args = ap.parse_args()
+
+    server, base_url = start(args.latency_ms)
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.llm.base_url = base_url
+        settings.data.provider = "mock"
+        settings.data.cache_format = "none"
+        settings.broker_provider = "paper"
+        # Every run must reach the LLM: no decision or response caching
+        settings.decision_cache.enabled = False
+        settings.llm_cache.backend = "none"
+        settings.paper = {**(settings.paper or {}), "ledger_path": str(Path(tmp) / "ledger.json")}
+        PaperBroker._instance = None
+        tracer.provider = "none"
+        invalidate_llm_cache()
+
+        app = build_trader_graph(config={}).compile()
+        inputs = _inputs(args.keys)
+        app.invoke(inputs[0])  # warm up imports, candle store and connections
+
+        sync_s = run_sync(app, inputs)
+        async_s = asyncio.run(run_async(app, inputs))
+        PaperBroker().close()
+    server.shutdown()
+
+    print(f"--- Trader graph: {args.keys} decision keys, fake LLM at {args.latency_ms:g} ms/call ---")
+    print(f"{'mode':>6} {'total s':>9} {'runs/s':>9}")
+    print(f"{'sync':>6} {sync_s:>9.2f} {args.keys / sync_s:>9.1f}")
+    print(f"{'async':>6} {async_s:>9.2f} {args.keys / async_s:>9.1f}")
+    print(f"speedup: {sync_s / async_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: event engine tick throughput.
+
+Feeds synthetic random-walk ticks for several instruments through
+`EventEngine.on_tick` (rolling ATR + spike check), then through the full
+replay path (OANDA pricing-stream JSON lines parsed from a file).
+
+    python scripts/bench_event_engine.py [--ticks 200000] [--instruments 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from app.event_engine import EventEngine, replay_feed
+from app.events import EventBus
+from app.settings import PriceStreamSettings
+from app.telemetry import tracer
+
+INSTRUMENTS = ["EUR_USD", "GBP_USD", "USD_JPY", "AUD_USD", "USD_CAD", "USD_CHF", "NZD_USD", "EUR_GBP"]
+
+
+def _ticks(n: int, instruments: int):
+    rng = np.random.default_rng(7)
+    start = datetime(2026, 10, 14, 8, tzinfo=timezone.utc).timestamp()
+    times = start + np.cumsum(rng.exponential(0.01, n))  # ~100 ticks/s overall
+    prices = 1.1 + np.cumsum(rng.normal(0, 2e-5, n))
+    names = [INSTRUMENTS[i % len(INSTRUMENTS)] for i in range(instruments)]
+    return [(names[i % instruments], float(t), float(p)) for i, (t, p) in enumerate(zip(times, prices))]
+
+
+def _oanda_line(instrument: str, ts: float, price: float) -> str:
+    iso = datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f") + "000Z"
+    return json.dumps({"type": "PRICE", "instrument": instrument, "time": iso,
+                       "bids": [{"price": f"{price - 5e-5:.5f}"}], "asks": [{"price": f"{price + 5e-5:.5f}"}]})
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark event engine tick throughput.")
+    ap.add_argument("--ticks", type=int, default=200_000)
+    ap.add_argument("--instruments", type=int, default=4)
+    args = ap.parse_args()
+    tracer.provider = "none"
+    cfg = PriceStreamSettings(enabled=True, spike_threshold_atr=3.0, cooldown_seconds=60)
+    ticks = _ticks(args.ticks, args.instruments)
+
+    engine = EventEngine(event_bus=EventBus(), cfg=cfg)
+    start = time.perf_counter()
+    for tick in ticks:
+        engine.on_tick(*tick)
+    direct_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "ticks.jsonl"
+        path.write_text("\n".join(_oanda_line(*t) for t in ticks) + "\n")
+        replay = EventEngine(event_bus=EventBus(), cfg=cfg)
+        start = time.perf_counter()
+        asyncio.run(replay.consume(replay_feed(str(path))))
+        replay_s = time.perf_counter() - start
+
+    print(f"--- Event engine: {args.ticks} ticks over {args.instruments} instruments, {engine.spikes} spikes ---")
+    print(f"{'path':>16} {'total s':>9} {'ticks/s':>12} {'us/tick':>9}")
+    print(f"{'on_tick':>16} {direct_s:>9.2f} {args.ticks / direct_s:>12,.0f} {direct_s / args.ticks * 1e6:>9.2f}")
+    print(f"{'replay (parse)':>16} {replay_s:>9.2f} {args.ticks / replay_s:>12,.0f} {replay_s / args.ticks * 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: feature summaries for many decision keys, per key vs batched.
+
+- per key: what each `get_candles` call did before the feature engine. It
+  reads the bars from the candle store, runs `compute_indicators` on a
+  DataFrame copy, and summarizes the frame.
+- batched: `feature_engine.precompute` reads the same bars, stacks them into
+  (N, T) NumPy panels and computes the indicators for all keys in one pass.
+
+Both read bars from a warm in-memory candle store (mock provider), so the
+timings cover indicator work and summarizing.
+
+    python scripts/bench_feature_engine.py [--sizes 10 50 200] [--bars 200] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from app.settings import settings
+from app.telemetry import tracer
+from app.tools import data_mock
+from app.tools.feature_engine import feature_engine
+from app.tools.features import summarize
+from app.tools.ta_tool import compute_indicators
+
+
+def per_key(keys: list, bars: int) -> None:
+    for instrument, granularity in keys:
+        df, path = data_mock.frame(instrument, granularity, bars)
+        summarize(compute_indicators(df, preset="trend_following"), instrument, granularity, path)
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark per-key vs batched feature summaries.")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="instruments per batch")
+    ap.add_argument("--bars", type=int, default=200, help="bars per summary")
+    ap.add_argument("--repeat", type=int, default=5, help="best of N timings")
+    args = ap.parse_args()
+
+    settings.data.provider = "mock"
+    settings.data.cache_format = "none"
+    settings.feature_engine.publish_to_disk = False
+    tracer.provider = "none"
+
+    print(f"--- Feature summaries: {args.bars} bars per key, M5, best of {args.repeat} ---")
+    print(f"{'keys':>6} {'per key ms':>11} {'batched ms':>11} {'speedup':>8}")
+    for n in args.sizes:
+        keys = [(f"X{i:03d}_USD", "M5") for i in range(n)]
+        per_key(keys, args.bars)  # warm the candle store
+        per_key_s = best_of(lambda: per_key(keys, args.bars), args.repeat)
+        batched_s = best_of(lambda: asyncio.run(feature_engine.precompute(keys, count=args.bars)), args.repeat)
+        print(f"{n:>6} {per_key_s * 1000:>11.1f} {batched_s * 1000:>11.1f} {per_key_s / batched_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
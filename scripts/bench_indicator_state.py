@@ -0,0 +1,57 @@
+"""
+Benchmark: indicators for one new bar, window recompute vs streaming state.
+
+- recompute: `compute_indicators` over the last `--bars` bars, as each
+  `get_candles` call did for its summary.
+- streaming: `IndicatorStates.advance` by the one new bar (O(1)).
+
+    python scripts/bench_indicator_state.py [--bars 500] [--steps 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.settings import settings
+from app.tools.feature_registry import columns_for
+from app.tools.indicator_state import IndicatorStates, bar_times
+from app.tools.ta_tool import compute_indicators
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark window recompute vs streaming indicator state per new bar.")
+    ap.add_argument("--bars", type=int, default=500, help="window recomputed per bar")
+    ap.add_argument("--steps", type=int, default=2000, help="new bars to process")
+    args = ap.parse_args()
+    settings.indicator_state.persist = False
+
+    n = args.bars + args.steps
+    rng = np.random.default_rng(0)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.001, n))
+    df = pd.DataFrame({"time": pd.date_range("2026-01-05", periods=n, freq="5min", tz="UTC"), "open": close,
+                       "high": close + rng.random(n) * 0.001, "low": close - rng.random(n) * 0.001, "close": close})
+    times, high, low = bar_times(df), df["high"].to_numpy(), df["low"].to_numpy()
+
+    start = time.perf_counter()
+    for t in range(args.bars, n):
+        compute_indicators(df.iloc[t - args.bars + 1:t + 1], preset="trend_following")
+    recompute = (time.perf_counter() - start) / args.steps
+
+    states, columns = IndicatorStates(), columns_for(["trend_following"])
+    states.advance("bench", "X", "M5", times[:args.bars], high, low, close, columns)
+    start = time.perf_counter()
+    for t in range(args.bars, n):
+        states.advance("bench", "X", "M5", times[t:t + 1], high[t:t + 1], low[t:t + 1], close[t:t + 1], columns)
+    streaming = (time.perf_counter() - start) / args.steps
+
+    print(f"--- One new bar, trend_following, {args.bars}-bar window, {args.steps} steps ---")
+    print(f"recompute  {recompute * 1e6:>9.1f} us/bar")
+    print(f"streaming  {streaming * 1e6:>9.1f} us/bar  ({recompute / streaming:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: preset indicators with the NumPy kernels vs pandas_ta.
+
+For each preset and input size it times:
+- numpy: `ta_tool.indicator_arrays` on raw OHLC arrays (app/tools/indicators.py)
+- frame: `ta_tool.compute_indicators` (the same kernels, plus the DataFrame)
+- pandas: the pandas_ta definitions written with pandas ewm/rolling, as a
+  stand-in when pandas_ta is not installed
+- pandas_ta: the library itself (`pip install -e .[ta]`), when importable
+
+    python scripts/bench_indicators.py [--sizes 500 1000000] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.tools.ta_tool import PRESETS, compute_indicators, indicator_arrays
+
+
+def pandas_reference(df: pd.DataFrame, preset: str) -> dict:
+    c, h, l = df["close"], df["high"], df["low"]
+
+    def ema(n):
+        seeded = c.copy()
+        seeded.iloc[:n - 1] = np.nan
+        seeded.iloc[n - 1] = c.iloc[:n].mean()
+        return seeded.ewm(span=n, adjust=False).mean()
+
+    prev = c.shift(1)
+    tr = pd.concat([h - l, (h - prev).abs(), (l - prev).abs()], axis=1).max(axis=1)
+    out = {"atr": tr.ewm(alpha=1 / 14, min_periods=14).mean()}
+    if preset == "mean_reversion":
+        mid, std = c.rolling(20).mean(), c.rolling(20).std(ddof=0)
+        diff = c.diff()
+        gains = diff.clip(lower=0).ewm(alpha=1 / 14, min_periods=14).mean()
+        losses = (-diff.clip(upper=0)).ewm(alpha=1 / 14, min_periods=14).mean()
+        out.update({"BBL": mid - 2 * std, "BBM": mid, "BBU": mid + 2 * std, "rsi": 100 * gains / (gains + losses)})
+    else:
+        fast, slow = (20, 50) if preset == "trend_following" else (12, 26)
+        out.update({"ema_fast": ema(fast), "ema_slow": ema(slow)})
+        if preset == "breakout":
+            out.update({"DCL": l.rolling(20).min(), "DCU": h.rolling(20).max()})
+    return out
+
+
+def pandas_ta_columns(ta, df: pd.DataFrame, preset: str) -> dict:
+    c, h, l = df["close"], df["high"], df["low"]
+    out = {"atr": ta.atr(h, l, c, length=14)}
+    if preset == "mean_reversion":
+        out["bbands"] = ta.bbands(c, length=20)
+        out["rsi"] = ta.rsi(c, length=14)
+    else:
+        fast, slow = (20, 50) if preset == "trend_following" else (12, 26)
+        out.update({"ema_fast": ta.ema(c, length=fast), "ema_slow": ta.ema(c, length=slow)})
+        if preset == "breakout":
+            out["donchian"] = ta.donchian(h, l, lower_length=20, upper_length=20)
+    return out
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the NumPy indicator kernels against pandas_ta.")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[500, 1_000_000], help="bars per input")
+    ap.add_argument("--repeat", type=int, default=5, help="best of N timings")
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    try:
+        ta = importlib.import_module("pandas_ta")
+        print(f"pandas_ta import: {(time.perf_counter() - start) * 1000:.0f} ms")
+    except Exception:
+        ta = None
+        print("pandas_ta not installed (pip install -e .[ta]); its column shows '-'")
+
+    print(f"{'preset':>16} {'bars':>9} {'numpy ms':>10} {'frame ms':>10} {'pandas ms':>10} {'pandas_ta ms':>13}")
+    for n in args.sizes:
+        rng = np.random.default_rng(0)
+        close = 1.1 + np.cumsum(rng.normal(0, 0.001, n))
+        high, low = close + rng.random(n) * 0.001, close - rng.random(n) * 0.001
+        df = pd.DataFrame({"open": close, "high": high, "low": low, "close": close})
+        repeat = args.repeat if n <= 100_000 else max(1, args.repeat // 2)
+        for preset in PRESETS:
+            numpy_s = best_of(lambda: indicator_arrays(high, low, close, preset), repeat)
+            frame_s = best_of(lambda: compute_indicators(df, preset), repeat)
+            pandas_s = best_of(lambda: pandas_reference(df, preset), repeat)
+            ta_col = f"{best_of(lambda: pandas_ta_columns(ta, df, preset), repeat) * 1000:>13.2f}" if ta else f"{'-':>13}"
+            print(f"{preset:>16} {n:>9} {numpy_s * 1000:>10.2f} {frame_s * 1000:>10.2f} {pandas_s * 1000:>10.2f} {ta_col}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: PaperBroker persistence cost over a stream of orders and bars.
+
+Compares the previous behaviour (a new broker per call that re-parses the
+ledger, and a full `indent=2` rewrite after every mutation) with the current
+process-wide broker (in-memory state, batched-fsync journal, periodic
+checkpoints).
+
+    python scripts/bench_paper_broker.py [--ops 10000] [--rewrite-ops 2000]
+
+The rewrite path is quadratic in the trade history, so by default it only
+runs the first `--rewrite-ops` operations of the same stream.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from datetime import datetime, UTC
+from pathlib import Path
+
+import numpy as np
+
+from app.settings import settings
+from app.tools.broker_paper import PaperBroker
+
+
+def _ops(n: int, seed: int = 7):
+    """Alternating orders and bars on a random walk; SL/TP close enough that trades churn."""
+    rng = np.random.default_rng(seed)
+    price = 1.10
+    for i in range(n):
+        if i % 2 == 0:
+            side = "buy" if rng.random() < 0.5 else "sell"
+            sign = 1 if side == "buy" else -1
+            yield "order", {"instrument": "EUR_USD", "side": side, "units": 1000, "entry_type": "market", "price": None,
+                            "stop_loss": price - sign * 0.0010, "take_profit": price + sign * 0.0015}
+        else:
+            o = price
+            price *= float(np.exp(0.0004 * rng.standard_normal()))
+            yield "bar", ("EUR_USD", o, max(o, price) + 0.0002, min(o, price) - 0.0002, price)
+
+
+def _broker(root: Path, **paper) -> PaperBroker:
+    settings.paper = {**(settings.paper or {}), "ledger_path": str(root / "ledger.json"), **paper}
+    PaperBroker._instance = None
+    brk = PaperBroker()
+    brk.reset()
+    return brk
+
+
+def run_rewrite(root: Path, n: int) -> float:
+    """Previous behaviour: parse the ledger per call, rewrite it in full per mutation."""
+    brk = _broker(root)
+    start = time.perf_counter()
+    for kind, args in _ops(n):
+        brk._load(brk.initial_cash)  # `PaperBroker()` re-read the ledger on every tool call
+        if kind == "order":
+            brk._apply({"op": "order", "order": {
+                "id": f"PAPER-{brk._next_trade_id + len(brk._state.open_orders)}",
+                "instrument": args["instrument"], "side": args["side"], "units": args["units"] * (1 if args["side"] == "buy" else -1),
+                "entry_type": "market", "price": None, "stop_loss": args["stop_loss"], "take_profit": args["take_profit"],
+                "status": "pending", "ts": datetime.now(UTC).isoformat()}})
+        else:
+            instrument, o, h, l, c = args
+            brk._apply({"op": "bar", "instrument": instrument, "ohlc": [o, h, l, c], "ts": datetime.now(UTC).isoformat()})
+        brk.ledger_path.write_text(json.dumps(brk.snapshot(), indent=2))
+    return time.perf_counter() - start
+
+
+def run_journal(root: Path, n: int) -> float:
+    brk = _broker(root)
+    start = time.perf_counter()
+    for kind, args in _ops(n):
+        if kind == "order":
+            PaperBroker().place_order(args)
+        else:
+            PaperBroker().on_bar(*args)
+    brk.close()
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark PaperBroker persistence.")
+    ap.add_argument("--ops", type=int, default=10_000, help="orders + bars to process")
+    ap.add_argument("--rewrite-ops", type=int, default=2_000, help="ops to run through the (slow) rewrite path")
+    args = ap.parse_args()
+    rewrite_ops = min(args.ops, args.rewrite_ops)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal_small = run_journal(Path(tmp) / "journal-small", rewrite_ops)
+        rewrite_s = run_rewrite(Path(tmp) / "rewrite", rewrite_ops)
+        journal_s = run_journal(Path(tmp) / "journal", args.ops)
+        history = len(PaperBroker().snapshot()["history"])
+
+    print(f"--- PaperBroker persistence ({history} trades kept in the ledger after {args.ops} ops) ---")
+    print(f"{'mode':>10} {'ops':>7} {'total s':>9} {'us/op':>9}")
+    print(f"{'rewrite':>10} {rewrite_ops:>7} {rewrite_s:>9.2f} {rewrite_s / rewrite_ops * 1e6:>9.0f}")
+    print(f"{'journal':>10} {rewrite_ops:>7} {journal_small:>9.2f} {journal_small / rewrite_ops * 1e6:>9.0f}")
+    print(f"{'journal':>10} {args.ops:>7} {journal_s:>9.2f} {journal_s / args.ops * 1e6:>9.0f}")
+    print(f"speedup at {rewrite_ops} ops: {rewrite_s / journal_small:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: replaying a long OHLC series through the PaperBroker.
+
+Compares `on_bar` per bar (journaled, as a live feed drives it) with
+`replay(df)` (event bars only, bulk equity marking, one checkpoint per call).
+Both place the same orders at the start of each day of bars.
+
+    python scripts/bench_paper_replay.py [--bars 105120] [--orders-every 288]
+    python scripts/bench_paper_replay.py --bars 1440 --orders-every 0   # one day of bars, one call
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from app.settings import settings
+from app.tools.broker_paper import PaperBroker
+from app.tools.data_mock import _synthetic
+
+
+def _orders(price: float) -> list:
+    return [
+        {"instrument": "EUR_USD", "side": "buy", "units": 1000, "entry_type": "market", "price": None,
+         "stop_loss": price - 0.004, "take_profit": price + 0.006},
+        {"instrument": "EUR_USD", "side": "sell", "units": 1000, "entry_type": "limit", "price": price + 0.002,
+         "stop_loss": price + 0.005, "take_profit": price - 0.003},
+    ]
+
+
+def _broker(root: Path) -> PaperBroker:
+    settings.paper = {**(settings.paper or {}), "ledger_path": str(root / "ledger.json")}
+    PaperBroker._instance = None
+    brk = PaperBroker()
+    brk.reset()
+    return brk
+
+
+def run(root: Path, df, every: int, vectorized: bool) -> tuple[float, float]:
+    brk = _broker(root)
+    start = time.perf_counter()
+    for s in range(0, len(df), every):
+        seg = df.iloc[s:s + every]
+        for order in _orders(float(seg["open"].iloc[0])):
+            brk.place_order(order)
+        if vectorized:
+            brk.replay("EUR_USD", seg)
+        else:
+            for bar in seg.itertuples():
+                brk.on_bar("EUR_USD", bar.open, bar.high, bar.low, bar.close, ts=bar.time.isoformat())
+    brk.close()
+    return time.perf_counter() - start, brk.snapshot()["equity"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark PaperBroker replay.")
+    ap.add_argument("--bars", type=int, default=365 * 288, help="M5 bars to replay (default: one year)")
+    ap.add_argument("--orders-every", type=int, default=288, help="bars between order batches (0: one batch, one call)")
+    args = ap.parse_args()
+    args.orders_every = args.orders_every if args.orders_every > 0 else args.bars
+
+    df = _synthetic("EUR_USD", args.bars, "M5")
+    with tempfile.TemporaryDirectory() as tmp:
+        per_bar_s, per_bar_eq = run(Path(tmp) / "per-bar", df, args.orders_every, vectorized=False)
+        replay_s, replay_eq = run(Path(tmp) / "replay", df, args.orders_every, vectorized=True)
+
+    print(f"--- PaperBroker: {args.bars} M5 bars, orders every {args.orders_every} bars ---")
+    print(f"{'mode':>8} {'total s':>9} {'us/bar':>9} {'final equity':>14}")
+    print(f"{'on_bar':>8} {per_bar_s:>9.2f} {per_bar_s / args.bars * 1e6:>9.1f} {per_bar_eq:>14.4f}")
+    print(f"{'replay':>8} {replay_s:>9.2f} {replay_s / args.bars * 1e6:>9.1f} {replay_eq:>14.4f}")
+    print(f"speedup: {per_bar_s / replay_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
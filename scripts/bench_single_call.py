@@ -0,0 +1,85 @@
+"""
+Benchmark: decision latency, agents pipeline vs single structured call.
+
+Runs the full graph (mock candles, paper broker) in both topologies against a
+local fake LLM server (scripts/fake_openai_server.py) with a fixed per-call
+latency, one decision at a time:
+
+- agents:      strategy -> signal -> risk -> exec agents (all in "llm" mode)
+- single_call: get_candles, one structured LLM call, deterministic stops/exec
+
+    python scripts/bench_single_call.py [--decisions 20] [--latency-ms 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from langchain_core.messages import HumanMessage
+
+from app.graph import build_trader_graph
+from app.llm import invalidate_llm_cache
+from app.settings import settings
+from app.telemetry import tracer
+from app.tools.broker_paper import PaperBroker
+from scripts.fake_openai_server import served, start
+
+INSTRUMENTS = ["EUR_USD", "GBP_USD", "USD_JPY", "AUD_USD"]
+
+
+def run(app, n: int) -> tuple[list, float]:
+    """Per-decision latencies (ms) and LLM requests per decision."""
+    latencies = []
+    before = served["requests"]
+    for i in range(n):
+        state = {"messages": [HumanMessage(content=f"CandleCloseEvent {INSTRUMENTS[i % len(INSTRUMENTS)]} M5")]}
+        start_time = time.perf_counter()
+        app.invoke(state)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return latencies, (served["requests"] - before) / n
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the agents pipeline vs the single-call topology.")
+    ap.add_argument("--decisions", type=int, default=20, help="graph runs per topology")
+    ap.add_argument("--latency-ms", type=float, default=50.0, help="fake LLM latency per call")
+    args = ap.parse_args()
+
+    server, base_url = start(args.latency_ms)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.llm.base_url = base_url
+        settings.data.provider = "mock"
+        settings.data.cache_format = "none"
+        settings.broker_provider = "paper"
+        # Every run must reach the LLM: no caches, no rules fast path
+        settings.decision_cache.enabled = False
+        settings.llm_cache.backend = "none"
+        settings.policies.modes = {"strategy": "llm", "risk": "llm"}
+        settings.paper = {**(settings.paper or {}), "ledger_path": str(Path(tmp) / "ledger.json")}
+        PaperBroker._instance = None
+        tracer.provider = "none"
+        invalidate_llm_cache()
+
+        for topology in ("agents", "single_call"):
+            app = build_trader_graph(config={}, topology=topology).compile()
+            run(app, 1)  # warm up imports, candle store and connections
+            results[topology] = run(app, args.decisions)
+        PaperBroker().close()
+    server.shutdown()
+
+    print(f"--- Decision latency: {args.decisions} decisions per topology, fake LLM at {args.latency_ms:g} ms/call ---")
+    print(f"{'topology':>12} {'LLM calls':>10} {'p50 ms':>9} {'mean ms':>9} {'max ms':>9}")
+    for topology, (latencies, calls) in results.items():
+        print(f"{topology:>12} {calls:>10.1f} {statistics.median(latencies):>9.1f} "
+              f"{statistics.fmean(latencies):>9.1f} {max(latencies):>9.1f}")
+    speedup = statistics.fmean(results["agents"][0]) / statistics.fmean(results["single_call"][0])
+    print(f"speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
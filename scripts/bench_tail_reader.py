@@ -0,0 +1,84 @@
+"""
+Benchmark: the latest `--count` bars from a long M1 history file.
+
+- full read: `pd.read_csv` of the whole file, then `tail(count)` (what
+  data_mock's csv source did before)
+- csv tail: reverse seek from the end of the CSV
+- parquet tail: the last row groups of a Parquet copy of the same history
+- arrow: the memory-mapped Arrow copy (built once, then read), and a window
+  LRU hit
+
+Peak memory is traced with tracemalloc (pandas/NumPy/Arrow allocations).
+
+    python scripts/bench_tail_reader.py [--rows 1000000] [--count 200] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.tools import tail_reader as tr
+
+
+def measure(fn, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark tail-only reads of long OHLC history files.")
+    ap.add_argument("--rows", type=int, default=1_000_000, help="M1 bars in the history file")
+    ap.add_argument("--count", type=int, default=200, help="bars served")
+    ap.add_argument("--repeat", type=int, default=3, help="best of N timings")
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp())
+    rng = np.random.default_rng(0)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0002, args.rows))
+    df = pd.DataFrame({"time": pd.date_range("2022-01-03", periods=args.rows, freq="1min").strftime("%Y-%m-%d %H:%M:%S"),
+                       "open": close, "high": close + 0.0003, "low": close - 0.0003, "close": close})
+    csv, parquet = tmp / "EUR_USD_M1.csv", tmp / "EUR_USD_M1.parquet"
+    df.to_csv(csv, index=False)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), parquet, row_group_size=64 * 1024)
+    print(f"--- Latest {args.count} of {args.rows:,} M1 bars ({csv.stat().st_size / 1e6:.0f} MB CSV), best of {args.repeat} ---")
+
+    copies = tr.ArrowCopies(root=tmp / "copies")
+    start = time.perf_counter()
+    copies.ensure(csv)
+    build_s = time.perf_counter() - start
+    cached = tr.TailReader(max_windows=4, copies=copies)
+    cached.read(csv, args.count)
+
+    cases = [
+        ("full read", lambda: tr.standardize(pd.read_csv(csv), csv).tail(args.count)),
+        ("csv tail", lambda: tr.read_csv_tail(csv, args.count)),
+        ("parquet tail", lambda: tr.read_parquet_tail(parquet, args.count)),
+        ("arrow mmap", lambda: copies.read_tail(csv, args.count)),
+        ("window LRU hit", lambda: cached.read(csv, args.count)),
+    ]
+    print(f"{'reader':>15} {'ms':>10} {'peak MB':>9}")
+    for name, fn in cases:
+        seconds, peak = measure(fn, args.repeat)
+        print(f"{name:>15} {seconds * 1000:>10.2f} {peak / 1e6:>9.2f}")
+    print(f"(arrow copy built once in {build_s * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
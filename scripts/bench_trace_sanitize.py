@@ -0,0 +1,78 @@
+"""
+Benchmark: cost of preparing one trace event as the thread history grows.
+
+Compares the previous sanitizer (full walk + messages_to_dict for every message,
+then str() of the whole payload for the CSV digests) with the current Tracer
+(memoized message conversion, payload cap and streaming digests).
+
+    python scripts/bench_trace_sanitize.py
+"""
+
+from __future__ import annotations
+
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, BaseMessage, messages_to_dict
+
+from app.telemetry import Tracer
+
+MESSAGE_COUNTS = [10, 100, 1000, 5000]
+EVENTS = 20
+
+
+def _legacy_sanitize(data, redact_keys):
+    if isinstance(data, dict):
+        return {k: "***REDACTED***" if k in redact_keys else _legacy_sanitize(v, redact_keys) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [_legacy_sanitize(item, redact_keys) for item in data]
+    elif isinstance(data, BaseMessage):
+        return messages_to_dict([data])[0]
+    return data
+
+
+def _legacy_event(event, redact_keys):
+    sanitized = _legacy_sanitize(event, redact_keys)
+    return str(sanitized.get("input", {}))[:200], str(sanitized.get("output", {}))[:200]
+
+
+def _history(n: int) -> list:
+    messages = []
+    for i in range(n):
+        if i % 3 == 0:
+            messages.append(HumanMessage(content=f"CandleCloseEvent EUR_USD M5 #{i}"))
+        elif i % 3 == 1:
+            messages.append(AIMessage(content="", id=f"ai-{i}", tool_calls=[{"name": "get_candles", "args": {"instrument": "EUR_USD", "timeframe": "M5"}, "id": f"call-{i}"}]))
+        else:
+            messages.append(ToolMessage(content='{"instrument": "EUR_USD", "indicators": {"ema_fast": 1.1, "atr": 0.0005}}' * 4, name="get_candles", tool_call_id=f"call-{i}", id=f"tool-{i}"))
+    return messages
+
+
+def _time_per_event(fn, events) -> float:
+    start = time.perf_counter()
+    for ev in events:
+        fn(ev)
+    return (time.perf_counter() - start) / len(events) * 1000
+
+
+def main():
+    Tracer._instance = None
+    tracer = Tracer()
+    redact_keys = tracer.redact_keys
+
+    print("--- Trace event preparation cost (ms/event) ---")
+    print(f"{'messages':>9} {'legacy':>10} {'current':>10} {'speedup':>8}")
+    for n in MESSAGE_COUNTS:
+        history = _history(n)
+        events = [{"event_type": "node_exit", "node": "strategy", "input": {"messages": history}, "output": {"messages": history}} for _ in range(EVENTS)]
+
+        legacy_ms = _time_per_event(lambda ev: _legacy_event(ev, redact_keys), events)
+        tracer._sanitize_for_json(events[0])  # warm the message memo, as a running graph would
+        current_ms = _time_per_event(lambda ev: tracer._csv_row(tracer._sanitize_for_json(ev)), events)
+
+        print(f"{n:>9} {legacy_ms:>10.3f} {current_ms:>10.3f} {legacy_ms / current_ms:>7.1f}x")
+
+    print(f"(max_payload_bytes={tracer.max_payload_bytes}, digest_chars={tracer.digest_chars})")
+
+
+if __name__ == "__main__":
+    main()
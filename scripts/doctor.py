@@ -161,6 +161,18 @@ def check_recent_decisions(max_runs: int = 10):
     print("7. Checking recent decisions from local logs ...")
 
     log_dir = ROOT / settings.telemetry.local.path
+    if "parquet" in settings.telemetry.tracing_provider:
+        from datetime import datetime, timedelta, timezone
+        from app.trace_store import TraceStore
+
+        print(f"   - Querying Parquet traces in: {log_dir / 'parquet'}")
+        since = datetime.now(timezone.utc) - timedelta(days=2)
+        latest_runs = TraceStore(log_dir / "parquet").latest_runs(start=since)
+        for run in latest_runs.values():
+            run["ts"] = run["ts"].isoformat()
+        _print_latest_runs(latest_runs, max_runs)
+        return
+
     list_of_files = glob.glob(str(log_dir / "*.jsonl"))
     if not list_of_files:
         print("   ⚪️ No local log files found.")
@@ -205,7 +217,7 @@ def check_recent_decisions(max_runs: int = 10):
                     # Extract structured output if available
                     output_messages = log["output"].get("messages", [])
                     if output_messages and isinstance(output_messages[-1], dict):
-                         content = output_messages[-1].get("content", "")
+                         content = output_messages[-1].get("data", output_messages[-1]).get("content", "")
                          runs[run_id]["nodes"][node_name] = content
         except json.JSONDecodeError:
             continue
@@ -217,6 +229,9 @@ def check_recent_decisions(max_runs: int = 10):
         if key and key not in latest_runs:
             latest_runs[key] = run
 
+    _print_latest_runs(latest_runs, max_runs)
+
+def _print_latest_runs(latest_runs: dict, max_runs: int):
     if not latest_runs:
         print("   ⚪️ No decision runs found in recent logs.")
         return
@@ -0,0 +1,111 @@
+"""
+A local stand-in for an OpenAI-compatible chat completions endpoint.
+
+Answers `POST /v1/chat/completions` after a fixed latency, so graph runs can be
+benchmarked without a model server. When `get_candles` is offered and has not
+been called yet, it asks for it with the instrument/timeframe of the
+"CandleCloseEvent <instrument> <timeframe>" input. Structured-output requests
+(`response_format` json_schema/json_object) get a fixed market-buy
+`DECISION`. Anything else gets a short text answer.
+
+    python scripts/fake_openai_server.py --port 8199 --latency-ms 50
+    LLM_BASE_URL=http://127.0.0.1:8199/v1 ...
+
+`start(latency_ms)` runs it in a background thread and returns (server, base_url).
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ids = itertools.count(1)
+served = {"requests": 0}
+
+DECISION = {
+    "preset": "trend_following", "rationale": "ema_fast is above ema_slow.", "action": "buy",
+    "units": 1000, "entry_type": "market", "price": None, "stop_loss_atr": 1.5, "take_profit_atr": 2.5,
+}
+
+
+def _event_args(messages: list) -> dict:
+    for m in messages:
+        parts = str(m.get("content") or "").split()
+        if m.get("role") == "user" and len(parts) == 3 and parts[0] == "CandleCloseEvent":
+            return {"instrument": parts[1], "timeframe": parts[2], "count": 50}
+    return {"instrument": "EUR_USD", "timeframe": "M5", "count": 50}
+
+
+def completion(body: dict) -> dict:
+    """The response to one chat completion request."""
+    messages = body.get("messages") or []
+    tools = {t.get("function", {}).get("name") for t in body.get("tools") or []}
+    called = any(m.get("role") == "tool" for m in messages)
+
+    n = next(_ids)
+    served["requests"] += 1
+    message: dict = {"role": "assistant", "content": "HOLD: no trade this bar."}
+    finish = "stop"
+    if (body.get("response_format") or {}).get("type") in ("json_schema", "json_object"):
+        message = {"role": "assistant", "content": json.dumps(DECISION)}
+    elif "get_candles" in tools and not called:
+        message = {
+            "role": "assistant", "content": None,
+            "tool_calls": [{
+                "id": f"call_{n}", "type": "function",
+                "function": {"name": "get_candles", "arguments": json.dumps(_event_args(messages))},
+            }],
+        }
+        finish = "tool_calls"
+    return {
+        "id": f"chatcmpl-{n}", "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110},
+    }
+
+
+def make_handler(latency_ms: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like a real server
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(latency_ms / 1000.0)
+            data = json.dumps(completion(body)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start(latency_ms: float = 50.0, port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """Serve in a daemon thread; returns the server and its `/v1` base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency_ms))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server.")
+    ap.add_argument("--port", type=int, default=8199)
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    args = ap.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.latency_ms))
+    print(f"--- Fake LLM on http://127.0.0.1:{args.port}/v1 ({args.latency_ms:g} ms per call) ---")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,14 @@
 from __future__ import annotations
+import asyncio
 import os
-import time
 import yaml
 import sys
-import json
 from pathlib import Path
-from langgraph_sdk import get_sync_client
-from langgraph_sdk.client import LangGraphClient
 
 # --- Configuration ---
-POLL_INTERVAL_SECONDS = 60
 ROOT = Path(__file__).resolve().parents[1]
 THREAD_MAP_FILE = ROOT / "runs" / "threads.json"
 
-class ThreadManager:
-    """Handles creation, storage, and retrieval of thread IDs with verification."""
-    def __init__(self, client: LangGraphClient, file_path: Path):
-        self.client = client
-        self.file_path = file_path
-        self._thread_map = self._load()
-        self._verify_all_threads()
-
-    def _load(self) -> dict:
-        if self.file_path.exists():
-            return json.loads(self.file_path.read_text())
-        return {}
-
-    def _save(self):
-        self.file_path.parent.mkdir(parents=True, exist_ok=True)
-        temp_path = self.file_path.with_suffix(".tmp")
-        temp_path.write_text(json.dumps(self._thread_map, indent=2))
-        os.replace(temp_path, self.file_path)
-
-    def _verify_all_threads(self):
-        """On startup, check if threads are stale. If so, wipe the map."""
-        if not self._thread_map:
-            return
-
-        first_thread_id = next(iter(self._thread_map.values()), None)
-        if not first_thread_id:
-            return
-
-        try:
-            self.client.threads.get(first_thread_id)
-        except Exception:
-            print("Stale thread detected, assuming new server session. Wiping thread map.")
-            self._thread_map = {}
-            self._save()
-
-    def ensure_thread_id(self, instrument: str, timeframe: str) -> str:
-        """Get or create a thread_id, verifying its existence on the server."""
-        key = f"{instrument}_{timeframe}"
-        thread_id = self._thread_map.get(key)
-
-        if thread_id:
-            try:
-                self.client.threads.get(thread_id)
-                print(f"Reusing thread for {key}: {thread_id} (verified)")
-                return thread_id
-            except Exception:
-                print(f"Stale thread ID for {key}: {thread_id}. Recreating...")
-
-        return self._create_new_thread(key, instrument, timeframe)
-
-    def force_recreate(self, instrument: str, timeframe: str) -> str:
-        """Explicitly recreates a thread, bypassing any cached ID."""
-        key = f"{instrument}_{timeframe}"
-        return self._create_new_thread(key, instrument, timeframe)
-
-    def _create_new_thread(self, key: str, instrument: str, timeframe: str) -> str:
-        print(f"Creating new thread for {key}...")
-        thread = self.client.threads.create(metadata={"instrument": instrument, "timeframe": timeframe})
-        thread_id = thread["thread_id"]
-        self._thread_map[key] = thread_id
-        self._save()
-        print(f"Created thread for {key}: {thread_id}")
-        return thread_id
-
 def load_schedule_config() -> list[dict]:
     """Load the scheduler decisions from settings.yaml."""
     try:
@@ -87,81 +19,58 @@ def load_schedule_config() -> list[dict]:
         print("Warning: config/settings.yaml not found. No schedule to run.", file=sys.stderr)
         return []
 
-def run_scheduler():
-    """Main loop to trigger graph runs on a schedule."""
-    lg_url = os.environ.get("LG_URL", "http://127.0.0.1:2024")
-    lg_graph_id = os.environ.get("LG_GRAPH_ID", "trader")
-
-    print("--- Scheduler Trigger Script ---")
+async def _run_async(lg_url: str, lg_graph_id: str, schedule_configs: list[dict]) -> None:
+    from app.scheduler import AsyncScheduler, AsyncThreadManager, connect
 
     try:
-        client = get_sync_client(url=lg_url)
-        assistants = client.assistants.search(graph_id=lg_graph_id)
-        if not assistants:
-            raise ValueError(f"No assistant found for graph_id '{lg_graph_id}'")
-        assistant_id = assistants[0]["assistant_id"]
+        client, assistant_id = await connect(lg_url, lg_graph_id)
         print(f"Connection successful. Using assistant {assistant_id}.")
     except Exception as e:
         print(f"Error connecting to server or finding assistant: {e}", file=sys.stderr)
         sys.exit(1)
 
-    schedule_configs = load_schedule_config()
-    if not schedule_configs:
-        return
-
-    thread_manager = ThreadManager(client, THREAD_MAP_FILE)
+    thread_manager = AsyncThreadManager(client, THREAD_MAP_FILE)
+    await thread_manager.verify()
 
-    try:
-        while True:
-            print(f"\n--- New scheduler cycle at {time.ctime()} ---")
-            from app.settings import settings
-
-            for i, config in enumerate(schedule_configs):
-                if i > 0:
-                    print(f"Staggering for {settings.scheduler.stagger_seconds}s...")
-                    time.sleep(settings.scheduler.stagger_seconds)
+    scheduler = await AsyncScheduler(client, assistant_id, schedule_configs, thread_manager).start()
+    print(f"Launching up to {scheduler.max_concurrency} runs at once"
+          + (f", {scheduler.bucket.rate:g}/s" if scheduler.bucket else "") + ".")
 
-                instrument = config["instrument"]
-                timeframe = config["timeframe"]
+    # Feature summaries for each batch of due decisions, computed in one pass before their runs
+    from app.settings import settings
+    if settings.feature_engine.enabled:
+        from app.tools.feature_engine import feature_engine
+        scheduler.prepare = feature_engine.precompute
 
-                for attempt in range(2): # Allow one retry
-                    try:
-                        from app.settings import settings
-                        thread_id = thread_manager.ensure_thread_id(instrument, timeframe)
+    # Price-spike triggers and the macro throttle, when enabled
+    from app.event_engine import start_event_tasks
+    event_tasks = start_event_tasks(scheduler)
+    try:
+        await scheduler.run_forever()
+    finally:
+        for task in event_tasks:
+            task.cancel()
+        await scheduler.stop()
 
-                        run_input = {"messages": [{"role": "user", "content": f"CandleCloseEvent {instrument} {timeframe}"}]}
+def run_scheduler():
+    """Trigger graph runs on a schedule, launched concurrently by the async scheduler (app/scheduler.py)."""
+    lg_url = os.environ.get("LG_URL", "http://127.0.0.1:2024")
+    lg_graph_id = os.environ.get("LG_GRAPH_ID", "trader")
 
-                        metadata = {
-                            "instrument": instrument,
-                            "timeframe": timeframe,
-                            "mode": settings.mode,
-                            "broker_provider": settings.broker_provider,
-                           "llm_provider": settings.llm.provider_label,
-                           "llm_model": settings.llm.model,
-                            "run_reason": "scheduled",
-                            "app_version": settings.app.get("version", "0.1.0"),
-                        }
+    print("--- Scheduler Trigger Script ---")
 
-                        print(f"Triggering run for {instrument}/{timeframe} on thread {thread_id}...")
-                        run = client.runs.create(
-                            assistant_id=assistant_id,
-                            thread_id=thread_id,
-                            input=run_input,
-                            metadata=metadata
-                        )
-                        print(f"Successfully triggered run {run['run_id']}.")
-                        break
-                    except Exception as e:
-                        if "404" in str(e) and "thread" in str(e).lower() and attempt == 0:
-                            print(f"Stale thread detected on run creation for {instrument}/{timeframe}. Retrying once.")
-                            thread_manager.force_recreate(instrument, timeframe)
-                            continue
+    schedule_configs = load_schedule_config()
+    if not schedule_configs:
+        return
 
-                        print(f"Error triggering run for {instrument}/{timeframe}: {e}", file=sys.stderr)
-                        break
+    from app.settings import settings
+    if settings.telemetry.local.retention_background:
+        from app.retention import RetentionWorker
+        RetentionWorker().start()
+        print(f"Trace retention running every {settings.telemetry.local.retention_interval_minutes} min in the background.")
 
-            print(f"--- Cycle complete. Waiting for {POLL_INTERVAL_SECONDS} seconds. ---")
-            time.sleep(POLL_INTERVAL_SECONDS)
+    try:
+        asyncio.run(_run_async(lg_url, lg_graph_id, schedule_configs))
     except KeyboardInterrupt:
         print("\nScheduler stopped by user. Exiting.")
         sys.exit(0)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+import argparse
+import json
+import sys
+import time
+
+def main():
+    """Run trace/cache retention once, or repeatedly with --loop."""
+    parser = argparse.ArgumentParser(description="Compress, compact and expire local traces and the candle cache.")
+    parser.add_argument("--loop", action="store_true", help="keep running every telemetry.local.retention_interval_minutes")
+    args = parser.parse_args()
+
+    from app.settings import settings
+    from app.retention import run_retention
+
+    interval = 60.0 * settings.telemetry.local.retention_interval_minutes
+    print("--- Trace Retention ---")
+    print(f"Traces: {settings.telemetry.local.path} (rotate_days={settings.telemetry.local.rotate_days}, "
+          f"compression={settings.telemetry.local.compression})")
+
+    try:
+        while True:
+            report = run_retention()
+            print(json.dumps(report.to_dict()))
+            if report.errors:
+                print(f"Retention finished with {len(report.errors)} error(s).", file=sys.stderr)
+            if not args.loop:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nRetention stopped by user. Exiting.")
+
+if __name__ == "__main__":
+    main()
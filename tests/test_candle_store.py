@@ -0,0 +1,146 @@
+import pytest
+import pandas as pd
+
+from app.settings import settings
+from app.tools.candle_store import CandleStore
+
+T0 = pd.Timestamp("2024-03-01 10:00", tz="UTC")
+
+def _bars(start: pd.Timestamp, n: int) -> pd.DataFrame:
+    t = pd.date_range(start=start, periods=n, freq="5min")
+    close = [1.10 + i * 0.0001 for i in range(n)]
+    return pd.DataFrame({"time": t, "open": close, "high": close, "low": close, "close": close})
+
+class FakeProvider:
+    """Serves bars up to the last complete M5 bar at the fake 'now'."""
+    def __init__(self):
+        self.now = T0 + pd.Timedelta(minutes=5 * 100)
+        self.calls = []
+
+    def fetch(self, last_bar, n):
+        self.calls.append((last_bar["time"] if last_bar else None, n))
+        end = self.now - pd.Timedelta(minutes=5)  # last complete bar
+        if last_bar is None:
+            return _bars(end - pd.Timedelta(minutes=5 * (n - 1)), n)
+        start = pd.Timestamp(last_bar["time"]) + pd.Timedelta(minutes=5)
+        return _bars(start, int((end - start) / pd.Timedelta(minutes=5)) + 1)
+
+@pytest.fixture
+def provider(monkeypatch):
+    p = FakeProvider()
+    monkeypatch.setattr("app.tools.candle_store.time.time", lambda: p.now.timestamp() + 1)
+    return p
+
+@pytest.mark.parametrize("cache_format", ["parquet", "csv"])
+def test_store_serves_repeats_and_fetches_only_the_tail(tmp_path, monkeypatch, provider, cache_format):
+    """Test hit on repeat requests, tail-only refresh after a bar closes, and reload from disk."""
+    monkeypatch.setattr(settings.data, "cache_format", cache_format)
+    store = CandleStore(root=tmp_path / "candles")
+
+    df1, path = store.get("mock", "EUR_USD", "M5", 50, provider.fetch)
+    df2, _ = store.get("mock", "EUR_USD", "M5", 20, provider.fetch)
+    assert len(df1) == 50 and len(df2) == 20
+    assert provider.calls == [(None, 50)]
+    assert df2["time"].iloc[-1] == df1["time"].iloc[-1]
+
+    # Two more bars close: only those are requested
+    provider.now += pd.Timedelta(minutes=10)
+    df3, _ = store.get("mock", "EUR_USD", "M5", 50, provider.fetch)
+    assert provider.calls[-1] == (df1["time"].iloc[-1], 2)
+    assert df3["time"].iloc[-1] == df1["time"].iloc[-1] + pd.Timedelta(minutes=10)
+    assert df3["time"].is_monotonic_increasing and df3["time"].is_unique
+
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["refreshes"]) == (1, 1, 1)
+    assert stats["disk_writes"] == 2
+    assert len(list(path.glob("part-*"))) == 2
+
+    # A fresh process rebuilds the frame from disk and only fetches the tail
+    reloaded = CandleStore(root=tmp_path / "candles")
+    df4, _ = reloaded.get("mock", "EUR_USD", "M5", 50, provider.fetch)
+    assert provider.calls[-1][0] == df3["time"].iloc[-1]
+    pd.testing.assert_frame_equal(df4, df3)
+
+def test_store_miss_when_history_too_short(tmp_path, provider):
+    """Test that asking for more bars than cached triggers a full fetch."""
+    store = CandleStore(root=tmp_path / "candles")
+    store.get("mock", "EUR_USD", "M5", 10, provider.fetch)
+    df, _ = store.get("mock", "EUR_USD", "M5", 30, provider.fetch)
+    assert provider.calls == [(None, 10), (None, 30)]
+    assert len(df) == 30
+
+def test_store_compacts_parts(tmp_path, monkeypatch, provider):
+    """Test that many appended parts are rewritten as one."""
+    monkeypatch.setattr(settings.data, "cache_format", "parquet")
+    store = CandleStore(root=tmp_path / "candles", compact_after_parts=3)
+    _, path = store.get("mock", "EUR_USD", "M5", 10, provider.fetch)
+    for _ in range(4):
+        provider.now += pd.Timedelta(minutes=5)
+        store.get("mock", "EUR_USD", "M5", 10, provider.fetch)
+    assert len(list(path.glob("part-*"))) <= 3
+    assert len(pd.read_parquet(path)) == 14
+
+def test_mock_candles_reuse_store(tmp_path, monkeypatch):
+    """Test that repeated data_mock.candles calls are served from the store."""
+    from app.tools import data_mock
+    store = CandleStore(root=tmp_path / "candles")
+    monkeypatch.setattr(data_mock, "candle_store", store)
+
+    s1 = data_mock.candles("EUR_USD", "M5", count=100)
+    s2 = data_mock.candles("EUR_USD", "M5", count=100)
+
+    assert s1.features_digest == s2.features_digest
+    assert store.stats()["provider_calls"] == 1
+    assert store.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_aget_plans_and_fetches_once(tmp_path, monkeypatch, provider):
+    """Test that concurrent async requests for one key share a single provider call and part file."""
+    import asyncio
+
+    async def fetch(last_bar, n):
+        await asyncio.sleep(0.01)  # overlap the callers
+        return provider.fetch(last_bar, n)
+
+    monkeypatch.setattr(settings.data, "cache_format", "parquet")
+    store = CandleStore(root=tmp_path / "candles")
+    store.get("mock", "EUR_USD", "M5", 50, provider.fetch)
+    provider.now += pd.Timedelta(minutes=10)
+
+    results = await asyncio.gather(*(store.aget("mock", "EUR_USD", "M5", 50, fetch) for _ in range(4)))
+    assert len(provider.calls) == 2  # the initial fill and one tail refresh
+    assert all(df["time"].is_unique and df.equals(results[0][0]) for df, _ in results)
+    stats = store.stats()
+    assert (stats["refreshes"], stats["hits"], stats["disk_writes"]) == (1, 3, 2)
+
+def test_synthetic_mock_bars_end_at_the_last_closed_bar(tmp_path, monkeypatch):
+    """Test that data_mock never serves the bar still forming."""
+    from app.tools import data_mock
+    monkeypatch.setattr(data_mock, "candle_store", CandleStore(root=tmp_path / "candles"))
+    df, _ = data_mock.frame("EUR_USD", "M5", 50)
+    now = pd.Timestamp.now(tz="UTC")
+    assert df["time"].iloc[-1] + pd.Timedelta(minutes=5) <= now
+    assert df["time"].iloc[-1] + pd.Timedelta(minutes=10) > now
+
+def test_gap_longer_than_count_refetches_and_replaces(tmp_path, monkeypatch, provider):
+    """Test that an outage longer than `count` bars replaces the stored series instead of leaving a hole."""
+    monkeypatch.setattr(settings.data, "cache_format", "parquet")
+    store = CandleStore(root=tmp_path / "candles")
+    _, path = store.get("mock", "EUR_USD", "M5", 50, provider.fetch)
+    provider.now += pd.Timedelta(minutes=5 * 80)
+
+    df, _ = store.get("mock", "EUR_USD", "M5", 50, provider.fetch)
+    assert provider.calls[-1] == (None, 50)
+    assert store.stats()["misses"] == 2
+    for frame in (df, store._frames[("mock", "EUR_USD", "M5")], CandleStore(root=tmp_path / "candles")._load(("mock", "EUR_USD", "M5"))):
+        assert (frame["time"].diff().dropna() == pd.Timedelta(minutes=5)).all()
+    assert df["time"].iloc[-1] == provider.now - pd.Timedelta(minutes=5)
+
+def test_synthetic_mock_bars_continue_without_a_hole():
+    """Test that data_mock continues a stale series from its last bar, however long the gap."""
+    from app.tools import data_mock
+    now = pd.Timestamp.now(tz="UTC").floor("5min")
+    last = {"time": now - pd.Timedelta(minutes=5 * 100), "close": 1.1}
+    df = data_mock._synthetic("EUR_USD", 10, "M5", last)
+    assert df["time"].iloc[0] == last["time"] + pd.Timedelta(minutes=5)
+    assert (df["time"].diff().dropna() == pd.Timedelta(minutes=5)).all()
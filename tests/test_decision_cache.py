@@ -0,0 +1,117 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+from app.decision_cache import DecisionCache
+from app.graph import build_trader_graph
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = DecisionCache(max_entries=2, ttl_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr("app.decision_cache.time.time", lambda: now[0])
+
+    cache.put(("a",), "strategy", [1])
+    cache.put(("b",), "strategy", [2])
+    assert cache.get(("a",)) == {"strategy": [1]}   # "a" is now the most recent
+    cache.put(("c",), "strategy", [3])
+    assert cache.get(("b",)) is None                # least recently used went first
+    assert cache.stats()["evictions"] == 1
+
+    now[0] += 61
+    assert cache.get(("a",)) is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["hit_rate"] == pytest.approx(1 / 3)
+
+
+
+def test_replay_counter_is_updated_under_the_lock():
+    import threading
+
+    cache = DecisionCache()
+    threads = [threading.Thread(target=lambda: [cache.count_replay() for _ in range(2000)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.stats()["nodes_replayed"] == 16000
+
+
+@pytest.fixture
+def cached_graph(monkeypatch):
+    """A graph whose agents append one message per call, with a features tool returning `digest[0]`."""
+    from app.decision_cache import decision_cache
+    decision_cache.clear()
+    digest = ["d1"]
+
+    @tool
+    def get_candles(instrument: str, timeframe: str, count: int = 200):
+        """Fake features."""
+        return json.dumps({"instrument": instrument, "features_digest": digest[0]})
+
+    agent = MagicMock()
+    agent.invoke.side_effect = lambda state: {"messages": state["messages"] + [AIMessage(content=f"answer {agent.invoke.call_count}")]}
+
+    def build(**nodes):
+        monkeypatch.setattr("app.graph.settings.decision_cache.nodes", {"strategy": True, "signal": True, "risk": True, **nodes})
+        with patch("app.graph.create_react_agent", return_value=agent):
+            return build_trader_graph(config={}, tools=[get_candles]).compile()
+
+    return build, agent, digest
+
+
+def test_unchanged_features_replay_the_cached_decision(cached_graph):
+    build, agent, digest = cached_graph
+    app = build()
+    state = {"messages": [HumanMessage(content="CandleCloseEvent EUR_USD M5")]}
+
+    first = [list(u.keys())[0] for u in app.stream(state, stream_mode="updates")]
+    assert first == ["strategy", "signal", "risk", "exec"]
+    assert agent.invoke.call_count == 4
+
+    out = app.invoke(state)
+    assert agent.invoke.call_count == 4  # no agent called; the run ends after risk
+    assert out["cache_hit"] is True
+    assert [m.content for m in out["messages"][1:]] == ["answer 1", "answer 2", "answer 3"]
+
+    digest[0] = "d2"  # a new bar
+    app.invoke(state)
+    assert agent.invoke.call_count == 8
+
+
+def test_node_opt_out_always_calls_its_agent_and_executes(cached_graph):
+    build, agent, _ = cached_graph
+    app = build(signal=False)
+    state = {"messages": [HumanMessage(content="CandleCloseEvent EUR_USD M5")]}
+    app.invoke(state)
+    sequence = [list(u.keys())[0] for u in app.stream(state, stream_mode="updates")]
+    # strategy replayed; the fresh signal is assessed and executed, not dropped
+    assert sequence == ["strategy", "signal", "risk", "exec"]
+    assert agent.invoke.call_count == 4 + 3
+
+
+def test_a_decision_whose_exec_did_not_execute_is_executed_on_replay(cached_graph):
+    build, agent, _ = cached_graph
+    exec_results = ['{"status": "skipped", "reason": "max_open_positions"}', '{"status": "accepted", "order_id": "1"}']
+
+    def answer(state):
+        messages = state["messages"]
+        if len(messages) == 4:  # exec, after strategy, signal and risk
+            return {"messages": messages + [ToolMessage(content=exec_results.pop(0), name="execute_order", tool_call_id="t")]}
+        return {"messages": messages + [AIMessage(content=f"answer {agent.invoke.call_count}")]}
+
+    agent.invoke.side_effect = answer
+    app = build()
+    state = {"messages": [HumanMessage(content="CandleCloseEvent EUR_USD M5")]}
+    app.invoke(state)
+
+    sequence = [list(u.keys())[0] for u in app.stream(state, stream_mode="updates")]
+    assert sequence == ["strategy", "signal", "risk", "exec"]
+    assert agent.invoke.call_count == 5  # only exec ran again
+
+    # The retried exec succeeded: the next replay ends after risk
+    assert [list(u.keys())[0] for u in app.stream(state, stream_mode="updates")] == ["strategy", "signal", "risk"]
+    assert agent.invoke.call_count == 5
@@ -0,0 +1,142 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.event_engine import EventEngine, MacroThrottle, RollingATR, parse_tick, replay_feed
+from app.events import EventBus, MacroEvent, PriceSpikeEvent
+from app.settings import PriceStreamSettings
+
+T0 = 1_791_999_960.0  # a whole minute
+
+
+def _walk(n, seed=3):
+    rng = np.random.default_rng(seed)
+    times = T0 + np.cumsum(rng.uniform(0.05, 1.5, n))
+    prices = 1.1 + np.cumsum(rng.normal(0, 1e-4, n))
+    return times, prices
+
+
+def test_rolling_atr_matches_wilder_atr_of_tick_bars():
+    times, prices = _walk(5000)
+    atr = RollingATR(window=14, bar_seconds=60)
+    for t, p in zip(times, prices):
+        atr.update(t, p)
+
+    # Reference: resample the ticks to bars and run Wilder's ATR over the completed ones
+    s = pd.Series(prices, index=pd.to_datetime(times, unit="s"))
+    bars = s.resample("60s").ohlc().dropna().iloc[:-1]  # last bar is still open
+    prev = bars["close"].shift()
+    tr = pd.concat([bars["high"] - bars["low"], (bars["high"] - prev).abs(), (bars["low"] - prev).abs()], axis=1).max(axis=1)
+    expected = tr.iloc[:14].mean()
+    for value in tr.iloc[14:]:
+        expected = (expected * 13 + value) / 14
+
+    assert atr.bars == len(bars)
+    assert atr.atr == pytest.approx(expected, rel=1e-9)
+    assert atr.prev_close == bars["close"].iloc[-1]
+
+
+def test_spike_event_on_large_move_with_cooldown():
+    bus = EventBus()
+    seen = []
+    bus.subscribe(PriceSpikeEvent, seen.append)
+    engine = EventEngine(event_bus=bus, cfg=PriceStreamSettings(atr_window=5, bar_seconds=60, spike_threshold_atr=2.0, cooldown_seconds=120))
+
+    # Ten quiet bars with a 10 pip range each
+    for i in range(10):
+        for j, p in enumerate((1.1000, 1.1010, 1.1000)):
+            engine.on_tick("EUR_USD", T0 + 60 * i + 10 * j, p)
+    assert engine.atr["EUR_USD"].atr == pytest.approx(0.0010)
+
+    assert engine.on_tick("EUR_USD", T0 + 600, 1.1015) is None            # 1.5 ATR: no spike
+    event = engine.on_tick("EUR_USD", T0 + 601, 1.1030)                   # 3 ATR from the last close
+    assert event is not None and event.abs_change == pytest.approx(0.0030)
+    assert engine.on_tick("EUR_USD", T0 + 602, 1.1040) is None            # cooling down
+    assert engine.on_tick("GBP_USD", T0 + 602, 1.3) is None               # other instruments are separate
+    assert seen == [event]
+
+
+@pytest.mark.parametrize("line,expected", [
+    ('{"type":"PRICE","instrument":"EUR_USD","time":"2026-10-14T13:07:30.250000000Z","bids":[{"price":"1.10000"}],"asks":[{"price":"1.10020"}]}',
+     ("EUR_USD", 1791983250.25, 1.1001)),
+    ('{"type":"HEARTBEAT","time":"2026-10-14T13:07:30.000000000Z"}', None),
+    ('{"instrument":"GBP_USD","time":1791983250.5,"price":1.3}', ("GBP_USD", 1791983250.5, 1.3)),
+    ("1791983250.5,USD_JPY,150.0,150.02", ("USD_JPY", 1791983250.5, 150.01)),
+    ('{"instrument":"EUR_USD","time":"2026-10-14T15:07:30.25+02:00","price":1.1}', ("EUR_USD", 1791983250.25, 1.1)),
+    ('{"instrument":"EUR_USD","time":"2026-10-14T08:07:30.250000000-05:00","price":1.1}', ("EUR_USD", 1791983250.25, 1.1)),
+    ("2026-10-14T13:07:30,EUR_USD,1.1", ("EUR_USD", 1791983250.0, 1.1)),
+    ("time,instrument,price", None),
+    ("", None),
+])
+def test_parse_tick_formats(line, expected):
+    tick = parse_tick(line)
+    if expected is None:
+        assert tick is None
+    else:
+        assert tick.instrument == expected[0]
+        assert tick.time == pytest.approx(expected[1])
+        assert tick.price == pytest.approx(expected[2])
+
+
+class FakeScheduler:
+    def __init__(self):
+        from app.scheduler import _Decision
+        self.decisions = {"EUR_USD_M5": _Decision("EUR_USD", "M5"), "EUR_USD_H1": _Decision("EUR_USD", "H1"),
+                          "GBP_USD_M5": _Decision("GBP_USD", "M5")}
+        self.triggers = []
+
+    def trigger(self, key, due=None, reason="scheduled"):
+        self.triggers.append((key, reason))
+        return "queued"
+
+
+@pytest.mark.asyncio
+async def test_replayed_ticks_trigger_runs_for_the_spiking_instrument(tmp_path):
+    lines = []
+    for i in range(10):
+        for j, p in enumerate((1.1000, 1.1010, 1.1000)):
+            lines.append(json.dumps({"instrument": "EUR_USD", "time": T0 + 60 * i + 10 * j, "price": p}))
+    lines.append(json.dumps({"instrument": "EUR_USD", "time": T0 + 601, "price": 1.1050}))
+    path = tmp_path / "ticks.jsonl"
+    path.write_text("\n".join(lines))
+
+    scheduler = FakeScheduler()
+    engine = EventEngine(scheduler, event_bus=EventBus(), cfg=PriceStreamSettings(atr_window=5, spike_threshold_atr=2.0))
+    assert await engine.consume(replay_feed(str(path))) == 31
+    assert sorted(scheduler.triggers) == [("EUR_USD_H1", "price_spike"), ("EUR_USD_M5", "price_spike")]
+    assert engine.stats()["runs_triggered"] == 2
+
+
+@pytest.mark.asyncio
+async def test_macro_throttle_windows_gate_the_scheduler(tmp_path):
+    from app.scheduler import AsyncScheduler
+    from tests.test_scheduler import FakeClient
+
+    bus = EventBus()
+    published = []
+    bus.subscribe(MacroEvent, published.append)
+    throttle = MacroThrottle(before_minutes=15, after_minutes=30, event_bus=bus)
+    items = [
+        {"Date": "2026-10-14T12:30:00", "Country": "United States", "Event": "Non Farm Payrolls", "Importance": 3},
+        {"Date": "2026-10-14T09:00:00", "Country": "Euro Area", "Currency": "EUR", "Event": "CPI", "Importance": 3},
+    ]
+    assert throttle.load(items) == 2
+    assert throttle.load(items) == 0  # already announced
+    assert [e.title for e in published] == ["Non Farm Payrolls", "CPI"]
+
+    nfp = 1791981000.0  # 2026-10-14 12:30 UTC
+    assert throttle.active("EUR_USD", nfp - 16 * 60) is None
+    assert throttle.active("USD_JPY", nfp - 10 * 60) == "USD Non Farm Payrolls"
+    assert throttle.active("EUR_GBP", nfp) is None
+    assert throttle.active("EUR_USD", nfp + 29 * 60) is not None
+    assert throttle.active("EUR_USD", nfp + 31 * 60) is None
+
+    scheduler = AsyncScheduler(FakeClient(), "asst", [{"instrument": "USD_JPY", "timeframe": "M5"}],
+                               gate=lambda instrument: throttle.active(instrument, nfp))
+    await scheduler.start()
+    assert scheduler.trigger("USD_JPY_M5") == "throttled"
+    await scheduler.stop()
+    assert scheduler.stats.throttled == 1
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.settings import settings
+from app.tools import data_mock, indicators
+from app.tools.candle_store import CandleStore
+from app.tools.feature_engine import FeatureEngine
+
+
+def _ohlc(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.001, n))
+    return close + rng.random(n) * 0.001, close - rng.random(n) * 0.001, close
+
+
+def test_kernels_match_pandas_ta_definitions():
+    """EMA seeded with the SMA and ATR as Wilder's RMA of the true range, as pandas_ta defines them."""
+    high, low, close = _ohlc(600)
+    c, h, l = pd.Series(close), pd.Series(high), pd.Series(low)
+
+    seeded = c.copy()
+    seeded.iloc[:19] = np.nan
+    seeded.iloc[19] = c.iloc[:20].mean()
+    expected_ema = seeded.ewm(span=20, adjust=False).mean()
+
+    prev = c.shift(1)
+    tr = pd.concat([h - l, (h - prev).abs(), (l - prev).abs()], axis=1).max(axis=1)
+    tr.iloc[0] = np.nan
+    expected_atr = tr.ewm(alpha=1 / 14, min_periods=14).mean()
+
+    np.testing.assert_allclose(indicators.ema(close, 20), expected_ema, rtol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(indicators.atr(high, low, close, 14), expected_atr, rtol=1e-10, equal_nan=True)
+
+
+def test_panel_rows_equal_single_series():
+    panel = np.stack([_ohlc(300, seed)[2] for seed in range(4)])
+    for row in range(4):
+        np.testing.assert_allclose(indicators.ema(panel, 50)[row], indicators.ema(panel[row], 50), rtol=1e-12, equal_nan=True)
+    assert np.isnan(indicators.last_valid(np.full((2, 5), np.nan))).all()
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings.data, "provider", "mock")
+    monkeypatch.setattr(settings.data, "cache_format", "none")
+    monkeypatch.setattr(data_mock, "candle_store", CandleStore(root=tmp_path / "candles"))
+    engine = FeatureEngine(root=tmp_path / "features")
+    monkeypatch.setattr(data_mock, "feature_engine", engine)
+    return engine
+
+
+def test_batch_summaries_equal_on_demand_ones(engine):
+    keys = [("EUR_USD", "M5"), ("GBP_USD", "M5"), ("EUR_USD", "H1")]
+    batch = asyncio.run(engine.precompute(keys, count=120))
+
+    for instrument, granularity in keys:
+        df, path = data_mock.frame(instrument, granularity, 120)
+        single = engine.summarize_one(df, instrument, granularity, path)
+        assert batch[(instrument, granularity)].model_dump() == single.model_dump()
+        assert set(single.indicators) == {"ema_fast", "ema_slow", "atr"}
+
+
+def test_published_summaries_serve_get_candles_until_the_next_bar(engine, monkeypatch):
+    asyncio.run(engine.precompute([("EUR_USD", "M5")], count=120))
+    provider_calls = data_mock.candle_store.stats()["provider_calls"]
+
+    summary = data_mock.candles("EUR_USD", "M5", count=120)
+    assert data_mock.candle_store.stats()["provider_calls"] == provider_calls  # no fetch, no recompute
+    assert engine.stats()["hits"] == 1
+
+    # Another process reads the published file
+    other = FeatureEngine(root=engine.root)
+    assert other.get("mock", "EUR_USD", "M5", 120).features_digest == summary.features_digest
+    assert other.stats()["disk_hits"] == 1
+
+    # After the next bar closes the summary is stale
+    now = time.time()
+    monkeypatch.setattr("app.tools.feature_engine.time.time", lambda: now + 300)
+    assert engine.get("mock", "EUR_USD", "M5", 120) is None
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import pytest
+
+from app.settings import settings
+from app.tools import data_mock, feature_engine as fe, feature_registry as fr
+from app.tools.candle_store import CandleStore
+from app.tools.standard import get_preset_features
+from app.tools.ta_tool import PRESETS, compute_indicators
+
+
+def test_one_pass_covers_every_preset_and_runs_each_kernel_once(monkeypatch):
+    calls = []
+
+    def counted(name, kernel):
+        def run(c, h, l):
+            calls.append(name)
+            return kernel(c, h, l)
+        return run
+
+    monkeypatch.setattr(fr, "FEATURES", {k: counted(k, v) for k, v in fr.FEATURES.items()})
+    df, _ = data_mock.frame("EUR_USD", "M5", 120)
+    union = fr.features(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy())
+
+    assert sorted(calls) == sorted(fr.FEATURES)
+    for preset in PRESETS:
+        expected = compute_indicators(df, preset).iloc[-1]
+        view = fr.preset_view({k: v[-1] for k, v in union.items()}, preset)
+        assert view == pytest.approx({k: expected[k] for k in view})
+        assert set(view) == set(expected.index[5:])
+
+
+@pytest.fixture
+def mock_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings.data, "provider", "mock")
+    monkeypatch.setattr(settings.data, "cache_format", "none")
+    monkeypatch.setattr(data_mock, "candle_store", CandleStore(root=tmp_path / "candles"))
+    engine = fe.FeatureEngine(root=tmp_path / "features")
+    monkeypatch.setattr(data_mock, "feature_engine", engine)
+    registry = fr.FeatureRegistry(max_entries=8)
+    monkeypatch.setattr(fr, "feature_registry", registry)
+    monkeypatch.setattr(fe, "feature_registry", registry)
+    return engine, registry
+
+
+def _tool(preset, digest=""):
+    return json.loads(get_preset_features.invoke({"instrument": "EUR_USD", "timeframe": "M5", "preset": preset,
+                                                  "features_digest": digest}))
+
+
+def test_signal_features_come_from_the_summary_pass(mock_data):
+    summary = data_mock.candles("EUR_USD", "M5", count=200)
+    calls = data_mock.candle_store.stats()["provider_calls"]
+
+    out = _tool("mean_reversion", summary.features_digest)
+    assert data_mock.candle_store.stats()["provider_calls"] == calls
+    assert out["features_digest"] == summary.features_digest
+    assert set(out["indicators"]) == {"BBL_20_2.0", "BBM_20_2.0", "BBU_20_2.0", "BBB_20_2.0", "BBP_20_2.0", "rsi", "atr"}
+    assert out["indicators"]["atr"] == summary.indicators["atr"]
+
+    # The trend view is exactly what get_candles exported
+    assert _tool("trend_following", summary.features_digest)["indicators"] == summary.indicators
+    assert "DCU_20_20" in _tool("breakout")["indicators"]
+
+
+def test_published_features_reach_another_process(mock_data):
+    engine, registry = mock_data
+    summaries = asyncio.run(engine.precompute([("EUR_USD", "M5")], count=200))
+    digest = summaries[("EUR_USD", "M5")].features_digest
+    registry.clear()
+
+    # A fresh engine (the LangGraph server) reads the published file and refills the registry
+    assert fe.FeatureEngine(root=engine.root).get("mock", "EUR_USD", "M5", 200) is not None
+    assert registry.peek(digest)["rsi_14"] == _tool("mean_reversion", digest)["indicators"]["rsi"]
+
+
+def test_disabled_registry_keeps_summaries_to_their_own_columns(mock_data, monkeypatch):
+    monkeypatch.setattr(settings.feature_registry, "enabled", False)
+    summary = data_mock.candles("EUR_USD", "M5", count=200)
+    assert set(summary.indicators) == {"ema_fast", "ema_slow", "atr"}
+    assert "error" in _tool("mean_reversion")
+
+
+def test_unknown_digest_is_flagged_stale_not_silently_replaced(mock_data):
+    _, registry = mock_data
+    summary = data_mock.candles("EUR_USD", "M5", count=200)
+    assert registry.get("mock", "EUR_USD", "M5", "evicted-digest") is None
+
+    out = _tool("mean_reversion", "evicted-digest")
+    assert out["stale"] is True and out["requested_digest"] == "evicted-digest"
+    assert out["features_digest"] == registry.get("mock", "EUR_USD", "M5")[0]  # the newest summary
+    assert "stale" not in _tool("mean_reversion", summary.features_digest)
@@ -115,3 +115,41 @@ def test_graph_early_exit(fake_toolset):
 
     expected_sequence = ["strategy", "error_handler"]
     assert sequence == expected_sequence
+
+def test_run_context_from_metadata_and_message():
+    """Tests that trace identifiers come from the run config or the input message."""
+    from app.graph import _run_context
+
+    state = {"messages": [HumanMessage(content="CandleCloseEvent EUR_USD M5")]}
+    ctx = _run_context(state, {"metadata": {"run_id": "r1", "thread_id": "t1"}})
+    assert ctx == {"run_id": "r1", "thread_id": "t1", "instrument": "EUR_USD", "timeframe": "M5", "decision_key": "EUR_USD_M5"}
+
+    ctx = _run_context(state, {"metadata": {"instrument": "GBP_USD", "timeframe": "H1"}})
+    assert ctx["decision_key"] == "GBP_USD_H1"
+
+    assert _run_context({"messages": [HumanMessage(content="Start")]}, None) == {}
+
+@pytest.mark.asyncio
+async def test_graph_async_path(fake_toolset):
+    """Tests that `ainvoke` runs the agents' async path and nothing blocks on the sync one."""
+    mock_agent = MagicMock()
+    mock_agent.invoke.side_effect = AssertionError("sync path used")
+
+    async def ainvoke(state):
+        return {"messages": [AIMessage(content="mocked agent response")]}
+    mock_agent.ainvoke.side_effect = ainvoke
+
+    with patch('app.graph.create_react_agent', return_value=mock_agent):
+        graph = build_trader_graph(
+            config={},
+            tools=fake_toolset,
+            route_overrides={name: (lambda state: "continue") for name in ("strategy", "signal", "risk", "exec")},
+        )
+
+    app = graph.compile()
+    sequence = []
+    async for node in app.astream({"messages": [HumanMessage(content="Start")]}, stream_mode="updates"):
+        sequence.append(list(node.keys())[0])
+
+    assert sequence == ["strategy", "signal", "risk", "exec"]
+    assert mock_agent.ainvoke.call_count == 4
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.settings import settings
+from app.tools.http_clients import HttpClientRegistry
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    reg = HttpClientRegistry()
+    monkeypatch.setattr("app.tools.http_clients.http_clients", reg)
+    monkeypatch.setattr("app.tools.data_oanda.http_clients", reg)
+    monkeypatch.setattr(settings.http, "log_requests", False)
+    return reg
+
+
+@pytest.mark.asyncio
+async def test_provider_requests_reuse_one_pooled_connection(registry, local_server):
+    """Test that repeated OANDA calls go through one client and one keep-alive connection."""
+    from app.tools import data_oanda
+    registry.override("oanda", base_url=local_server)
+
+    first = await data_oanda._get("/v3/instruments/EUR_USD/candles", params={"count": "5"})
+    client = registry.client("oanda")
+    for _ in range(4):
+        await data_oanda._get("/v3/instruments/EUR_USD/candles")
+
+    assert first == {"path": "/v3/instruments/EUR_USD/candles?count=5"}
+    assert registry.client("oanda") is client
+    stats = registry.stats()["oanda"]
+    assert stats["requests"] == 5
+    assert stats["new_connections"] == 1
+    assert stats["reuse_ratio"] == pytest.approx(0.8)
+    await registry.aclose()
+    assert client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_provider_concurrency_cap(registry, monkeypatch):
+    """Test that in-flight requests per provider are capped by max_concurrency."""
+    monkeypatch.setitem(settings.http.providers, "finnhub", {"max_concurrency": 2})
+    in_flight, peak = 0, 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json=[])
+
+    registry.override("finnhub", transport=httpx.MockTransport(handler))
+    await asyncio.gather(*(registry.request("finnhub", "GET", "/news") for _ in range(8)))
+
+    assert peak == 2
+    assert registry.stats()["finnhub"]["requests"] == 8
+
+
+def test_clients_are_per_event_loop(registry):
+    """Test that each event loop gets its own client."""
+    registry.override("oanda", transport=httpx.MockTransport(lambda r: httpx.Response(200, json={})))
+
+    async def get_client():
+        await registry.request("oanda", "GET", "/v3/accounts")
+        return registry.client("oanda")
+
+    c1 = asyncio.run(get_client())
+    c2 = asyncio.run(get_client())
+    assert c1 is not c2
+
+
+def test_sync_callers_share_one_background_loop_and_its_clients(registry, local_server):
+    """Test that run_sync reuses one loop (and so one pooled client) across calls, and closes it at exit."""
+    registry.override("oanda", base_url=local_server)
+
+    async def call():
+        await registry.request("oanda", "GET", "/v3/accounts")
+        return asyncio.get_running_loop(), registry.client("oanda")
+
+    loop, client = registry.run_sync(call())
+    assert registry.run_sync(call()) == (loop, client)
+    assert registry.stats()["oanda"]["new_connections"] == 1
+
+    registry.close()
+    assert client.is_closed and loop.is_closed()
+    # A later sync call starts a fresh loop
+    assert registry.run_sync(call())[0] is not loop
+    registry.close()
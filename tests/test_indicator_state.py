@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.settings import settings
+from app.tools.feature_registry import preset_view
+from app.tools.indicator_state import IndicatorSet, IndicatorStates
+
+
+def _frame(n, seed=0, start="2026-01-05"):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.001, n))
+    return pd.DataFrame({
+        "time": pd.date_range(start, periods=n, freq="5min", tz="UTC"),
+        "open": close, "high": close + rng.random(n) * 0.001, "low": close - rng.random(n) * 0.001, "close": close,
+    })
+
+
+def _reference(df):
+    """pandas_ta's ema/atr/rsi/bbands definitions, spelled out in pandas."""
+    c, h, l = df["close"], df["high"], df["low"]
+
+    def ema(n):
+        seeded = c.copy()
+        seeded.iloc[:n - 1] = np.nan
+        seeded.iloc[n - 1] = c.iloc[:n].mean()
+        return seeded.ewm(span=n, adjust=False).mean()
+
+    def rma(s, n):
+        return s.ewm(alpha=1 / n, min_periods=n).mean()
+
+    prev = c.shift(1)
+    tr = pd.concat([h - l, (h - prev).abs(), (l - prev).abs()], axis=1).max(axis=1)
+    tr.iloc[0] = np.nan
+    diff = c.diff()
+    gains, losses = rma(diff.clip(lower=0), 14), rma(-diff.clip(upper=0), 14)
+    mid, std = c.rolling(20).mean(), c.rolling(20).std(ddof=0)
+    lower, upper = mid - 2 * std, mid + 2 * std
+    return pd.DataFrame({
+        "ema_fast": ema(20), "ema_slow": ema(50), "atr": rma(tr, 14), "rsi": 100 * gains / (gains + losses),
+        "BBL_20_2.0": lower, "BBM_20_2.0": mid, "BBU_20_2.0": upper,
+        "BBB_20_2.0": 100 * (upper - lower) / mid, "BBP_20_2.0": (c - lower) / (upper - lower),
+    })
+
+
+def test_streaming_states_match_pandas_ta_definitions():
+    df = _frame(500)
+    expected = _reference(df)
+    ind = IndicatorSet()
+    for i, row in enumerate(df.itertuples()):
+        ind.update(i, row.high, row.low, row.close)
+        if i in (10, 19, 49, 120, 499):
+            got = {**preset_view(ind.values(), "trend_following"), **preset_view(ind.values(), "mean_reversion")}
+            for col in expected:
+                assert got[col] == pytest.approx(expected[col].iloc[i], rel=1e-9, nan_ok=True), (i, col)
+
+
+@pytest.fixture
+def persisted(monkeypatch):
+    monkeypatch.setattr(settings.indicator_state, "persist", True)
+
+
+def test_advance_applies_only_new_bars_and_resumes_after_restart(tmp_path, persisted):
+    df = _frame(300)
+    states = IndicatorStates(root=tmp_path)
+    states.advance_frame("mock", "EUR_USD", "M5", df.iloc[:200])
+    states.advance_frame("mock", "EUR_USD", "M5", df.iloc[1:201])  # one new bar
+    assert states.stats()["bars_applied"] == 201
+
+    restarted = IndicatorStates(root=tmp_path)
+    resumed = restarted.advance_frame("mock", "EUR_USD", "M5", df.iloc[100:300])
+    assert restarted.stats() == {"keys": 1, "bars_applied": 99, "rebuilds": 0, "restored": 1}
+
+    uninterrupted = IndicatorStates(root=tmp_path / "other").advance_frame("mock", "EUR_USD", "M5", df)
+    assert resumed == pytest.approx(uninterrupted, rel=1e-12)
+
+
+def test_a_gap_rebuilds_from_the_frame(tmp_path, persisted):
+    df = _frame(400)
+    states = IndicatorStates(root=tmp_path)
+    states.advance_frame("mock", "EUR_USD", "M5", df.iloc[:100])
+    after_gap = states.advance_frame("mock", "EUR_USD", "M5", df.iloc[200:])
+    fresh = IndicatorStates(root=tmp_path / "fresh").advance_frame("mock", "EUR_USD", "M5", df.iloc[200:])
+    assert states.stats()["rebuilds"] == 1
+    assert after_gap == pytest.approx(fresh)
+
+
+def test_states_missing_requested_columns_are_rebuilt(tmp_path):
+    df = _frame(100)
+    states = IndicatorStates(root=tmp_path)
+    assert set(states.advance_frame("mock", "EUR_USD", "M5", df, ["ema_20", "atr_14"])) == {"ema_20", "atr_14"}
+    widened = states.advance_frame("mock", "EUR_USD", "M5", df, ["ema_20", "rsi_14"])
+    assert widened["rsi_14"] == pytest.approx(IndicatorStates(root=tmp_path / "fresh").advance_frame(
+        "mock", "EUR_USD", "M5", df, ["rsi_14"])["rsi_14"])
+    assert states.stats()["bars_applied"] == 200
+
+
+def test_feature_engine_summaries_from_streaming_state(tmp_path, monkeypatch, persisted):
+    from app.tools import feature_engine as fe
+
+    monkeypatch.setattr(settings.indicator_state, "enabled", True)
+    monkeypatch.setattr(fe, "indicator_states", IndicatorStates(root=tmp_path / "states"))
+    engine = fe.FeatureEngine(root=tmp_path)
+    df = _frame(201)
+
+    engine.summarize_one(df.iloc[:200], "EUR_USD", "M5", None, "mock")
+    summary = engine.summarize_one(df.iloc[1:], "EUR_USD", "M5", None, "mock")
+
+    # One state set for every preset's features: each bar is applied once and one file is written per key
+    assert fe.indicator_states.stats()["bars_applied"] == 201
+    assert [p.name for p in (tmp_path / "states").rglob("*.json")] == ["EUR_USD_M5.json"]
+    expected = _reference(df).iloc[-1]
+    assert summary.indicators == pytest.approx({k: expected[k] for k in ("ema_fast", "ema_slow", "atr")}, rel=1e-9)
@@ -3,7 +3,14 @@ import os
 from unittest.mock import patch, MagicMock
 
 from app.settings import settings
-from app.llm import make_llm, probe_tool_calling_capability
+from app.llm import make_llm, probe_tool_calling_capability, invalidate_llm_cache, llm_cache_info
+
+@pytest.fixture(autouse=True)
+def fresh_llm_cache():
+    """Each test builds its own client."""
+    invalidate_llm_cache()
+    yield
+    invalidate_llm_cache()
 
 @patch('app.llm.ChatOpenAI')
 def test_make_llm_creates_openai_client(mock_chat_openai):
@@ -44,3 +51,98 @@ def test_probe_disabled_by_setting(monkeypatch):
     from app.llm import probe_tool_calling_capability
 
     assert probe_tool_calling_capability() is True
+
+@patch('app.llm.ChatOpenAI')
+def test_make_llm_reuses_cached_client(mock_chat_openai, monkeypatch):
+    """Test that clients are cached per (base_url, model, temperature, max_tokens) and share one pool."""
+    mock_chat_openai.side_effect = lambda **kw: MagicMock(**kw)
+    monkeypatch.setattr(settings.llm, "require_tools", False)
+
+    first = make_llm()
+    assert make_llm() is first
+    monkeypatch.setattr(settings.llm, "temperature", 0.7)
+    second = make_llm()
+
+    assert second is not first
+    assert mock_chat_openai.call_count == 2
+    calls = [c.kwargs for c in mock_chat_openai.call_args_list]
+    assert calls[0]["http_client"] is calls[1]["http_client"]
+    assert calls[0]["http_async_client"] is calls[1]["http_async_client"]
+    assert llm_cache_info() == {"hits": 1, "misses": 2, "clients": 2}
+
+    invalidate_llm_cache()
+    monkeypatch.setattr(settings.llm, "temperature", 0.2)
+    assert make_llm() is not first
+
+def test_async_client_serves_a_new_event_loop_per_run(monkeypatch):
+    """Repeated asyncio.run() calls reuse the cached client without 'Event loop is closed'."""
+    import asyncio
+    from app import llm as llm_module
+    from scripts.fake_openai_server import start
+
+    server, base_url = start(latency_ms=0)
+    monkeypatch.setattr(settings.llm, "base_url", base_url)
+    monkeypatch.setattr(settings.llm, "require_tools", False)
+    monkeypatch.setattr(settings.llm_cache, "backend", "none")
+    try:
+        for _ in range(3):
+            assert asyncio.run(make_llm().ainvoke("hi")).content
+        assert llm_cache_info()["clients"] == 1
+
+        # invalidate_llm_cache() closes the async pools too
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(make_llm().ainvoke("hi"))
+            transports = llm_module._HTTP_CLIENTS[2]
+            assert transports.loops() == 1
+            invalidate_llm_cache()
+            assert transports.loops() == 0
+        finally:
+            loop.close()
+    finally:
+        server.shutdown()
+
+@patch('app.llm.ChatOpenAI')
+def test_api_key_rotation_builds_a_new_client(mock_chat_openai, monkeypatch):
+    mock_chat_openai.side_effect = lambda **kw: MagicMock(**kw)
+    monkeypatch.setattr(settings.llm, "require_tools", False)
+    monkeypatch.setattr(settings.llm, "api_key", "old")
+    first = make_llm()
+    monkeypatch.setattr(settings.llm, "api_key", "new")
+    assert make_llm() is not first
+    assert mock_chat_openai.call_args.kwargs["api_key"] == "new"
+
+def test_close_runs_each_pool_close_on_its_own_loop():
+    """With several running loops, each loop's pool is closed on that loop."""
+    import asyncio
+    import threading
+    import time
+    from app.llm import _LoopTransports
+
+    class Recorder:
+        def __init__(self, closed):
+            self.closed = closed
+
+        async def aclose(self):
+            self.closed.set_result(asyncio.get_running_loop())
+
+    transports = _LoopTransports()
+    loops = [asyncio.new_event_loop() for _ in range(2)]
+    threads = [threading.Thread(target=lp.run_forever, daemon=True) for lp in loops]
+    for t in threads:
+        t.start()
+    try:
+        closed = {}
+        for lp in loops:
+            closed[lp] = lp.create_future()
+            transports._transports[lp] = Recorder(closed[lp])
+            lp.call_soon_threadsafe(time.sleep, 0.2)  # busy: the close callbacks run after close() returns
+        transports.close()
+        for lp, fut in closed.items():
+            done = asyncio.run_coroutine_threadsafe(asyncio.wait_for(asyncio.shield(fut), 5), lp).result(5)
+            assert done is lp
+    finally:
+        for lp, t in zip(loops, threads):
+            lp.call_soon_threadsafe(lp.stop)
+            t.join()
+            lp.close()
@@ -0,0 +1,124 @@
+import pytest
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration
+
+from app.llm import invalidate_llm_cache, make_llm
+from app.llm_cache import TieredLLMCache, cache_key, reset_llm_cache
+from app.settings import settings
+
+
+def _gen(text="ok", tokens=42):
+    return [ChatGeneration(message=AIMessage(content=text, usage_metadata={"input_tokens": tokens - 2, "output_tokens": 2, "total_tokens": tokens}))]
+
+
+def test_key_ignores_ids_and_response_metadata():
+    a = dumps([HumanMessage(content="hi", id="1"), AIMessage(content="yo", id="x", response_metadata={"created": 1})])
+    b = dumps([HumanMessage(content="hi", id="2"), AIMessage(content="yo", id="y", response_metadata={"created": 2})])
+    c = dumps([HumanMessage(content="hi!"), AIMessage(content="yo")])
+    assert cache_key(a, "llm") == cache_key(b, "llm")
+    assert cache_key(a, "llm") != cache_key(c, "llm")
+    assert cache_key(a, "llm") != cache_key(a, "llm-with-tools")
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    path = tmp_path / "llm.sqlite"
+    cache = TieredLLMCache(path=path)
+    assert cache.lookup("prompt", "llm") is None
+    cache.update("prompt", "llm", _gen())
+    cache.close()
+
+    restarted = TieredLLMCache(path=path)
+    hit = restarted.lookup("prompt", "llm")
+    assert hit[0].message.content == "ok"
+    stats = restarted.stats()
+    assert stats["disk_hits"] == 1 and stats["tokens_saved"] == 42
+
+    # Now served from memory
+    restarted.lookup("prompt", "llm")
+    assert restarted.stats()["disk_hits"] == 1 and restarted.stats()["hits"] == 2
+
+
+def test_memory_tier_is_lru():
+    cache = TieredLLMCache(max_entries=2)
+    for p in ("a", "b", "c"):
+        cache.update(p, "llm", _gen(p))
+    assert cache.lookup("a", "llm") is None
+    assert cache.lookup("c", "llm")[0].message.content == "c"
+
+
+@pytest.fixture
+def fake_llm(monkeypatch, tmp_path):
+    from scripts.fake_openai_server import served, start
+    server, base_url = start(latency_ms=20)
+    monkeypatch.setattr(settings.llm, "base_url", base_url)
+    monkeypatch.setattr(settings.llm, "temperature", 0.0)
+    monkeypatch.setattr(settings.llm_cache, "backend", "sqlite")
+    monkeypatch.setattr(settings.llm_cache, "path", str(tmp_path / "llm.sqlite"))
+    reset_llm_cache()
+    invalidate_llm_cache()
+    yield served
+    server.shutdown()
+    reset_llm_cache()
+    invalidate_llm_cache()
+
+
+def test_make_llm_serves_repeated_requests_from_cache(fake_llm):
+    llm = make_llm()
+    messages = [SystemMessage(content="You are a trader."), HumanMessage(content="CandleCloseEvent EUR_USD M5")]
+    before = fake_llm["requests"]
+    first = llm.invoke(messages)
+    second = llm.invoke(messages)
+    assert fake_llm["requests"] - before == 1
+    assert second.content == first.content
+    stats = llm.cache.stats()
+    assert stats["hits"] == 1 and stats["tokens_saved"] == 110 and stats["latency_saved_ms"] >= 20
+
+
+def test_sampling_clients_can_bypass_the_cache(fake_llm, monkeypatch):
+    monkeypatch.setattr(settings.llm, "temperature", 0.7)
+    monkeypatch.setattr(settings.llm_cache, "skip_when_sampling", True)
+    assert make_llm().cache is False
+
+
+def test_sqlite_tier_is_pruned_by_age_and_row_cap(tmp_path, monkeypatch):
+    import app.llm_cache as llm_cache
+
+    monkeypatch.setattr(llm_cache, "PRUNE_EVERY", 1)
+    cache = TieredLLMCache(path=tmp_path / "llm.sqlite", ttl_seconds=60, max_rows=3)
+    for p in "abcde":
+        cache.update(p, "llm", _gen(p))
+    assert cache._disk.rows() == 3
+    assert cache._disk.get(cache_key("a", "llm")) is None
+
+    monkeypatch.setattr(llm_cache.time, "time", lambda: 1e12)
+    assert cache._disk.prune() == 3 and cache._disk.rows() == 0
+
+
+def test_concurrent_and_failed_misses_are_tracked_per_call(monkeypatch):
+    import app.llm_cache as llm_cache
+
+    cache = TieredLLMCache()
+    assert cache.lookup("p", "llm") is None
+    assert cache.lookup("p", "llm") is None  # a second identical miss in flight
+    assert cache.stats()["pending"] == 2
+    cache.update("p", "llm", _gen())
+    assert cache.stats()["pending"] == 1
+
+    # The other call raised and never reported back: it expires
+    now = llm_cache.time.perf_counter()
+    monkeypatch.setattr(llm_cache.time, "perf_counter", lambda: now + llm_cache.PENDING_EXPIRY_S + 1)
+    assert cache.lookup("q", "llm") is None
+    assert cache.stats()["pending"] == 1 and list(cache._pending) == [cache_key("q", "llm")]
+
+
+def test_shipped_config_caches_its_default_client(fake_llm, monkeypatch):
+    from app.settings import load_settings
+    monkeypatch.setenv("OPENAI_BASE_URL", settings.llm.base_url)
+    monkeypatch.setenv("OPENAI_MODEL", "test-model")
+    monkeypatch.setenv("MODE", "BACKTEST")
+    shipped = load_settings()
+    assert shipped.llm.temperature > 0
+    monkeypatch.setattr(settings.llm, "temperature", shipped.llm.temperature)
+    monkeypatch.setattr(settings.llm_cache, "skip_when_sampling", shipped.llm_cache.skip_when_sampling)
+    assert make_llm().cache is not False
@@ -1,3 +1,9 @@
+import json
+import threading
+
+import pytest
+
+from app.settings import settings
 from app.tools.broker_paper import PaperBroker
 from app.tools.data_mock import candles
 
@@ -54,3 +60,242 @@ def test_paper_broker_stop_loss():
     assert snap["history"][0]["status"] == "closed"
     assert snap["history"][0]["close_reason"] == "stop_loss"
     assert snap["history"][0]["close_price"] == stop_loss_price
+
+
+# --- Journal / process-wide instance ---
+@pytest.fixture
+def journaled(tmp_path, monkeypatch):
+    """Point the broker at a temporary ledger and return a factory for 'restarted' instances."""
+    monkeypatch.setattr(settings, "paper", {**(settings.paper or {}), "ledger_path": str(tmp_path / "ledger.json"), "snapshot_every": 5})
+
+    def restart() -> PaperBroker:
+        PaperBroker._instance = None
+        return PaperBroker()
+
+    monkeypatch.setattr(PaperBroker, "_instance", None)
+    return restart
+
+
+def _buy(brk, **kw):
+    return brk.place_order({"instrument": "EUR_USD", "side": "buy", "units": 1000, "entry_type": "market",
+                            "price": None, "stop_loss": 1.05, "take_profit": 1.20, **kw})
+
+
+def test_paper_broker_is_process_wide(journaled):
+    brk = journaled()
+    assert PaperBroker() is brk
+
+
+def test_paper_broker_replays_journal_after_crash(journaled):
+    brk = journaled()
+    brk.reset()
+    _buy(brk)
+    brk.on_bar("EUR_USD", o=1.10, h=1.11, l=1.09, c=1.10)
+    _buy(brk)
+    brk.flush()
+    before = brk.snapshot()
+
+    # No checkpoint happened: the ledger is still the empty reset state
+    assert json.loads(brk.ledger_path.read_text())["history"] == []
+    assert len(brk.journal_path.read_text().splitlines()) == 3
+
+    recovered = journaled()  # simulated crash: the old instance never closed
+    assert recovered is not brk
+    assert recovered.snapshot() == before
+
+
+def test_paper_broker_checkpoints_and_truncates_journal(journaled):
+    brk = journaled()
+    brk.reset()
+    for _ in range(3):
+        _buy(brk)
+        brk.on_bar("EUR_USD", o=1.10, h=1.11, l=1.09, c=1.10)
+
+    # snapshot_every=5: one checkpoint after the 5th record, one record journaled since
+    brk.flush()
+    ledger = json.loads(brk.ledger_path.read_text())
+    assert ledger["seq"] == 5
+    assert len(brk.journal_path.read_text().splitlines()) == 1
+
+    # A torn tail is ignored on recovery
+    with open(brk.journal_path, "a") as f:
+        f.write('{"op": "bar", "instr')
+    assert journaled().snapshot() == brk.snapshot()
+
+
+def test_paper_broker_keeps_writes_made_after_recovering_a_torn_tail(journaled):
+    brk = journaled()
+    brk.reset()
+    _buy(brk, stop_loss=None, take_profit=None)
+    brk.flush()
+    with open(brk.journal_path, "a") as f:
+        f.write('{"op": "order", "ord')  # crash mid-write
+
+    recovered = journaled()
+    assert len(recovered.snapshot()["open_orders"]) == 1
+    _buy(recovered, stop_loss=None, take_profit=None)
+    _buy(recovered, stop_loss=None, take_profit=None)
+    recovered.flush()
+    live = recovered.snapshot()
+    assert len(live["open_orders"]) == 3
+
+    # Second crash: everything written after the first recovery comes back
+    assert journaled().snapshot() == live
+
+
+def test_paper_broker_serializes_concurrent_orders(journaled):
+    brk = journaled()
+    brk.reset()
+    ids = []
+    def worker():
+        for _ in range(25):
+            ids.append(_buy(brk)["order_id"])
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(ids)) == 100
+    brk.close()
+    assert len(journaled().snapshot()["open_orders"]) == 100
+
+
+# --- Indexed open-trade book ---
+def test_paper_broker_triggers_only_touched_levels(journaled):
+    brk = journaled()
+    brk.reset()
+    _buy(brk, stop_loss=1.090, take_profit=1.130)                  # 1: untouched
+    _buy(brk, stop_loss=1.098, take_profit=1.130)                  # 2: SL
+    _buy(brk, stop_loss=1.098, take_profit=1.101)                  # 3: SL and TP touched -> SL wins
+    _buy(brk, side="sell", stop_loss=1.120, take_profit=1.099)     # 4: TP
+    _buy(brk, side="sell", stop_loss=1.101, take_profit=1.080)     # 5: SL
+    _buy(brk, instrument="GBP_USD", stop_loss=1.25, take_profit=1.30)
+    brk.on_bar("EUR_USD", o=1.10, h=1.10, l=1.10, c=1.10)
+    assert len(brk.open_trades("EUR_USD")) == 5
+    assert len(brk.snapshot()["open_orders"]) == 1  # GBP_USD order untouched by a EUR_USD bar
+
+    brk.on_bar("EUR_USD", o=1.10, h=1.102, l=1.0975, c=1.10)
+
+    closed = {t["trade_id"]: (t["close_reason"], t["close_price"]) for t in brk.snapshot()["history"] if t["status"] == "closed"}
+    assert closed == {
+        2: ("stop_loss", 1.098),
+        3: ("stop_loss", 1.098),
+        4: ("take_profit", 1.099),
+        5: ("stop_loss", 1.101),
+    }
+    assert [t["trade_id"] for t in brk.open_trades()] == [1]
+
+
+def test_paper_broker_spills_closed_trades(journaled, monkeypatch):
+    monkeypatch.setitem(settings.paper, "archive_max_closed", 2)
+    brk = journaled()
+    brk.reset()
+    for _ in range(5):
+        _buy(brk, stop_loss=1.099)
+        brk.on_bar("EUR_USD", o=1.10, h=1.10, l=1.10, c=1.10)  # fill
+        brk.on_bar("EUR_USD", o=1.10, h=1.10, l=1.09, c=1.09)  # stop out
+    _buy(brk)
+    brk.on_bar("EUR_USD", o=1.10, h=1.10, l=1.10, c=1.10)
+    brk.checkpoint()
+
+    history = brk.snapshot()["history"]
+    assert [t["trade_id"] for t in history] == [4, 5, 6]
+    assert brk.snapshot()["archived"] == 3
+    assert [t["trade_id"] for t in brk.archived_trades()] == [1, 2, 3]
+
+    # Order ids keep counting across spills and restarts
+    restarted = journaled()
+    assert restarted.snapshot()["history"] == history
+    assert _buy(restarted)["order_id"] == "PAPER-7"
+
+
+# --- Multi-bar replay ---
+def _segment_orders(price: float) -> list:
+    return [
+        {"side": "buy", "stop_loss": price - 0.004, "take_profit": price + 0.006},
+        {"side": "sell", "stop_loss": price + 0.003, "take_profit": price - 0.005},
+        {"side": "buy", "entry_type": "limit", "price": price - 0.002, "stop_loss": price - 0.006, "take_profit": price + 0.001},
+        {"side": "sell", "entry_type": "limit", "price": price + 0.002, "stop_loss": price + 0.0035, "take_profit": price},
+        {"side": "buy", "units": 3000, "stop_loss": None, "take_profit": price + 0.0005},
+    ]
+
+
+def _strip_ts(snap: dict) -> dict:
+    for item in snap["open_orders"] + snap["history"]:
+        item.pop("ts", None)
+        item.pop("ts_open", None)
+    return snap
+
+
+def test_paper_broker_replay_matches_bar_by_bar(journaled):
+    from app.tools.data_mock import _synthetic
+    df = _synthetic("EUR_USD", 3000, "M5")
+    segments = [df.iloc[:1000], df.iloc[1000:2200], df.iloc[2200:]]
+
+    def run(replay: bool):
+        brk = journaled()
+        brk.reset()
+        curve = []
+        for seg in segments:
+            for order in _segment_orders(float(seg["open"].iloc[0])):
+                _buy(brk, **order)
+            if replay:
+                curve.extend(brk.replay("EUR_USD", seg).tolist())
+            else:
+                for bar in seg.itertuples():
+                    brk.on_bar("EUR_USD", bar.open, bar.high, bar.low, bar.close, ts=bar.time.isoformat())
+                    curve.append(brk._state.equity)
+        return curve, _strip_ts(brk.snapshot())
+
+    bar_curve, bar_snap = run(replay=False)
+    replay_curve, replay_snap = run(replay=True)
+
+    assert sum(t["status"] == "closed" for t in bar_snap["history"]) >= 5
+    assert replay_curve == bar_curve
+    assert replay_snap == bar_snap
+    # The series is journaled as one record and replays to the same state
+    assert _strip_ts(journaled().snapshot()) == replay_snap
+
+
+# --- Per-instrument marks ---
+def test_paper_broker_marks_each_instrument_at_its_own_price(journaled):
+    brk = journaled()
+    brk.reset()
+    _buy(brk, stop_loss=None, take_profit=None)
+    _buy(brk, instrument="GBP_USD", side="sell", units=2000, stop_loss=None, take_profit=None)
+    brk.on_bar("EUR_USD", o=1.10, h=1.10, l=1.10, c=1.10)
+    brk.on_bar("GBP_USD", o=1.27, h=1.27, l=1.27, c=1.27)
+    eur_px = brk.snapshot()["positions"]["EUR_USD"]["avg_price"]
+    gbp_px = brk.snapshot()["positions"]["GBP_USD"]["avg_price"]
+
+    # A EUR_USD bar moves only the EUR_USD mark
+    brk.on_bar("EUR_USD", o=1.10, h=1.12, l=1.10, c=1.12)
+    cash = brk.snapshot()["cash"]
+    assert brk.last_price("GBP_USD") == 1.27
+    assert brk.equity() == pytest.approx(cash + 1000 * 1.12 - 2000 * 1.27)
+    assert brk.snapshot()["equity"] == pytest.approx(brk.equity())
+    assert brk.exposure() == pytest.approx(1000 * 1.12 + 2000 * 1.27)
+    assert brk.unrealized_pnl() == pytest.approx(1000 * (1.12 - eur_px) - 2000 * (1.27 - gbp_px))
+    assert brk.account()["open_positions"] == 2
+
+    # The incremental book survives a restart
+    brk.close()
+    restarted = journaled()
+    assert restarted.equity() == brk.equity()
+    assert restarted.exposure() == brk.exposure()
+
+
+# --- Event bus bars ---
+def test_paper_broker_applies_each_closed_bar_once_per_instrument(journaled):
+    brk = journaled()
+    brk.reset()
+    bar = dict(o=1.10, h=1.11, l=1.09, c=1.10)
+    assert brk.on_closed_bar("EUR_USD", "M5", "2026-01-05T10:55:00+00:00", *bar.values())
+    assert not brk.on_closed_bar("EUR_USD", "M5", "2026-01-05T10:55:00+00:00", *bar.values())  # seen by another decision
+    assert not brk.on_closed_bar("EUR_USD", "H1", "2026-01-05T10:00:00+00:00", *bar.values())  # ends with the M5 bar
+    assert brk.on_closed_bar("GBP_USD", "H1", "2026-01-05T10:00:00+00:00", *bar.values())
+    assert brk.on_closed_bar("EUR_USD", "M5", "2026-01-05T11:00:00+00:00", *bar.values())
+
+    brk.reset()
+    assert brk.on_closed_bar("EUR_USD", "M5", "2026-01-05T10:55:00+00:00", *bar.values())
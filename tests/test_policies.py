@@ -0,0 +1,126 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+from app.graph import build_trader_graph
+from app.policies import NodePolicy, policy_stats, risk_rule, strategy_rule
+
+
+def _summary(fast, slow, atr=0.001, close=None):
+    return {"indicators": {"ema_fast": fast, "ema_slow": slow, "atr": atr},
+            "last_n_closes": [slow, close if close is not None else slow]}
+
+
+@pytest.mark.parametrize("summary, preset", [
+    (_summary(1.1010, 1.1000), "trend_following"),                  # spread 1.0 ATR
+    (_summary(1.1000, 1.1010), "trend_following"),                  # downtrend
+    (_summary(1.1001, 1.1000, close=1.1030), "breakout"),           # close 3 ATR away, flat EMAs
+    (_summary(1.1001, 1.1000, close=1.1005), "mean_reversion"),     # flat, close nearby
+    (_summary(1.1003, 1.1000), None),                               # spread 0.3 ATR: ambiguous
+    ({"indicators": {"ema_fast": 1.1}}, None),                      # indicators missing
+])
+def test_strategy_rule(summary, preset):
+    decision = strategy_rule(summary)
+    assert (decision or {}).get("preset") == preset
+    if decision:
+        assert decision["rationale"]
+
+
+def test_strategy_rule_strict_decides_ambiguous_markets():
+    assert strategy_rule(_summary(1.1004, 1.1000), strict=True)["preset"] == "trend_following"
+    assert strategy_rule(_summary(1.1002, 1.1000), strict=True)["preset"] == "mean_reversion"
+
+
+def test_risk_rule_stops_follow_the_side(monkeypatch):
+    monkeypatch.setattr("app.tools.risk_tool.settings.risk.sl_buffer_atr", 1.5)
+    monkeypatch.setattr("app.tools.risk_tool.settings.risk.tp_buffer_atr", 2.0)
+    buy = risk_rule({"side": "buy", "units": 1000, "price": 1.1}, atr=0.005)
+    assert buy["stop_loss"] == pytest.approx(1.0925) and buy["take_profit"] == pytest.approx(1.11)
+    sell = risk_rule({"side": "sell", "units": 1000, "price": None}, atr=0.005, reference_price=1.1)
+    assert sell["stop_loss"] == pytest.approx(1.1075) and sell["take_profit"] == pytest.approx(1.09)
+
+    assert risk_rule({"side": "buy", "units": 1000, "price": 1.1}, atr=None) is None
+    assert risk_rule({"side": "flat", "units": 1000, "price": 1.1}, atr=0.005) is None
+    assert risk_rule({"side": "buy", "units": 0, "price": 1.1}, atr=0.005) is None
+
+
+@pytest.fixture
+def rules_graph(monkeypatch):
+    """A graph with real tool names; the agent proposes a buy when it sees the strategy answer."""
+    monkeypatch.setattr("app.graph.settings.decision_cache.enabled", False)
+    policy_stats.reset()
+    features = [_summary(1.1010, 1.1000)]
+
+    @tool
+    def get_candles(instrument: str, timeframe: str, count: int = 200):
+        """Fake features."""
+        return json.dumps({"instrument": instrument, "timeframe": timeframe, "features_digest": "d", **features[0]})
+
+    @tool
+    def propose_order(instrument: str, side: str, units: int):
+        """Fake proposal."""
+        return {"instrument": instrument, "side": side, "units": units, "price": None}
+
+    @tool
+    def attach_stops(order: dict, atr: float):
+        """Fake stops."""
+        return order
+
+    def agent_invoke(state):
+        order = {"instrument": "EUR_USD", "side": "buy", "units": 1000, "price": None}
+        return {"messages": state["messages"] + [
+            ToolMessage(content=json.dumps(order), name="propose_order", tool_call_id="c1"),
+            AIMessage(content=json.dumps({"action": "buy"})),
+        ]}
+
+    agent = MagicMock()
+    agent.invoke.side_effect = agent_invoke
+
+    def build(**modes):
+        with patch("app.graph.create_react_agent", return_value=agent):
+            return build_trader_graph(config={}, tools=[get_candles, propose_order, attach_stops], modes=modes).compile()
+
+    return build, agent, features
+
+
+def test_rules_mode_skips_strategy_and_risk_agents(rules_graph):
+    build, agent, _ = rules_graph
+    app = build(strategy="rules", risk="rules")
+    final = app.invoke({"messages": [HumanMessage(content="CandleCloseEvent EUR_USD M5")]})
+
+    assert agent.invoke.call_count == 2  # signal and exec only
+    assert json.loads(final["messages"][3].content)["preset"] == "trend_following"
+    order = json.loads(final["messages"][-3].content)
+    assert order["stop_loss"] < 1.1000 < order["take_profit"]  # priced at the last close
+    stats = policy_stats.stats()
+    assert stats["rules"] == 2 and stats["llm"] == 2 and stats["llm_avoided_share"] == 0.5
+
+
+def test_ambiguous_markets_escalate_to_the_agent(rules_graph):
+    build, agent, features = rules_graph
+    features[0] = _summary(1.1003, 1.1000)
+    app = build(strategy="rules-then-llm-on-ambiguity", risk="llm")
+    app.invoke({"messages": [HumanMessage(content="CandleCloseEvent EUR_USD M5")]})
+
+    assert agent.invoke.call_count == 4
+    assert policy_stats.stats()["nodes"]["strategy"] == {"rules": 0, "llm": 1, "escalated": 1, "llm_avoided_share": 0.0}
+
+
+def test_rules_mode_errors_without_features(rules_graph):
+    build, agent, features = rules_graph
+    features[0] = {"indicators": {}}
+    app = build(strategy="rules")
+    sequence = [list(u.keys())[0] for u in app.stream({"messages": [HumanMessage(content="CandleCloseEvent EUR_USD M5")]}, stream_mode="updates")]
+
+    assert sequence == ["strategy", "error_handler"]
+    assert agent.invoke.call_count == 0
+
+
+def test_only_strategy_and_risk_have_rules():
+    with pytest.raises(ValueError):
+        NodePolicy("signal", "rules")
+    with pytest.raises(ValueError):
+        NodePolicy("risk", "heuristic")
@@ -0,0 +1,128 @@
+import gzip
+import os
+import pytest
+from datetime import datetime, timezone
+
+import pyarrow.parquet as pq
+
+from app.retention import RetentionJob, COMPACTED_NAME
+from app.trace_store import ParquetTraceSink, TraceStore
+
+NOW = datetime(2024, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+@pytest.fixture
+def dirs(tmp_path):
+    trace_dir = tmp_path / "traces"
+    cache = tmp_path / "cache"
+    trace_dir.mkdir()
+    cache.mkdir()
+    return trace_dir, cache
+
+def _job(trace_dir, cache, **kwargs):
+    params = dict(rotate_days=5, compress_after_days=1, compression="gzip",
+                  cache_max_age_days=None, cache_max_bytes=None, max_files_per_run=100)
+    params.update(kwargs)
+    return RetentionJob(trace_dir=trace_dir, cache_path=cache, **params)
+
+def test_compresses_closed_days_and_expires_old(dirs):
+    """Test that closed days are gzipped, today is untouched and old days are deleted."""
+    trace_dir, cache = dirs
+    for day in ("2024-03-01", "2024-03-09", "2024-03-10"):
+        (trace_dir / f"{day}_actions.jsonl").write_text('{"event_type": "node_exit"}\n' * 200)
+        (trace_dir / f"{day}_actions.csv").write_text("ts_iso,run_id\n" + "x,y\n" * 200)
+
+    report = _job(trace_dir, cache).run(NOW)
+
+    names = sorted(p.name for p in trace_dir.iterdir())
+    assert names == [
+        "2024-03-09_actions.csv.gz", "2024-03-09_actions.jsonl.gz",
+        "2024-03-10_actions.csv", "2024-03-10_actions.jsonl",
+    ]
+    assert report.files_deleted == 2
+    assert report.files_compressed == 2
+    assert report.bytes_reclaimed > 0
+    assert report.runtime_ms >= 0
+    with gzip.open(trace_dir / "2024-03-09_actions.jsonl.gz", "rt") as f:
+        assert len(f.readlines()) == 200
+
+def test_compacts_and_expires_parquet_partitions(dirs):
+    """Test that closed-day Parquet partitions are merged into one file."""
+    trace_dir, cache = dirs
+    sink = ParquetTraceSink(lambda: trace_dir / "parquet", row_group_size=1)
+    for day in ("2024-03-01", "2024-03-09"):
+        for i in range(3):
+            sink.append({"ts_iso": f"{day}T10:0{i}:00+00:00", "run_id": f"r{i}", "decision_key": "EUR_USD_M5", "event_type": "node_exit"})
+
+    report = _job(trace_dir, cache).run(NOW)
+
+    part_dir = trace_dir / "parquet" / "date=2024-03-09" / "decision_key=EUR_USD_M5"
+    assert [p.name for p in part_dir.iterdir()] == [COMPACTED_NAME]
+    assert pq.read_table(part_dir / COMPACTED_NAME).num_rows == 3
+    assert not (trace_dir / "parquet" / "date=2024-03-01").exists()
+    assert report.partitions_compacted == 1
+    assert TraceStore(trace_dir / "parquet").latest_runs()["EUR_USD_M5"]["run_id"] == "r2"
+
+def test_prunes_cache_by_age_and_size(dirs):
+    """Test the candle cache policy: expired files first, then oldest until under the size cap."""
+    trace_dir, cache = dirs
+    for i in range(5):
+        p = cache / f"EUR_USD_M5_{i}.csv.gz"
+        p.write_bytes(b"x" * 1000)
+        mtime = NOW.timestamp() - (10 - i) * 86400  # i=0 is 10 days old, i=4 is 6 days old
+        os.utime(p, (mtime, mtime))
+
+    report = _job(trace_dir, cache, cache_max_age_days=7, cache_max_bytes=1500).run(NOW)
+
+    assert sorted(p.name for p in cache.iterdir()) == ["EUR_USD_M5_4.csv.gz"]
+    assert report.cache_files_deleted == 4
+    assert report.bytes_reclaimed == 4000
+
+def test_prunes_nested_cache_stores(dirs):
+    """Test that the stores' subdirectories are pruned, and the self-pruning LLM database is kept."""
+    trace_dir, cache = dirs
+    files = {
+        "candles/mock/EUR_USD_M5/part-20240301T000000-20240301T235500.csv.gz": 20,
+        "candles/mock/EUR_USD_M5/part-20240309T000000-20240309T235500.csv.gz": 2,
+        "features/mock/EUR_USD_M5.json": 9,
+        "indicator_state/mock/EUR_USD_M5.json": 1,
+        "mock_data/EUR_USD_M1-0123abcd.arrow": 3,
+        "llm/responses.sqlite": 30,
+        "llm/responses.sqlite-wal": 30,
+    }
+    for name, age_days in files.items():
+        p = cache / name
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(b"x" * 1000)
+        mtime = NOW.timestamp() - age_days * 86400
+        os.utime(p, (mtime, mtime))
+
+    report = _job(trace_dir, cache, cache_max_age_days=7, cache_max_bytes=2500).run(NOW)
+
+    kept = sorted(str(p.relative_to(cache)) for p in cache.rglob("*") if p.is_file())
+    # Expired: the old candle part and the features file; over the cap: the Arrow copy
+    assert kept == ["candles/mock/EUR_USD_M5/part-20240309T000000-20240309T235500.csv.gz",
+                    "indicator_state/mock/EUR_USD_M5.json", "llm/responses.sqlite", "llm/responses.sqlite-wal"]
+    assert report.cache_files_deleted == 3
+
+def test_incremental_budget(dirs):
+    """Test that a pass touches at most max_files_per_run files."""
+    trace_dir, cache = dirs
+    for d in range(1, 8):
+        (trace_dir / f"2024-03-0{d}_actions.jsonl").write_text("{}\n")
+
+    job = _job(trace_dir, cache, rotate_days=30, max_files_per_run=3)
+    assert job.run(NOW).files_compressed == 3
+    assert job.run(NOW).files_compressed == 3
+    assert job.run(NOW).files_compressed == 1
+    assert job.run(NOW).files_compressed == 0
+
+def test_zstd_compression(dirs):
+    """Test zstd archives when the optional zstandard package is installed."""
+    zstandard = pytest.importorskip("zstandard")
+    trace_dir, cache = dirs
+    (trace_dir / "2024-03-09_actions.jsonl").write_text('{"a": 1}\n' * 50)
+
+    _job(trace_dir, cache, compression="zstd").run(NOW)
+
+    data = (trace_dir / "2024-03-09_actions.jsonl.zst").read_bytes()
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(data) == b'{"a": 1}\n' * 50
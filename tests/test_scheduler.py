@@ -0,0 +1,188 @@
+import asyncio
+import time
+
+import pytest
+
+from app.scheduler import AsyncScheduler, AsyncThreadManager, TokenBucket
+
+
+class FakeRuns:
+    def __init__(self, run_seconds=0.05, fail_first_with=None):
+        self.run_seconds = run_seconds
+        self.fail_first_with = fail_first_with
+        self.created = []
+        self.active = 0
+        self.max_active = 0
+
+    async def create(self, thread_id, assistant_id, input=None, metadata=None):
+        if self.fail_first_with:
+            e, self.fail_first_with = self.fail_first_with, None
+            raise e
+        self.created.append((thread_id, metadata["instrument"], metadata["timeframe"]))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        return {"run_id": f"run-{len(self.created)}"}
+
+    async def join(self, thread_id, run_id):
+        await asyncio.sleep(self.run_seconds)
+        self.active -= 1
+        return {}
+
+
+class FakeThreads:
+    def __init__(self):
+        self.n = 0
+
+    async def create(self, metadata=None):
+        self.n += 1
+        return {"thread_id": f"thread-{self.n}"}
+
+    async def get(self, thread_id):
+        return {"thread_id": thread_id}
+
+
+class FakeClient:
+    def __init__(self, **kw):
+        self.runs = FakeRuns(**kw)
+        self.threads = FakeThreads()
+
+
+DECISIONS = [{"instrument": i, "timeframe": t} for i in ("EUR_USD", "GBP_USD", "USD_JPY") for t in ("M5", "H1")]
+
+
+async def _scheduler(tmp_path, client, **kw):
+    threads = AsyncThreadManager(client, tmp_path / "threads.json")
+    kw.setdefault("rate_per_second", 0)
+    return await AsyncScheduler(client, "asst", DECISIONS, threads, **kw).start()
+
+
+@pytest.mark.asyncio
+async def test_runs_fan_out_under_concurrency_limit(tmp_path):
+    client = FakeClient()
+    scheduler = await _scheduler(tmp_path, client, max_concurrency=2)
+    start = time.perf_counter()
+    for key in scheduler.decisions:
+        scheduler.trigger(key)
+    assert scheduler.report()["queue_depth"] == 6
+    await scheduler.drain()
+    elapsed = time.perf_counter() - start
+    await scheduler.stop()
+
+    assert len(client.runs.created) == 6
+    assert client.runs.max_active == 2
+    assert 0.15 <= elapsed < 0.5  # three waves of two runs, not six in a row
+    assert scheduler.stats.completed == 6
+    # One thread per decision key, created once
+    assert client.threads.n == 6
+
+
+@pytest.mark.asyncio
+async def test_triggers_coalesce_per_key(tmp_path):
+    client = FakeClient()
+    scheduler = await _scheduler(tmp_path, client, max_concurrency=4)
+    assert scheduler.trigger("EUR_USD_M5") == "queued"
+    assert scheduler.trigger("EUR_USD_M5") == "coalesced"
+    await asyncio.sleep(0.01)  # the run is now in flight
+    assert scheduler.trigger("EUR_USD_M5") == "pending"
+    assert scheduler.trigger("EUR_USD_M5") == "pending"
+    await scheduler.drain()
+    await scheduler.stop()
+
+    # One run for the first two triggers, one follow-up for the two that arrived mid-run
+    assert [c[1:] for c in client.runs.created] == [("EUR_USD", "M5")] * 2
+    assert client.runs.max_active == 1
+    assert scheduler.stats.coalesced == 2
+
+
+@pytest.mark.asyncio
+async def test_late_runs_are_skipped_or_run(tmp_path):
+    client = FakeClient()
+    scheduler = await _scheduler(tmp_path, client, deadline_seconds=5, late_policy="skip")
+    scheduler.trigger("EUR_USD_M5", due=time.time() - 60)
+    scheduler.trigger("GBP_USD_M5", due=time.time())
+    await scheduler.drain()
+    await scheduler.stop()
+    assert [c[1] for c in client.runs.created] == ["GBP_USD"]
+    assert scheduler.stats.skipped_late == 1
+
+    client = FakeClient()
+    scheduler = await _scheduler(tmp_path, client, deadline_seconds=5, late_policy="coalesce")
+    scheduler.trigger("EUR_USD_M5", due=time.time() - 60)
+    await scheduler.drain()
+    await scheduler.stop()
+    assert len(client.runs.created) == 1
+    assert scheduler.stats.late == 1 and scheduler.stats.skipped_late == 0
+
+
+@pytest.mark.asyncio
+async def test_stale_thread_is_recreated_on_404(tmp_path):
+    client = FakeClient(fail_first_with=Exception("404 Not Found: thread not found"))
+    scheduler = await _scheduler(tmp_path, client)
+    scheduler.trigger("EUR_USD_M5")
+    await scheduler.drain()
+    await scheduler.stop()
+    assert client.runs.created == [("thread-2", "EUR_USD", "M5")]
+    assert scheduler.stats.errors == 0
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_launches():
+    bucket = TokenBucket(rate=20, burst=2)
+    start = time.perf_counter()
+    for _ in range(4):
+        await bucket.acquire()
+    # Two from the burst, then one every 50 ms
+    assert 0.08 <= time.perf_counter() - start < 0.3
+
+
+def _ts(*args):
+    from datetime import datetime, timezone
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_next_bar_close_per_granularity():
+    from app.timeframes import next_bar_close
+
+    now = _ts(2026, 10, 14, 13, 7, 30)  # a Wednesday
+    assert next_bar_close("M1", now) == _ts(2026, 10, 14, 13, 8)
+    assert next_bar_close("M5", now) == _ts(2026, 10, 14, 13, 10)
+    assert next_bar_close("M15", now) == _ts(2026, 10, 14, 13, 15)
+    assert next_bar_close("H1", now) == _ts(2026, 10, 14, 14)
+    assert next_bar_close("H4", now) == _ts(2026, 10, 14, 16)
+    assert next_bar_close("D", now) == _ts(2026, 10, 15)
+    assert next_bar_close("D", now, daily_close_hour=21) == _ts(2026, 10, 14, 21)
+    assert next_bar_close("W", now) == _ts(2026, 10, 19)  # next Monday
+    assert next_bar_close("W", now, daily_close_hour=21, weekly_close_weekday=4) == _ts(2026, 10, 16, 21)
+    # Strictly after: at a close, the next one
+    assert next_bar_close("M5", _ts(2026, 10, 14, 13, 10)) == _ts(2026, 10, 14, 13, 15)
+
+
+def test_bar_aligned_schedule_fires_once_per_bar():
+    """Over one trading hour, each decision fires once per bar of its own timeframe."""
+    scheduler = AsyncScheduler(FakeClient(), "asst", [
+        {"instrument": "EUR_USD", "timeframe": "M5"},
+        {"instrument": "EUR_USD", "timeframe": "M15"},
+        {"instrument": "GBP_USD", "timeframe": "H1"},
+    ])
+    start = _ts(2026, 10, 14, 13, 0, 1)
+    heap = scheduler.bar_deadlines(start)
+    fired = {key: [] for key in scheduler.decisions}
+    while heap[0][0] <= start + 3600:
+        close = heap[0][0]
+        for key in scheduler.pop_due(heap, close):
+            fired[key].append(close)
+
+    assert len(fired["EUR_USD_M5"]) == 12
+    assert len(fired["EUR_USD_M15"]) == 4
+    assert fired["GBP_USD_H1"] == [_ts(2026, 10, 14, 14)]
+
+
+def test_bar_aligned_schedule_skips_weekend_and_stalls():
+    scheduler = AsyncScheduler(FakeClient(), "asst", [{"instrument": "EUR_USD", "timeframe": "H1"}])
+    heap = scheduler.bar_deadlines(_ts(2026, 10, 16, 20, 30))  # Friday evening
+    assert scheduler.pop_due(heap, _ts(2026, 10, 16, 21)) == ["EUR_USD_H1"]  # last bar of the week
+    assert scheduler.pop_due(heap, _ts(2026, 10, 16, 22)) == []              # market closed
+
+    # After a long stall, the next deadline is the next close to come, not the missed ones
+    scheduler.pop_due(heap, _ts(2026, 10, 19, 9, 30))
+    assert heap[0][0] == _ts(2026, 10, 19, 10)
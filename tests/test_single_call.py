@@ -0,0 +1,90 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool
+
+from app.graph import build_trader_graph
+from app.tools.data_models import TradeDecision
+
+EVENT = {"messages": [HumanMessage(content="CandleCloseEvent EUR_USD M5")]}
+
+
+@pytest.fixture
+def single_call(monkeypatch):
+    """A single_call graph with fake tools and an LLM answering `answer[0]`."""
+    answer = [TradeDecision(preset="trend_following", rationale="up", action="sell", units=500, stop_loss_atr=1.0, take_profit_atr=2.0)]
+    executed = []
+
+    @tool
+    def get_candles(instrument: str, timeframe: str, count: int = 200):
+        """Fake features."""
+        return json.dumps({"instrument": instrument, "timeframe": timeframe, "last_n_closes": [1.1],
+                           "indicators": {"ema_fast": 1.1, "ema_slow": 1.1, "atr": 0.01}, "features_digest": "d"})
+
+    @tool
+    def execute_order(order: dict):
+        """Fake broker."""
+        executed.append(order)
+        return json.dumps({"status": "filled"})
+
+    llm = MagicMock()
+    llm.with_structured_output.return_value = RunnableLambda(lambda messages: answer[0])
+
+    def build():
+        with patch("app.single_call.make_llm", return_value=llm):
+            return build_trader_graph(config={}, tools=[get_candles, execute_order], topology="single_call").compile()
+
+    return build, answer, executed
+
+
+def test_one_llm_call_then_deterministic_stops_and_execution(single_call):
+    build, _, executed = single_call
+    app = build()
+    sequence = [list(u.keys())[0] for u in app.stream(EVENT, stream_mode="updates")]
+
+    assert sequence == ["features", "decide", "risk", "exec"]
+    order = executed[0]
+    assert order["side"] == "sell" and order["units"] == 500
+    assert order["stop_loss"] == pytest.approx(1.11) and order["take_profit"] == pytest.approx(1.08)
+
+
+def test_hold_ends_after_the_decision(single_call):
+    build, answer, executed = single_call
+    answer[0] = TradeDecision(preset="mean_reversion", rationale="flat", action="hold")
+    sequence = [list(u.keys())[0] for u in build().stream(EVENT, stream_mode="updates")]
+
+    assert sequence == ["features", "decide"]
+    assert executed == []
+
+
+def test_fake_server_answers_the_structured_call(monkeypatch, tmp_path):
+    """End to end through ChatOpenAI's structured output, against the local fake server."""
+    from app.llm import invalidate_llm_cache
+    from scripts.fake_openai_server import served, start
+
+    server, base_url = start(latency_ms=0)
+    monkeypatch.setattr("app.settings.settings.llm.base_url", base_url)
+    monkeypatch.setattr("app.settings.settings.llm_cache.backend", "none")
+    invalidate_llm_cache()
+    try:
+        @tool
+        def get_candles(instrument: str, timeframe: str, count: int = 200):
+            """Fake features."""
+            return json.dumps({"instrument": instrument, "last_n_closes": [1.1], "indicators": {"atr": 0.01}})
+
+        @tool
+        def execute_order(order: dict):
+            """Fake broker."""
+            return json.dumps({"status": "filled", "order": order})
+
+        before = served["requests"]
+        app = build_trader_graph(config={}, tools=[get_candles, execute_order], topology="single_call").compile()
+        final = app.invoke(EVENT)
+        assert served["requests"] - before == 1
+        assert json.loads(final["messages"][-1].content)["status"] == "filled"
+    finally:
+        server.shutdown()
+        invalidate_llm_cache()
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.tools import indicators
+from app.tools.feature_registry import columns_for, preset_view
+from app.tools.indicator_state import IndicatorSet
+from app.tools.ta_tool import PRESETS, compute_indicators
+
+
+def _frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.001, n))
+    return pd.DataFrame({
+        "time": pd.date_range("2026-01-05", periods=n, freq="5min", tz="UTC"),
+        "open": close, "high": close + rng.random(n) * 0.001, "low": close - rng.random(n) * 0.001, "close": close,
+    })
+
+
+def _expected(df, preset):
+    """The preset's columns per pandas_ta's definitions, spelled out in pandas."""
+    c, h, l = df["close"], df["high"], df["low"]
+
+    def ema(n):
+        seeded = c.copy()
+        seeded.iloc[:n - 1] = np.nan
+        seeded.iloc[n - 1] = c.iloc[:n].mean()
+        return seeded.ewm(span=n, adjust=False).mean()
+
+    def rma(s, n):
+        return s.ewm(alpha=1 / n, min_periods=n).mean()
+
+    prev = c.shift(1)
+    tr = pd.concat([h - l, (h - prev).abs(), (l - prev).abs()], axis=1).max(axis=1)
+    tr.iloc[0] = np.nan
+    out = {}
+    if preset == "mean_reversion":
+        mid, std = c.rolling(20).mean(), c.rolling(20).std(ddof=0)
+        lower, upper = mid - 2 * std, mid + 2 * std
+        diff = c.diff()
+        gains, losses = rma(diff.clip(lower=0), 14), rma(-diff.clip(upper=0), 14)
+        out.update({"BBL_20_2.0": lower, "BBM_20_2.0": mid, "BBU_20_2.0": upper,
+                    "BBB_20_2.0": 100 * (upper - lower) / mid, "BBP_20_2.0": (c - lower) / (upper - lower),
+                    "rsi": 100 * gains / (gains + losses)})
+    else:
+        fast, slow = (20, 50) if preset == "trend_following" else (12, 26)
+        out.update({"ema_fast": ema(fast), "ema_slow": ema(slow)})
+        if preset == "breakout":
+            lower, upper = l.rolling(20).min(), h.rolling(20).max()
+            out.update({"DCL_20_20": lower, "DCM_20_20": (lower + upper) / 2, "DCU_20_20": upper})
+    out["atr"] = rma(tr, 14)
+    return pd.DataFrame(out)
+
+
+@pytest.mark.parametrize("preset", PRESETS)
+def test_preset_columns_match_pandas_ta_definitions(preset):
+    df = _frame(500)
+    out = compute_indicators(df, preset)
+    expected = _expected(df, preset)
+
+    assert list(out.columns) == list(df.columns) + list(expected.columns)
+    pd.testing.assert_frame_equal(out[expected.columns], expected, rtol=1e-10)
+
+
+@pytest.mark.parametrize("preset", PRESETS)
+def test_matches_pandas_ta_when_installed(preset):
+    ta = pytest.importorskip("pandas_ta")
+    df = _frame(500)
+    c, h, l = df["close"], df["high"], df["low"]
+    ref = {"atr": ta.atr(h, l, c, length=14)}
+    if preset == "mean_reversion":
+        ref.update(ta.bbands(c, length=20).to_dict("series"))
+        ref["rsi"] = ta.rsi(c, length=14)
+    else:
+        fast, slow = (20, 50) if preset == "trend_following" else (12, 26)
+        ref.update({"ema_fast": ta.ema(c, length=fast), "ema_slow": ta.ema(c, length=slow)})
+        if preset == "breakout":
+            ref.update(ta.donchian(h, l, lower_length=20, upper_length=20).to_dict("series"))
+    out = compute_indicators(df, preset)
+    for col, series in ref.items():
+        np.testing.assert_allclose(out[col], series, rtol=1e-8, equal_nan=True, err_msg=col)
+
+
+@pytest.mark.parametrize("preset", PRESETS)
+def test_streaming_state_agrees_with_the_kernels(preset):
+    df = _frame(300, seed=3)
+    ind = IndicatorSet(columns_for([preset]))
+    for i, row in enumerate(df.itertuples()):
+        ind.update(i, row.high, row.low, row.close)
+    latest = compute_indicators(df, preset).iloc[-1]
+    values = preset_view(ind.values(), preset)
+    assert values == pytest.approx({k: latest[k] for k in values}, rel=1e-9)
+
+
+def test_rolling_windows_are_chunked(monkeypatch):
+    monkeypatch.setattr(indicators, "_CHUNK", 7)
+    panel = np.stack([_frame(100, seed)["close"].to_numpy() for seed in range(3)])
+    for row in range(3):
+        expected = pd.Series(panel[row]).rolling(20).std(ddof=0)
+        np.testing.assert_allclose(indicators.stdev(panel, 20)[row], expected, rtol=1e-10, equal_nan=True)
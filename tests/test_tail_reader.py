@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.settings import settings
+from app.tools import data_mock, tail_reader as tr
+from app.tools.candle_store import CandleStore
+
+
+def _history(n):
+    rng = np.random.default_rng(0)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.001, n))
+    return pd.DataFrame({"Time": pd.date_range("2020-01-01", periods=n, freq="1min").strftime("%Y-%m-%d %H:%M:%S"),
+                         "Open": close, "High": close + 0.001, "Low": close - 0.001, "Close": close})
+
+
+def _full(path, count):
+    """What data_mock used to do: parse the whole file, then keep the tail."""
+    return tr.standardize(pd.read_csv(path), path).tail(count).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("count", [1, 200, 5000, 20000])
+def test_csv_tail_matches_a_full_read(tmp_path, monkeypatch, count):
+    monkeypatch.setattr(tr, "BLOCK_BYTES", 4096)  # many blocks
+    path = tmp_path / "EUR_USD_M1.csv"
+    _history(10000).to_csv(path, index=False)
+    pd.testing.assert_frame_equal(tr.read_csv_tail(path, count), _full(path, count))
+
+
+def test_csv_tail_edge_cases(tmp_path):
+    path = tmp_path / "h.csv"
+    df = _history(300)
+    df["Close"] = df["Close"].astype(object)
+    df.loc[295:298, "Close"] = "n/a"  # unusable rows near the end: the tail reads further back
+    path.write_bytes(df.to_csv(index=False, lineterminator="\r\n").encode().rstrip(b"\r\n"))  # CRLF, no final newline
+    pd.testing.assert_frame_equal(tr.read_csv_tail(path, 10), _full(path, 10))
+
+    header_only = tmp_path / "empty.csv"
+    header_only.write_text("time,open,high,low,close\n")
+    assert tr.read_csv_tail(header_only, 5).empty
+
+
+def test_parquet_reads_only_the_last_row_groups(tmp_path, monkeypatch):
+    path = tmp_path / "h.parquet"
+    pq.write_table(pa.Table.from_pandas(_history(1000)), path, row_group_size=100)
+    read = []
+    original = pq.ParquetFile.read_row_groups
+    monkeypatch.setattr(pq.ParquetFile, "read_row_groups", lambda self, groups, **kw: read.append(groups) or original(self, groups, **kw))
+
+    out = tr.read_parquet_tail(path, 150)
+    assert read == [[8, 9]]
+    pd.testing.assert_frame_equal(out, tr.standardize(_history(1000), path).tail(150).reset_index(drop=True))
+
+
+def test_arrow_copy_is_built_once_and_rebuilt_when_the_source_changes(tmp_path):
+    path = tmp_path / "h.csv"
+    _history(50000).to_csv(path, index=False)
+    reader = tr.TailReader(max_windows=0, copies=tr.ArrowCopies(root=tmp_path / "copies"))
+
+    first = reader.read(path, 200, mode="arrow")
+    pd.testing.assert_frame_equal(first, _full(path, 200))
+    reader.read(path, 300, mode="arrow")
+    assert reader.stats()["arrow_builds"] == 1
+
+    _history(50010).to_csv(path, index=False)
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+    pd.testing.assert_frame_equal(reader.read(path, 200, mode="arrow"), _full(path, 200))
+    assert reader.stats()["arrow_builds"] == 2
+
+
+def test_windows_lru_and_data_mock_csv_source(tmp_path, monkeypatch):
+    path = tmp_path / "EUR_USD_M5.csv"
+    _history(5000).to_csv(path, index=False)
+    reader = tr.TailReader(max_windows=4)
+    monkeypatch.setattr(data_mock, "tail_reader", reader)
+    monkeypatch.setattr(data_mock, "candle_store", CandleStore(root=tmp_path / "candles"))
+    monkeypatch.setattr(settings.data, "cache_format", "none")
+    monkeypatch.setattr(settings, "mock_data", {"source": "csv", "csv_files": {"EUR_USD": str(path)}})
+
+    df = data_mock._from_csv("EUR_USD", 200)
+    data_mock._from_csv("EUR_USD", 200)
+    assert reader.stats()["hits"] == 1 and reader.stats()["reads"] == 1
+    pd.testing.assert_frame_equal(df, _full(path, 200))
+
+    df, _ = data_mock.frame("EUR_USD", "M5", 100)
+    assert len(df) == 100
+    assert data_mock._from_csv("GBP_USD", 200).empty  # no file configured
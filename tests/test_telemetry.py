@@ -92,3 +92,130 @@ def test_tracer_file_rotation(monkeypatch, tmp_path):
         tracer2.log({"event_type": "event2"})
 
     assert (tmp_path / "traces" / "2024-01-02_actions.csv").exists()
+
+@pytest.fixture
+def background_tracer(monkeypatch, tmp_path):
+    """A tracer configured with the background writer, pointed at a temp dir."""
+    Tracer._instance = None
+    monkeypatch.setattr(settings.telemetry, "tracing_provider", "local_both")
+    monkeypatch.setattr(settings.telemetry.local, "writer", "background")
+    monkeypatch.setattr(settings.telemetry.local, "flush_interval_ms", 50)
+    monkeypatch.setattr(settings.telemetry.local, "max_batch_size", 4)
+    t = Tracer()
+    t.local_path = tmp_path / "traces"
+    yield t
+    t.close()
+    Tracer._instance = None
+
+def test_background_writer_batches_and_flushes(background_tracer):
+    """Test that queued events end up in both files once flushed."""
+    for i in range(10):
+        background_tracer.log({"event_type": "node_enter", "node": f"n{i}", "input": {"i": i}})
+
+    assert background_tracer.flush(timeout=5)
+
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    jsonl_lines = (background_tracer.local_path / f"{today}_actions.jsonl").read_text().splitlines()
+    csv_lines = (background_tracer.local_path / f"{today}_actions.csv").read_text().splitlines()
+
+    assert [json.loads(l)["node"] for l in jsonl_lines] == [f"n{i}" for i in range(10)]
+    assert len(csv_lines) == 11  # header + rows
+    assert "ts_iso" in csv_lines[0]
+
+    stats = background_tracer.stats()
+    assert stats["writer"] == "background"
+    assert stats["written"] == 10
+    assert stats["batches"] >= 3  # max_batch_size=4
+    assert stats["dropped"] == 0
+
+def test_background_writer_drops_when_full(monkeypatch, tmp_path):
+    """Test the drop policy counts events rejected by a full queue."""
+    from app.telemetry import TraceWriter
+    import threading
+
+    gate = threading.Event()
+    owner = MagicMock(csv_headers=["ts_iso"], _paths_for_day=lambda day: (None, None))
+    monkeypatch.setattr(TraceWriter, "_write_batch", lambda self, events: gate.wait())
+
+    writer = TraceWriter(owner, queue_size=2, max_batch_size=1, flush_interval_ms=0, queue_full_policy="drop")
+    results = [writer.submit(("2024-01-01", {"n": i}, None)) for i in range(10)]
+    gate.set()
+    writer.close()
+
+    assert results.count(False) == writer.dropped
+    assert writer.dropped >= 7
+
+def test_sanitize_memoizes_messages(tracer, monkeypatch):
+    """Test that each message is converted once and reused across events."""
+    from langchain_core.messages import HumanMessage, AIMessage
+    import app.telemetry as telemetry_module
+
+    calls = []
+    real_messages_to_dict = telemetry_module.messages_to_dict
+    monkeypatch.setattr(telemetry_module, "messages_to_dict", lambda msgs: calls.append(1) or real_messages_to_dict(msgs))
+
+    history = [HumanMessage(content="start"), AIMessage(content="reply", id="ai-1")]
+    first = tracer._sanitize_for_json({"input": {"messages": history}})
+    history.append(AIMessage(content="next", id="ai-2"))
+    second = tracer._sanitize_for_json({"input": {"messages": history}})
+
+    assert len(calls) == 3
+    assert second["input"]["messages"][:2] == first["input"]["messages"]
+    # A re-created message with the same id hits the memo too
+    tracer._sanitize_for_json(AIMessage(content="reply", id="ai-1"))
+    assert len(calls) == 3
+
+def test_sanitize_payload_cap_keeps_newest(tracer):
+    """Test that the payload cap truncates the oldest list items first."""
+    tracer.max_payload_bytes = 200
+    sanitized = tracer._sanitize_for_json({"input": {"messages": [f"message-{i}" * 5 for i in range(100)]}})
+
+    messages = sanitized["input"]["messages"]
+    assert messages[0].endswith("earlier items truncated>")
+    assert messages[-1] == "message-99" * 5
+    assert len(json.dumps(sanitized)) < 600
+
+def test_digest_matches_str_prefix(tracer):
+    """Test that the streaming digest equals the old str(payload)[:200]."""
+    payload = {"messages": [{"type": "human", "data": {"content": "x" * 500}}], "n": 1.5, "none": None}
+    assert tracer._digest(payload) == str(payload)[:200]
+    assert tracer._digest("plain text") == "plain text"
+
+def test_tracer_parquet_provider(monkeypatch, tmp_path):
+    """Test that the local_parquet provider writes queryable Parquet traces."""
+    from app.trace_store import TraceStore
+
+    Tracer._instance = None
+    monkeypatch.setattr(settings.telemetry, "tracing_provider", "local_parquet")
+    t = Tracer()
+    t.local_path = tmp_path / "traces"
+
+    t.log({"event_type": "node_exit", "node": "strategy", "run_id": "r1", "decision_key": "EUR_USD_M5", "status": "ok", "latency_ms": 12.0})
+    t.flush()
+    Tracer._instance = None
+
+    assert not list(t.local_path.glob("*_actions.*"))
+    assert TraceStore(t.local_path / "parquet").latest_runs()["EUR_USD_M5"]["run_id"] == "r1"
+
+def test_background_writer_writes_idle_parquet_partitions(monkeypatch, tmp_path):
+    """Test that a partition that stops getting events is written once it comes of age, without a flush."""
+    import time
+    from app.telemetry import TraceWriter
+
+    Tracer._instance = None
+    monkeypatch.setattr(settings.telemetry, "tracing_provider", "local_parquet")
+    monkeypatch.setattr(settings.telemetry.local, "writer", "background")
+    monkeypatch.setattr(settings.telemetry.local, "flush_interval_ms", 10)
+    monkeypatch.setattr(settings.telemetry.local, "parquet_flush_interval_ms", 100)
+    monkeypatch.setattr(TraceWriter, "idle_tick", 0.02)
+    t = Tracer()
+    t.local_path = tmp_path / "traces"
+    try:
+        t.log({"event_type": "node_exit", "node": "risk", "run_id": "r1", "decision_key": "EUR_USD_M5", "status": "ok"})
+        deadline = time.monotonic() + 5
+        while t._parquet.files_written == 0 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert t._parquet.files_written == 1 and t._parquet.buffered_rows() == 0
+    finally:
+        t.close()
+        Tracer._instance = None
@@ -43,3 +43,64 @@ def test_attach_stops():
     assert "take_profit" in result
     assert result["stop_loss"] == pytest.approx(1.0925)
     assert result["take_profit"] == pytest.approx(1.1100)
+
+    sell = attach_stops.invoke({"order": {"side": "sell", "price": 1.1000}, "atr": 0.0050, "sl_mult": 1.5, "tp_mult": 2.0})
+    assert sell["stop_loss"] == pytest.approx(1.1075)
+    assert sell["take_profit"] == pytest.approx(1.0900)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cache_format", ["csv", "parquet", "none"])
+async def test_get_candles_feeds_paper_broker_from_memory(tmp_path, monkeypatch, cache_format):
+    """Test that the paper broker gets the last closed bar over the event bus, with its time, in every cache format."""
+    from app.events import EventBus
+    from app.tools import broker_paper, data_mock
+    from app.tools.candle_store import CandleStore
+
+    event_bus = EventBus()
+    broker = MagicMock()
+    monkeypatch.setattr("app.tools.standard.settings.data.provider", "mock")
+    monkeypatch.setattr("app.tools.standard.settings.data.cache_format", cache_format)
+    monkeypatch.setattr("app.tools.standard.settings.broker_provider", "paper")
+    monkeypatch.setattr("app.tools.standard.bus", event_bus)
+    monkeypatch.setattr(broker_paper, "bus", event_bus)
+    monkeypatch.setattr(broker_paper, "PaperBroker", MagicMock(return_value=broker))
+    monkeypatch.setattr(data_mock, "candle_store", CandleStore(root=tmp_path / "candles"))
+
+    result = json.loads(await get_candles.ainvoke({"instrument": "EUR_USD", "timeframe": "M5", "count": 50}))
+    await get_candles.ainvoke({"instrument": "EUR_USD", "timeframe": "M5", "count": 50})
+
+    assert "last_bar" not in result
+    assert broker.on_closed_bar.call_count == 2  # the broker itself skips the repeated bar
+    assert broker.on_closed_bar.call_args_list[0] == broker.on_closed_bar.call_args
+    instrument, timeframe, bar_time, o, h, l, c = broker.on_closed_bar.call_args.args
+    assert (instrument, timeframe) == ("EUR_USD", "M5") and bar_time is not None
+    assert c == pytest.approx(result["last_n_closes"][-1])
+    assert l <= min(o, c) and h >= max(o, c)
+
+def test_event_bus_isolates_handler_errors():
+    """Test that a failing subscriber does not stop delivery to the others."""
+    from app.events import CandleCloseEvent, EventBus
+
+    event_bus, seen = EventBus(), []
+    def boom(ev):
+        raise RuntimeError("boom")
+    event_bus.subscribe(CandleCloseEvent, boom)
+    event_bus.subscribe(CandleCloseEvent, seen.append)
+    event_bus.subscribe(CandleCloseEvent, seen.append)  # idempotent
+
+    assert event_bus.publish(CandleCloseEvent("EUR_USD", "M5")) == 2
+    assert [e.instrument for e in seen] == ["EUR_USD"]
+
+@pytest.mark.asyncio
+async def test_execute_order_awaits_broker_in_running_loop(monkeypatch):
+    """Test that the async path of execute_order awaits the OANDA broker instead of nesting a loop."""
+    async def place_order(order):
+        return {"orderFillTransaction": {"id": "42"}}
+
+    monkeypatch.setattr("app.tools.standard.settings.broker_provider", "oanda")
+    monkeypatch.setattr("app.tools.standard.guardrails_pass", lambda *a: (True, ""))
+    monkeypatch.setattr("app.tools.broker_oanda.place_order", place_order)
+
+    order = {"instrument": "EUR_USD", "side": "buy", "units": 1000, "entry_type": "market"}
+    result = json.loads(await execute_order.ainvoke({"order": order}))
+    assert result == {"orderFillTransaction": {"id": "42"}}
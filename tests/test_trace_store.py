@@ -0,0 +1,105 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from app.trace_store import ParquetTraceSink, TraceStore
+
+BASE = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+def _event(minutes: int, run_id: str, decision_key: str, event_type: str, node: str, **extra):
+    return {
+        "ts_iso": (BASE + timedelta(minutes=minutes)).isoformat(),
+        "run_id": run_id,
+        "decision_key": decision_key,
+        "event_type": event_type,
+        "node": node,
+        **extra,
+    }
+
+def _run(minutes: int, run_id: str, decision_key: str, latency: float, signal_error: bool = False):
+    events = [
+        _event(minutes, run_id, decision_key, "node_enter", "strategy", prompt_id="decide_strategy__v1", prompt_version=1.3),
+        _event(minutes, run_id, decision_key, "node_exit", "strategy", status="ok", latency_ms=latency,
+               output={"messages": [{"type": "ai", "data": {"content": f"preset from {run_id}"}}]}),
+    ]
+    if signal_error:
+        events.append(_event(minutes, run_id, decision_key, "node_exit", "signal", status="error", error_type="ReadTimeout"))
+    else:
+        events.append(_event(minutes, run_id, decision_key, "node_exit", "signal", status="ok", latency_ms=latency * 2))
+    return events
+
+@pytest.fixture
+def store(tmp_path):
+    """A store populated with two days of runs for two decision keys."""
+    root = tmp_path / "parquet"
+    sink = ParquetTraceSink(lambda: root, row_group_size=1000)
+    for i in range(10):
+        for e in _run(i * 5, f"eur-{i}", "EUR_USD_M5", latency=100 + i):
+            sink.append(e)
+    for e in _run(24 * 60, "gbp-0", "GBP_USD_M15", latency=50, signal_error=True):
+        sink.append(e)
+    sink.flush()
+    return TraceStore(root)
+
+def test_sink_writes_hive_partitions(store):
+    """Test that rows land in date/decision_key partitions."""
+    partitions = sorted(p.relative_to(store.root).as_posix() for p in store.root.glob("date=*/decision_key=*"))
+    assert partitions == ["date=2024-03-01/decision_key=EUR_USD_M5", "date=2024-03-02/decision_key=GBP_USD_M15"]
+
+def test_latest_runs_per_decision_key(store):
+    """Test that the latest run and its node results are returned per key."""
+    latest = store.latest_runs()
+
+    assert set(latest) == {"EUR_USD_M5", "GBP_USD_M15"}
+    assert latest["EUR_USD_M5"]["run_id"] == "eur-9"
+    assert latest["EUR_USD_M5"]["nodes"]["strategy"] == "preset from eur-9"
+    assert latest["EUR_USD_M5"]["prompt_id"] == "decide_strategy__v1"
+    assert latest["GBP_USD_M15"]["nodes"]["signal"] == "ERROR: ReadTimeout"
+
+    # A time range that only covers the first day
+    first_day = store.latest_runs(end=BASE + timedelta(hours=12))
+    assert set(first_day) == {"EUR_USD_M5"}
+
+def test_node_latency_percentiles(store):
+    """Test latency percentiles over successful node exits."""
+    stats = store.node_latency_percentiles(end=BASE + timedelta(hours=12), percentiles=(50, 100))
+    assert stats["strategy"]["p50"] == pytest.approx(104.5)
+    assert stats["strategy"]["p100"] == pytest.approx(109)
+    assert stats["strategy"]["count"] == 10
+    assert stats["signal"]["p100"] == pytest.approx(218)
+
+def test_error_counts(store):
+    """Test error counts grouped by node and by decision key."""
+    assert store.error_counts() == {"signal": 1}
+    assert store.error_counts(by="decision_key") == {"GBP_USD_M15": 1}
+    assert store.error_counts(end=BASE + timedelta(hours=12)) == {}
+
+def test_empty_store(tmp_path):
+    """Test that queries against a missing directory return empty results."""
+    store = TraceStore(tmp_path / "missing")
+    assert store.latest_runs() == {}
+    assert store.node_latency_percentiles() == {}
+    assert store.error_counts() == {}
+
+def test_sink_buffers_per_partition_and_rolls_by_size_or_age(tmp_path, monkeypatch):
+    """Test that small batches accumulate into one file per partition until a roll trigger."""
+    root = tmp_path / "parquet"
+    now = [1000.0]
+    monkeypatch.setattr("app.trace_store.time.monotonic", lambda: now[0])
+    sink = ParquetTraceSink(lambda: root, row_group_size=100, flush_interval_ms=60_000)
+
+    for i in range(12):  # a run's events every few seconds, through the background writer
+        sink.write(_run(i, f"eur-{i}", "EUR_USD_M5", latency=100))
+        now[0] += 4
+    assert sink.files_written == 0 and sink.buffered_rows() == 36
+
+    now[0] += 20  # the oldest buffered row is now a minute old
+    sink.write(_run(12, "gbp-0", "GBP_USD_M15", latency=50))
+    assert sink.files_written == 1 and sink.buffered_rows() == 3
+    assert len(list(root.glob("date=*/decision_key=EUR_USD_M5/*.parquet"))) == 1
+
+    small = ParquetTraceSink(lambda: root, row_group_size=1000, flush_interval_ms=60_000, roll_bytes=500)
+    small.write(_run(0, "big", "USD_JPY_M5", latency=1))
+    assert small.files_written == 1
+
+    sink.flush()
+    assert TraceStore(root).latest_runs()["GBP_USD_M15"]["run_id"] == "gbp-0"